@@ -4,7 +4,9 @@ Arquivo: app/__init__.py
 """
 from flask import Flask
 from config import config
-from app.modules.analise_visual_receitas import registrar_modulo
+from app.modules.compressao_etag import registrar_compressao_etag
+from app.modules.cache_resultados import registrar_cache_resultados
+from app.modules.json_rapido import ProvedorJSON
 from .db_manager import db_manager
 
 def create_app(config_name='default'):
@@ -13,12 +15,21 @@ def create_app(config_name='default'):
     # Criar instância do Flask
     app = Flask(__name__)
 
+    # Serialização JSON (orjson quando instalado; entende Decimal, datas e NumPy)
+    app.json = ProvedorJSON(app)
+
     # Carregar configurações
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
 
     db_manager.init_app(app)
 
+    # Compressão das respostas e 304 para consultas repetidas sem mudança nos dados
+    registrar_compressao_etag(app)
+
+    # Resultados dos relatórios pesados gravados em disco e reaproveitados por todos os workers
+    registrar_cache_resultados(app)
+
     # Registrar blueprints
     from app.routes.main import main as main_blueprint
     app.register_blueprint(main_blueprint)
@@ -69,6 +80,7 @@ def create_app(config_name='default'):
     from app.modules.comparativo_mensal_acumulado import comparativo_mensal
     app.register_blueprint(comparativo_mensal, url_prefix='/comparativo-mensal')
 
+    from app.modules.analise_visual_receitas import registrar_modulo
     registrar_modulo(app)
 
     # Registrar filtros customizados para o Jinja2
@@ -1,20 +1,25 @@
 # app/db_manager.py
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
 from app.modules.database_duckdb import db_duckdb
-from app.modules.database import db as db_postgres
-import pandas as pd
-from sqlalchemy import text
+from app.modules.consultas import Consulta, converter_interrogacoes
+from app.modules.datatables import LIMITE_VALORES_FILTRO, sql_valores_coluna
 
 class DBManager:
     """
     Gerente de Conexão que escolhe o banco de dados (DuckDB ou PostgreSQL)
     com base no ambiente da aplicação (desenvolvimento ou produção).
+
+    SQLAlchemy, psycopg2 e pandas só são importados quando o PostgreSQL é
+    usado: em desenvolvimento a aplicação sobe sem carregá-los.
     """
     def __init__(self):
         self.db_engine = None
         self.is_duckdb = True
+        self._executor = None
+        self.max_workers = int(os.getenv('DB_MAX_WORKERS', 4))
 
     def init_app(self, app):
         """Inicializa o gerente com base na configuração do Flask."""
@@ -24,44 +29,170 @@ class DBManager:
                 self.is_duckdb = True
             else:
                 print("🚀 Ambiente de Produção: Usando PostgreSQL.")
+                from app.modules.database import db as db_postgres
                 self.db_engine = db_postgres.engine
                 self.is_duckdb = False
 
+    def reiniciar_apos_fork(self):
+        """
+        Chamado em cada worker logo após o fork (hook post_fork do gunicorn).
+        As threads do pool do mestre não existem no processo filho, e as
+        conexões do pool do SQLAlchemy abertas pelo mestre não podem ser
+        compartilhadas: o worker cria as suas sob demanda. O mesmo vale para
+        a conexão de leitura do DuckDB, aberta no mestre pelo
+        dimensoes.carregar() do when_ready.
+        """
+        self._executor = None
+        db_duckdb.reiniciar_apos_fork()
+        if self.db_engine is not None:
+            self.db_engine.dispose(close=False)
+
+    @property
+    def dialeto(self):
+        """Nome do dialeto ativo, usado para escolher a versão compilada das consultas."""
+        return 'duckdb' if self.is_duckdb else 'postgres'
+
     def execute_query(self, query, params=None):
         """
         Executa uma query SELECT e retorna os resultados como uma lista de dicionários,
         unificando o comportamento do DuckDB e do PostgreSQL.
+
+        `query` pode ser um texto SQL ou uma Consulta registrada em app.modules.consultas;
+        nesse caso `params` é um dicionário com os parâmetros nomeados.
+        """
+        if isinstance(query, Consulta):
+            compilada, valores = query.preparar(self.dialeto, params)
+            if self.is_duckdb:
+                return self._executar_duckdb(compilada.sql, valores)
+            return self._executar_postgres(compilada.texto, valores)
+
+        if self.is_duckdb:
+            # DuckDB espera uma LISTA de parâmetros para os '?'
+            return self._executar_duckdb(query, params)
+
+        # PostgreSQL com SQLAlchemy
+        if params and isinstance(params, list):
+            # Converter placeholders ? para :param1, :param2, etc (conversão em cache por texto)
+            param_dict = {f'param{i}': param for i, param in enumerate(params, 1)}
+            return self._executar_postgres(converter_interrogacoes(query), param_dict)
+
+        # Se params já for um dicionário ou None, usar diretamente
+        if params is None:
+            params = {}
+        return self._executar_postgres(query, params)
+
+    def executar_pagina(self, consulta, params, requisicao, colunas, ordem_padrao):
         """
+        Executa uma Consulta registrada no modo server-side do DataTables:
+        busca, ordenação e paginação aplicadas no banco (ver app.modules.datatables).
+        Retorna o dicionário de resposta esperado pelo DataTables.
+        """
+        compilada, valores = consulta.preparar(self.dialeto, params)
+        sql, extras = requisicao.envolver(compilada.sql, self.dialeto, colunas, ordem_padrao)
+
         if self.is_duckdb:
-            conn = db_duckdb.get_connection()
+            linhas = self._executar_duckdb(sql, valores + extras)
+        else:
+            valores.update({f'dt_param{i}': valor for i, valor in enumerate(extras, 1)})
+            linhas = self._executar_postgres(sql, valores)
+
+        return requisicao.resposta(linhas)
+
+    def valores_filtro(self, consulta, params, colunas, nomes):
+        """
+        Valores distintos das colunas `nomes` da grade server-side, para os
+        selects do cabeçalho: {nome: [valores]}, ou None quando a coluna passa
+        de LIMITE_VALORES_FILTRO valores (ver app.modules.datatables).
+        """
+        compilada, valores = consulta.preparar(self.dialeto, params)
+        tarefas = [(sql_valores_coluna(compilada.sql, colunas, nome), valores) for nome in nomes]
+        resultado = {}
+        for nome, linhas in zip(nomes, self.executar_em_paralelo(tarefas)):
+            lista = [linha['valor'] for linha in linhas]
+            resultado[nome] = lista if len(lista) <= LIMITE_VALORES_FILTRO else None
+        return resultado
+
+    def _executar_postgres(self, query, params):
+        """Executa no PostgreSQL (texto SQL com :parametros ou cláusula text() já pronta)."""
+        import pandas as pd
+        from sqlalchemy import text
+        if isinstance(query, str):
+            query = text(query)
+        df = pd.read_sql(query, self.db_engine, params=params)
+        return df.to_dict(orient='records')
+
+    def _executar_duckdb(self, query, params, conn=None):
+        """Executa no DuckDB; sem `conn`, abre e fecha uma conexão própria."""
+        fechar = conn is None
+        if fechar:
+            conn = db_duckdb.get_connection(historico=True, perfil='web')
+        try:
+            df = conn.execute(query, params).fetchdf()
+            return df.to_dict(orient='records')
+        finally:
+            if fechar:
+                conn.close()
+
+    def _executar_em_cursor(self, cursor, query, params):
+        """Executa uma query (texto ou Consulta) em um cursor DuckDB já aberto."""
+        try:
+            if isinstance(query, Consulta):
+                compilada, valores = query.preparar('duckdb', params)
+                return self._executar_duckdb(compilada.sql, valores, cursor)
+            return self._executar_duckdb(query, params, cursor)
+        finally:
+            cursor.close()
+
+    @property
+    def executor(self):
+        """Pool de threads compartilhado para consultas simultâneas (criado sob demanda)."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='db_manager'
+            )
+        return self._executor
+
+    def executar_em_paralelo(self, tarefas):
+        """
+        Executa tarefas independentes simultaneamente e devolve os resultados na
+        mesma ordem em que foram passadas. O tempo total passa a ser o da tarefa
+        mais lenta, e não a soma de todas.
+
+        Cada tarefa pode ser:
+          - uma tupla (query, params), executada como em execute_query; no DuckDB
+            cada uma roda em um cursor próprio da mesma conexão e no PostgreSQL
+            em uma conexão do pool do SQLAlchemy;
+          - uma função sem argumentos, para etapas que combinam mais de uma
+            consulta com processamento em Python.
+
+        Tarefas não podem depender do contexto da requisição Flask (request.args):
+        leia os parâmetros antes e passe-os para a tarefa. Também não devem chamar
+        executar_em_paralelo de novo (o pool é compartilhado e poderia esgotar).
+        """
+        tarefas = list(tarefas)
+        if len(tarefas) <= 1:
+            return [self._executar_tarefa(tarefa) for tarefa in tarefas]
+
+        if self.is_duckdb and any(not callable(tarefa) for tarefa in tarefas):
+            conn = db_duckdb.get_connection(perfil='web')
             try:
-                # DuckDB espera uma LISTA de parâmetros para os '?'
-                df = conn.execute(query, params).fetchdf()
-                return df.to_dict(orient='records')
+                futuros = [
+                    self.executor.submit(tarefa) if callable(tarefa)
+                    else self.executor.submit(self._executar_em_cursor, db_duckdb.cursor(conn, historico=True), *tarefa)
+                    for tarefa in tarefas
+                ]
+                return [futuro.result() for futuro in futuros]
             finally:
                 conn.close()
-        else:
-            # PostgreSQL com SQLAlchemy
-            # Converter placeholders ? para :param1, :param2, etc e criar dicionário
-            if params and isinstance(params, list):
-                # Substituir ? por placeholders nomeados
-                param_dict = {}
-                query_converted = query
-                for i, param in enumerate(params, 1):
-                    param_name = f'param{i}'
-                    # Substituir apenas o primeiro ? encontrado
-                    query_converted = query_converted.replace('?', f':{param_name}', 1)
-                    param_dict[param_name] = param
-                
-                # Usar o query convertido e o dicionário de parâmetros
-                df = pd.read_sql(text(query_converted), self.db_engine, params=param_dict)
-            else:
-                # Se params já for um dicionário ou None, usar diretamente
-                if params is None:
-                    params = {}
-                df = pd.read_sql(text(query), self.db_engine, params=params)
-            
-            return df.to_dict(orient='records')
+
+        futuros = [self.executor.submit(self._executar_tarefa, tarefa) for tarefa in tarefas]
+        return [futuro.result() for futuro in futuros]
+
+    def _executar_tarefa(self, tarefa):
+        if callable(tarefa):
+            return tarefa()
+        query, params = tarefa
+        return self.execute_query(query, params)
 
 # Instância global do nosso gerente
 db_manager = DBManager()
\ No newline at end of file
@@ -0,0 +1,273 @@
+# app/modules/aquecimento_cache.py
+"""
+Aquecimento do cache de resultados após cada carga.
+
+Sem aquecimento, o primeiro usuário a abrir cada tela depois da carga mensal
+paga a consulta fria. aquecer() monta o espaço de parâmetros mais usado e
+dispara as requisições em paralelo, gravando os resultados no cache em disco
+(app/modules/cache_resultados.py), que todos os workers leem:
+
+  - RREO receita, despesa e despesa por função: cada bimestre do ano
+  - Balanço da receita: o último mês de cada bimestre, consolidado e as
+    maiores UGs
+  - Relatório por fonte/receita e comparativo mensal: consolidado e as
+    maiores UGs
+  - Quadros do Balanço Geral
+
+As requisições podem ir para um servidor em execução (AQUECIMENTO_URL) ou ser
+executadas no próprio processo, com o cliente de testes do Flask.
+
+Uso:
+    python scripts/aquecer_cache.py [--url URL] [--ano ANO] [--ugs N] [--paralelo N]
+
+Nas cargas, processar_arquivo é decorado com @aquecer_apos_carga. Com o
+manifesto da carga (app/modules/controle_carga.py), só os exercícios afetados
+são aquecidos, e nenhum quando a carga não alterou dados: o cache dos demais
+continua válido, porque a versão dos dados é por exercício.
+"""
+import functools
+import os
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode
+
+from app.db_manager import db_manager
+from app.modules.controle_carga import anos_afetados
+
+QUADROS_BALANCO_GERAL = (
+    '/balanco-geral/api/dados-receita-estimada',
+    '/balanco-geral/api/dados-receita-tipo-administracao',
+    '/balanco-geral/api/dados-previsao-atualizada',
+    '/balanco-geral/api/dados-receita-realizada',
+)
+
+
+def _parametros_base(ano, top_ugs):
+    """Retorna (ano, último mês com saldo, maiores UGs por receita realizada)"""
+    if ano is None:
+        anos = db_manager.execute_query(
+            "SELECT MAX(coexercicio) as ano FROM receita_saldo WHERE coexercicio <= ?",
+            [datetime.now().year]
+        )
+        ano = int(anos[0]['ano']) if anos and anos[0]['ano'] is not None else datetime.now().year
+
+    meses = db_manager.execute_query(
+        "SELECT MAX(inmes) as mes FROM receita_saldo WHERE coexercicio = ?", [ano]
+    )
+    ultimo_mes = int(meses[0]['mes']) if meses and meses[0]['mes'] is not None else 12
+
+    ugs = db_manager.execute_query("""
+        SELECT coug, SUM(ABS(saldo_contabil_receita)) as volume
+        FROM receita_saldo
+        WHERE coexercicio = ?
+            AND cocontacontabil BETWEEN '621200000' AND '621399999'
+            AND coug IS NOT NULL
+        GROUP BY coug
+        ORDER BY volume DESC
+        LIMIT ?
+    """, [ano, top_ugs])
+    return ano, ultimo_mes, [str(row['coug']) for row in ugs]
+
+
+def montar_requisicoes(ano=None, top_ugs=5):
+    """
+    Lista (relatório, url) com os parâmetros a aquecer. O relatório por
+    fonte/receita usa sempre o ano corrente (definido pela própria rota).
+
+    A chave do cache é o ETag, calculado com todos os parâmetros da URL: cada
+    requisição leva exatamente os parâmetros que a tela envia, inclusive os
+    vazios (coug= no consolidado do balanço e do comparativo) e os padrões
+    (tipo_receita=todas), e nenhum a mais (sem coug no consolidado do
+    relatório por fonte/receita). Conferido por verificar_cache().
+    """
+    ano, ultimo_mes, ugs = _parametros_base(ano, top_ugs)
+    bimestres = range(1, (ultimo_mes + 1) // 2 + 1)
+    consolidado_e_ugs = [''] + ugs
+
+    def url(caminho, **params):
+        return f"{caminho}?{urlencode(params)}" if params else caminho
+
+    requisicoes = []
+    for relatorio in ('rreo-receita', 'rreo-despesa', 'rreo-despesa-funcao'):
+        for bimestre in bimestres:
+            requisicoes.append((relatorio, url(f'/{relatorio}/api/gerar-relatorio', ano=ano, bimestre=bimestre)))
+
+    for bimestre in bimestres:
+        for coug in consolidado_e_ugs:
+            # balanco_receita/filtros.js: obterFiltrosSelecionados
+            requisicoes.append(('balanco-receita', url(
+                '/balanco-receita/api/gerar-relatorio', ano=ano, mes=min(bimestre * 2, ultimo_mes),
+                coug=coug, tipo_receita='todas'
+            )))
+
+    for coug in consolidado_e_ugs:
+        # relatorio_receita_fonte.js: sem coug no consolidado
+        parametros_ug = {'coug': coug} if coug else {}
+        requisicoes.append(('relatorio-receita-fonte', url('/relatorio-receita-fonte/api/dados-por-fonte', **parametros_ug)))
+        requisicoes.append(('relatorio-receita-fonte', url('/relatorio-receita-fonte/api/dados-por-receita', **parametros_ug)))
+        requisicoes.append(('comparativo-mensal', url(
+            '/comparativo-mensal/api/comparativo-mensal', ano=ano, coug=coug, tipo_receita='todas'
+        )))
+
+    for caminho in QUADROS_BALANCO_GERAL:
+        requisicoes.append(('balanco-geral', caminho))
+
+    return requisicoes
+
+
+def requisicoes_das_telas(ano, mes, coug):
+    """
+    URLs como as telas as montam (consolidado com coug=''), para conferir
+    que o aquecimento grava as mesmas chaves que os usuários leem
+    """
+    ug = {'coug': coug} if coug else {}
+    return [
+        # rreo_receita.js (e rreo_despesa.js, rreo_despesa_funcao.js): data {ano, bimestre}
+        '/rreo-receita/api/gerar-relatorio?' + urlencode({'ano': ano, 'bimestre': 1}),
+        # balanco_receita/filtros.js: obterFiltrosSelecionados
+        '/balanco-receita/api/gerar-relatorio?' + urlencode(
+            {'ano': ano, 'mes': mes, 'coug': coug, 'tipo_receita': 'todas'}
+        ),
+        # relatorio_receita_fonte.js: params = ugSelecionada ? {coug} : {}
+        '/relatorio-receita-fonte/api/dados-por-fonte' + ('?' + urlencode(ug) if ug else ''),
+        '/relatorio-receita-fonte/api/dados-por-receita' + ('?' + urlencode(ug) if ug else ''),
+        # comparativo_mensal.js: template com ano, coug e tipo_receita
+        f'/comparativo-mensal/api/comparativo-mensal?ano={ano}&coug={coug}&tipo_receita=todas',
+        # balanco_geral/*.js: sem parâmetros
+        QUADROS_BALANCO_GERAL[0],
+    ]
+
+
+def _executar_http(base_url, caminho, cabecalho=None):
+    try:
+        with urllib.request.urlopen(base_url.rstrip('/') + caminho, timeout=600) as resposta:
+            resposta.read()
+            return resposta.headers.get(cabecalho) if cabecalho else resposta.status
+    except urllib.error.HTTPError as e:
+        return None if cabecalho else e.code
+
+
+def _executar_local(app, caminho, cabecalho=None):
+    with app.test_client() as cliente:
+        resposta = cliente.get(caminho)
+        return resposta.headers.get(cabecalho) if cabecalho else resposta.status_code
+
+
+def aquecer(app=None, base_url=None, ano=None, top_ugs=5, paralelo=4, anos=None):
+    """
+    Executa as requisições em paralelo e imprime o tempo por relatório.
+    anos: lista de exercícios a aquecer (no lugar de ano). Retorna a lista
+    de resultados (relatório, url, status, ms).
+    """
+    if app is None and not base_url:
+        raise ValueError("Informe a aplicação Flask ou a URL do servidor")
+
+    requisicoes = []
+    for ano_requisicoes in (anos or [ano]):
+        for item in montar_requisicoes(ano_requisicoes, top_ugs):
+            # As rotas sem ano entram uma vez só
+            if item not in requisicoes:
+                requisicoes.append(item)
+    destino = base_url or 'no próprio processo'
+    print(f"🔥 Aquecendo cache: {len(requisicoes)} requisições ({destino}, {paralelo} em paralelo)")
+
+    def executar(item):
+        relatorio, caminho = item
+        inicio = time.perf_counter()
+        try:
+            status = _executar_http(base_url, caminho) if base_url else _executar_local(app, caminho)
+        except Exception as e:
+            print(f"   ❌ {caminho}: {str(e)}")
+            status = None
+        return relatorio, caminho, status, (time.perf_counter() - inicio) * 1000
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=paralelo, thread_name_prefix='aquecimento') as executor:
+        resultados = list(executor.map(executar, requisicoes))
+    total = time.perf_counter() - inicio
+
+    # Resumo por relatório, na ordem de montagem
+    resumo = OrderedDict()
+    for relatorio, caminho, status, ms in resultados:
+        item = resumo.setdefault(relatorio, {'qtd': 0, 'erros': 0, 'soma': 0.0, 'maior': 0.0})
+        item['qtd'] += 1
+        item['soma'] += ms
+        item['maior'] = max(item['maior'], ms)
+        if status != 200:
+            item['erros'] += 1
+
+    for relatorio, item in resumo.items():
+        print(f"   {relatorio:<25} {item['qtd']:3d} req | soma {item['soma'] / 1000:7.2f}s | "
+              f"mais lenta {item['maior'] / 1000:6.2f}s | erros {item['erros']}")
+    print(f"✅ Aquecimento concluído em {total:.2f}s")
+    return resultados
+
+
+def verificar_cache(app=None, base_url=None, ano=None, top_ugs=5):
+    """
+    Depois de aquecer(), repete as requisições como as telas as fazem
+    (requisicoes_das_telas) e confere que todas saem do cache (X-Cache: HIT).
+    Retorna a lista de URLs que não saíram do cache.
+    """
+    ano, ultimo_mes, ugs = _parametros_base(ano, top_ugs)
+    caminhos = []
+    for coug in [''] + ugs[:1]:
+        for caminho in requisicoes_das_telas(ano, min(2, ultimo_mes), coug):
+            # As rotas sem UG entram uma vez só
+            if caminho not in caminhos:
+                caminhos.append(caminho)
+
+    falhas = []
+    for caminho in caminhos:
+        if base_url:
+            origem = _executar_http(base_url, caminho, 'X-Cache')
+        else:
+            origem = _executar_local(app, caminho, 'X-Cache')
+        if origem != 'HIT':
+            falhas.append(caminho)
+        print(f"   {'✅' if origem == 'HIT' else '❌'} {origem or '-':<4} {caminho}")
+    return falhas
+
+
+def aquecer_apos_carga(funcao):
+    """
+    Decorador para os processar_arquivo das cargas: se a carga terminou com
+    sucesso, aquece o cache dos exercícios afetados (manifesto em
+    self.manifesto). AQUECER_APOS_CARGA=0 desliga. Uma falha no aquecimento
+    nunca altera o resultado da carga.
+    """
+    @functools.wraps(funcao)
+    def envolvida(*args, **kwargs):
+        sucesso = funcao(*args, **kwargs)
+        if sucesso and os.getenv('AQUECER_APOS_CARGA', '1') == '1':
+            manifesto = getattr(args[0], 'manifesto', None) if args else None
+            if manifesto is not None and not manifesto['alterado']:
+                print("♻️ Carga sem dados alterados: cache mantido")
+                return sucesso
+            try:
+                aquecer_no_ambiente(anos_afetados(manifesto))
+            except Exception as e:
+                print(f"⚠️ Aquecimento do cache não executado: {str(e)}")
+        return sucesso
+    return envolvida
+
+
+def aquecer_no_ambiente(anos=None):
+    """
+    Aquece com a configuração da aplicação (AQUECIMENTO_URL ou no próprio
+    processo). anos=None: o exercício mais recente.
+    """
+    from app import create_app
+    app = create_app(os.getenv('FLASK_ENV', 'default'))
+    with app.app_context():
+        return aquecer(
+            app=app,
+            base_url=app.config['AQUECIMENTO_URL'] or None,
+            top_ugs=app.config['AQUECIMENTO_TOP_UGS'],
+            paralelo=app.config['AQUECIMENTO_PARALELO'],
+            anos=anos,
+        )
@@ -0,0 +1,116 @@
+# app/modules/cache_resultados.py
+"""
+Cache de resultados dos relatórios pesados, compartilhado entre processos.
+
+As respostas 200 das rotas em ROTAS_EM_CACHE são gravadas em disco com o
+mesmo ETag de app/modules/compressao_etag.py (versão dos dados + rota +
+parâmetros). Qualquer worker do gunicorn reaproveita o resultado gravado por
+outro, inclusive pelo aquecimento feito ao final de cada carga
+(app/modules/aquecimento_cache.py), até os dados mudarem.
+
+Cada versão dos dados tem a sua pasta, dentro da pasta do escopo da versão
+(o exercício pedido, ano_<ano>, ou geral); ao gravar a primeira resposta de
+uma versão nova, as pastas das versões anteriores do mesmo escopo são
+apagadas. Nas requisições sem o exercício (escopo geral), a data faz parte
+da versão: as respostas valem até a virada do dia, e a primeira gravação do
+dia seguinte apaga as do dia anterior. Uma carga de um exercício não
+descarta o cache dos demais. Com CACHE_RESULTADOS_DIR vazio, o cache fica
+desligado.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from flask import request, g
+
+# Relatórios cujo resultado depende só dos parâmetros e da versão dos dados
+ROTAS_EM_CACHE = (
+    '/rreo-receita/api/gerar-relatorio',
+    '/rreo-despesa/api/gerar-relatorio',
+    '/rreo-despesa-funcao/api/gerar-relatorio',
+    '/balanco-receita/api/gerar-relatorio',
+    '/relatorio-receita-fonte/api/dados-por-fonte',
+    '/relatorio-receita-fonte/api/dados-por-receita',
+    '/comparativo-mensal/api/comparativo-mensal',
+    '/balanco-geral/api/dados-receita-estimada',
+    '/balanco-geral/api/dados-receita-tipo-administracao',
+    '/balanco-geral/api/dados-previsao-atualizada',
+    '/balanco-geral/api/dados-receita-realizada',
+)
+
+
+def pasta_versao(raiz, versao, escopo='geral'):
+    """Pasta do cache para uma versão dos dados de um escopo"""
+    return Path(raiz) / escopo / hashlib.sha1(versao.encode('utf-8')).hexdigest()[:16]
+
+
+def _arquivo_atual(raiz):
+    """Arquivo do resultado da requisição atual (None se ela não usa o cache)"""
+    etag = g.get('etag')
+    versao = g.get('versao_dados')
+    if not etag or versao is None or request.method != 'GET' or request.path not in ROTAS_EM_CACHE:
+        return None
+    return pasta_versao(raiz, versao, g.get('escopo_versao', 'geral')) / f"{etag}.json"
+
+
+def _gravar(arquivo, corpo):
+    """Grava de forma atômica (outro processo nunca lê um arquivo pela metade)"""
+    pasta = arquivo.parent
+    if not pasta.exists():
+        pasta.mkdir(parents=True, exist_ok=True)
+        # Primeira resposta de uma versão nova: descarta as versões anteriores
+        for antiga in pasta.parent.iterdir():
+            if antiga.is_dir() and antiga != pasta:
+                shutil.rmtree(antiga, ignore_errors=True)
+
+    descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'wb') as f:
+            f.write(corpo)
+        os.replace(temporario, arquivo)
+    except Exception:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+def registrar_cache_resultados(app):
+    """
+    Registra os hooks do cache de resultados. Deve vir depois de
+    registrar_compressao_etag, que calcula g.etag, g.versao_dados e
+    g.escopo_versao.
+    """
+    raiz = app.config.get('CACHE_RESULTADOS_DIR')
+    if not raiz:
+        return
+
+    @app.before_request
+    def ler_cache_resultados():
+        arquivo = _arquivo_atual(raiz)
+        if arquivo is None:
+            return None
+        try:
+            corpo = arquivo.read_bytes()
+        except OSError:
+            return None
+        g.cache_resultado = True
+        response = app.response_class(corpo, mimetype='application/json')
+        response.headers['X-Cache'] = 'HIT'
+        return response
+
+    @app.after_request
+    def gravar_cache_resultados(response):
+        if g.pop('cache_resultado', False):
+            return response
+        if response.status_code != 200 or response.mimetype != 'application/json':
+            return response
+        arquivo = _arquivo_atual(raiz)
+        if arquivo is None:
+            return response
+        try:
+            _gravar(arquivo, response.get_data())
+            response.headers['X-Cache'] = 'MISS'
+        except OSError as e:
+            print(f"⚠️ Cache de resultados não gravado: {str(e)}")
+        return response
@@ -7,12 +7,31 @@ Adaptado para trabalhar com a estrutura DuckDB do sistema
 
 from flask import Blueprint, jsonify, request
 from app.db_manager import db_manager
+from app.modules.dimensoes import dimensoes
+from app.modules.compressao_etag import versao_dados
 from datetime import datetime
+import threading
+import time
 import traceback
 
 # Criar blueprint
 comparativo_mensal = Blueprint('comparativo_mensal', __name__)
 
+# Fontes de receita corrente que agregam também a intra-orçamentária correspondente (7x)
+TIPOS_COM_INTRA = ['11', '12', '13', '14', '15', '16', '17', '19']
+
+# Cache dos comparativos: (versão dos dados, ano, coug) -> {tipo_receita: dados}.
+# A versão (do exercício e do anterior, comparados) faz uma carga feita por
+# outro processo invalidar o cache deste, só nos exercícios afetados.
+CACHE_TTL_SEGUNDOS = 600
+_cache_comparativo = {}
+_cache_lock = threading.Lock()
+
+def limpar_cache_comparativo():
+    """Descarta todos os comparativos em cache (usar após nova carga de receita_saldo)"""
+    with _cache_lock:
+        _cache_comparativo.clear()
+
 class ComparativoMensalAcumulado:
     """Classe para gerar dados do comparativo mensal acumulado"""
     
@@ -25,124 +44,103 @@ class ComparativoMensalAcumulado:
     
     def gerar_comparativo(self, ano: int, coug: str = None, tipo_receita: str = None):
         """
-        Gera o comparativo mensal acumulado de receitas
+        Gera o comparativo mensal acumulado de receitas para um tipo de receita
+        """
+        variantes = self.gerar_todas_variantes(ano, coug)
+        return variantes.get(tipo_receita or 'todas', [])
+    
+    def gerar_todas_variantes(self, ano: int, coug: str = None):
+        """
+        Gera o comparativo de todos os tipos de receita com uma única consulta.
+        Retorna um dicionário {tipo_receita: dados}, incluindo 'todas'.
+        """
+        chave = (versao_dados(ano=ano), ano, coug or '')
+        with _cache_lock:
+            entrada = _cache_comparativo.get(chave)
+        if entrada and time.monotonic() - entrada[0] < CACHE_TTL_SEGUNDOS:
+            return entrada[1]
+        
+        filtro_ug = "AND rs.coug = ?" if coug else ""
+        
+        # Agregado mensal por fonte -> variantes de tipo de receita -> acumulado por janela
+        query = f"""
+        WITH receitas_mensais AS (
+            SELECT
+                rs.coexercicio,
+                rs.inmes,
+                SUBSTRING(rs.cofontereceita, 1, 2) as fonte_principal,
+                SUM(CASE 
+                    WHEN rs.cocontacontabil >= '621200000' AND rs.cocontacontabil <= '621399999' 
+                    THEN rs.saldo_contabil_receita 
+                    ELSE 0 
+                END) as receita_liquida
+            FROM receita_saldo rs
+            WHERE
+                rs.coexercicio IN (?, ?)
+                AND rs.cocategoriareceita IN ('1', '2', '7')
+                {filtro_ug}
+            GROUP BY rs.coexercicio, rs.inmes, SUBSTRING(rs.cofontereceita, 1, 2)
+        ),
+        variantes AS (
+            SELECT 'todas' as tipo_receita, coexercicio, inmes, receita_liquida
+            FROM receitas_mensais
+            UNION ALL
+            SELECT fonte_principal, coexercicio, inmes, receita_liquida
+            FROM receitas_mensais
+            WHERE fonte_principal IS NOT NULL
+            UNION ALL
+            -- Intra-orçamentárias (7x) também compõem a receita corrente 1x
+            SELECT '1' || SUBSTRING(fonte_principal, 2, 1), coexercicio, inmes, receita_liquida
+            FROM receitas_mensais
+            WHERE fonte_principal IN ({', '.join("'7" + t[1] + "'" for t in TIPOS_COM_INTRA)})
+        ),
+        receitas_por_mes AS (
+            SELECT tipo_receita, coexercicio, inmes, SUM(receita_liquida) as receita_liquida
+            FROM variantes
+            GROUP BY tipo_receita, coexercicio, inmes
+        )
+        SELECT
+            tipo_receita,
+            coexercicio,
+            inmes,
+            SUM(receita_liquida) OVER (
+                PARTITION BY tipo_receita, coexercicio
+                ORDER BY inmes
+                ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+            ) as receita_acumulada
+        FROM receitas_por_mes
+        ORDER BY tipo_receita, coexercicio, inmes
         """
-        # Construir filtros
-        filtros_sql = []
-        params = {'ano': ano, 'ano_anterior': ano - 1}
         
+        params = [ano, ano - 1]
         if coug:
-            filtros_sql.append("rs.coug = :coug")
-            params['coug'] = coug
+            params.append(coug)
         
-        # Filtro por tipo de receita (fonte)
-        if tipo_receita and tipo_receita != 'todas':
-            # Para receitas intra-orçamentárias, incluir também as correspondentes
-            if tipo_receita in ['11', '12', '13', '14', '15', '16', '17', '19']:
-                filtros_sql.append(f"(SUBSTRING(rs.cofontereceita, 1, 2) IN ('{tipo_receita}', '7{tipo_receita[1:]}'))")
-            else:
-                filtros_sql.append(f"SUBSTRING(rs.cofontereceita, 1, 2) = '{tipo_receita}'")
+        resultados = db_manager.execute_query(query, params=params)
         
-        where_clause = " AND " + " AND ".join(filtros_sql) if filtros_sql else ""
+        # Organizar acumulados por tipo -> exercício -> mês
+        acumulados = {}
+        for row in resultados:
+            por_ano = acumulados.setdefault(row['tipo_receita'], {})
+            por_ano.setdefault(int(row['coexercicio']), {})[int(row['inmes'])] = float(row['receita_acumulada'] or 0)
         
-        # Query adaptada para DuckDB
-        if db_manager.is_duckdb:
-            query = f"""
-            WITH receitas_mensais AS (
-                SELECT
-                    rs.coexercicio,
-                    rs.inmes,
-                    SUM(CASE 
-                        WHEN rs.cocontacontabil >= '621200000' AND rs.cocontacontabil <= '621399999' 
-                        THEN rs.saldo_contabil_receita 
-                        ELSE 0 
-                    END) as receita_liquida
-                FROM receita_saldo rs
-                WHERE
-                    rs.coexercicio IN (?, ?)
-                    AND rs.cocategoriareceita IN ('1', '2', '7')
-                    {where_clause.replace(':coug', '?').replace(':ano', '?').replace(':ano_anterior', '?')}
-                GROUP BY rs.coexercicio, rs.inmes
-            ),
-            meses_acumulados AS (
-                SELECT 
-                    m1.coexercicio,
-                    m1.inmes,
-                    SUM(m2.receita_liquida) as receita_acumulada
-                FROM receitas_mensais m1
-                JOIN receitas_mensais m2 
-                    ON m1.coexercicio = m2.coexercicio 
-                    AND m2.inmes <= m1.inmes
-                GROUP BY m1.coexercicio, m1.inmes
-            )
-            SELECT
-                atual.inmes,
-                atual.receita_acumulada as receita_atual,
-                COALESCE(anterior.receita_acumulada, 0) as receita_anterior
-            FROM meses_acumulados atual
-            LEFT JOIN meses_acumulados anterior 
-                ON atual.inmes = anterior.inmes 
-                AND anterior.coexercicio = ?
-            WHERE atual.coexercicio = ?
-            ORDER BY atual.inmes
-            """
-            # Preparar parâmetros para DuckDB
-            query_params = [ano, ano - 1]
-            if coug:
-                query_params.append(coug)
-            query_params.extend([ano - 1, ano])
-        else:
-            # Query para PostgreSQL
-            query = f"""
-            WITH receitas_mensais AS (
-                SELECT
-                    rs.coexercicio,
-                    rs.inmes,
-                    SUM(CASE 
-                        WHEN rs.cocontacontabil >= '621200000' AND rs.cocontacontabil <= '621399999' 
-                        THEN rs.saldo_contabil_receita 
-                        ELSE 0 
-                    END) as receita_liquida
-                FROM receita_saldo rs
-                WHERE
-                    rs.coexercicio IN (:ano, :ano_anterior)
-                    AND rs.cocategoriareceita IN ('1', '2', '7')
-                    {where_clause}
-                GROUP BY rs.coexercicio, rs.inmes
-            ),
-            meses_acumulados AS (
-                SELECT 
-                    m1.coexercicio,
-                    m1.inmes,
-                    SUM(m2.receita_liquida) as receita_acumulada
-                FROM receitas_mensais m1
-                JOIN receitas_mensais m2 
-                    ON m1.coexercicio = m2.coexercicio 
-                    AND m2.inmes <= m1.inmes
-                GROUP BY m1.coexercicio, m1.inmes
-            )
-            SELECT
-                atual.inmes,
-                atual.receita_acumulada as receita_atual,
-                COALESCE(anterior.receita_acumulada, 0) as receita_anterior
-            FROM meses_acumulados atual
-            LEFT JOIN meses_acumulados anterior 
-                ON atual.inmes = anterior.inmes 
-                AND anterior.coexercicio = :ano_anterior
-            WHERE atual.coexercicio = :ano
-            ORDER BY atual.inmes
-            """
-            query_params = params
+        variantes = {
+            tipo: self._montar_dados(ano, por_ano.get(ano, {}), por_ano.get(ano - 1, {}))
+            for tipo, por_ano in acumulados.items()
+        }
+        variantes.setdefault('todas', [])
         
-        # Executar query
-        resultados = db_manager.execute_query(query, params=query_params)
+        with _cache_lock:
+            _cache_comparativo[chave] = (time.monotonic(), variantes)
         
-        # Processar resultados
+        return variantes
+    
+    def _montar_dados(self, ano, acumulado_atual, acumulado_anterior):
+        """Monta a lista mensal com variações a partir dos acumulados de cada exercício"""
         dados_finais = []
-        for row in resultados:
-            mes = row['inmes']
-            receita_atual = float(row['receita_atual'] or 0)
-            receita_anterior = float(row['receita_anterior'] or 0)
+        for mes in sorted(acumulado_atual):
+            receita_atual = acumulado_atual[mes]
+            receita_anterior = acumulado_anterior.get(mes, 0.0)
             
             if receita_atual != 0 or receita_anterior != 0:
                 variacao_absoluta = receita_atual - receita_anterior
@@ -257,18 +255,26 @@ def gerar_comparativo_mensal():
         
         # Gerar comparativo
         comparativo = ComparativoMensalAcumulado()
-        dados = comparativo.gerar_comparativo(ano, coug, tipo_receita)
+        todas_variantes = comparativo.gerar_todas_variantes(ano, coug)
+        dados = todas_variantes.get(tipo_receita or 'todas', [])
         dados_html = comparativo.formatar_para_html(dados)
         dados_grafico = comparativo.gerar_dados_grafico(dados)
         
+        # Variantes por tipo de receita, para a tela trocar o filtro sem nova requisição
+        variantes = {
+            tipo: {
+                'dados_html': comparativo.formatar_para_html(dados_tipo),
+                'dados_grafico': comparativo.gerar_dados_grafico(dados_tipo),
+                'dados_brutos': dados_tipo
+            }
+            for tipo, dados_tipo in todas_variantes.items()
+        }
+        
         # Obter nome da UG se especificada
         nome_ug = 'Consolidado'
         if coug:
             try:
-                query = "SELECT noug FROM dim_unidade_gestora WHERE coug = ?"
-                result = db_manager.execute_query(query, [int(coug)])
-                if result:
-                    nome_ug = result[0]['noug']
+                nome_ug = dimensoes.nome('ug', int(coug), nome_ug)
             except:
                 nome_ug = f"UG {coug}"
         
@@ -276,6 +282,7 @@ def gerar_comparativo_mensal():
             'dados_html': dados_html,
             'dados_grafico': dados_grafico,
             'dados_brutos': dados,
+            'variantes': variantes,
             'filtros': {
                 'ano': ano,
                 'coug': coug,
@@ -0,0 +1,191 @@
+# app/modules/compressao_etag.py
+"""
+Compressão e requisições condicionais (ETag/304) para as APIs dos relatórios.
+
+- ETag: calculado ANTES da rota, a partir da versão dos dados e dos parâmetros
+  da requisição. Se o navegador já tem a mesma versão (If-None-Match), a
+  resposta é 304 Not Modified e nenhuma consulta é executada.
+- Compressão: respostas JSON/CSV acima de COMPRESSAO_MINIMO_BYTES são
+  comprimidas com brotli (se o pacote estiver instalado e o cliente aceitar)
+  ou gzip.
+
+A versão dos dados no DuckDB vem do manifesto das cargas (etl_control,
+app/modules/controle_carga.py): com o parâmetro ano, só as cargas que
+alteraram o exercício ou o anterior a mudam; sem ele, qualquer carga que
+alterou dados. O manifesto é relido só quando a data de modificação do
+arquivo do banco (e do WAL) muda. Sem etl_control, ou com uma carga do
+exercício em andamento, a versão é a própria data de modificação. No
+PostgreSQL, a soma dos contadores de escrita de pg_stat_user_tables, guardada
+por VERSAO_DADOS_TTL segundos para não consultar o catálogo a cada
+requisição.
+"""
+import gzip
+import hashlib
+import time
+from datetime import date
+from pathlib import Path
+from flask import request, g
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from app.db_manager import db_manager
+from app.modules.database_duckdb import db_duckdb
+from app.modules.controle_carga import controle_carga, versao_exercicio
+
+# Tipos de conteúdo que valem a compressão
+TIPOS_COMPRIMIVEIS = ('application/json', 'text/csv', 'text/plain')
+
+_versao_postgres = {'valor': None, 'lido_em': 0.0}
+_versoes_duckdb = {'arquivo': None, 'versoes': None}
+_versoes_postgres_tabelas = {}  # tabelas -> (escritas, lido_em)
+
+
+def _versao_arquivo_duckdb():
+    partes = []
+    for caminho in (Path(db_duckdb.db_path), Path(f"{db_duckdb.db_path}.wal")):
+        if caminho.exists():
+            info = caminho.stat()
+            partes.append(f"{info.st_mtime_ns}:{info.st_size}")
+    return '|'.join(partes)
+
+
+def _versoes_duckdb_atuais():
+    """Versões do etl_control, relidas só quando o arquivo do banco muda"""
+    arquivo = _versao_arquivo_duckdb()
+    if _versoes_duckdb['arquivo'] != arquivo:
+        conn = db_duckdb.get_connection(perfil='web')
+        try:
+            _versoes_duckdb['versoes'] = controle_carga.versoes(conn)
+        finally:
+            conn.close()
+        _versoes_duckdb['arquivo'] = arquivo
+    return _versoes_duckdb['versoes']
+
+
+def versao_dados(ttl=30, ano=None):
+    """
+    Identificador que muda sempre que os dados do banco ativo mudam (no
+    DuckDB, com ano, só quando mudam os dados do exercício ou do anterior)
+    """
+    if db_manager.is_duckdb:
+        versoes = _versoes_duckdb_atuais()
+        versao = versao_exercicio(versoes, ano) if versoes is not None else None
+        return versao if versao is not None else _versoes_duckdb['arquivo']
+
+    agora = time.monotonic()
+    if _versao_postgres['valor'] is None or agora - _versao_postgres['lido_em'] > ttl:
+        resultado = db_manager.execute_query("""
+            SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0) as escritas
+            FROM pg_stat_user_tables
+        """)
+        _versao_postgres['valor'] = str(resultado[0]['escritas'])
+        _versao_postgres['lido_em'] = agora
+    return _versao_postgres['valor']
+
+
+def versao_global(ttl=30, tabelas=()):
+    """
+    Identificador que muda só com as cargas globais (dimensões, tabelas
+    recriadas), e não com as cargas mensais dos fatos. No DuckDB, a última
+    carga global do etl_control (None durante uma em andamento); sem o
+    etl_control, a data de modificação do arquivo. No PostgreSQL, os
+    contadores de escrita só das tabelas informadas.
+    """
+    if db_manager.is_duckdb:
+        versoes = _versoes_duckdb_atuais()
+        if versoes is None:
+            return _versoes_duckdb['arquivo']
+        return None if versoes['em_andamento']['global'] else f"g{versoes['global']}"
+
+    chave = tuple(sorted(tabelas))
+    agora = time.monotonic()
+    lida = _versoes_postgres_tabelas.get(chave)
+    if lida is None or agora - lida[1] > ttl:
+        resultado = db_manager.execute_query("""
+            SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0) as escritas
+            FROM pg_stat_user_tables
+            WHERE relname = ANY(:tabelas)
+        """, {'tabelas': list(chave)})
+        lida = (str(resultado[0]['escritas']), agora)
+        _versoes_postgres_tabelas[chave] = lida
+    return lida[0]
+
+
+def calcular_etag(versao):
+    """ETag da requisição atual: versão dos dados + rota + parâmetros (em ordem)"""
+    parametros = sorted(request.args.items(multi=True))
+    chave = f"{versao}|{request.path}|{parametros}"
+    return hashlib.sha1(chave.encode('utf-8')).hexdigest()
+
+
+def _usa_etag():
+    return request.method in ('GET', 'HEAD') and '/api/' in request.path
+
+
+def _comprimir(response, minimo, nivel):
+    """Comprime o corpo da resposta conforme o Accept-Encoding do cliente"""
+    if (response.direct_passthrough
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in TIPOS_COMPRIMIVEIS):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    corpo = response.get_data()
+    if len(corpo) < minimo:
+        return response
+
+    aceitas = request.accept_encodings
+    if brotli is not None and aceitas['br']:
+        response.set_data(brotli.compress(corpo, quality=min(nivel, 11)))
+        response.headers['Content-Encoding'] = 'br'
+    elif aceitas['gzip']:
+        response.set_data(gzip.compress(corpo, compresslevel=nivel))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def registrar_compressao_etag(app):
+    """Registra os hooks de ETag/304 e de compressão na aplicação Flask"""
+    minimo = app.config.get('COMPRESSAO_MINIMO_BYTES', 1024)
+    nivel = app.config.get('COMPRESSAO_NIVEL', 6)
+    ttl = app.config.get('VERSAO_DADOS_TTL', 30)
+
+    @app.before_request
+    def verificar_etag():
+        if not _usa_etag():
+            return None
+        try:
+            ano = request.args.get('ano', type=int)
+            # Escopo da versão: o exercício pedido ou todos (cache_resultados)
+            g.escopo_versao = f"ano_{ano}" if ano is not None else 'geral'
+            g.versao_dados = versao_dados(ttl, ano)
+            if ano is None:
+                # Sem o exercício, as rotas usam o ano atual (ou os últimos
+                # exercícios): a data entra na versão para a resposta virar o
+                # dia. Com o ano, o resultado não depende da data.
+                g.versao_dados = f"{g.versao_dados}|{date.today()}"
+            g.etag = calcular_etag(g.versao_dados)
+        except Exception as e:
+            # Sem versão dos dados, a requisição segue sem cache condicional
+            print(f"⚠️ ETag indisponível: {str(e)}")
+            return None
+
+        if request.if_none_match.contains_weak(g.etag):
+            response = app.response_class(status=304)
+            response.set_etag(g.etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return None
+
+    @app.after_request
+    def finalizar_resposta(response):
+        etag = g.pop('etag', None)
+        if etag and response.status_code == 200:
+            response.set_etag(etag, weak=True)
+            # O navegador guarda a resposta, mas revalida sempre (304 quando igual)
+            response.headers['Cache-Control'] = 'no-cache'
+        return _comprimir(response, minimo, nivel)
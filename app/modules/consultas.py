@@ -0,0 +1,187 @@
+# app/modules/consultas.py
+"""
+Registro de consultas SQL neutras em relação ao banco de dados.
+
+Cada consulta é declarada uma única vez, com parâmetros nomeados (:ano, :conta)
+e funções de dialeto entre chaves, e é compilada na importação para DuckDB
+('?' posicionais) e PostgreSQL (':nome' do SQLAlchemy).
+
+Sintaxe aceita no SQL declarado:
+    :nome                      parâmetro nomeado
+    {ano(coluna)}              ano de uma data
+    {mes(coluna)}              mês de uma data
+    {data_br(coluna)}          data formatada como DD/MM/AAAA
+    {no_ano(coluna)}           data dentro do exercício de :ano, reescrito como
+                               intervalo (coluna >= :ano_inicio AND coluna <
+                               :ano_fim); os limites são derivados de :ano
+    {na_lista(coluna, :nome)}  coluna contida na lista passada em :nome
+    [[ AND coluna = :nome ]]   trecho opcional, incluído só quando todos os
+                               seus parâmetros forem diferentes de None
+"""
+
+import re
+import itertools
+from datetime import date
+from functools import lru_cache
+
+DIALETOS = ('duckdb', 'postgres')
+
+# Funções que mudam de sintaxe entre DuckDB e PostgreSQL
+FRAGMENTOS = {
+    'duckdb': {
+        'ano': 'YEAR({0})',
+        'mes': 'MONTH({0})',
+        'data_br': "strftime({0}, '%d/%m/%Y')",
+        'na_lista': 'list_contains({1}, {0})',
+        'no_ano': '({0} >= :ano_inicio AND {0} < :ano_fim)',
+    },
+    'postgres': {
+        'ano': 'EXTRACT(YEAR FROM {0})::integer',
+        'mes': 'EXTRACT(MONTH FROM {0})::integer',
+        'data_br': "TO_CHAR({0}, 'DD/MM/YYYY')",
+        'na_lista': '{0} = ANY({1})',
+        'no_ano': '({0} >= :ano_inicio AND {0} < :ano_fim)',
+    },
+}
+
+# Literais entre aspas são ignorados para não confundir '%H:%M' com parâmetro
+_RE_PARAMETRO = re.compile(r"('(?:[^']|'')*')|(?<![:\w]):([A-Za-z_]\w*)")
+_RE_INTERROGACAO = re.compile(r"('(?:[^']|'')*')|\?")
+_RE_FRAGMENTO = re.compile(r'\{(\w+)\(([^{}]*)\)\}')
+_RE_OPCIONAL = re.compile(r'\[\[(.*?)\]\]', re.DOTALL)
+
+
+class ConsultaCompilada:
+    """SQL final de um dialeto com a ordem dos parâmetros já resolvida"""
+
+    def __init__(self, sql, ordem):
+        self.sql = sql
+        self.ordem = tuple(ordem)
+        self._texto = None
+
+    @property
+    def texto(self):
+        """TextClause do SQLAlchemy, criado uma vez e reaproveitado (cache de compilação)"""
+        if self._texto is None:
+            from sqlalchemy import text
+            self._texto = text(self.sql)
+        return self._texto
+
+
+class Consulta:
+    """Consulta declarada uma vez e compilada para todos os dialetos"""
+
+    def __init__(self, nome, sql):
+        self.nome = nome
+        self.sql = sql
+        self.opcionais = [
+            tuple(_nomes_parametros(trecho)) for trecho in _RE_OPCIONAL.findall(sql)
+        ]
+        self._compiladas = {}
+
+        # Compilar todas as combinações de trechos opcionais para cada dialeto
+        for dialeto in DIALETOS:
+            for ativos in itertools.product((False, True), repeat=len(self.opcionais)):
+                self._compiladas[(dialeto, ativos)] = self._compilar(dialeto, ativos)
+
+    def _compilar(self, dialeto, ativos):
+        sql = _expandir_fragmentos(self.sql, dialeto)
+
+        # Incluir ou remover cada trecho opcional conforme a combinação
+        indices = iter(ativos)
+        sql = _RE_OPCIONAL.sub(lambda m: m.group(1) if next(indices) else '', sql)
+
+        ordem = []
+
+        def substituir(m):
+            if m.group(1):
+                return m.group(1)
+            ordem.append(m.group(2))
+            return '?' if dialeto == 'duckdb' else f':{m.group(2)}'
+
+        sql = _RE_PARAMETRO.sub(substituir, sql)
+        return ConsultaCompilada(sql, ordem)
+
+    def preparar(self, dialeto, params=None):
+        """
+        Retorna (compilada, valores) prontos para execução.
+        DuckDB recebe lista posicional; PostgreSQL recebe dicionário.
+        """
+        params = params or {}
+        ativos = tuple(
+            all(params.get(nome) is not None for nome in nomes)
+            for nomes in self.opcionais
+        )
+        compilada = self._compiladas[(dialeto, ativos)]
+        params = _derivar_parametros(params, compilada.ordem)
+
+        faltando = [nome for nome in compilada.ordem if nome not in params]
+        if faltando:
+            raise ValueError(f"Consulta '{self.nome}': parâmetros ausentes {faltando}")
+
+        if dialeto == 'duckdb':
+            valores = [params[nome] for nome in compilada.ordem]
+        else:
+            valores = {nome: params[nome] for nome in compilada.ordem}
+        return compilada, valores
+
+    def __repr__(self):
+        return f"<Consulta {self.nome}>"
+
+
+def _nomes_parametros(sql):
+    return [m.group(2) for m in _RE_PARAMETRO.finditer(sql) if m.group(2)]
+
+
+def _derivar_parametros(params, ordem):
+    """Completa os parâmetros calculados a partir de outros ({no_ano} usa :ano)"""
+    if 'ano_inicio' in ordem and 'ano_inicio' not in params and params.get('ano') is not None:
+        params = dict(params)
+        params['ano_inicio'], params['ano_fim'] = intervalo_ano(params['ano'])
+    return params
+
+
+def _expandir_fragmentos(sql, dialeto):
+    def substituir(m):
+        funcao, argumentos = m.group(1), m.group(2)
+        if funcao not in FRAGMENTOS[dialeto]:
+            raise ValueError(f"Função de dialeto desconhecida: {funcao}")
+        args = [arg.strip() for arg in argumentos.split(',')]
+        return FRAGMENTOS[dialeto][funcao].format(*args)
+
+    return _RE_FRAGMENTO.sub(substituir, sql)
+
+
+@lru_cache(maxsize=512)
+def converter_interrogacoes(query):
+    """
+    Converte '?' posicionais em ':param1', ':param2'... para o PostgreSQL.
+    Feito uma vez por texto de consulta (consultas avulsas ainda não registradas).
+    """
+    contador = itertools.count(1)
+    return _RE_INTERROGACAO.sub(
+        lambda m: m.group(1) or f':param{next(contador)}', query
+    )
+
+
+def intervalo_ano(ano):
+    """
+    Limites [inicio, fim) de um exercício para filtrar datas por intervalo.
+    `data >= :inicio AND data < :fim` aproveita as estatísticas da coluna
+    (zonemaps no DuckDB, índices no PostgreSQL), o que YEAR(data) = :ano impede.
+    """
+    ano = int(ano)
+    return date(ano, 1, 1), date(ano + 1, 1, 1)
+
+
+# Registro global de consultas nomeadas
+consultas = {}
+
+
+def registrar_consulta(nome, sql):
+    """Declara uma consulta nomeada, compila para todos os dialetos e a registra"""
+    if nome in consultas:
+        raise ValueError(f"Consulta já registrada: {nome}")
+    consulta = Consulta(nome, sql)
+    consultas[nome] = consulta
+    return consulta
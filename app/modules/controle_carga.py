@@ -0,0 +1,327 @@
+# app/modules/controle_carga.py
+"""
+Manifesto das cargas no DuckDB (tabela etl_control).
+
+Cada carga das tabelas fato registra o que mudou, por fatia
+(coexercicio, inmes, coug, cocontacontabil):
+
+  1. iniciar(): antes de gravar, guarda as fatias dos períodos do arquivo
+     (linhas, valor e uma assinatura da linha inteira) e registra a carga
+     'em_andamento', já com os anos dos períodos;
+  2. concluir(): depois de gravar, compara as fatias dos mesmos períodos com
+     as guardadas e grava só as alteradas, com os deltas de linhas e de
+     valor, mais os resumos: períodos, anos, UGs e prefixos de conta
+     (PREFIXO_CONTA dígitos) alterados.
+
+Uma recarga com o mesmo conteúdo (sobrescrever ou atualizar) termina sem
+fatias alteradas. Cargas que trocam a tabela inteira (recriar) e as cargas de
+dimensões ficam registradas sem períodos, valendo para todos os anos.
+
+Quem usa o manifesto:
+  - versoes(): a versão dos dados de cada exercício é o último registro que
+    alterou o exercício ou o anterior (comparativos). O ETag e o cache de
+    resultados passam a mudar só para os exercícios afetados, e a
+    manutenção do banco (que muda o arquivo, não os dados) não invalida
+    nada. Enquanto uma carga do exercício está em andamento, vale a versão
+    pelo arquivo do banco (app/modules/compressao_etag.py);
+  - o aquecimento após a carga refaz só os exercícios afetados e nada
+    quando a carga não alterou nenhuma fatia;
+  - o índice de inconsistências de receita é recalculado só nos períodos
+    alterados.
+"""
+import logging
+from datetime import datetime
+
+from app.modules.database_duckdb import db_duckdb
+from app.modules.manutencao_duckdb import colunas_gravadas
+
+logger = logging.getLogger(__name__)
+
+TABELA_CONTROLE = 'etl_control'
+
+# Coluna de valor somada nas fatias de cada tabela fato
+COLUNA_VALOR = {
+    'receita_lancamento': 'valancamento',
+    'despesa_lancamento': 'valancamento',
+    'receita_saldo': 'saldo_contabil_receita',
+    'despesa_saldo': 'saldo_contabil_despesa',
+}
+
+# Dígitos da conta contábil nos prefixos do resumo (classe, grupo, subgrupo, título)
+PREFIXO_CONTA = 4
+
+DDL_CONTROLE = f"""
+CREATE TABLE IF NOT EXISTS {TABELA_CONTROLE} (
+    id BIGINT PRIMARY KEY,
+    tabela VARCHAR,
+    arquivo VARCHAR,
+    modo VARCHAR,
+    situacao VARCHAR,
+    inicio TIMESTAMP,
+    fim TIMESTAMP,
+    periodos VARCHAR[],
+    periodos_alterados VARCHAR[],
+    anos INTEGER[],
+    ugs INTEGER[],
+    prefixos_conta VARCHAR[],
+    delta_linhas BIGINT,
+    delta_valor DECIMAL(18,2),
+    fatias STRUCT(
+        coexercicio INTEGER, inmes INTEGER, coug INTEGER, conta VARCHAR,
+        delta_linhas BIGINT, delta_valor DECIMAL(18,2)
+    )[],
+    fatias_antes STRUCT(
+        coexercicio INTEGER, inmes INTEGER, coug INTEGER, conta VARCHAR,
+        linhas BIGINT, valor DECIMAL(18,2), assinatura UBIGINT
+    )[]
+)
+"""
+
+
+def periodos_do_arquivo(df):
+    """Períodos (AAAA-MM) de todas as linhas do arquivo lido"""
+    return sorted((
+        df['COEXERCICIO'].astype(str) + '-' + df['INMES'].astype(str).str.zfill(2)
+    ).unique().tolist())
+
+
+def _periodos_numericos(periodos):
+    return sorted({int(str(periodo)[:4]) * 100 + int(str(periodo)[5:7]) for periodo in periodos})
+
+
+class ControleCarga:
+    """Manifesto das cargas (etl_control) e versão dos dados por exercício"""
+
+    def __init__(self, db=None):
+        self.db = db or db_duckdb
+
+    def garantir_tabela(self, conn):
+        conn.execute(DDL_CONTROLE)
+
+    def _sql_fatias(self, conn, tabela):
+        """SELECT das fatias da tabela nos períodos do parâmetro (AAAAMM)"""
+        assinatura = ', '.join(c for c in colunas_gravadas(conn, tabela) if c != 'data_carga')
+        return f"""
+            SELECT
+                CAST(coexercicio AS INTEGER) AS coexercicio,
+                CAST(inmes AS INTEGER) AS inmes,
+                CAST(coug AS INTEGER) AS coug,
+                CAST(cocontacontabil AS VARCHAR) AS conta,
+                COUNT(*) AS linhas,
+                CAST(COALESCE(SUM({COLUNA_VALOR[tabela]}), 0) AS DECIMAL(18,2)) AS valor,
+                bit_xor(hash({assinatura})) AS assinatura
+            FROM main.{tabela}
+            WHERE CAST(coexercicio AS INTEGER) * 100 + inmes IN (SELECT unnest(?::INTEGER[]))
+            GROUP BY ALL
+        """
+
+    def iniciar(self, tabela, arquivo, modo, periodos=None, conn=None):
+        """
+        Registra a carga 'em_andamento' e guarda as fatias dos períodos antes
+        de gravar. periodos=None: a carga troca a tabela inteira. Retorna o id.
+        """
+        fechar = conn is None
+        if fechar:
+            conn = self.db.get_connection(perfil='etl')
+        try:
+            self.garantir_tabela(conn)
+            id_carga = conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {TABELA_CONTROLE}").fetchone()[0]
+            periodos = sorted(set(periodos)) if periodos is not None else None
+            conn.execute(f"""
+                INSERT INTO {TABELA_CONTROLE} (id, tabela, arquivo, modo, situacao, inicio, periodos, anos)
+                VALUES (?, ?, ?, ?, 'em_andamento', ?, ?, ?)
+            """, [
+                id_carga, tabela, str(arquivo), modo, datetime.now(), periodos,
+                sorted({int(str(p)[:4]) for p in periodos}) if periodos is not None else None
+            ])
+            if periodos and tabela in COLUNA_VALOR:
+                # A linha da subconsulta (f) já é o STRUCT das fatias
+                conn.execute(f"""
+                    UPDATE {TABELA_CONTROLE}
+                    SET fatias_antes = (SELECT list(f) FROM ({self._sql_fatias(conn, tabela)}) f)
+                    WHERE id = ?
+                """, [_periodos_numericos(periodos), id_carga])
+            return id_carga
+        finally:
+            if fechar:
+                conn.close()
+
+    def concluir(self, id_carga, conn=None, sucesso=True):
+        """
+        Compara as fatias depois da carga com as guardadas em iniciar() e
+        grava o manifesto (só as fatias alteradas). Retorna o manifesto
+        (dict) ou None se não foi possível gravá-lo; uma falha aqui nunca
+        altera o resultado da carga.
+        """
+        fechar = conn is None
+        try:
+            if fechar:
+                conn = self.db.get_connection(perfil='etl')
+            tabela, periodos = conn.execute(
+                f"SELECT tabela, periodos FROM {TABELA_CONTROLE} WHERE id = ?", [id_carga]
+            ).fetchone()
+
+            if periodos is None or tabela not in COLUNA_VALOR:
+                conn.execute(f"""
+                    UPDATE {TABELA_CONTROLE} SET situacao = ?, fim = ? WHERE id = ?
+                """, ['concluida' if sucesso else 'falhou', datetime.now(), id_carga])
+                return self.manifesto(id_carga, conn)
+
+            conn.execute(f"""
+                CREATE OR REPLACE TEMP TABLE etl_fatias_alteradas AS
+                WITH antes AS (
+                    SELECT unnest(fatias_antes, recursive := true) FROM {TABELA_CONTROLE} WHERE id = ?
+                ),
+                depois AS ({self._sql_fatias(conn, tabela)})
+                SELECT
+                    COALESCE(d.coexercicio, a.coexercicio) AS coexercicio,
+                    COALESCE(d.inmes, a.inmes) AS inmes,
+                    COALESCE(d.coug, a.coug) AS coug,
+                    COALESCE(d.conta, a.conta) AS conta,
+                    COALESCE(d.linhas, 0) - COALESCE(a.linhas, 0) AS delta_linhas,
+                    CAST(COALESCE(d.valor, 0) - COALESCE(a.valor, 0) AS DECIMAL(18,2)) AS delta_valor
+                FROM depois d
+                FULL OUTER JOIN antes a
+                    ON d.coexercicio = a.coexercicio
+                    AND d.inmes = a.inmes
+                    AND d.coug IS NOT DISTINCT FROM a.coug
+                    AND d.conta IS NOT DISTINCT FROM a.conta
+                WHERE d.assinatura IS DISTINCT FROM a.assinatura
+                    OR d.linhas IS DISTINCT FROM a.linhas
+            """, [id_carga, _periodos_numericos(periodos)])
+            try:
+                conn.execute(f"""
+                    UPDATE {TABELA_CONTROLE} SET
+                        situacao = ?,
+                        fim = ?,
+                        fatias_antes = NULL,
+                        fatias = r.fatias,
+                        periodos_alterados = r.periodos_alterados,
+                        anos = r.anos,
+                        ugs = r.ugs,
+                        prefixos_conta = r.prefixos_conta,
+                        delta_linhas = r.delta_linhas,
+                        delta_valor = r.delta_valor
+                    FROM (
+                        SELECT
+                            COALESCE(list(f ORDER BY coexercicio, inmes, coug, conta), []) AS fatias,
+                            list_sort(list_distinct(list(printf('%04d-%02d', coexercicio, inmes)))) AS periodos_alterados,
+                            list_sort(list_distinct(list(coexercicio))) AS anos,
+                            list_sort(list_distinct(list(coug))) AS ugs,
+                            list_sort(list_distinct(list(left(conta, {PREFIXO_CONTA})))) AS prefixos_conta,
+                            COALESCE(SUM(delta_linhas), 0) AS delta_linhas,
+                            COALESCE(SUM(delta_valor), 0) AS delta_valor
+                        FROM etl_fatias_alteradas f
+                    ) r
+                    WHERE id = ?
+                """, ['concluida' if sucesso else 'falhou', datetime.now(), id_carga])
+            finally:
+                conn.execute("DROP TABLE IF EXISTS etl_fatias_alteradas")
+
+            manifesto = self.manifesto(id_carga, conn)
+            if manifesto['fatias']:
+                logger.info(
+                    f"🧾 Manifesto da carga {id_carga}: {manifesto['fatias']:,} fatia(s) alterada(s) em "
+                    f"{', '.join(manifesto['periodos_alterados'])} | {len(manifesto['ugs']):,} UG(s) | "
+                    f"Δ linhas {manifesto['delta_linhas']:+,} | Δ valor R$ {manifesto['delta_valor']:+,.2f}"
+                )
+            else:
+                logger.info(f"🧾 Manifesto da carga {id_carga}: nenhuma fatia alterada")
+            return manifesto
+        except Exception as e:
+            logger.error(f"⚠️ Manifesto da carga {id_carga} não gravado: {e}")
+            return None
+        finally:
+            if fechar and conn is not None:
+                conn.close()
+
+    def registrar_global(self, conn, tabela, arquivo, modo):
+        """Registra uma alteração sem períodos (dimensões, tabela recriada), válida para todos os anos"""
+        id_carga = self.iniciar(tabela, arquivo, modo, conn=conn)
+        return self.concluir(id_carga, conn)
+
+    def manifesto(self, id_carga, conn):
+        """Resumo de uma carga registrada"""
+        linha = conn.execute(f"""
+            SELECT id, tabela, modo, situacao, periodos, periodos_alterados, anos, ugs,
+                   prefixos_conta, delta_linhas, delta_valor, len(fatias)
+            FROM {TABELA_CONTROLE} WHERE id = ?
+        """, [id_carga]).fetchone()
+        manifesto = dict(zip((
+            'id', 'tabela', 'modo', 'situacao', 'periodos', 'periodos_alterados', 'anos', 'ugs',
+            'prefixos_conta', 'delta_linhas', 'delta_valor', 'fatias'
+        ), linha))
+        for chave in ('periodos_alterados', 'anos', 'ugs', 'prefixos_conta'):
+            manifesto[chave] = manifesto[chave] or []
+        manifesto['fatias'] = manifesto['fatias'] or 0
+        # Sem períodos, a carga vale para a tabela inteira
+        manifesto['global'] = manifesto['periodos'] is None
+        manifesto['alterado'] = manifesto['global'] or manifesto['fatias'] > 0
+        return manifesto
+
+    def versoes(self, conn):
+        """
+        Versão dos dados a partir do etl_control: {'global', 'ultima', 'anos',
+        'em_andamento'}. None se a tabela ainda não existe (o chamador usa
+        outra versão).
+        """
+        existe = conn.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ? AND schema_name = 'main'",
+            [TABELA_CONTROLE]
+        ).fetchone()[0]
+        if not existe:
+            return None
+        # Cargas concluídas sem fatias alteradas (anos vazio) não mudam nenhuma versão
+        global_, ultima = conn.execute(f"""
+            SELECT
+                COALESCE(MAX(id) FILTER (WHERE periodos IS NULL), 0),
+                COALESCE(MAX(id) FILTER (WHERE periodos IS NULL OR len(anos) > 0), 0)
+            FROM {TABELA_CONTROLE}
+        """).fetchone()
+        anos = dict(conn.execute(f"""
+            SELECT ano, MAX(id) FROM (SELECT id, unnest(anos) AS ano FROM {TABELA_CONTROLE})
+            GROUP BY ano
+        """).fetchall())
+        # Cargas sem conclusão registrada: os dados desses anos ainda podem mudar
+        em_andamento = conn.execute(f"""
+            SELECT
+                COALESCE(bool_or(periodos IS NULL), false),
+                COALESCE(list_distinct(flatten(list(anos))), [])
+            FROM {TABELA_CONTROLE}
+            WHERE situacao = 'em_andamento'
+        """).fetchone()
+        return {
+            'global': global_, 'ultima': ultima, 'anos': anos,
+            'em_andamento': {'global': em_andamento[0], 'anos': set(em_andamento[1])},
+        }
+
+
+def versao_exercicio(versoes, ano=None):
+    """
+    Versão dos dados de um exercício: a última alteração global e a última do
+    exercício ou do anterior. Sem exercício, a última alteração de qualquer um.
+    None enquanto uma carga que afeta o exercício está em andamento.
+    """
+    em_andamento = versoes['em_andamento']
+    if em_andamento['global'] or (em_andamento['anos'] and (
+            ano is None or {ano, ano - 1} & em_andamento['anos'])):
+        return None
+    if ano is None:
+        return f"c{versoes['ultima']}"
+    por_ano = versoes['anos']
+    return f"c{versoes['global']}|{max(por_ano.get(ano, 0), por_ano.get(ano - 1, 0))}"
+
+
+def anos_afetados(manifesto, ano_atual=None):
+    """
+    Exercícios cujos resultados mudam com a carga (os alterados e o seguinte,
+    que os compara), até o ano atual. None: todos (carga global ou sem manifesto).
+    """
+    if manifesto is None or manifesto['global']:
+        return None
+    ano_atual = ano_atual or datetime.now().year
+    return sorted({a for ano in manifesto['anos'] for a in (ano, ano + 1) if a <= ano_atual})
+
+
+# Instância global
+controle_carga = ControleCarga()
@@ -1,26 +1,34 @@
 """
 Módulo de conexão e gerenciamento do banco de dados
+
+O engine do SQLAlchemy só é criado no primeiro uso de `db.engine`: importar
+este módulo não abre conexões (o driver psycopg2 é carregado pelo SQLAlchemy
+ao conectar). No ambiente de desenvolvimento (DuckDB) a aplicação nem chega a
+importá-lo (ver app/db_manager.py).
 """
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
-import pandas as pd
 from config import Config
 
 class Database:
     """Classe para gerenciar conexões com o PostgreSQL"""
     
     def __init__(self):
-        self.engine = None
+        self._engine = None
         self.SessionLocal = None
-        self.init_engine()
+    
+    @property
+    def engine(self):
+        """Engine do SQLAlchemy, criado sob demanda"""
+        if self._engine is None:
+            self.init_engine()
+        return self._engine
     
     def init_engine(self):
         """Inicializa o engine do SQLAlchemy"""
         try:
-            self.engine = create_engine(
+            self._engine = create_engine(
                 Config.SQLALCHEMY_DATABASE_URI,
                 pool_size=5,
                 max_overflow=10,
@@ -30,7 +38,7 @@ class Database:
             self.SessionLocal = sessionmaker(
                 autocommit=False,
                 autoflush=False,
-                bind=self.engine
+                bind=self._engine
             )
             print("✅ Conexão com banco de dados configurada com sucesso!")
         except Exception as e:
@@ -40,6 +48,8 @@ class Database:
     @contextmanager
     def get_session(self):
         """Context manager para sessões do banco"""
+        if self.SessionLocal is None:
+            self.init_engine()
         session = self.SessionLocal()
         try:
             yield session
@@ -120,6 +130,7 @@ class Database:
     
     def read_sql(self, query, params=None):
         """Lê dados do banco e retorna um DataFrame pandas"""
+        import pandas as pd
         return pd.read_sql(query, self.engine, params=params)
     
     def table_exists(self, table_name):
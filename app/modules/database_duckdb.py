@@ -1,11 +1,115 @@
 """
 Módulo para conexão com DuckDB local (uban.duckdb)
 Contém todas as tabelas: lançamentos e saldos
+
+O módulo duckdb só é importado (e a pasta do banco só é criada) na primeira
+conexão, para não pesar na inicialização de quem usa apenas o PostgreSQL.
+
+Perfis de conexão (get_connection(perfil=...)), para que as telas e as
+cargas não disputem todos os núcleos e toda a memória da máquina:
+  - web: poucas threads e memória limitada por worker do gunicorn, com o
+    cache de metadados do Parquet (histórico) ligado;
+  - etl: todas as threads, memória grande, preserve_insertion_order
+    desligado (as cargas não dependem da ordem sem ORDER BY) e, se
+    configurada, a pasta temporária em disco rápido.
+Sem perfil, a conexão não altera as configurações (scripts e ferramentas).
+As configurações do DuckDB valem para o banco aberto no processo inteiro, e
+não só para a conexão: cada conexão reaplica o seu perfil ao abrir.
+
+Cargas em cópia (DUCKDB_CARGA_EM_COPIA): o DuckDB aceita um único processo
+gravando no arquivo, e uma carga segura o banco por vários minutos. As cargas
+(decoradas com @publicar_apos_carga ou dentro de db_duckdb.carga()) copiam o
+banco publicado para uban.carga.duckdb e gravam só na cópia; ao terminar com
+sucesso, a cópia passa por CHECKPOINT e substitui o arquivo publicado com
+os.replace (troca atômica). Em caso de falha, a cópia é descartada e o banco
+publicado fica como estava.
+
+As telas (perfil 'web') e as leituras com somente_leitura=True usam cursores
+de uma conexão somente leitura ao banco publicado, mantida aberta no
+processo, e continuam respondendo durante a carga. Quando o arquivo muda (uma
+carga publicada), a próxima conexão abre o arquivo novo; os cursores em uso
+terminam no arquivo anterior. A conexão fica em um banco em memória com o
+arquivo anexado (ATTACH ... READ_ONLY): duckdb.connect no mesmo caminho
+reaproveitaria a instância já aberta, ainda apontando para o arquivo antigo.
+
+Com a conexão de leitura aberta, outro processo não consegue gravar no
+arquivo publicado: as gravações fora de uma carga (scripts avulsos) só
+funcionam com o servidor parado. No Windows, o arquivo aberto pelo servidor
+não pode ser substituído, e o padrão é gravar direto no banco (0).
+
+Variáveis de ambiente:
+    DUCKDB_CARGA_EM_COPIA cargas em cópia e leitura pela conexão publicada (padrão 1; 0 no Windows)
+    DUCKDB_WEB_THREADS    threads por processo web (padrão 2)
+    DUCKDB_WEB_MEMORIA    memory_limit por processo web (padrão 1GB)
+    DUCKDB_ETL_THREADS    threads das cargas (padrão: todos os núcleos)
+    DUCKDB_ETL_MEMORIA    memory_limit das cargas (padrão: 80% da memória física)
+    DUCKDB_ETL_TEMP       temp_directory das cargas (padrão: <banco>.tmp)
 """
-import duckdb
+import contextlib
+import functools
 import os
+import shutil
+import threading
+import time
 from pathlib import Path
 
+# Nome do banco publicado na conexão de leitura (ATTACH)
+CATALOGO_LEITURA = 'uban'
+
+# Segundos entre a publicação e as ações adiadas (apos_publicar): as consultas
+# que começaram no arquivo anterior ainda podem ler o que elas vão apagar
+ESPERA_APOS_PUBLICAR = 5
+
+
+def _memoria_fisica_mb():
+    """Memória física da máquina em MB (None se o sistema não informa)"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def montar_perfis():
+    """
+    Configurações de cada perfil, lidas das variáveis de ambiente. Chaves
+    ausentes ficam como estão no banco aberto.
+    """
+    memoria_etl = os.getenv('DUCKDB_ETL_MEMORIA')
+    memoria_fisica = _memoria_fisica_mb()
+    if not memoria_etl and memoria_fisica:
+        memoria_etl = f"{int(memoria_fisica * 0.8)}MB"
+
+    perfis = {
+        'web': {
+            'threads': int(os.getenv('DUCKDB_WEB_THREADS', 2)),
+            'memory_limit': os.getenv('DUCKDB_WEB_MEMORIA', '1GB'),
+            'preserve_insertion_order': True,
+            'parquet_metadata_cache': True,
+        },
+        'etl': {
+            'threads': int(os.getenv('DUCKDB_ETL_THREADS', os.cpu_count() or 1)),
+            'preserve_insertion_order': False,
+        },
+    }
+    if memoria_etl:
+        perfis['etl']['memory_limit'] = memoria_etl
+    if os.getenv('DUCKDB_ETL_TEMP'):
+        perfis['etl']['temp_directory'] = os.getenv('DUCKDB_ETL_TEMP')
+    return perfis
+
+
+def _sql_perfil(configuracoes):
+    """Comandos SET de um perfil, em uma única instrução"""
+    comandos = []
+    for nome, valor in configuracoes.items():
+        if isinstance(valor, bool):
+            valor = 'true' if valor else 'false'
+        elif isinstance(valor, str):
+            valor = "'" + valor.replace("'", "''") + "'"
+        comandos.append(f"SET {nome} = {valor}")
+    return '; '.join(comandos)
+
+
 class DatabaseDuckDB:
     """Gerencia conexão com DuckDB local"""
     
@@ -21,12 +125,216 @@ class DatabaseDuckDB:
                 print(f"   Renomeie para: {self.db_path}")
                 self.db_path = old_path
         
-        # Criar pasta se não existir
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._pasta_criada = False
+        self.perfis = {nome: _sql_perfil(configuracoes) for nome, configuracoes in montar_perfis().items()}
+        
+        # Cargas em cópia e conexão de leitura do banco publicado
+        self.carga_em_copia = os.getenv('DUCKDB_CARGA_EM_COPIA', '0' if os.name == 'nt' else '1') == '1'
+        self.caminho_copia = self.db_path.with_name(f"{self.db_path.stem}.carga{self.db_path.suffix}")
+        self._cargas_abertas = 0
+        self._apos_publicar = []
+        self._leitura = None  # (conexão, identificação do arquivo aberto)
+        self._trava_leitura = threading.Lock()
+        
+    def get_connection(self, historico=False, perfil=None, somente_leitura=False):
+        """
+        Retorna uma conexão com o DuckDB. historico=True (leituras da
+        aplicação) inclui os exercícios arquivados em Parquet nas tabelas
+        fato (ver app/modules/historico_parquet.py). perfil: 'web' ou 'etl'
+        (ver montar_perfis); None não altera as configurações.
         
-    def get_connection(self):
-        """Retorna uma conexão com o DuckDB"""
-        return duckdb.connect(str(self.db_path))
+        Com cargas em cópia, as conexões de perfil 'web' leem o banco
+        publicado (cursor da conexão de leitura). As demais usam a cópia
+        durante uma carga do processo; fora dela, as com somente_leitura=True
+        também leem o banco publicado e as outras gravam direto nele.
+        """
+        import duckdb
+        
+        # Criar pasta se não existir (uma vez, na primeira conexão)
+        if not self._pasta_criada:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._pasta_criada = True
+        
+        em_carga = self._cargas_abertas > 0 and perfil != 'web'
+        if self.carga_em_copia and not em_carga and (perfil == 'web' or somente_leitura):
+            cursor = self._cursor_leitura()
+            if cursor is not None:
+                if historico:
+                    self.usar_historico(cursor)
+                return cursor
+        
+        if em_carga:
+            caminho = self.caminho_copia
+        else:
+            # Gravação direto no banco publicado: a conexão de leitura do
+            # processo deixaria de ver o arquivo como ele está
+            caminho = self.db_path
+            self._leitura = None
+        conn = duckdb.connect(str(caminho))
+        if perfil is not None:
+            conn.execute(self.perfis[perfil])
+        if historico:
+            self.usar_historico(conn)
+        return conn
+
+    def reiniciar_apos_fork(self):
+        """
+        No processo filho: descarta a conexão de leitura e a trava herdadas
+        do mestre (uma instância do DuckDB não pode ser usada nos dois lados
+        de um fork, e a trava pode ter sido copiada fechada). O worker abre
+        a sua conexão no primeiro cursor.
+        """
+        self._leitura = None
+        self._trava_leitura = threading.Lock()
+
+    def caminho_escrita(self):
+        """Arquivo em que as gravações do processo caem agora (a cópia, durante uma carga)"""
+        return self.caminho_copia if self._cargas_abertas else self.db_path
+
+    def _cursor_leitura(self):
+        """
+        Cursor da conexão somente leitura do banco publicado, reaberta quando
+        o arquivo muda. None se o banco ainda não existe.
+        """
+        import duckdb
+        try:
+            info = self.db_path.stat()
+        except FileNotFoundError:
+            return None
+        identificacao = (info.st_ino, info.st_mtime_ns, info.st_size)
+        with self._trava_leitura:
+            if self._leitura is None or self._leitura[1] != identificacao:
+                conn = duckdb.connect(':memory:')
+                conn.execute(self.perfis['web'])
+                conn.execute(f"ATTACH '{self.db_path.as_posix()}' AS {CATALOGO_LEITURA} (READ_ONLY)")
+                # A conexão anterior fecha quando o último cursor dela terminar
+                self._leitura = (conn, identificacao)
+            conexao = self._leitura[0]
+        cursor = conexao.cursor()
+        cursor.execute(f"USE {CATALOGO_LEITURA}")
+        return cursor
+
+    def iniciar_carga(self):
+        """
+        Abre a cópia de trabalho do banco (ou reaproveita a aberta, em cargas
+        aninhadas): as gravações do processo passam a cair nela.
+        """
+        if not self.carga_em_copia:
+            return
+        if self._cargas_abertas == 0:
+            import duckdb
+            copia_wal = Path(f"{self.caminho_copia}.wal")
+            if self.caminho_copia.exists():
+                # Sobra de uma carga interrompida, a menos que outro processo esteja gravando nela
+                try:
+                    duckdb.connect(str(self.caminho_copia)).close()
+                except duckdb.IOException as e:
+                    raise RuntimeError(f"Outra carga está gravando em {self.caminho_copia}: {e}")
+                print(f"⚠️ Cópia de carga anterior descartada: {self.caminho_copia}")
+            for caminho in (self.caminho_copia, copia_wal):
+                if caminho.exists():
+                    caminho.unlink()
+            if self.db_path.exists():
+                shutil.copyfile(self.db_path, self.caminho_copia)
+                wal = Path(f"{self.db_path}.wal")
+                if wal.exists():
+                    shutil.copyfile(wal, copia_wal)
+            print(f"📋 Carga em cópia: {self.caminho_copia}")
+        self._cargas_abertas += 1
+
+    def publicar_carga(self, sucesso=True):
+        """
+        Fecha a carga aberta em iniciar_carga. Na última (cargas aninhadas),
+        publica a cópia no lugar do banco (sucesso=True) ou a descarta.
+        Retorna False se a cópia foi descartada ou não pôde ser publicada.
+        """
+        if not self.carga_em_copia or self._cargas_abertas == 0:
+            return sucesso
+        self._cargas_abertas -= 1
+        if self._cargas_abertas:
+            return sucesso
+        
+        import duckdb
+        acoes, self._apos_publicar = self._apos_publicar, []
+        copia_wal = Path(f"{self.caminho_copia}.wal")
+        if not sucesso:
+            for caminho in (self.caminho_copia, copia_wal):
+                if caminho.exists():
+                    caminho.unlink()
+            print("🗑️ Carga sem sucesso: cópia descartada, banco publicado mantido")
+            return False
+        if not self.caminho_copia.exists():
+            return True
+        
+        try:
+            conn = duckdb.connect(str(self.caminho_copia))
+            conn.execute("CHECKPOINT")
+            conn.close()
+            # WAL do arquivo anterior não pode ser aplicado ao novo
+            wal = Path(f"{self.db_path}.wal")
+            if wal.exists():
+                wal.unlink()
+            os.replace(self.caminho_copia, self.db_path)
+        except (OSError, duckdb.Error) as e:
+            print(f"❌ Banco não publicado ({str(e)}). A carga ficou em {self.caminho_copia}")
+            return False
+        print(f"📦 Banco publicado: {self.db_path}")
+        
+        if acoes:
+            time.sleep(ESPERA_APOS_PUBLICAR)
+        for acao in acoes:
+            try:
+                acao()
+            except Exception as e:
+                print(f"⚠️ Ação após a publicação não executada: {str(e)}")
+        return True
+
+    @contextlib.contextmanager
+    def carga(self):
+        """Bloco de gravação em cópia: publica ao sair, descarta se houver exceção"""
+        self.iniciar_carga()
+        try:
+            yield self
+        except BaseException:
+            self.publicar_carga(sucesso=False)
+            raise
+        self.publicar_carga()
+
+    def apos_publicar(self, acao):
+        """
+        Executa a ação quando a carga em andamento for publicada (na hora, se
+        não houver carga), p.ex. apagar arquivos que o banco publicado ainda usa
+        """
+        if self._cargas_abertas:
+            self._apos_publicar.append(acao)
+        else:
+            acao()
+
+    def cursor(self, conn, historico=False):
+        """
+        Cursor de uma conexão de get_connection, no mesmo banco. Cursores não
+        herdam o USE: os da conexão de leitura (banco em memória com o
+        arquivo anexado) ficariam no banco em memória.
+        """
+        banco = conn.execute("SELECT current_database()").fetchone()[0]
+        cursor = conn.cursor()
+        cursor.execute(f"USE {banco}")
+        if historico:
+            self.usar_historico(cursor)
+        return cursor
+
+    def usar_historico(self, conn):
+        """
+        Resolve as tabelas fato pelas views do schema historico, quando ele
+        existe. Vale só para a conexão (ou cursor) informada: conn.cursor()
+        não herda o search_path.
+        """
+        import duckdb
+        try:
+            conn.execute("SET search_path = 'historico,main'")
+        except duckdb.CatalogException:
+            pass  # Nenhum exercício arquivado
+        return conn
     
     def test_connection(self):
         """Testa a conexão com o DuckDB"""
@@ -69,6 +377,25 @@ class DatabaseDuckDB:
         finally:
             conn.close()
 
+def publicar_apos_carga(funcao):
+    """
+    Decorador para os processar_arquivo das cargas: a carga grava na cópia
+    do banco, publicada se terminar com sucesso e descartada se falhar (ver
+    "Cargas em cópia" no início do módulo). Vem depois do aquecimento do
+    cache e antes da manutenção, que também grava na cópia.
+    """
+    @functools.wraps(funcao)
+    def envolvida(*args, **kwargs):
+        db_duckdb.iniciar_carga()
+        sucesso = False
+        try:
+            sucesso = funcao(*args, **kwargs)
+        finally:
+            publicado = db_duckdb.publicar_carga(bool(sucesso))
+        return sucesso and publicado
+    return envolvida
+
+
 # Instância global
 db_duckdb = DatabaseDuckDB()
 
@@ -0,0 +1,195 @@
+# app/modules/datatables.py
+"""
+Protocolo server-side do DataTables aplicado às consultas registradas.
+
+Quando a grade é inicializada com `serverSide: true`, o DataTables envia
+draw, start, length, order[i][column|dir], columns[i][data|search][value] e
+search[value]. A consulta base (uma Consulta registrada, sem ORDER BY/LIMIT)
+é envolvida em um SELECT externo que aplica a busca (ILIKE), a ordenação e a
+paginação no próprio banco, devolvendo só a página visível e as contagens.
+
+Apenas colunas declaradas pela rota podem ser ordenadas ou pesquisadas; os
+nomes vindos da requisição nunca são inseridos no SQL. Os selects de filtro
+do cabeçalho pedem os valores distintos de cada coluna à parte
+(sql_valores_coluna), já que a grade só recebe a página visível.
+"""
+
+# Tamanho máximo de página aceito (length=-1 ou valores maiores são limitados)
+TAMANHO_MAXIMO_PAGINA = 1000
+
+# Valores distintos oferecidos nos selects do cabeçalho; acima disso, a coluna
+# recebe um campo de texto (o filtro continua sendo por valor exato)
+LIMITE_VALORES_FILTRO = 500
+
+# Colunas auxiliares adicionadas pelo SELECT externo e removidas da resposta
+_COLUNAS_CONTAGEM = ('dt_total_filtrado', 'dt_total', 'dt_linha')
+
+
+class RequisicaoDataTables:
+    """Parâmetros de uma requisição server-side já validados contra as colunas permitidas"""
+
+    def __init__(self, draw, inicio, tamanho, ordenacao, busca, filtros_coluna):
+        self.draw = draw
+        self.inicio = inicio
+        self.tamanho = tamanho
+        self.ordenacao = ordenacao
+        self.busca = busca
+        self.filtros_coluna = filtros_coluna
+
+    def envolver(self, sql_base, dialeto, colunas, ordem_padrao):
+        """
+        Monta o SELECT externo sobre o SQL já compilado da consulta base.
+        `ordem_padrao` é uma lista de (expressão, 'ASC'|'DESC').
+        Retorna (sql, valores_extras); os valores extras vêm depois dos da
+        consulta base, na mesma ordem dos marcadores no texto.
+        """
+        extras = []
+
+        def marcador(valor):
+            extras.append(valor)
+            return '?' if dialeto == 'duckdb' else f':dt_param{len(extras)}'
+
+        condicoes = []
+
+        # Busca global: cada palavra precisa aparecer em alguma coluna pesquisável
+        pesquisaveis = [busca for _, busca in colunas.values() if busca]
+        for palavra in self.busca.split():
+            padrao = f"%{_escapar_like(palavra)}%"
+            alternativas = [
+                f"CAST({expr} AS VARCHAR) ILIKE {marcador(padrao)} ESCAPE '\\'"
+                for expr in pesquisaveis
+            ]
+            if alternativas:
+                condicoes.append('(' + ' OR '.join(alternativas) + ')')
+
+        # Filtro por coluna (selects do cabeçalho): valor exato
+        for expr, valor in self.filtros_coluna:
+            condicoes.append(f"CAST({expr} AS VARCHAR) = {marcador(valor)}")
+
+        # A ordem padrão completa a escolhida para a paginação ser estável
+        escolhidas = {expr for expr, _ in self.ordenacao}
+        ordem = [
+            f"{expr} {direcao}"
+            for expr, direcao in self.ordenacao + [
+                item for item in ordem_padrao if item[0] not in escolhidas
+            ]
+        ]
+
+        if condicoes:
+            total = "(SELECT COUNT(*) FROM base)"
+            filtrados = "SELECT * FROM base WHERE " + ' AND '.join(condicoes)
+        else:
+            total = "COUNT(*)"
+            filtrados = "SELECT * FROM base"
+
+        # As contagens saem de uma linha própria, ligada à página por LEFT
+        # JOIN: uma página além do fim (start grande) ainda traz os totais
+        sql = f"""
+    WITH base AS (
+{sql_base}
+    ),
+    filtrados AS (
+        {filtrados}
+    ),
+    pagina AS (
+        SELECT f.*, 1 as dt_linha
+        FROM filtrados f
+        ORDER BY {', '.join(ordem)}
+        LIMIT {marcador(self.tamanho)} OFFSET {marcador(self.inicio)}
+    ),
+    contagem AS (
+        SELECT COUNT(*) as dt_total_filtrado, {total} as dt_total
+        FROM filtrados
+    )
+    SELECT p.*, c.dt_total_filtrado, c.dt_total
+    FROM contagem c
+    LEFT JOIN pagina p ON TRUE
+    ORDER BY {', '.join(ordem)}
+    """
+        return sql, extras
+
+    def resposta(self, linhas):
+        """Monta o JSON esperado pelo DataTables e remove as colunas de contagem"""
+        total_filtrado = int(linhas[0]['dt_total_filtrado']) if linhas else 0
+        total = int(linhas[0]['dt_total']) if linhas else 0
+        # Página vazia: só a linha das contagens, com dt_linha nulo
+        linhas = [linha for linha in linhas if linha['dt_linha'] == 1]
+        for linha in linhas:
+            for coluna in _COLUNAS_CONTAGEM:
+                del linha[coluna]
+
+        return {
+            'draw': self.draw,
+            'recordsTotal': total,
+            'recordsFiltered': total_filtrado,
+            'data': linhas
+        }
+
+
+def sql_valores_coluna(sql_base, colunas, nome):
+    """
+    SELECT dos valores distintos de uma coluna declarada, como texto (a mesma
+    expressão e o mesmo CAST do filtro por coluna), para montar o select do
+    cabeçalho. Traz um valor além do limite para indicar que a lista não cabe.
+    """
+    ordem, busca = colunas[nome]
+    expr = busca or ordem
+    return f"""
+    WITH base AS (
+{sql_base}
+    )
+    SELECT DISTINCT CAST({expr} AS VARCHAR) as valor
+    FROM base
+    WHERE {expr} IS NOT NULL
+    ORDER BY valor
+    LIMIT {LIMITE_VALORES_FILTRO + 1}
+    """
+
+
+def ler_requisicao_datatables(args, colunas):
+    """
+    Lê os parâmetros do DataTables de request.args. Retorna None quando a
+    requisição não usa o protocolo (sem 'draw'), mantendo o formato antigo.
+
+    `colunas` mapeia o nome da coluna no DataTables (columns[i][data]) para
+    uma tupla (expressão de ordenação, expressão de busca ou None), ambas
+    sobre as colunas da consulta base. Colunas sem expressão de busca ficam
+    fora da busca global, mas aceitam o filtro exato por coluna.
+    """
+    if 'draw' not in args:
+        return None
+
+    draw = int(args.get('draw', 0))
+    inicio = max(int(args.get('start', 0)), 0)
+    tamanho = int(args.get('length', 25))
+    if tamanho < 0 or tamanho > TAMANHO_MAXIMO_PAGINA:
+        tamanho = TAMANHO_MAXIMO_PAGINA
+
+    ordenacao = []
+    i = 0
+    while f'order[{i}][column]' in args:
+        indice = args.get(f'order[{i}][column]')
+        nome = args.get(f'columns[{indice}][data]')
+        direcao = 'DESC' if args.get(f'order[{i}][dir]') == 'desc' else 'ASC'
+        if nome in colunas:
+            ordenacao.append((colunas[nome][0], direcao))
+        i += 1
+
+    filtros_coluna = []
+    i = 0
+    while f'columns[{i}][data]' in args:
+        nome = args.get(f'columns[{i}][data]')
+        valor = args.get(f'columns[{i}][search][value]', '').strip()
+        if valor and nome in colunas:
+            ordem, busca = colunas[nome]
+            filtros_coluna.append((busca or ordem, valor))
+        i += 1
+
+    busca = args.get('search[value]', '').strip()
+
+    return RequisicaoDataTables(draw, inicio, tamanho, ordenacao, busca, filtros_coluna)
+
+
+def _escapar_like(texto):
+    """Escapa os curingas do LIKE para que a busca seja literal"""
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
@@ -0,0 +1,133 @@
+# app/modules/dimensoes.py
+"""
+Cache das tabelas de dimensão usadas como dicionário de nomes (UG, fonte,
+alínea), consultadas por várias telas a cada requisição.
+
+Cada dimensão vira um dicionário {código (texto): nome}, carregado uma vez por
+processo no primeiro uso. No gunicorn com preload_app (gunicorn.conf.py),
+carregar() roda no processo mestre antes do fork e todos os workers leem as
+mesmas páginas de memória (copy-on-write), sem consulta nem cópia por worker.
+
+As cargas das tabelas dim_* rodam em outro processo (scripts), que não
+alcança o cache dos workers nem o do mestre. Cada dicionário guarda a versão
+global dos dados em que foi lido (versao_global: muda só com as cargas
+globais do etl_control, como as das dimensões, e não com as cargas mensais
+dos fatos, para os workers não trocarem as páginas compartilhadas por cópias
+próprias a cada carga) e é relido quando ela muda. A versão é conferida no
+máximo a cada VERIFICACAO_VERSAO_SEGUNDOS, para não custar nada nas chamadas
+de nome() em laço.
+"""
+import threading
+import time
+from app.db_manager import db_manager
+from app.modules.compressao_etag import versao_global
+
+# Nome da dimensão -> consulta que devolve (codigo, nome)
+CONSULTAS_DIMENSOES = {
+    'ug': """
+        SELECT CAST(coug AS VARCHAR) as codigo, noug as nome
+        FROM dim_unidade_gestora
+    """,
+    'fonte': """
+        SELECT DISTINCT CAST(cofonte AS VARCHAR) as codigo, nofonte as nome
+        FROM dim_fonte
+    """,
+    'alinea': """
+        SELECT DISTINCT CAST(coalinea AS VARCHAR) as codigo, noalinea as nome
+        FROM dim_receita_alinea
+    """,
+}
+
+# Nome da dimensão -> tabela de origem (invalidação por tabela alterada)
+TABELAS_DIMENSOES = {
+    'ug': 'dim_unidade_gestora',
+    'fonte': 'dim_fonte',
+    'alinea': 'dim_receita_alinea',
+}
+
+# Intervalo mínimo entre duas conferências da versão global dos dados
+VERIFICACAO_VERSAO_SEGUNDOS = 5
+
+
+class CacheDimensoes:
+    """Dicionários de código -> nome das dimensões, compartilhados pelo processo"""
+
+    def __init__(self):
+        self._mapas = {}
+        self._versoes = {}  # dimensão -> versão global em que foi lida
+        self._versao = None
+        self._verificado_em = None
+        self._lock = threading.Lock()
+
+    def versao_atual(self):
+        """
+        Versão global dos dados, relida no máximo a cada
+        VERIFICACAO_VERSAO_SEGUNDOS. Se não puder ser lida, fica a última
+        conhecida (o cache é mantido).
+        """
+        agora = time.monotonic()
+        if self._verificado_em is None or agora - self._verificado_em >= VERIFICACAO_VERSAO_SEGUNDOS:
+            try:
+                self._versao = versao_global(tabelas=TABELAS_DIMENSOES.values())
+            except Exception as e:
+                print(f"⚠️ Versão dos dados indisponível para as dimensões: {str(e)}")
+            self._verificado_em = agora
+        return self._versao
+
+    def _ler(self, dimensao):
+        versao = self.versao_atual()
+        linhas = db_manager.execute_query(CONSULTAS_DIMENSOES[dimensao])
+        return {str(linha['codigo']): linha['nome'] for linha in linhas}, versao
+
+    def carregar(self, dimensoes=None):
+        """
+        Carrega as dimensões (todas, por padrão). Falhas são apenas
+        informadas: a dimensão será lida de novo no primeiro uso.
+        """
+        for dimensao in dimensoes or CONSULTAS_DIMENSOES:
+            try:
+                mapa, versao = self._ler(dimensao)
+            except Exception as e:
+                print(f"⚠️ Dimensão '{dimensao}' não carregada: {str(e)}")
+                continue
+            with self._lock:
+                self._mapas[dimensao] = mapa
+                self._versoes[dimensao] = versao
+            print(f"📚 Dimensão '{dimensao}' em cache: {len(mapa):,} registros")
+
+    def mapa(self, dimensao):
+        """
+        Dicionário {código: nome} da dimensão, lido do banco se ainda não
+        estiver em cache ou se os dados mudaram desde a leitura
+        """
+        mapa = self._mapas.get(dimensao)
+        if mapa is None or self._versoes.get(dimensao) != self.versao_atual():
+            mapa, versao = self._ler(dimensao)
+            with self._lock:
+                self._mapas[dimensao] = mapa
+                self._versoes[dimensao] = versao
+        return mapa
+
+    def nome(self, dimensao, codigo, padrao=None):
+        """Nome do código na dimensão (padrao se não encontrado)"""
+        return self.mapa(dimensao).get(str(codigo), padrao)
+
+    def limpar(self, tabelas=None):
+        """
+        Descarta os dicionários deste processo. Com tabelas, descarta só as
+        dimensões lidas dessas tabelas. Os outros processos releem os seus
+        quando a versão global dos dados muda (ver mapa).
+        """
+        with self._lock:
+            if tabelas is None:
+                self._mapas.clear()
+                self._versoes.clear()
+                return
+            for dimensao, tabela in TABELAS_DIMENSOES.items():
+                if tabela in tabelas:
+                    self._mapas.pop(dimensao, None)
+                    self._versoes.pop(dimensao, None)
+
+
+# Instância global
+dimensoes = CacheDimensoes()
@@ -9,16 +9,176 @@ from pathlib import Path
 from tqdm import tqdm
 import logging
 from app.modules.etl_lancamento_duckdb import ETLLancamentoDuckDB
-from app.modules.database_duckdb import db_duckdb
+from app.modules.database_duckdb import db_duckdb, publicar_apos_carga
+from app.modules.aquecimento_cache import aquecer_apos_carga
+from app.modules.manutencao_duckdb import manter_apos_carga
+from app.modules.historico_parquet import historico_parquet
+from app.modules.controle_carga import controle_carga, periodos_do_arquivo
 
 logger = logging.getLogger(__name__)
 
+# Layout compacto da despesa_lancamento no DuckDB:
+#   - tipo_lancamento em ENUM (1 byte por linha) e hotransacao em TIME;
+#   - a cocontacorrente de 38/40 dígitos é gravada só nas partes, em inteiros
+#     (como na despesa_saldo); a conta fora desse padrão fica inteira em
+#     cocontacorrente_bruta;
+#   - cocontacorrente, periodo e as partes da natureza são colunas geradas
+#     (VIRTUAL): calculadas na leitura, sem ocupar o arquivo, e as consultas
+#     continuam usando os mesmos nomes.
+
+# Partes da conta corrente: (coluna, posição inicial, tamanho, tipo)
+PARTES_CONTA_CORRENTE = (
+    ('inesfera', 1, 1, 'UTINYINT'),
+    ('couo', 2, 5, 'INTEGER'),
+    ('cofuncao', 7, 2, 'UTINYINT'),
+    ('cosubfuncao', 9, 3, 'USMALLINT'),
+    ('coprograma', 12, 4, 'USMALLINT'),
+    ('coprojeto', 16, 4, 'USMALLINT'),
+    ('cosubtitulo', 20, 4, 'USMALLINT'),
+    ('cofonte', 24, 9, 'INTEGER'),
+    ('conatureza', 33, 6, 'INTEGER'),
+)
+CONTA_DECOMPONIVEL = "regexp_full_match(cocontacorrente, '[0-9]{38}([0-9]{2})?')"
+
+# Colunas geradas: (coluna, expressão)
+CONTA_RECOMPOSTA = "COALESCE(cocontacorrente_bruta, {} || COALESCE(cosubelemento, ''))".format(
+    ' || '.join(f"lpad(CAST({coluna} AS VARCHAR), {tamanho}, '0')" for coluna, _, tamanho, _ in PARTES_CONTA_CORRENTE)
+)
+NATUREZA_TEXTO = "lpad(CAST(conatureza AS VARCHAR), 6, '0')"
+COLUNAS_GERADAS = (
+    ('cocontacorrente', CONTA_RECOMPOSTA),
+    ('periodo', "CAST(coexercicio AS VARCHAR) || '-' || lpad(CAST(inmes AS VARCHAR), 2, '0')"),
+    ('incategoria', f"substr({NATUREZA_TEXTO}, 1, 1)"),
+    ('cogrupo', f"substr({NATUREZA_TEXTO}, 2, 1)"),
+    ('comodalidade', f"substr({NATUREZA_TEXTO}, 3, 2)"),
+    ('coelemento', f"substr({NATUREZA_TEXTO}, 5, 2)"),
+)
+
+# Colunas gravadas: (coluna, tipo)
+COLUNAS_GRAVADAS = (
+    ('coexercicio', 'SMALLINT'),
+    ('coug', 'INTEGER'),
+    ('cogestao', 'INTEGER'),
+    ('nudocumento', 'VARCHAR'),
+    ('nulancamento', 'INTEGER'),
+    ('coevento', 'INTEGER'),
+    ('cocontacontabil', 'BIGINT'),
+    ('inmes', 'UTINYINT'),
+    ('dalancamento', 'DATE'),
+    ('valancamento', 'DECIMAL(18,2)'),
+    ('indebitocredito', 'VARCHAR'),
+    ('inabreencerra', 'TINYINT'),
+    ('cougdestino', 'INTEGER'),
+    ('cogestaodestino', 'INTEGER'),
+    ('datransacao', 'DATE'),
+    ('hotransacao', 'TIME'),
+    ('cougcontab', 'INTEGER'),
+    ('cogestaocontab', 'INTEGER'),
+) + tuple((coluna, tipo) for coluna, _, _, tipo in PARTES_CONTA_CORRENTE) + (
+    ('cosubelemento', 'VARCHAR'),
+    ('cocontacorrente_bruta', 'VARCHAR'),
+    ('tipo_lancamento', "ENUM('DEBITO', 'CREDITO', 'INDEFINIDO')"),
+)
+
+# Colunas gravadas calculadas a partir das colunas do ETL: coluna -> (coluna de origem, expressão)
+EXPRESSOES_COMPACTAS = {
+    coluna: ('cocontacorrente', f"CASE WHEN {CONTA_DECOMPONIVEL} THEN CAST(substr(cocontacorrente, {inicio}, {tamanho}) AS {tipo}) END")
+    for coluna, inicio, tamanho, tipo in PARTES_CONTA_CORRENTE
+}
+EXPRESSOES_COMPACTAS.update({
+    'cosubelemento': ('cocontacorrente', f"CASE WHEN {CONTA_DECOMPONIVEL} AND length(cocontacorrente) = 40 THEN substr(cocontacorrente, 39, 2) END"),
+    'cocontacorrente_bruta': ('cocontacorrente', f"CASE WHEN {CONTA_DECOMPONIVEL} THEN NULL ELSE cocontacorrente END"),
+    'hotransacao': ('hotransacao', "TRY_CAST(NULLIF(TRIM(CAST(hotransacao AS VARCHAR)), 'nan') AS TIME)"),
+})
+
+
+def ddl_despesa_lancamento(tabela='despesa_lancamento'):
+    """CREATE TABLE do layout compacto"""
+    colunas = [f"{coluna} {tipo}" for coluna, tipo in COLUNAS_GRAVADAS]
+    colunas.append("data_carga TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+    colunas += [f"{coluna} VARCHAR GENERATED ALWAYS AS ({expressao}) VIRTUAL" for coluna, expressao in COLUNAS_GERADAS]
+    return f"CREATE TABLE {tabela} (\n    " + ",\n    ".join(colunas) + "\n)"
+
+
+def select_compacto(colunas_origem):
+    """
+    SELECT das colunas gravadas a partir das colunas do ETL (ou de uma tabela
+    no layout antigo). Colunas sem origem entram como NULL.
+    """
+    expressoes = []
+    for coluna, _ in COLUNAS_GRAVADAS:
+        origem, expressao = EXPRESSOES_COMPACTAS.get(coluna, (coluna, coluna))
+        expressoes.append(f"{expressao if origem in colunas_origem else 'NULL'} AS {coluna}")
+    return ', '.join(expressoes)
+
+
 class ETLDespesaLancamentoDuckDB(ETLLancamentoDuckDB):
     """Classe para processar DespesaLancamento no DuckDB"""
     
     def __init__(self, chunk_size=50000):  # Chunks maiores para despesa
         super().__init__(tipo_lancamento='despesa', chunk_size=chunk_size)
-    
+
+    def garantir_tabela(self):
+        """Cria a tabela no layout compacto ou converte a tabela do layout antigo"""
+        conn = db_duckdb.get_connection(perfil='etl')
+        try:
+            tipos = dict(conn.execute("""
+                SELECT column_name, data_type FROM duckdb_columns()
+                WHERE table_name = ? AND schema_name = 'main'
+            """, [self.table_name]).fetchall())
+            if not tipos:
+                conn.execute(ddl_despesa_lancamento(self.table_name))
+                logger.info(f"✅ Tabela {self.table_name} criada (layout compacto)")
+            elif 'cocontacorrente_bruta' not in tipos or tipos['cocontacontabil'] != 'BIGINT':
+                # Layout antigo, ou compacto com a conta contábil em VARCHAR
+                self.migrar_layout_compacto(conn, set(tipos))
+        finally:
+            conn.close()
+
+    def migrar_layout_compacto(self, conn, colunas_antigas):
+        """Regrava a tabela do layout antigo (ou com a conta contábil em VARCHAR) no layout compacto, em uma transação"""
+        logger.info(f"🔄 Convertendo {self.table_name} para o layout compacto...")
+        nova = f"{self.table_name}__compacta"
+        colunas = ', '.join(coluna for coluna, _ in COLUNAS_GRAVADAS)
+        data_carga = ', data_carga' if 'data_carga' in colunas_antigas else ''
+
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {nova}")
+            conn.execute(ddl_despesa_lancamento(nova))
+            conn.execute(f"""
+                INSERT INTO {nova} ({colunas}{data_carga})
+                SELECT {select_compacto(colunas_antigas)}{data_carga} FROM {self.table_name}
+            """)
+            antes = conn.execute(f"SELECT COUNT(*) FROM {self.table_name}").fetchone()[0]
+            depois = conn.execute(f"SELECT COUNT(*) FROM {nova}").fetchone()[0]
+            if antes != depois:
+                raise ValueError(f"Conversão divergente: {antes:,} linhas antes, {depois:,} depois")
+            conn.execute(f"DROP TABLE {self.table_name}")
+            conn.execute(f"ALTER TABLE {nova} RENAME TO {self.table_name}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("CHECKPOINT")
+        logger.info(f"✅ {depois:,} registros convertidos para o layout compacto")
+
+    def filtro_periodo(self, periodo):
+        """
+        periodo é coluna gerada (calculada linha a linha, sem min/max dos
+        blocos): o período é filtrado pelas colunas gravadas
+        """
+        ano, mes = str(periodo).split('-')
+        return "coexercicio = ? AND inmes = ?", [int(ano), int(mes)]
+
+    def colunas_carga(self):
+        """Colunas gravadas no layout compacto (as geradas são calculadas pelo banco)"""
+        return [coluna for coluna, _ in COLUNAS_GRAVADAS]
+
+    def select_carga(self, colunas_chunk):
+        """Partes da conta e tipos compactos calculados no SELECT"""
+        return select_compacto(colunas_chunk)
+
     def transform_data(self, df):
         """Aplica as transformações necessárias"""
         # Criar cópia para não modificar o original
@@ -114,8 +274,14 @@ class ETLDespesaLancamentoDuckDB(ETLLancamentoDuckDB):
         
         return df[colunas_finais]
     
-    def processar_arquivo(self, file_path, sobrescrever=False):
-        """Processa um arquivo Excel e carrega no DuckDB"""
+    @aquecer_apos_carga
+    @publicar_apos_carga
+    @manter_apos_carga
+    def processar_arquivo(self, file_path, sobrescrever=False, atualizar=False):
+        """
+        Processa um arquivo Excel e carrega no DuckDB. Com atualizar=True os
+        períodos existentes são mantidos e só a diferença é gravada.
+        """
         logger.info(f"Iniciando processamento: {file_path}")
         inicio = datetime.now()
         
@@ -124,6 +290,9 @@ class ETLDespesaLancamentoDuckDB(ETLLancamentoDuckDB):
             logger.error(f"Arquivo não encontrado: {file_path}")
             return False
         
+        # Tabela no layout compacto (criada ou convertida na primeira carga)
+        self.garantir_tabela()
+        
         # Analisar arquivo
         periodos, total_estimado = self.analisar_arquivo(file_path)
         
@@ -134,6 +303,9 @@ class ETLDespesaLancamentoDuckDB(ETLLancamentoDuckDB):
         logger.info(f"Períodos encontrados: {', '.join(periodos)}")
         logger.info(f"Total estimado: {total_estimado:,} registros")
         
+        # Ano arquivado em Parquet volta para a tabela antes de verificar os períodos
+        historico_parquet.restaurar_periodos(self.table_name, periodos)
+        
         # Aviso para arquivos grandes
         if total_estimado > 500000:
             logger.warning(f"⚠️ ARQUIVO GRANDE! Processamento pode demorar 10-20 minutos")
@@ -145,17 +317,12 @@ class ETLDespesaLancamentoDuckDB(ETLLancamentoDuckDB):
                 periodos_existentes.append(periodo)
                 logger.warning(f"Período {periodo} já existe no banco!")
         
-        # Se tem períodos existentes e não quer sobrescrever
-        if periodos_existentes and not sobrescrever:
-            logger.error("Existem períodos já carregados. Use sobrescrever=True para substituir.")
+        # Se tem períodos existentes e não quer sobrescrever nem atualizar
+        if periodos_existentes and not (sobrescrever or atualizar):
+            logger.error("Existem períodos já carregados. Use sobrescrever=True para substituir "
+                         "ou atualizar=True para gravar só a diferença.")
             return False
         
-        # Deletar períodos existentes se necessário
-        if periodos_existentes and sobrescrever:
-            logger.info("Removendo períodos existentes...")
-            for periodo in periodos_existentes:
-                self.deletar_periodo(periodo)
-        
         # Ler arquivo completo
         logger.info("Lendo arquivo Excel completo (pode demorar para arquivos grandes)...")
         try:
@@ -170,12 +337,27 @@ class ETLDespesaLancamentoDuckDB(ETLLancamentoDuckDB):
             logger.error(f"Erro ao ler arquivo: {e}")
             return False
         
+        # Manifesto da carga (etl_control): fatias dos períodos do arquivo antes de gravar
+        modo = 'atualizar' if atualizar else 'sobrescrever' if periodos_existentes and sobrescrever else 'incluir'
+        id_carga = controle_carga.iniciar(
+            self.table_name, file_path, modo, list(periodos) + periodos_do_arquivo(df_completo)
+        )
+        
+        # Deletar períodos existentes só depois de ler o arquivo inteiro (na atualização eles são mantidos)
+        if periodos_existentes and sobrescrever and not atualizar:
+            logger.info("Removendo períodos existentes...")
+            for periodo in periodos_existentes:
+                self.deletar_periodo(periodo)
+        
         # Processar e inserir dados
         total_processado = 0
         total_erro = 0
         
-        conn = db_duckdb.get_connection()
+        conn = db_duckdb.get_connection(perfil='etl')
         try:
+            # Na atualização o arquivo vai para uma tabela temporária e só a diferença é gravada
+            destino = self.preparar_tabela_carga(conn) if atualizar else self.table_name
+            
             # Processar em chunks
             with tqdm(total=total_linhas, desc="Processando") as pbar:
                 for start in range(0, total_linhas, self.chunk_size):
@@ -186,16 +368,8 @@ class ETLDespesaLancamentoDuckDB(ETLLancamentoDuckDB):
                         # Transformar dados
                         chunk_transformado = self.transform_data(chunk)
                         
-                        # Inserir no DuckDB
-                        colunas = self.get_colunas_insert()
-                        colunas_str = ', '.join(colunas)
-                        
-                        conn.register('chunk_df', chunk_transformado)
-                        conn.execute(f"""
-                            INSERT INTO {self.table_name} ({colunas_str})
-                            SELECT {colunas_str} FROM chunk_df
-                        """)
-                        conn.unregister('chunk_df')
+                        # Inserir no DuckDB (partes da conta e tipos compactos calculados no SELECT)
+                        self.inserir_chunk(conn, chunk_transformado, destino)
                         
                         total_processado += len(chunk)
                         pbar.update(len(chunk))
@@ -209,6 +383,18 @@ class ETLDespesaLancamentoDuckDB(ETLLancamentoDuckDB):
                         total_erro += len(chunk)
                         pbar.update(len(chunk))
             
+            # Gravar só a diferença do arquivo
+            if atualizar:
+                resumo = self.aplicar_atualizacao(conn, destino)
+                logger.info(f"🔄 Atualização pela chave: {resumo['inseridos']:,} inseridos, "
+                            f"{resumo['atualizados']:,} atualizados, {resumo['inalterados']:,} inalterados")
+                if resumo['ausentes_no_arquivo']:
+                    logger.warning(f"⚠️ {resumo['ausentes_no_arquivo']:,} lançamentos dos períodos do arquivo "
+                                   "estão no banco e não no arquivo (mantidos)")
+            
+            # Manifesto: só as fatias que a carga alterou
+            self.manifesto = controle_carga.concluir(id_carga, conn)
+            
             # Verificar total inserido
             count = conn.execute(f"SELECT COUNT(*) FROM {self.table_name}").fetchone()[0]
             logger.info(f"✅ Total no banco: {count:,} registros")
@@ -224,13 +410,14 @@ class ETLDespesaLancamentoDuckDB(ETLLancamentoDuckDB):
             logger.error(f"Erro geral no processamento: {e}")
             import traceback
             traceback.print_exc()
+            self.manifesto = controle_carga.concluir(id_carga, conn, sucesso=False)
             return False
         finally:
             conn.close()
 
 def validar_carga():
     """Valida os dados carregados"""
-    conn = db_duckdb.get_connection()
+    conn = db_duckdb.get_connection(perfil='etl', somente_leitura=True)
     try:
         query = """
         SELECT 
@@ -8,7 +8,11 @@ from datetime import datetime
 from pathlib import Path
 from tqdm import tqdm
 import logging
-from app.modules.database_duckdb import db_duckdb
+from app.modules.database_duckdb import db_duckdb, publicar_apos_carga
+from app.modules.aquecimento_cache import aquecer_apos_carga
+from app.modules.manutencao_duckdb import manter_apos_carga
+from app.modules.historico_parquet import historico_parquet
+from app.modules.controle_carga import controle_carga, periodos_do_arquivo
 
 logger = logging.getLogger(__name__)
 
@@ -19,10 +23,12 @@ class ETLDespesaSaldoDuckDB:
         self.chunk_size = chunk_size
         self.table_name = 'despesa_saldo'
         self.db_duckdb = db_duckdb
+        # Manifesto da última carga (app/modules/controle_carga.py)
+        self.manifesto = None
         
     def validar_periodo_existente(self, periodo):
         """Verifica se um período já foi carregado"""
-        conn = self.db_duckdb.get_connection()
+        conn = self.db_duckdb.get_connection(perfil='etl', somente_leitura=True)
         try:
             query = f"SELECT COUNT(*) FROM {self.table_name} WHERE periodo = ?"
             result = conn.execute(query, [periodo]).fetchone()
@@ -32,7 +38,7 @@ class ETLDespesaSaldoDuckDB:
     
     def deletar_periodo(self, periodo):
         """Remove dados de um período específico"""
-        conn = self.db_duckdb.get_connection()
+        conn = self.db_duckdb.get_connection(perfil='etl')
         try:
             count_query = f"SELECT COUNT(*) FROM {self.table_name} WHERE periodo = ?"
             count = conn.execute(count_query, [periodo]).fetchone()[0]
@@ -47,7 +53,7 @@ class ETLDespesaSaldoDuckDB:
     
     def drop_table_if_exists(self):
         """Remove a tabela se existir (para recriação completa)"""
-        conn = self.db_duckdb.get_connection()
+        conn = self.db_duckdb.get_connection(perfil='etl')
         try:
             # Verificar se tabela existe
             check_query = """
@@ -68,7 +74,7 @@ class ETLDespesaSaldoDuckDB:
     
     def create_table(self):
         """Cria a tabela com a nova estrutura"""
-        conn = self.db_duckdb.get_connection()
+        conn = self.db_duckdb.get_connection(perfil='etl')
         try:
             logger.info("📝 Criando tabela despesa_saldo com nova estrutura...")
             
@@ -199,6 +205,9 @@ class ETLDespesaSaldoDuckDB:
         
         return df[colunas_finais]
     
+    @aquecer_apos_carga
+    @publicar_apos_carga
+    @manter_apos_carga
     def processar_arquivo(self, file_path, sobrescrever=False, recriar_tabela=False):
         """Processa um arquivo Excel e carrega no DuckDB"""
         logger.info(f"Iniciando processamento: {file_path}")
@@ -208,8 +217,10 @@ class ETLDespesaSaldoDuckDB:
             logger.error(f"Arquivo não encontrado: {file_path}")
             return False
         
-        # Se recriar_tabela, dropar e criar nova
+        # Se recriar_tabela, dropar e criar nova (o manifesto vale para a tabela inteira)
+        id_carga = None
         if recriar_tabela:
+            id_carga = controle_carga.iniciar(self.table_name, file_path, 'recriar')
             self.drop_table_if_exists()
             self.create_table()
         
@@ -217,14 +228,23 @@ class ETLDespesaSaldoDuckDB:
         
         if not periodos:
             logger.error("Nenhum período encontrado no arquivo!")
+            if id_carga is not None:
+                self.manifesto = controle_carga.concluir(id_carga, sucesso=False)
             return False
         
         logger.info(f"Períodos encontrados: {', '.join(periodos)}")
         logger.info(f"Total estimado: {total_estimado:,} registros")
         
+        # Ano arquivado em Parquet volta para a tabela antes de verificar os períodos
+        restaurados = historico_parquet.restaurar_periodos(self.table_name, periodos)
+        if recriar_tabela and restaurados:
+            # Na tabela recriada, os períodos do arquivo substituem os restaurados
+            for periodo in periodos:
+                self.deletar_periodo(periodo)
+
         # Verificar períodos existentes (se não for recriação)
+        periodos_existentes = []
         if not recriar_tabela:
-            periodos_existentes = []
             for periodo in periodos:
                 if self.validar_periodo_existente(periodo):
                     periodos_existentes.append(periodo)
@@ -233,11 +253,6 @@ class ETLDespesaSaldoDuckDB:
             if periodos_existentes and not sobrescrever:
                 logger.error("Existem períodos já carregados. Use sobrescrever=True para substituir.")
                 return False
-            
-            if periodos_existentes and sobrescrever:
-                logger.info("Removendo períodos existentes...")
-                for periodo in periodos_existentes:
-                    self.deletar_periodo(periodo)
         
         # Ler arquivo completo
         logger.info("Lendo arquivo Excel completo...")
@@ -248,13 +263,28 @@ class ETLDespesaSaldoDuckDB:
             
         except Exception as e:
             logger.error(f"Erro ao ler arquivo: {e}")
+            if id_carga is not None:
+                self.manifesto = controle_carga.concluir(id_carga, sucesso=False)
             return False
         
+        # Manifesto da carga: fatias dos períodos antes de gravar
+        if id_carga is None:
+            modo = 'sobrescrever' if periodos_existentes else 'incluir'
+            id_carga = controle_carga.iniciar(
+                self.table_name, file_path, modo, list(periodos) + periodos_do_arquivo(df_completo)
+            )
+        
+        # Deletar períodos existentes só depois de ler o arquivo inteiro
+        if periodos_existentes and sobrescrever:
+            logger.info("Removendo períodos existentes...")
+            for periodo in periodos_existentes:
+                self.deletar_periodo(periodo)
+        
         # Processar e inserir dados
         total_processado = 0
         total_erro = 0
         
-        conn = self.db_duckdb.get_connection()
+        conn = self.db_duckdb.get_connection(perfil='etl')
         try:
             with tqdm(total=total_linhas, desc="Processando") as pbar:
                 for start in range(0, total_linhas, self.chunk_size):
@@ -294,12 +324,14 @@ class ETLDespesaSaldoDuckDB:
             # Validar dados carregados
             self.validar_carga(conn)
             
+            self.manifesto = controle_carga.concluir(id_carga, conn)
             return True
             
         except Exception as e:
             logger.error(f"Erro geral no processamento: {e}")
             import traceback
             traceback.print_exc()
+            self.manifesto = controle_carga.concluir(id_carga, conn, sucesso=False)
             return False
         finally:
             conn.close()
@@ -0,0 +1,280 @@
+"""
+Módulo ETL para pré-calcular as inconsistências de receita no DuckDB
+Regras (as mesmas do relatório por Fonte/Receita):
+  - FONTE_ALINEA: combinação fonte/alínea sem cadastro ativo em dim_receita_fonte_conta_contabil
+  - ALINEA_UG: alínea iniciada em 7 com UG contábil diferente da UG emitente
+
+O resultado fica na tabela receita_inconsistencia, recalculada por período após
+cada carga de receita_lancamento ou das dimensões envolvidas. Os endpoints do
+relatório apenas leem essa tabela.
+"""
+from datetime import datetime
+import logging
+from app.modules.database_duckdb import db_duckdb
+
+logger = logging.getLogger(__name__)
+
+TABELA_INCONSISTENCIAS = 'receita_inconsistencia'
+
+# Dimensões que alteram o resultado das regras (cadastro ou descrições)
+DIMENSOES_INCONSISTENCIAS = {
+    'dim_receita_fonte_conta_contabil',
+    'dim_fonte',
+    'dim_receita_alinea',
+    'dim_unidade_gestora',
+    'dim_evento',
+}
+
+# Quantidade de documentos novos listados no log ao final do recálculo
+LIMITE_DOCUMENTOS_LOG = 20
+
+DDL_INCONSISTENCIAS = f"""
+CREATE TABLE IF NOT EXISTS {TABELA_INCONSISTENCIAS} (
+    regra VARCHAR,
+    coexercicio INTEGER,
+    periodo VARCHAR,
+    nudocumento VARCHAR,
+    cougcontab INTEGER,
+    coug INTEGER,
+    coevento INTEGER,
+    cofonte VARCHAR,
+    coalinea VARCHAR,
+    dalancamento DATE,
+    valancamento DECIMAL(18,2),
+    indebitocredito VARCHAR,
+    nofonte VARCHAR,
+    noalinea VARCHAR,
+    noug_contabil VARCHAR,
+    noug_emitente VARCHAR,
+    noevento VARCHAR,
+    data_calculo TIMESTAMP
+)
+"""
+
+# Cadastro ativo de fonte/alínea, com as chaves como texto sem espaços. É a
+# regra do relatório desde a versão original: fonte e alínea do lançamento
+# (VARCHAR) comparadas com TRIM, como texto, com as da dimensão (BIGINT). Usada
+# aqui e na consulta direta do relatório (sem a tabela pré-calculada).
+CADASTRO_FONTE_ALINEA = """
+    SELECT DISTINCT
+        TRIM(CAST(cofonte AS VARCHAR)) as cofonte,
+        TRIM(CAST(coalinea AS VARCHAR)) as coalinea
+    FROM dim_receita_fonte_conta_contabil
+    WHERE instatus = 0
+"""
+
+# Descrições comuns às duas regras. As chaves das dimensões são BIGINT e as de
+# receita_lancamento são INTEGER (UG, evento) ou VARCHAR (fonte, alínea); fonte
+# e alínea seguem a mesma comparação como texto do cadastro.
+_JOINS_DESCRICOES = """
+    LEFT JOIN dim_fonte f
+        ON CAST(f.cofonte AS VARCHAR) = TRIM(rl.cofonte)
+    LEFT JOIN dim_receita_alinea a
+        ON CAST(a.coalinea AS VARCHAR) = TRIM(rl.coalinea)
+    LEFT JOIN dim_unidade_gestora ug1
+        ON ug1.coug = rl.cougcontab
+    LEFT JOIN dim_unidade_gestora ug2
+        ON ug2.coug = rl.coug
+    LEFT JOIN dim_evento ev
+        ON ev.coevento = rl.coevento
+"""
+
+_COLUNAS_INSERT = """
+    regra, coexercicio, periodo, nudocumento, cougcontab, coug, coevento,
+    cofonte, coalinea, dalancamento, valancamento, indebitocredito,
+    nofonte, noalinea, noug_contabil, noug_emitente, noevento, data_calculo
+"""
+
+_SELECT_DOCUMENTOS = """
+    SELECT DISTINCT
+        '{regra}',
+        rl.coexercicio,
+        rl.periodo,
+        rl.nudocumento,
+        rl.cougcontab,
+        rl.coug,
+        rl.coevento,
+        TRIM(rl.cofonte),
+        TRIM(rl.coalinea),
+        rl.dalancamento,
+        rl.valancamento,
+        rl.indebitocredito,
+        f.nofonte,
+        a.noalinea,
+        ug1.noug,
+        ug2.noug,
+        ev.noevento,
+        CAST(? AS TIMESTAMP)
+"""
+
+# Anti-join: os pares fonte/alínea do período são reduzidos a valores
+# distintos e comparados uma única vez com o cadastro ativo
+INSERT_FONTE_ALINEA = f"""
+INSERT INTO {TABELA_INCONSISTENCIAS} ({_COLUNAS_INSERT})
+WITH pares AS (
+    SELECT DISTINCT cofonte, coalinea
+    FROM receita_lancamento
+    WHERE periodo = ?
+        AND cofonte IS NOT NULL AND TRIM(cofonte) != ''
+        AND coalinea IS NOT NULL AND TRIM(coalinea) != ''
+),
+cadastrados AS ({CADASTRO_FONTE_ALINEA}),
+pares_invalidos AS (
+    SELECT p.cofonte, p.coalinea
+    FROM pares p
+    LEFT JOIN cadastrados c
+        ON c.cofonte = TRIM(p.cofonte)
+        AND c.coalinea = TRIM(p.coalinea)
+    WHERE c.cofonte IS NULL
+)
+{_SELECT_DOCUMENTOS.format(regra='FONTE_ALINEA')}
+FROM receita_lancamento rl
+JOIN pares_invalidos inv
+    ON inv.cofonte = rl.cofonte
+    AND inv.coalinea = rl.coalinea
+{_JOINS_DESCRICOES}
+WHERE rl.periodo = ?
+"""
+
+INSERT_ALINEA_UG = f"""
+INSERT INTO {TABELA_INCONSISTENCIAS} ({_COLUNAS_INSERT})
+{_SELECT_DOCUMENTOS.format(regra='ALINEA_UG')}
+FROM receita_lancamento rl
+{_JOINS_DESCRICOES}
+WHERE rl.periodo = ?
+    AND LEFT(TRIM(rl.coalinea), 1) = '7'
+    AND rl.cougcontab != rl.coug
+"""
+
+
+class ETLInconsistenciasReceitaDuckDB:
+    """Recalcula a tabela de inconsistências de receita por período"""
+
+    def __init__(self):
+        self.table_name = TABELA_INCONSISTENCIAS
+
+    def tabela_existe(self, conn):
+        """Verifica se a tabela de inconsistências já foi criada"""
+        result = conn.execute("""
+            SELECT COUNT(*) FROM information_schema.tables
+            WHERE table_name = ?
+        """, [self.table_name]).fetchone()
+        return result[0] > 0
+
+    def listar_periodos(self, conn):
+        """Retorna todos os períodos carregados em receita_lancamento"""
+        result = conn.execute("""
+            SELECT DISTINCT periodo FROM receita_lancamento
+            WHERE periodo IS NOT NULL
+            ORDER BY periodo
+        """).fetchall()
+        return [row[0] for row in result]
+
+    def recalcular(self, periodos=None, conn=None):
+        """
+        Recalcula as inconsistências dos períodos informados (todos se None).
+        Retorna um resumo por regra com o total e os documentos novos, isto é,
+        que não constavam na tabela antes do recálculo.
+        """
+        if conn is None:
+            # Fora de uma carga (p.ex. após as dimensões), grava em uma cópia própria
+            with db_duckdb.carga():
+                conn = db_duckdb.get_connection(perfil='etl')
+                try:
+                    return self.recalcular(periodos, conn)
+                finally:
+                    conn.close()
+
+        inicio = datetime.now()
+        primeira_execucao = not self.tabela_existe(conn)
+        conn.execute(DDL_INCONSISTENCIAS)
+
+        if periodos is None:
+            periodos = self.listar_periodos(conn)
+        periodos = sorted(set(periodos))
+
+        logger.info(f"🔎 Recalculando inconsistências de receita: {len(periodos)} período(s)")
+
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            # Guardar documentos já conhecidos para identificar os novos
+            conn.execute("DROP TABLE IF EXISTS inconsistencias_anteriores")
+            conn.execute(f"""
+                CREATE TEMP TABLE inconsistencias_anteriores AS
+                SELECT DISTINCT regra, nudocumento
+                FROM {self.table_name}
+                WHERE list_contains(?, periodo)
+            """, [periodos])
+
+            data_calculo = datetime.now()
+            for periodo in periodos:
+                conn.execute(f"DELETE FROM {self.table_name} WHERE periodo = ?", [periodo])
+                conn.execute(INSERT_FONTE_ALINEA, [periodo, data_calculo, periodo])
+                conn.execute(INSERT_ALINEA_UG, [data_calculo, periodo])
+
+            resumo = self._resumir(conn, periodos)
+            conn.execute("DROP TABLE inconsistencias_anteriores")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._registrar_log(resumo, primeira_execucao)
+        logger.info(f"✅ Inconsistências recalculadas em {datetime.now() - inicio}")
+        return resumo
+
+    def _resumir(self, conn, periodos):
+        """Totais por regra e documentos que não existiam antes do recálculo"""
+        resumo = {
+            'FONTE_ALINEA': {'total_documentos': 0, 'documentos_novos': []},
+            'ALINEA_UG': {'total_documentos': 0, 'documentos_novos': []},
+        }
+
+        totais = conn.execute(f"""
+            SELECT regra, COUNT(DISTINCT nudocumento)
+            FROM {self.table_name}
+            WHERE list_contains(?, periodo)
+            GROUP BY regra
+        """, [periodos]).fetchall()
+        for regra, total in totais:
+            resumo[regra]['total_documentos'] = total
+
+        novos = conn.execute(f"""
+            SELECT DISTINCT i.regra, i.nudocumento
+            FROM {self.table_name} i
+            LEFT JOIN inconsistencias_anteriores ant
+                ON ant.regra = i.regra
+                AND ant.nudocumento = i.nudocumento
+            WHERE list_contains(?, i.periodo)
+                AND ant.nudocumento IS NULL
+            ORDER BY i.regra, i.nudocumento
+        """, [periodos]).fetchall()
+        for regra, nudocumento in novos:
+            resumo[regra]['documentos_novos'].append(nudocumento)
+
+        return resumo
+
+    def _registrar_log(self, resumo, primeira_execucao):
+        """Mostra no log os totais e as inconsistências novas de cada regra"""
+        if primeira_execucao:
+            logger.info(f"🆕 Tabela {self.table_name} criada")
+
+        for regra, info in resumo.items():
+            novos = info['documentos_novos']
+            logger.info(f"   {regra}: {info['total_documentos']:,} documento(s) inconsistente(s)")
+
+            if novos and not primeira_execucao:
+                logger.warning(f"⚠️ {regra}: {len(novos):,} nova(s) inconsistência(s)")
+                for nudocumento in novos[:LIMITE_DOCUMENTOS_LOG]:
+                    logger.warning(f"   - {nudocumento}")
+                if len(novos) > LIMITE_DOCUMENTOS_LOG:
+                    logger.warning(f"   ... e mais {len(novos) - LIMITE_DOCUMENTOS_LOG:,}")
+
+
+def recalcular_inconsistencias(periodos=None, conn=None):
+    """Atalho para recalcular o índice de inconsistências de receita"""
+    return ETLInconsistenciasReceitaDuckDB().recalcular(periodos, conn)
+
+
+if __name__ == "__main__":
+    recalcular_inconsistencias()
@@ -7,7 +7,9 @@ from datetime import datetime
 from pathlib import Path
 from tqdm import tqdm
 import logging
-from app.modules.database_duckdb import db_duckdb
+from app.modules.database_duckdb import db_duckdb, publicar_apos_carga
+from app.modules.aquecimento_cache import aquecer_apos_carga
+from app.modules.manutencao_duckdb import manter_apos_carga
 
 # Configurar logging
 logging.basicConfig(
@@ -16,6 +18,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Chave de um lançamento, usada na carga com atualizar=True (índice único idx_<tabela>_chave)
+CHAVE_LANCAMENTO = ('coexercicio', 'coug', 'nudocumento', 'nulancamento')
+
+# Tabela temporária que recebe o arquivo na carga com atualizar=True
+TABELA_CARGA = 'lancamento_carga'
+
 class ETLLancamentoDuckDB:
     """Classe base para processar lançamentos no DuckDB"""
     
@@ -23,28 +31,37 @@ class ETLLancamentoDuckDB:
         self.tipo_lancamento = tipo_lancamento
         self.chunk_size = chunk_size
         self.table_name = f"{tipo_lancamento}_lancamento"
+        # Manifesto da última carga (app/modules/controle_carga.py)
+        self.manifesto = None
         
+    def filtro_periodo(self, periodo):
+        """Condição e parâmetros do WHERE de um período (AAAA-MM)"""
+        return "periodo = ?", [periodo]
+    
     def validar_periodo_existente(self, periodo):
         """Verifica se um período já foi carregado"""
-        conn = db_duckdb.get_connection()
+        conn = db_duckdb.get_connection(perfil='etl', somente_leitura=True)
         try:
-            query = f"SELECT COUNT(*) FROM {self.table_name} WHERE periodo = ?"
-            result = conn.execute(query, [periodo]).fetchone()
+            filtro, params = self.filtro_periodo(periodo)
+            query = f"SELECT COUNT(*) FROM {self.table_name} WHERE {filtro}"
+            result = conn.execute(query, params).fetchone()
             return result[0] > 0 if result else False
         finally:
             conn.close()
     
     def deletar_periodo(self, periodo):
         """Remove dados de um período específico"""
-        conn = db_duckdb.get_connection()
+        conn = db_duckdb.get_connection(perfil='etl')
         try:
+            filtro, params = self.filtro_periodo(periodo)
+            
             # Contar registros antes
-            count_query = f"SELECT COUNT(*) FROM {self.table_name} WHERE periodo = ?"
-            count = conn.execute(count_query, [periodo]).fetchone()[0]
+            count_query = f"SELECT COUNT(*) FROM {self.table_name} WHERE {filtro}"
+            count = conn.execute(count_query, params).fetchone()[0]
             
             # Deletar
-            delete_query = f"DELETE FROM {self.table_name} WHERE periodo = ?"
-            conn.execute(delete_query, [periodo])
+            delete_query = f"DELETE FROM {self.table_name} WHERE {filtro}"
+            conn.execute(delete_query, params)
             
             logger.info(f"✅ Removidos {count:,} registros do período {periodo}")
             return count
@@ -121,6 +138,136 @@ class ETLLancamentoDuckDB:
                 'cosubelemento', 'periodo', 'tipo_lancamento'
             ]
     
-    def processar_arquivo(self, file_path, sobrescrever=False):
-        """Processa um arquivo Excel e carrega no DuckDB"""
+    def colunas_carga(self):
+        """Colunas gravadas pela carga (as demais têm DEFAULT ou são geradas)"""
+        return self.get_colunas_insert()
+    
+    def select_carga(self, colunas_chunk):
+        """Expressões do SELECT sobre o chunk transformado, na ordem de colunas_carga"""
+        return ', '.join(self.get_colunas_insert())
+    
+    def inserir_chunk(self, conn, chunk_transformado, destino=None):
+        """Insere o chunk transformado na tabela (ou em destino, na carga com atualizar=True)"""
+        colunas_str = ', '.join(self.colunas_carga())
+        conn.register('chunk_df', chunk_transformado)
+        try:
+            conn.execute(f"""
+                INSERT INTO {destino or self.table_name} ({colunas_str})
+                SELECT {self.select_carga(chunk_transformado.columns)} FROM chunk_df
+            """)
+        finally:
+            conn.unregister('chunk_df')
+    
+    def preparar_tabela_carga(self, conn):
+        """Cria a tabela temporária da carga com atualizar=True, com os tipos da tabela"""
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE {TABELA_CARGA} AS
+            SELECT {', '.join(self.colunas_carga())} FROM {self.table_name} LIMIT 0
+        """)
+        return TABELA_CARGA
+    
+    def garantir_indice_chave(self, conn):
+        """
+        Cria o índice único da chave do lançamento (CHAVE_LANCAMENTO), se
+        ainda não existe. Falha se a tabela já tem chaves repetidas.
+        """
+        indice = f"idx_{self.table_name}_chave"
+        existe = conn.execute(
+            "SELECT COUNT(*) FROM duckdb_indexes() WHERE index_name = ?", [indice]
+        ).fetchone()[0]
+        if existe:
+            return indice
+        chave = ', '.join(CHAVE_LANCAMENTO)
+        repetidas = conn.execute(f"""
+            SELECT COUNT(*) - COUNT(DISTINCT ({chave})) FROM {self.table_name}
+        """).fetchone()[0]
+        if repetidas:
+            raise ValueError(
+                f"{self.table_name} tem {repetidas:,} lançamentos com a chave ({chave}) repetida; "
+                "recarregue os períodos com sobrescrever=True"
+            )
+        logger.info(f"🔑 Criando índice único {indice} ({chave})...")
+        conn.execute(f"CREATE UNIQUE INDEX {indice} ON {self.table_name} ({chave})")
+        return indice
+    
+    def aplicar_atualizacao(self, conn, origem=TABELA_CARGA):
+        """
+        Grava na tabela só a diferença entre o arquivo (origem) e o banco, pela
+        chave do lançamento: chaves novas são inseridas e as existentes com
+        algum valor diferente (hash da linha) são atualizadas, com um único
+        INSERT ... ON CONFLICT DO UPDATE. Lançamentos do banco que não estão
+        no arquivo são mantidos e apenas contados.
+
+        Retorna {'inseridos', 'atualizados', 'inalterados', 'ausentes_no_arquivo'}.
+        """
+        chave = ', '.join(CHAVE_LANCAMENTO)
+        colunas = self.colunas_carga()
+        colunas_str = ', '.join(colunas)
+        hash_banco = f"hash({colunas_str})"
+        hash_arquivo = f"hash({', '.join('c.' + c for c in colunas)})"
+        
+        total, distintas = conn.execute(
+            f"SELECT COUNT(*), COUNT(DISTINCT ({chave})) FROM {origem}"
+        ).fetchone()
+        if total != distintas:
+            raise ValueError(f"O arquivo tem {total - distintas:,} lançamentos com a chave ({chave}) repetida")
+        self.garantir_indice_chave(conn)
+        
+        try:
+            # Só os exercícios do arquivo são lidos do banco (a chave começa pelo exercício)
+            conn.execute(f"""
+                CREATE OR REPLACE TEMP TABLE lancamento_diferenca AS
+                SELECT c.*, a._h IS NOT NULL AS _existente
+                FROM {origem} c
+                LEFT JOIN (
+                    SELECT {chave}, {hash_banco} AS _h
+                    FROM {self.table_name}
+                    WHERE coexercicio IN (SELECT DISTINCT coexercicio FROM {origem})
+                ) a USING ({chave})
+                WHERE a._h IS NULL OR a._h <> {hash_arquivo}
+            """)
+            inseridos, atualizados = conn.execute("""
+                SELECT COUNT(*) FILTER (WHERE NOT _existente), COUNT(*) FILTER (WHERE _existente)
+                FROM lancamento_diferenca
+            """).fetchone()
+            ausentes = conn.execute(f"""
+                SELECT COUNT(*) FROM (
+                    SELECT {chave} FROM {self.table_name}
+                    WHERE (coexercicio, inmes) IN (SELECT DISTINCT coexercicio, inmes FROM {origem})
+                ) a
+                ANTI JOIN {origem} USING ({chave})
+            """).fetchone()[0]
+            
+            if inseridos or atualizados:
+                existentes = {linha[0] for linha in conn.execute(
+                    "SELECT column_name FROM duckdb_columns() WHERE table_name = ? AND schema_name = 'main'",
+                    [self.table_name]
+                ).fetchall()}
+                atribuicoes = [f"{c} = excluded.{c}" for c in colunas if c not in CHAVE_LANCAMENTO]
+                if 'data_carga' in existentes:
+                    atribuicoes.append("data_carga = now()")
+                conn.execute(f"""
+                    INSERT INTO {self.table_name} ({colunas_str})
+                    SELECT {colunas_str} FROM lancamento_diferenca
+                    ON CONFLICT ({chave}) DO UPDATE SET {', '.join(atribuicoes)}
+                """)
+        finally:
+            conn.execute("DROP TABLE IF EXISTS lancamento_diferenca")
+        
+        return {
+            'inseridos': inseridos,
+            'atualizados': atualizados,
+            'inalterados': total - inseridos - atualizados,
+            'ausentes_no_arquivo': ausentes,
+        }
+    
+    @aquecer_apos_carga
+    @publicar_apos_carga
+    @manter_apos_carga
+    def processar_arquivo(self, file_path, sobrescrever=False, atualizar=False):
+        """
+        Processa um arquivo Excel e carrega no DuckDB. Com atualizar=True os
+        períodos existentes não são apagados: só a diferença é gravada
+        (aplicar_atualizacao).
+        """
         raise NotImplementedError("Deve ser implementado nas classes filhas")
\ No newline at end of file
@@ -9,7 +9,12 @@ from pathlib import Path
 from tqdm import tqdm
 import logging
 from app.modules.etl_lancamento_duckdb import ETLLancamentoDuckDB
-from app.modules.database_duckdb import db_duckdb
+from app.modules.database_duckdb import db_duckdb, publicar_apos_carga
+from app.modules.aquecimento_cache import aquecer_apos_carga
+from app.modules.manutencao_duckdb import manter_apos_carga
+from app.modules.historico_parquet import historico_parquet
+from app.modules.controle_carga import controle_carga, periodos_do_arquivo
+from app.modules.etl_inconsistencias_receita_duckdb import recalcular_inconsistencias
 
 logger = logging.getLogger(__name__)
 
@@ -118,8 +123,14 @@ class ETLReceitaLancamentoDuckDB(ETLLancamentoDuckDB):
         
         return df[colunas_finais]
     
-    def processar_arquivo(self, file_path, sobrescrever=False):
-        """Processa um arquivo Excel e carrega no DuckDB"""
+    @aquecer_apos_carga
+    @publicar_apos_carga
+    @manter_apos_carga
+    def processar_arquivo(self, file_path, sobrescrever=False, atualizar=False):
+        """
+        Processa um arquivo Excel e carrega no DuckDB. Com atualizar=True os
+        períodos existentes são mantidos e só a diferença é gravada.
+        """
         logger.info(f"Iniciando processamento: {file_path}")
         inicio = datetime.now()
         
@@ -138,6 +149,9 @@ class ETLReceitaLancamentoDuckDB(ETLLancamentoDuckDB):
         logger.info(f"Períodos encontrados: {', '.join(periodos)}")
         logger.info(f"Total estimado: {total_estimado:,} registros")
         
+        # Ano arquivado em Parquet volta para a tabela antes de verificar os períodos
+        historico_parquet.restaurar_periodos(self.table_name, periodos)
+        
         # Verificar períodos existentes
         periodos_existentes = []
         for periodo in periodos:
@@ -145,17 +159,12 @@ class ETLReceitaLancamentoDuckDB(ETLLancamentoDuckDB):
                 periodos_existentes.append(periodo)
                 logger.warning(f"Período {periodo} já existe no banco!")
         
-        # Se tem períodos existentes e não quer sobrescrever
-        if periodos_existentes and not sobrescrever:
-            logger.error("Existem períodos já carregados. Use sobrescrever=True para substituir.")
+        # Se tem períodos existentes e não quer sobrescrever nem atualizar
+        if periodos_existentes and not (sobrescrever or atualizar):
+            logger.error("Existem períodos já carregados. Use sobrescrever=True para substituir "
+                         "ou atualizar=True para gravar só a diferença.")
             return False
         
-        # Deletar períodos existentes se necessário
-        if periodos_existentes and sobrescrever:
-            logger.info("Removendo períodos existentes...")
-            for periodo in periodos_existentes:
-                self.deletar_periodo(periodo)
-        
         # Ler arquivo completo
         logger.info("Lendo arquivo Excel completo...")
         try:
@@ -170,12 +179,27 @@ class ETLReceitaLancamentoDuckDB(ETLLancamentoDuckDB):
             logger.error(f"Erro ao ler arquivo: {e}")
             return False
         
+        # Manifesto da carga (etl_control): fatias dos períodos do arquivo antes de gravar
+        modo = 'atualizar' if atualizar else 'sobrescrever' if periodos_existentes and sobrescrever else 'incluir'
+        id_carga = controle_carga.iniciar(
+            self.table_name, file_path, modo, list(periodos) + periodos_do_arquivo(df_completo)
+        )
+        
+        # Deletar períodos existentes só depois de ler o arquivo inteiro (na atualização eles são mantidos)
+        if periodos_existentes and sobrescrever and not atualizar:
+            logger.info("Removendo períodos existentes...")
+            for periodo in periodos_existentes:
+                self.deletar_periodo(periodo)
+        
         # Processar e inserir dados
         total_processado = 0
         total_erro = 0
         
-        conn = db_duckdb.get_connection()
+        conn = db_duckdb.get_connection(perfil='etl')
         try:
+            # Na atualização o arquivo vai para uma tabela temporária e só a diferença é gravada
+            destino = self.preparar_tabela_carga(conn) if atualizar else self.table_name
+            
             # Processar em chunks
             with tqdm(total=total_linhas, desc="Processando") as pbar:
                 for start in range(0, total_linhas, self.chunk_size):
@@ -187,15 +211,7 @@ class ETLReceitaLancamentoDuckDB(ETLLancamentoDuckDB):
                         chunk_transformado = self.transform_data(chunk)
                         
                         # Inserir no DuckDB
-                        colunas = self.get_colunas_insert()
-                        colunas_str = ', '.join(colunas)
-                        
-                        conn.register('chunk_df', chunk_transformado)
-                        conn.execute(f"""
-                            INSERT INTO {self.table_name} ({colunas_str})
-                            SELECT {colunas_str} FROM chunk_df
-                        """)
-                        conn.unregister('chunk_df')
+                        self.inserir_chunk(conn, chunk_transformado, destino)
                         
                         total_processado += len(chunk)
                         pbar.update(len(chunk))
@@ -205,6 +221,18 @@ class ETLReceitaLancamentoDuckDB(ETLLancamentoDuckDB):
                         total_erro += len(chunk)
                         pbar.update(len(chunk))
             
+            # Gravar só a diferença do arquivo
+            if atualizar:
+                resumo = self.aplicar_atualizacao(conn, destino)
+                logger.info(f"🔄 Atualização pela chave: {resumo['inseridos']:,} inseridos, "
+                            f"{resumo['atualizados']:,} atualizados, {resumo['inalterados']:,} inalterados")
+                if resumo['ausentes_no_arquivo']:
+                    logger.warning(f"⚠️ {resumo['ausentes_no_arquivo']:,} lançamentos dos períodos do arquivo "
+                                   "estão no banco e não no arquivo (mantidos)")
+            
+            # Manifesto: só as fatias que a carga alterou
+            self.manifesto = controle_carga.concluir(id_carga, conn)
+            
             # Verificar total inserido
             count = conn.execute(f"SELECT COUNT(*) FROM {self.table_name}").fetchone()[0]
             logger.info(f"✅ Total no banco: {count:,} registros")
@@ -214,19 +242,34 @@ class ETLReceitaLancamentoDuckDB(ETLLancamentoDuckDB):
             logger.info(f"   - Registros processados: {total_processado:,}")
             logger.info(f"   - Registros com erro: {total_erro:,}")
             
+            # Atualizar o índice de inconsistências só nos períodos que a carga
+            # alterou (sem manifesto, em todos os períodos do arquivo)
+            if self.manifesto is not None:
+                periodos_recalculo = self.manifesto['periodos_alterados']
+            else:
+                periodos_recalculo = periodos_do_arquivo(df_completo)
+            try:
+                if periodos_recalculo:
+                    recalcular_inconsistencias(periodos_recalculo, conn)
+                else:
+                    logger.info("🔎 Nenhum período alterado: inconsistências mantidas")
+            except Exception as e:
+                logger.error(f"⚠️ Erro ao recalcular inconsistências: {e}")
+            
             return True
             
         except Exception as e:
             logger.error(f"Erro geral no processamento: {e}")
             import traceback
             traceback.print_exc()
+            self.manifesto = controle_carga.concluir(id_carga, conn, sucesso=False)
             return False
         finally:
             conn.close()
 
 def validar_carga():
     """Valida os dados carregados"""
-    conn = db_duckdb.get_connection()
+    conn = db_duckdb.get_connection(perfil='etl', somente_leitura=True)
     try:
         query = """
         SELECT 
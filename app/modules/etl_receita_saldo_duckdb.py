@@ -7,7 +7,11 @@ from datetime import datetime
 from pathlib import Path
 from tqdm import tqdm
 import logging
-from app.modules.database_duckdb import db_duckdb
+from app.modules.database_duckdb import db_duckdb, publicar_apos_carga
+from app.modules.aquecimento_cache import aquecer_apos_carga
+from app.modules.manutencao_duckdb import manter_apos_carga
+from app.modules.historico_parquet import historico_parquet
+from app.modules.controle_carga import controle_carga, periodos_do_arquivo
 
 logger = logging.getLogger(__name__)
 
@@ -18,10 +22,12 @@ class ETLReceitaSaldoDuckDB:
         self.chunk_size = chunk_size
         self.table_name = 'receita_saldo'
         self.db_duckdb = db_duckdb
+        # Manifesto da última carga (app/modules/controle_carga.py)
+        self.manifesto = None
         
     def validar_periodo_existente(self, periodo):
         """Verifica se um período já foi carregado"""
-        conn = self.db_duckdb.get_connection()
+        conn = self.db_duckdb.get_connection(perfil='etl', somente_leitura=True)
         try:
             query = f"SELECT COUNT(*) FROM {self.table_name} WHERE periodo = ?"
             result = conn.execute(query, [periodo]).fetchone()
@@ -31,7 +37,7 @@ class ETLReceitaSaldoDuckDB:
     
     def deletar_periodo(self, periodo):
         """Remove dados de um período específico"""
-        conn = self.db_duckdb.get_connection()
+        conn = self.db_duckdb.get_connection(perfil='etl')
         try:
             count_query = f"SELECT COUNT(*) FROM {self.table_name} WHERE periodo = ?"
             count = conn.execute(count_query, [periodo]).fetchone()[0]
@@ -146,6 +152,9 @@ class ETLReceitaSaldoDuckDB:
         
         return df[colunas_finais]
     
+    @aquecer_apos_carga
+    @publicar_apos_carga
+    @manter_apos_carga
     def processar_arquivo(self, file_path, sobrescrever=False):
         """Processa um arquivo Excel e carrega no DuckDB"""
         logger.info(f"Iniciando processamento: {file_path}")
@@ -164,6 +173,9 @@ class ETLReceitaSaldoDuckDB:
         logger.info(f"Períodos encontrados: {', '.join(periodos)}")
         logger.info(f"Total estimado: {total_estimado:,} registros")
         
+        # Ano arquivado em Parquet volta para a tabela antes de verificar os períodos
+        historico_parquet.restaurar_periodos(self.table_name, periodos)
+        
         # Verificar períodos existentes
         periodos_existentes = []
         for periodo in periodos:
@@ -175,11 +187,6 @@ class ETLReceitaSaldoDuckDB:
             logger.error("Existem períodos já carregados. Use sobrescrever=True para substituir.")
             return False
         
-        if periodos_existentes and sobrescrever:
-            logger.info("Removendo períodos existentes...")
-            for periodo in periodos_existentes:
-                self.deletar_periodo(periodo)
-        
         # Ler arquivo completo
         logger.info("Lendo arquivo Excel completo...")
         try:
@@ -191,11 +198,23 @@ class ETLReceitaSaldoDuckDB:
             logger.error(f"Erro ao ler arquivo: {e}")
             return False
         
+        # Manifesto da carga: fatias dos períodos antes de gravar
+        modo = 'sobrescrever' if periodos_existentes else 'incluir'
+        id_carga = controle_carga.iniciar(
+            self.table_name, file_path, modo, list(periodos) + periodos_do_arquivo(df_completo)
+        )
+        
+        # Deletar períodos existentes só depois de ler o arquivo inteiro
+        if periodos_existentes and sobrescrever:
+            logger.info("Removendo períodos existentes...")
+            for periodo in periodos_existentes:
+                self.deletar_periodo(periodo)
+        
         # Processar e inserir dados
         total_processado = 0
         total_erro = 0
         
-        conn = self.db_duckdb.get_connection()
+        conn = self.db_duckdb.get_connection(perfil='etl')
         try:
             with tqdm(total=total_linhas, desc="Processando") as pbar:
                 for start in range(0, total_linhas, self.chunk_size):
@@ -232,12 +251,14 @@ class ETLReceitaSaldoDuckDB:
             logger.info(f"   - Registros processados: {total_processado:,}")
             logger.info(f"   - Registros com erro: {total_erro:,}")
             
+            self.manifesto = controle_carga.concluir(id_carga, conn)
             return True
             
         except Exception as e:
             logger.error(f"Erro geral no processamento: {e}")
             import traceback
             traceback.print_exc()
+            self.manifesto = controle_carga.concluir(id_carga, conn, sucesso=False)
             return False
         finally:
             conn.close()
\ No newline at end of file
@@ -0,0 +1,59 @@
+# app/modules/formato_colunar.py
+"""
+Formato colunar (compacto) para as respostas de grades de lançamentos.
+
+Com ?format=columnar, a lista de linhas de uma resposta é trocada por:
+
+    {
+        "columns": ["nudocumento", "noug", ...],
+        "data": [["2025NL000001", 0, ...], ...],
+        "dictionaries": {"noug": ["SECRETARIA X", ...]}
+    }
+
+Os nomes das colunas aparecem uma única vez e as colunas de baixa
+cardinalidade (nomes de UG, eventos, datas, D/C) vão como índice em
+"dictionaries". O front decodifica com decodificarColunar() (static/js/base.js).
+Sem o parâmetro, a resposta continua no formato de lista de objetos.
+"""
+
+FORMATO_COLUNAR = 'columnar'
+
+
+def pedir_colunar(args):
+    """True quando a requisição pediu o formato colunar (format=columnar)"""
+    return args.get('format') == FORMATO_COLUNAR
+
+
+def colunar(linhas, dicionario=()):
+    """
+    Converte uma lista de dicionários (todas com as mesmas chaves) no formato
+    colunar. As colunas listadas em `dicionario` são codificadas por índice;
+    None continua None.
+    """
+    if not linhas:
+        return {'columns': [], 'data': [], 'dictionaries': {}}
+
+    colunas = list(linhas[0].keys())
+    codificadas = [(i, {}) for i, coluna in enumerate(colunas) if coluna in dicionario]
+
+    data = []
+    for row in linhas:
+        valores = list(row.values())
+        for i, codigos in codificadas:
+            valor = valores[i]
+            if valor is not None:
+                valores[i] = codigos.setdefault(valor, len(codigos))
+        data.append(valores)
+
+    return {
+        'columns': colunas,
+        'data': data,
+        'dictionaries': {colunas[i]: list(codigos) for i, codigos in codificadas}
+    }
+
+
+def formatar_linhas(linhas, args, dicionario=()):
+    """Devolve as linhas no formato pedido pela requisição (lista ou colunar)"""
+    if pedir_colunar(args):
+        return colunar(linhas, dicionario)
+    return linhas
@@ -0,0 +1,123 @@
+# app/modules/hierarquia.py
+"""
+Consolidação hierárquica em uma única passada (ex.: categoria → fonte →
+subfonte → alínea → UG), usada pelas telas de receita que exibem árvores de
+subtotais.
+
+consolidar() recebe as linhas agregadas no banco JÁ ORDENADAS pelas chaves dos
+níveis (o ORDER BY da consulta). Cada linha é decomposta em um caminho (a
+chave em cada nível, da raiz até o nível mais profundo que ela alcança) e nos
+seus valores. Percorrendo as linhas uma vez:
+  - o caminho é comparado com o caminho aberto; a partir do primeiro nível
+    diferente, os nós abertos são fechados e os novos são abertos;
+  - os valores da linha são somados só no nó mais profundo do caminho;
+  - ao fechar um nó, o subtotal dele é somado no pai, os campos derivados
+    (variações) são calculados e o nó pode ser descartado com os
+    descendentes (mas continua no subtotal do pai).
+
+A saída já é a lista de exibição: plana, em pré-ordem (pai antes dos
+filhos), ou aninhada em uma lista do nó pai (ex.: 'fontes'). Os totais gerais
+são a soma dos nós raiz mantidos, sem nova varredura.
+"""
+
+
+class Nivel:
+    """
+    Um nível da hierarquia:
+      montar(linha)   -> dict do nó (códigos, descrição e os campos somados
+                         já zerados)
+      finalizar(no)   -> calcula os campos derivados ao fechar o nó (opcional)
+      manter(no)      -> False descarta o nó e seus descendentes (opcional)
+    """
+    __slots__ = ('montar', 'finalizar', 'manter')
+
+    def __init__(self, montar, finalizar=None, manter=None):
+        self.montar = montar
+        self.finalizar = finalizar
+        self.manter = manter
+
+
+def somar_campos(campos):
+    """Soma padrão: destino[campo] += origem[campo] para cada campo numérico"""
+    def somar(destino, origem):
+        for campo in campos:
+            destino[campo] += origem[campo]
+    return somar
+
+
+def consolidar(linhas, niveis, decompor, campos=(), somar=None, filhos=None):
+    """
+    Monta a hierarquia em uma passada e retorna (lista de exibição, totais).
+
+    linhas   : iterável ordenado pelas chaves dos níveis
+    niveis   : sequência de Nivel, da raiz para as folhas
+    decompor : linha -> (caminho, valores), ou None para ignorar a linha;
+               caminho é a tupla de chaves da raiz até o nível mais profundo
+               que a linha alcança e valores é um dict com os mesmos campos
+               somados do nó
+    campos   : campos numéricos somados nos nós e nos totais
+    somar    : soma personalizada (destino, origem), para valores que não são
+               campos numéricos simples; padrão: somar_campos(campos)
+    filhos   : chave da lista de filhos no nó pai; None gera a lista plana
+
+    Um nó com o campo 'tem_filhos' tem o campo marcado ao receber o primeiro filho.
+    """
+    somar = somar or somar_campos(tuple(campos))
+    saida = []
+    totais = dict.fromkeys(campos, 0)
+    caminho_aberto = ()
+    # Nós do caminho aberto, um por nível: (nó, nível, lista onde está, posição)
+    abertos = []
+
+    def fechar(profundidade):
+        while len(abertos) > profundidade:
+            no, nivel, lista, posicao = abertos.pop()
+            if abertos:
+                somar(abertos[-1][0], no)
+            if nivel.finalizar:
+                nivel.finalizar(no)
+            if nivel.manter and not nivel.manter(no):
+                del lista[posicao:]
+            elif not abertos:
+                somar(totais, no)
+
+    for linha in linhas:
+        decomposta = decompor(linha)
+        if decomposta is None:
+            continue
+        caminho, valores = decomposta
+        if not caminho:
+            continue
+
+        # Primeiro nível em que a linha sai do caminho aberto
+        tamanho = len(caminho)
+        comum = 0
+        limite = min(tamanho, len(abertos))
+        while comum < limite and caminho[comum] == caminho_aberto[comum]:
+            comum += 1
+
+        if comum == tamanho:
+            # Mesmo caminho (ou um prefixo dele): soma no nó já aberto
+            somar(abertos[comum - 1][0], valores)
+            continue
+
+        fechar(comum)
+        for profundidade in range(comum, tamanho):
+            nivel = niveis[profundidade]
+            no = nivel.montar(linha)
+            if abertos:
+                pai = abertos[-1][0]
+                if 'tem_filhos' in pai:
+                    pai['tem_filhos'] = True
+                lista = pai.setdefault(filhos, []) if filhos else saida
+            else:
+                lista = saida
+            abertos.append((no, nivel, lista, len(lista)))
+            lista.append(no)
+        caminho_aberto = caminho
+
+        # Nó aberto por esta linha: ainda zerado, recebe os valores direto
+        abertos[-1][0].update(valores)
+
+    fechar(0)
+    return saida, totais
@@ -0,0 +1,243 @@
+# app/modules/historico_parquet.py
+"""
+Histórico dos exercícios fechados em Parquet, fora do banco DuckDB.
+
+As telas consultam quase sempre o exercício atual e o anterior. Os exercícios
+mais antigos das tabelas fato (TABELAS_HISTORICO) podem ser exportados para
+arquivos Parquet compactados (ZSTD) e ordenados pelas chaves das consultas,
+um por tabela e ano:
+
+    dados_brutos/fato/historico/<tabela>/coexercicio_<ano>.parquet
+
+e apagados do uban.duckdb, que fica só com os anos quentes
+(HISTORICO_ANOS_QUENTES, padrão 2: o atual e o anterior) e mais rápido de
+gravar e de fazer checkpoint.
+
+A leitura continua transparente: para cada tabela com histórico existe a
+view historico.<tabela> (a tabela nativa UNION ALL BY NAME os arquivos
+Parquet). As conexões de leitura da aplicação usam search_path =
+'historico,main' (DatabaseDuckDB.get_connection(historico=True)), então
+"FROM receita_lancamento" passa a ler a view. O filtro por coexercicio chega
+às duas partes e as estatísticas dos arquivos descartam os anos fora do
+filtro. As cargas continuam gravando na tabela nativa (main).
+
+Uma carga de um ano já arquivado chama restaurar_periodos antes de
+verificar os períodos existentes: o ano volta para a tabela nativa e o
+arquivo é removido, para que as linhas não apareçam duas vezes. Com cargas em
+cópia (ver database_duckdb), o arquivo só é removido depois que o banco da
+carga é publicado: até lá, as views do banco publicado ainda o leem. O
+próximo arquivamento exporta o ano de novo.
+
+Uso:
+    python scripts/historico_parquet.py [--anos-quentes 2] [--tabelas t1 t2] [--compactar] [--restaurar ANO ...] [--listar]
+"""
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app.modules.database_duckdb import db_duckdb
+from app.modules.manutencao_duckdb import ORDENACAO_TABELAS, colunas_gravadas, manutencao_duckdb
+
+TABELAS_HISTORICO = ('receita_lancamento', 'despesa_lancamento', 'receita_saldo', 'despesa_saldo')
+SCHEMA_HISTORICO = 'historico'
+
+
+class HistoricoParquet:
+    """Arquivamento dos exercícios fechados em Parquet e views de união"""
+
+    def __init__(self, db=None, pasta=None, anos_quentes=None):
+        self.db = db or db_duckdb
+        self.pasta = Path(pasta) if pasta else Path(self.db.db_path).parent.parent / 'historico'
+        if anos_quentes is None:
+            anos_quentes = int(os.getenv('HISTORICO_ANOS_QUENTES', 2))
+        self.anos_quentes = anos_quentes
+
+    def arquivo(self, tabela, ano):
+        return self.pasta / tabela / f"coexercicio_{ano}.parquet"
+
+    def anos_arquivados(self, tabela):
+        """Anos com arquivo Parquet da tabela, em ordem"""
+        pasta = self.pasta / tabela
+        if not pasta.exists():
+            return []
+        return sorted(int(arquivo.stem.split('_')[1]) for arquivo in pasta.glob('coexercicio_*.parquet'))
+
+    def recriar_views(self, conn, ignorar=None):
+        """
+        Cria (ou remove) as views historico.<tabela> conforme os arquivos
+        existentes, menos os anos em ignorar ({tabela: anos}, em restauração).
+        """
+        ignorar = ignorar or {}
+        conn.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA_HISTORICO}")
+        for tabela in TABELAS_HISTORICO:
+            anos = [ano for ano in self.anos_arquivados(tabela) if ano not in ignorar.get(tabela, ())]
+            if not anos:
+                conn.execute(f"DROP VIEW IF EXISTS {SCHEMA_HISTORICO}.{tabela}")
+                continue
+            arquivos = ', '.join(f"'{self.arquivo(tabela, ano).as_posix()}'" for ano in anos)
+            conn.execute(f"""
+                CREATE OR REPLACE VIEW {SCHEMA_HISTORICO}.{tabela} AS
+                SELECT * FROM main.{tabela}
+                UNION ALL BY NAME
+                SELECT * FROM read_parquet([{arquivos}])
+            """)
+        # Sem nenhuma view, o schema sai (as conexões de leitura voltam ao search_path padrão)
+        restantes = conn.execute(
+            "SELECT COUNT(*) FROM duckdb_views() WHERE schema_name = ?", [SCHEMA_HISTORICO]
+        ).fetchone()[0]
+        if not restantes:
+            conn.execute(f"DROP SCHEMA {SCHEMA_HISTORICO}")
+
+    def exportar_ano(self, conn, tabela, ano):
+        """
+        Grava o ano da tabela nativa em Parquet (arquivo temporário, conferido
+        pela contagem e renomeado). Retorna (linhas, bytes).
+        """
+        destino = self.arquivo(tabela, ano)
+        if destino.exists():
+            raise ValueError(f"{destino} já existe e a tabela nativa também tem o ano {ano}")
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporario = destino.with_suffix('.parquet.tmp')
+
+        colunas = {linha[0] for linha in conn.execute(f"DESCRIBE main.{tabela}").fetchall()}
+        ordem = [c for c in ORDENACAO_TABELAS.get(tabela, ()) if c in colunas]
+        order_by = f" ORDER BY {', '.join(ordem)}" if ordem else ""
+
+        linhas = conn.execute(f"SELECT COUNT(*) FROM main.{tabela} WHERE coexercicio = ?", [ano]).fetchone()[0]
+        conn.execute(f"""
+            COPY (SELECT * FROM main.{tabela} WHERE coexercicio = {int(ano)}{order_by})
+            TO '{temporario.as_posix()}' (FORMAT PARQUET, COMPRESSION ZSTD)
+        """)
+        gravadas = conn.execute(
+            f"SELECT COUNT(*) FROM read_parquet('{temporario.as_posix()}')"
+        ).fetchone()[0]
+        if gravadas != linhas:
+            temporario.unlink()
+            raise ValueError(f"{tabela} {ano}: {gravadas:,} linhas no Parquet, {linhas:,} na tabela")
+        os.replace(temporario, destino)
+        return linhas, destino.stat().st_size
+
+    def arquivar(self, tabelas=None, ano_atual=None, anos_quentes=None, compactar=False):
+        """
+        Exporta para Parquet os exercícios anteriores aos anos quentes, apaga
+        esses anos da tabela nativa e executa a manutenção do banco (que
+        reescreve as tabelas e, com compactar=True, encolhe o arquivo).
+        Retorna {tabela: {ano: (linhas, bytes)}}.
+        """
+        if not Path(self.db.db_path).exists():
+            print(f"❌ Banco DuckDB não encontrado: {self.db.db_path}")
+            return None
+
+        ano_atual = ano_atual or datetime.now().year
+        anos_quentes = self.anos_quentes if anos_quentes is None else anos_quentes
+        primeiro_quente = ano_atual - anos_quentes + 1
+        print(f"🗄️ Arquivando exercícios anteriores a {primeiro_quente} em {self.pasta}")
+
+        with self.db.carga():
+            arquivados = {}
+            conn = self.db.get_connection(perfil='etl')
+            try:
+                existentes = {linha[0] for linha in conn.execute(
+                    "SELECT table_name FROM duckdb_tables() WHERE schema_name = 'main'"
+                ).fetchall()}
+                for tabela in tabelas or TABELAS_HISTORICO:
+                    if tabela not in existentes:
+                        continue
+                    anos = [linha[0] for linha in conn.execute(
+                        f"SELECT DISTINCT coexercicio FROM main.{tabela} WHERE coexercicio < ? ORDER BY 1",
+                        [primeiro_quente]
+                    ).fetchall()]
+                    for ano in anos:
+                        inicio = time.perf_counter()
+                        try:
+                            linhas, tamanho = self.exportar_ano(conn, tabela, ano)
+                        except Exception as e:
+                            print(f"   ⚠️ {tabela} {ano}: não arquivado ({str(e)})")
+                            continue
+                        arquivados.setdefault(tabela, {})[ano] = (linhas, tamanho)
+                        print(f"   ✅ {tabela} {ano}: {linhas:,} linhas -> "
+                              f"{tamanho / (1024 * 1024):.1f} MB ({time.perf_counter() - inicio:.1f}s)")
+
+                if not arquivados:
+                    print("   Nenhum exercício a arquivar")
+                    return arquivados
+
+                # Apagar os anos e apontar as views para os arquivos na mesma
+                # transação: quem lê nunca vê um ano faltando nem duplicado
+                conn.execute("BEGIN TRANSACTION")
+                try:
+                    for tabela, anos in arquivados.items():
+                        conn.execute(
+                            f"DELETE FROM main.{tabela} WHERE coexercicio IN ({', '.join('?' * len(anos))})",
+                            list(anos)
+                        )
+                    self.recriar_views(conn)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    for tabela, anos in arquivados.items():
+                        for ano in anos:
+                            self.arquivo(tabela, ano).unlink()
+                    raise
+            finally:
+                conn.close()
+
+            manutencao_duckdb.executar(tabelas=list(arquivados), compactar=compactar)
+        return arquivados
+
+    def restaurar(self, tabela, anos, conn=None):
+        """
+        Traz os anos arquivados de volta para a tabela nativa e remove os
+        arquivos. Retorna a lista de anos restaurados.
+        """
+        anos = [ano for ano in sorted(set(anos)) if ano in self.anos_arquivados(tabela)]
+        if not anos:
+            return []
+
+        if conn is None:
+            with self.db.carga():
+                conn = self.db.get_connection(perfil='etl')
+                try:
+                    return self.restaurar(tabela, anos, conn)
+                finally:
+                    conn.close()
+
+        # As colunas geradas também estão no Parquet, mas não aceitam INSERT
+        gravadas = ', '.join(colunas_gravadas(conn, tabela))
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            for ano in anos:
+                conn.execute(f"""
+                    INSERT INTO main.{tabela} ({gravadas})
+                    SELECT {gravadas} FROM read_parquet('{self.arquivo(tabela, ano).as_posix()}')
+                """)
+            self.recriar_views(conn, ignorar={tabela: anos})
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for ano in anos:
+            # As views do banco publicado leem o arquivo até a carga ser publicada
+            self.db.apos_publicar(self.arquivo(tabela, ano).unlink)
+            print(f"   ♻️ {tabela} {ano}: restaurado do histórico Parquet")
+        return anos
+
+    def restaurar_periodos(self, tabela, periodos):
+        """Restaura os anos dos períodos ('AAAA-MM') de uma carga, se estiverem arquivados"""
+        if tabela not in TABELAS_HISTORICO:
+            return []
+        return self.restaurar(tabela, {int(str(periodo)[:4]) for periodo in periodos})
+
+    def listar(self):
+        """Imprime os anos arquivados por tabela, com linhas e tamanho"""
+        for tabela in TABELAS_HISTORICO:
+            anos = self.anos_arquivados(tabela)
+            if not anos:
+                continue
+            tamanho = sum(self.arquivo(tabela, ano).stat().st_size for ano in anos)
+            print(f"   {tabela:<22} {', '.join(map(str, anos))} ({tamanho / (1024 * 1024):.1f} MB)")
+
+
+# Instância global
+historico_parquet = HistoricoParquet()
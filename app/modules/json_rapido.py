@@ -0,0 +1,68 @@
+# app/modules/json_rapido.py
+"""
+Provedor JSON da aplicação (app.json), usado por jsonify em todas as rotas.
+
+Com o orjson instalado, a serialização é feita em C e já entende float/int do
+NumPy, datas e chaves não textuais; sem ele, cai no json da biblioteca padrão
+do Flask com o mesmo tratamento de tipos. Em ambos os casos:
+
+    Decimal                 -> número (float)
+    escalares/arrays NumPy  -> número/lista nativos
+    date/datetime/Timestamp -> texto ISO 8601 (AAAA-MM-DD[THH:MM:SS])
+    NaT do pandas           -> null
+
+Assim as rotas podem devolver direto as linhas de db_manager.execute_query,
+sem laços de float(...)/int(...) por linha. Datas que a tela mostra como
+DD/MM/AAAA devem vir formatadas da consulta ({data_br(coluna)}).
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def converter_valor(valor):
+    """Converte tipos que o JSON não conhece; chamado só para esses valores"""
+    if type(valor).__name__ == 'NaTType':
+        return None
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    if type(valor).__module__ == 'numpy':
+        return valor.tolist()
+    raise TypeError(f"Objeto do tipo {type(valor).__name__} não é serializável em JSON")
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """DefaultJSONProvider do Flask com orjson (quando disponível) e tipos do pandas/NumPy"""
+
+    default = staticmethod(converter_valor)
+
+    def _serializar(self, obj, indentar, ordenar):
+        opcoes = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indentar:
+            opcoes |= orjson.OPT_INDENT_2
+        if ordenar:
+            opcoes |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=converter_valor, option=opcoes)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        indentar = kwargs.get('indent') is not None
+        return self._serializar(obj, indentar, kwargs.get('sort_keys', self.sort_keys)).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = (self.compact is None and self._app.debug) or self.compact is False
+        # orjson já devolve bytes: vai direto para o corpo da resposta
+        return self._app.response_class(
+            self._serializar(obj, indentar, self.sort_keys) + b"\n", mimetype=self.mimetype
+        )
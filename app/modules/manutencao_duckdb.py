@@ -0,0 +1,275 @@
+# app/modules/manutencao_duckdb.py
+"""
+Manutenção do banco DuckDB (uban.duckdb) após as cargas.
+
+Cada recarga mensal apaga o período com deletar_periodo e insere de novo. As
+linhas apagadas continuam nos row groups (as leituras passam por elas) e as
+linhas novas entram no fim da tabela, fora da ordem das consultas. A
+manutenção:
+
+  1. CHECKPOINT (grava o WAL no arquivo);
+  2. reescreve as tabelas com muitas linhas apagadas (acima de
+     MANUTENCAO_LIMITE_EXCLUIDOS) ou, com ordenar=True, todas as tabelas
+     fato, já ordenadas pelas chaves das consultas (ORDENACAO_TABELAS), para
+     que os zonemaps de exercício/mês/data descartem row groups inteiros;
+  3. ANALYZE (estatísticas usadas pelo otimizador);
+  4. FORCE CHECKPOINT, liberando os blocos das versões antigas;
+  5. opcionalmente (compactar=True), COPY FROM DATABASE para um arquivo novo
+     que substitui o atual.
+
+O DuckDB não tem VACUUM que devolva espaço: os blocos liberados ficam livres
+no arquivo e são reaproveitados pelas próximas cargas, e a reescrita grava a
+tabela nova antes de liberar a antiga (o arquivo pode crescer). Só a cópia
+para um arquivo novo encolhe o arquivo; sem cargas em cópia, ela exige que
+nenhum outro processo esteja com o banco aberto.
+
+O relatório mostra, antes e depois, o tamanho do arquivo, os blocos livres e,
+por tabela, linhas, linhas apagadas e row groups.
+
+A reescrita usa o DDL original da tabela (mantém DEFAULT e constraints),
+recria os índices e é feita em uma transação.
+
+Uso:
+    python scripts/manutencao_duckdb.py [--ordenar] [--compactar] [--limite 0.10] [--tabelas t1 t2]
+
+Nas cargas, processar_arquivo é decorado com @manter_apos_carga (antes do
+aquecimento do cache, que depende do arquivo final). Com cargas em cópia
+(ver database_duckdb), a manutenção grava na cópia da carga ou, avulsa, em
+uma cópia própria publicada no final.
+"""
+import functools
+import os
+import time
+from pathlib import Path
+
+from app.modules.database_duckdb import db_duckdb
+
+# Tabela -> colunas na ordem em que as consultas filtram
+ORDENACAO_TABELAS = {
+    'receita_saldo': ('coexercicio', 'inmes', 'cocontacontabil', 'coug'),
+    'despesa_saldo': ('coexercicio', 'inmes', 'cocontacontabil', 'coug'),
+    'receita_lancamento': ('coexercicio', 'dalancamento', 'coug'),
+    'despesa_lancamento': ('coexercicio', 'dalancamento', 'coug'),
+    'receita_inconsistencia': ('coexercicio', 'periodo', 'regra'),
+}
+
+LIMITE_EXCLUIDOS_PADRAO = 0.10
+
+
+def _tamanho_mb(bytes_):
+    return bytes_ / (1024 * 1024)
+
+
+def colunas_gravadas(conn, tabela):
+    """
+    Colunas gravadas da tabela, na ordem, sem as colunas geradas (GENERATED
+    ALWAYS AS), que não aceitam INSERT. O catálogo não marca as geradas:
+    elas são reconhecidas pelo DDL.
+    """
+    ddl = conn.execute(
+        "SELECT sql FROM duckdb_tables() WHERE table_name = ? AND schema_name = 'main'", [tabela]
+    ).fetchone()[0]
+    return [nome for nome, tipo in conn.execute("""
+        SELECT column_name, data_type FROM duckdb_columns()
+        WHERE table_name = ? AND schema_name = 'main'
+        ORDER BY column_index
+    """, [tabela]).fetchall() if f"{nome} {tipo} GENERATED ALWAYS AS" not in ddl]
+
+
+class ManutencaoDuckDB:
+    """Checkpoint, reescrita ordenada e estatísticas do banco DuckDB"""
+
+    def __init__(self, db=None, limite_excluidos=None):
+        self.db = db or db_duckdb
+        if limite_excluidos is None:
+            limite_excluidos = float(os.getenv('MANUTENCAO_LIMITE_EXCLUIDOS', LIMITE_EXCLUIDOS_PADRAO))
+        self.limite_excluidos = limite_excluidos
+
+    def tamanho_arquivo(self):
+        """Bytes do arquivo do banco (a cópia, durante uma carga) + WAL"""
+        total = 0
+        arquivo = self.db.caminho_escrita()
+        for caminho in (Path(arquivo), Path(f"{arquivo}.wal")):
+            if caminho.exists():
+                total += caminho.stat().st_size
+        return total
+
+    def diagnostico(self, conn, tabelas=None):
+        """
+        Situação do banco: {'arquivo': bytes, 'blocos_livres', 'blocos_total',
+        'tabelas': {tabela: {'linhas', 'excluidas', 'row_groups'}}}.
+        As linhas apagadas são a diferença entre as linhas gravadas
+        (estimated_size) e as visíveis (COUNT).
+        """
+        blocos = conn.execute("SELECT total_blocks, free_blocks FROM pragma_database_size()").fetchone()
+        situacao = {
+            'arquivo': self.tamanho_arquivo(),
+            'blocos_total': blocos[0],
+            'blocos_livres': blocos[1],
+            'tabelas': {},
+        }
+        for tabela, gravadas in conn.execute("""
+            SELECT table_name, estimated_size FROM duckdb_tables()
+            WHERE schema_name = 'main' AND NOT temporary
+            ORDER BY table_name
+        """).fetchall():
+            if tabelas and tabela not in tabelas:
+                continue
+            linhas = conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+            row_groups = conn.execute(
+                "SELECT COUNT(DISTINCT row_group_id) FROM pragma_storage_info(?)", [tabela]
+            ).fetchone()[0]
+            situacao['tabelas'][tabela] = {
+                'linhas': linhas,
+                'excluidas': max(gravadas - linhas, 0),
+                'row_groups': row_groups,
+            }
+        return situacao
+
+    def reescrever_tabela(self, conn, tabela, ordenar_por=()):
+        """
+        Reescreve a tabela (sem as linhas apagadas e, se informado, na ordem
+        das colunas), com o mesmo DDL e os mesmos índices, em uma transação.
+        """
+        ddl = conn.execute(
+            "SELECT sql FROM duckdb_tables() WHERE table_name = ? AND schema_name = 'main'", [tabela]
+        ).fetchone()[0]
+        prefixo = f"CREATE TABLE {tabela}("
+        if not ddl.startswith(prefixo):
+            raise ValueError(f"DDL inesperado para {tabela}: {ddl[:60]}")
+        indices = [linha[0] for linha in conn.execute(
+            "SELECT sql FROM duckdb_indexes() WHERE table_name = ? AND sql IS NOT NULL", [tabela]
+        ).fetchall()]
+
+        colunas = {linha[0] for linha in conn.execute(f"DESCRIBE {tabela}").fetchall()}
+        ordem = [c for c in ordenar_por if c in colunas]
+        order_by = f" ORDER BY {', '.join(ordem)}" if ordem else ""
+        gravadas = ', '.join(colunas_gravadas(conn, tabela))
+        nova = f"{tabela}__manutencao"
+
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {nova}")
+            conn.execute(f"CREATE TABLE {nova}(" + ddl[len(prefixo):])
+            conn.execute(f"INSERT INTO {nova} ({gravadas}) SELECT {gravadas} FROM {tabela}{order_by}")
+            conn.execute(f"DROP TABLE {tabela}")
+            conn.execute(f"ALTER TABLE {nova} RENAME TO {tabela}")
+            for indice in indices:
+                conn.execute(indice)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return ordem
+
+    def compactar(self, conn):
+        """
+        Copia o banco para um arquivo novo (sem blocos livres) e troca os
+        arquivos. Fecha a conexão recebida; retorna uma conexão nova.
+        """
+        banco = conn.execute("SELECT current_database()").fetchone()[0]
+        arquivo = self.db.caminho_escrita()
+        destino = Path(f"{arquivo}.compactando")
+        for caminho in (destino, Path(f"{destino}.wal")):
+            if caminho.exists():
+                caminho.unlink()
+        conn.execute(f"ATTACH '{destino}' AS compacto")
+        try:
+            conn.execute(f"COPY FROM DATABASE {banco} TO compacto")
+        finally:
+            conn.execute("DETACH compacto")
+        conn.close()
+        os.replace(destino, arquivo)
+        return self.db.get_connection(perfil='etl')
+
+    def executar(self, ordenar=False, tabelas=None, compactar=False):
+        """
+        Executa a manutenção e imprime o relatório. ordenar=True reescreve
+        todas as tabelas de ORDENACAO_TABELAS; senão, só as que passaram do
+        limite de linhas apagadas. compactar=True copia o banco para um
+        arquivo novo no final. Retorna {'antes', 'depois', 'reescritas', 'segundos'}.
+        """
+        if not Path(self.db.db_path).exists():
+            print(f"❌ Banco DuckDB não encontrado: {self.db.db_path}")
+            return None
+
+        inicio = time.perf_counter()
+        with self.db.carga():
+            conn = self.db.get_connection(perfil='etl')
+            try:
+                conn.execute("CHECKPOINT")
+                antes = self.diagnostico(conn, tabelas)
+
+                reescritas = {}
+                for tabela, info in antes['tabelas'].items():
+                    fracao = info['excluidas'] / (info['linhas'] + info['excluidas']) if info['excluidas'] else 0.0
+                    ordenar_tabela = ordenar and tabela in ORDENACAO_TABELAS
+                    if fracao <= self.limite_excluidos and not ordenar_tabela:
+                        continue
+                    t = time.perf_counter()
+                    try:
+                        ordem = self.reescrever_tabela(conn, tabela, ORDENACAO_TABELAS.get(tabela, ()))
+                    except Exception as e:
+                        print(f"   ⚠️ {tabela}: não reescrita ({str(e)})")
+                        continue
+                    reescritas[tabela] = {
+                        'motivo': f"{fracao:.0%} apagadas" if fracao > self.limite_excluidos else 'ordenação',
+                        'ordem': ordem,
+                        'segundos': time.perf_counter() - t,
+                    }
+
+                conn.execute("ANALYZE")
+                conn.execute("FORCE CHECKPOINT")
+                if compactar:
+                    conn = self.compactar(conn)
+                depois = self.diagnostico(conn, tabelas)
+            finally:
+                conn.close()
+
+        resultado = {
+            'antes': antes,
+            'depois': depois,
+            'reescritas': reescritas,
+            'segundos': time.perf_counter() - inicio,
+        }
+        self.imprimir_relatorio(resultado)
+        return resultado
+
+    def imprimir_relatorio(self, resultado):
+        antes, depois = resultado['antes'], resultado['depois']
+        print(f"🧹 Manutenção do DuckDB concluída em {resultado['segundos']:.1f}s")
+        print(f"   Arquivo       : {_tamanho_mb(antes['arquivo']):8.1f} MB -> {_tamanho_mb(depois['arquivo']):8.1f} MB")
+        print(f"   Blocos livres : {antes['blocos_livres']:,} de {antes['blocos_total']:,} -> "
+              f"{depois['blocos_livres']:,} de {depois['blocos_total']:,}")
+        for tabela, info in antes['tabelas'].items():
+            novo = depois['tabelas'].get(tabela, info)
+            if tabela not in resultado['reescritas'] and not info['excluidas']:
+                continue
+            reescrita = resultado['reescritas'].get(tabela)
+            detalhe = (f" | reescrita ({reescrita['motivo']}, {reescrita['segundos']:.1f}s"
+                       f"{', ordem: ' + ', '.join(reescrita['ordem']) if reescrita['ordem'] else ''})"
+                       if reescrita else "")
+            print(f"   {tabela:<28} linhas {novo['linhas']:>12,} | apagadas {info['excluidas']:>10,} -> "
+                  f"{novo['excluidas']:>10,} | row groups {info['row_groups']:>5} -> {novo['row_groups']:>5}{detalhe}")
+
+
+def manter_apos_carga(funcao):
+    """
+    Decorador para os processar_arquivo das cargas no DuckDB: se a carga
+    terminou com sucesso, executa a manutenção. MANUTENCAO_APOS_CARGA=0
+    desliga. Uma falha na manutenção nunca altera o resultado da carga.
+    """
+    @functools.wraps(funcao)
+    def envolvida(*args, **kwargs):
+        sucesso = funcao(*args, **kwargs)
+        if sucesso and os.getenv('MANUTENCAO_APOS_CARGA', '1') == '1':
+            try:
+                manutencao_duckdb.executar()
+            except Exception as e:
+                print(f"⚠️ Manutenção do DuckDB não executada: {str(e)}")
+        return sucesso
+    return envolvida
+
+
+# Instância global
+manutencao_duckdb = ManutencaoDuckDB()
@@ -5,6 +5,7 @@ Compara Previsão Inicial (521100000-521199999) com Previsão Atualizada (521100
 """
 from flask import Blueprint, jsonify
 from app.db_manager import db_manager
+from app.modules.hierarquia import Nivel, consolidar
 from datetime import datetime
 import traceback
 
@@ -91,82 +92,45 @@ def get_dados_previsao_atualizada():
         traceback.print_exc()
         return jsonify({'erro': str(e)}), 500
 
-def processar_dados_previsao_dinamico(resultados):
-    """
-    Processa os resultados da query em estrutura hierárquica de forma dinâmica,
-    seguindo exatamente o mesmo padrão do receita_estimada.py
-    """
-    dados_por_categoria = {}
-
-    # Etapa 1: Agrupar os dados lidos do banco em uma estrutura aninhada
-    for row in resultados:
-        cat_id = row['cocategoriareceita']
-        cat_nome = row['nocategoriareceita']
-        fonte_id = row['fonte_principal']
-        fonte_nome = row['nofontereceita']
-        previsao_inicial = float(row['previsao_inicial'] or 0)
-        previsao_atualizada = float(row['previsao_atualizada'] or 0)
-
-        # Cria a entrada da categoria se for a primeira vez que ela aparece
-        if cat_id not in dados_por_categoria:
-            dados_por_categoria[cat_id] = {
-                'nome': cat_nome,
-                'fontes': {},
-                'total_inicial': 0,
-                'total_atualizada': 0
-            }
+CAMPOS_VALORES = ('previsao_inicial', 'previsao_atualizada')
 
-        # Cria a entrada da fonte dentro da categoria se for a primeira vez
-        if fonte_id not in dados_por_categoria[cat_id]['fontes']:
-            dados_por_categoria[cat_id]['fontes'][fonte_id] = {
-                'nome': fonte_nome,
-                'previsao_inicial': 0,
-                'previsao_atualizada': 0
-            }
+def _montar_no(tipo, nome, filhos=False):
+    def montar(row):
+        no = {'tipo': tipo, 'nome': row[nome], 'previsao_inicial': 0, 'previsao_atualizada': 0}
+        if filhos:
+            no['fontes'] = []
+        return no
+    return montar
 
-        # Acumula os valores na estrutura
-        dados_por_categoria[cat_id]['fontes'][fonte_id]['previsao_inicial'] += previsao_inicial
-        dados_por_categoria[cat_id]['fontes'][fonte_id]['previsao_atualizada'] += previsao_atualizada
-        dados_por_categoria[cat_id]['total_inicial'] += previsao_inicial
-        dados_por_categoria[cat_id]['total_atualizada'] += previsao_atualizada
+def _calcular_variacao(item):
+    item['variacao'] = calcular_variacao_percentual(item['previsao_atualizada'], item['previsao_inicial'])
 
-    # Etapa 2: Calcular totais gerais
-    total_geral_inicial = sum(cat['total_inicial'] for cat in dados_por_categoria.values())
-    total_geral_atualizada = sum(cat['total_atualizada'] for cat in dados_por_categoria.values())
+NIVEIS = (
+    Nivel(_montar_no('categoria', 'nocategoriareceita', filhos=True), _calcular_variacao),
+    Nivel(_montar_no('fonte', 'nofontereceita'), _calcular_variacao),
+)
 
-    dados_finais = []
-    
-    # Itera sobre as categorias que foram encontradas dinamicamente
-    for cat_id, cat_data in sorted(dados_por_categoria.items()):
-        categoria = {
-            'tipo': 'categoria',
-            'nome': cat_data['nome'],
-            'previsao_inicial': cat_data['total_inicial'],
-            'previsao_atualizada': cat_data['total_atualizada'],
-            'variacao': calcular_variacao_percentual(cat_data['total_atualizada'], cat_data['total_inicial']),
-            'fontes': []
+def processar_dados_previsao_dinamico(resultados):
+    """
+    Processa os resultados da query (ordenados por categoria e fonte) em
+    estrutura hierárquica de forma dinâmica, em uma passada, seguindo o mesmo
+    padrão do receita_estimada.py
+    """
+    def decompor(row):
+        return (row['cocategoriareceita'], row['fonte_principal']), {
+            'previsao_inicial': float(row['previsao_inicial'] or 0),
+            'previsao_atualizada': float(row['previsao_atualizada'] or 0),
         }
 
-        # Itera sobre as fontes encontradas para cada categoria
-        for fonte_id, fonte_data in sorted(cat_data['fontes'].items()):
-            fonte = {
-                'tipo': 'fonte',
-                'nome': fonte_data['nome'],
-                'previsao_inicial': fonte_data['previsao_inicial'],
-                'previsao_atualizada': fonte_data['previsao_atualizada'],
-                'variacao': calcular_variacao_percentual(fonte_data['previsao_atualizada'], fonte_data['previsao_inicial'])
-            }
-            categoria['fontes'].append(fonte)
-        
-        dados_finais.append(categoria)
+    dados_finais, totais = consolidar(resultados, NIVEIS, decompor, CAMPOS_VALORES, filhos='fontes')
 
     # Adicionar a linha de total ao final
     dados_finais.append({
         'tipo': 'total',
         'nome': 'RECEITA LÍQUIDA',
-        'previsao_inicial': total_geral_inicial,
-        'previsao_atualizada': total_geral_atualizada,
-        'variacao': calcular_variacao_percentual(total_geral_atualizada, total_geral_inicial)
+        'previsao_inicial': totais['previsao_inicial'],
+        'previsao_atualizada': totais['previsao_atualizada'],
+        'variacao': calcular_variacao_percentual(totais['previsao_atualizada'], totais['previsao_inicial'])
     })
 
     return dados_finais
@@ -5,6 +5,7 @@ Versão 100% dinâmica, que lê a estrutura do banco de dados.
 """
 from flask import Blueprint, jsonify
 from app.db_manager import db_manager
+from app.modules.hierarquia import Nivel, consolidar
 from datetime import datetime
 import traceback
 
@@ -94,79 +95,44 @@ def get_dados_receita_estimada():
         traceback.print_exc()
         return jsonify({'erro': str(e)}), 500
 
+CAMPOS_VALORES = ('valor_atual', 'valor_anterior')
+
+def _montar_no(tipo, nome, filhos=False):
+    def montar(row):
+        no = {'tipo': tipo, 'nome': row[nome], 'valor_atual': 0, 'valor_anterior': 0}
+        if filhos:
+            no['fontes'] = []
+        return no
+    return montar
+
+NIVEIS = (
+    Nivel(_montar_no('categoria', 'nocategoriareceita', filhos=True)),
+    Nivel(_montar_no('fonte', 'nofontereceita')),
+)
+
 def processar_dados_receita_dinamico(resultados, ano_atual, ano_anterior):
     """
-    Processa os resultados da query em estrutura hierárquica de forma dinâmica,
-    sem depender de nenhuma estrutura pré-definida.
+    Processa os resultados da query (ordenados por categoria e fonte) em
+    estrutura hierárquica de forma dinâmica, em uma passada, sem depender de
+    nenhuma estrutura pré-definida.
     """
-    dados_por_categoria = {}
-
-    # Etapa 1: Agrupar os dados lidos do banco em uma estrutura aninhada
-    for row in resultados:
-        cat_id = row['cocategoriareceita']
-        cat_nome = row['nocategoriareceita']
-        fonte_id = row['fonte_principal']
-        fonte_nome = row['nofontereceita']
-        exercicio = row['coexercicio']
+    def decompor(row):
+        caminho = (row['cocategoriareceita'], row['fonte_principal'])
         valor = float(row['receita_prevista'] or 0)
+        if row['coexercicio'] == ano_atual:
+            return caminho, {'valor_atual': valor, 'valor_anterior': 0}
+        return caminho, {'valor_atual': 0, 'valor_anterior': valor}
 
-        # Cria a entrada da categoria se for a primeira vez que ela aparece
-        if cat_id not in dados_por_categoria:
-            dados_por_categoria[cat_id] = {
-                'nome': cat_nome,
-                'fontes': {},
-                'total_atual': 0,
-                'total_anterior': 0
-            }
-
-        # Cria a entrada da fonte dentro da categoria se for a primeira vez
-        if fonte_id not in dados_por_categoria[cat_id]['fontes']:
-            dados_por_categoria[cat_id]['fontes'][fonte_id] = {
-                'nome': fonte_nome,
-                'valor_atual': 0,
-                'valor_anterior': 0
-            }
+    dados_finais, totais = consolidar(resultados, NIVEIS, decompor, CAMPOS_VALORES, filhos='fontes')
+    total_geral_atual = totais['valor_atual']
+    total_geral_anterior = totais['valor_anterior']
 
-        # Acumula os valores na estrutura
-        if exercicio == ano_atual:
-            dados_por_categoria[cat_id]['fontes'][fonte_id]['valor_atual'] += valor
-            dados_por_categoria[cat_id]['total_atual'] += valor
-        else:
-            dados_por_categoria[cat_id]['fontes'][fonte_id]['valor_anterior'] += valor
-            dados_por_categoria[cat_id]['total_anterior'] += valor
-
-    # Etapa 2: Calcular totais e transformar o dicionário na lista final para a API
-    total_geral_atual = sum(cat['total_atual'] for cat in dados_por_categoria.values())
-    total_geral_anterior = sum(cat['total_anterior'] for cat in dados_por_categoria.values())
-
-    dados_finais = []
-    # Itera sobre as categorias que foram encontradas dinamicamente
-    for cat_id, cat_data in sorted(dados_por_categoria.items()):
-        categoria = {
-            'tipo': 'categoria',
-            'nome': cat_data['nome'],
-            'valor_atual': cat_data['total_atual'],
-            'valor_anterior': cat_data['total_anterior'],
-            'percentual_atual': (cat_data['total_atual'] / total_geral_atual * 100) if total_geral_atual > 0 else 0,
-            'percentual_anterior': (cat_data['total_anterior'] / total_geral_anterior * 100) if total_geral_anterior > 0 else 0,
-            'variacao': calcular_variacao(cat_data['total_atual'], cat_data['total_anterior']),
-            'fontes': []
-        }
-
-        # Itera sobre as fontes encontradas para cada categoria
-        for fonte_id, fonte_data in sorted(cat_data['fontes'].items()):
-            fonte = {
-                'tipo': 'fonte',
-                'nome': fonte_data['nome'],
-                'valor_atual': fonte_data['valor_atual'],
-                'valor_anterior': fonte_data['valor_anterior'],
-                'percentual_atual': (fonte_data['valor_atual'] / total_geral_atual * 100) if total_geral_atual > 0 else 0,
-                'percentual_anterior': (fonte_data['valor_anterior'] / total_geral_anterior * 100) if total_geral_anterior > 0 else 0,
-                'variacao': calcular_variacao(fonte_data['valor_atual'], fonte_data['valor_anterior'])
-            }
-            categoria['fontes'].append(fonte)
-        
-        dados_finais.append(categoria)
+    # Percentuais sobre o total geral, conhecido só ao final da passada
+    for categoria in dados_finais:
+        for item in [categoria] + categoria['fontes']:
+            item['percentual_atual'] = (item['valor_atual'] / total_geral_atual * 100) if total_geral_atual > 0 else 0
+            item['percentual_anterior'] = (item['valor_anterior'] / total_geral_anterior * 100) if total_geral_anterior > 0 else 0
+            item['variacao'] = calcular_variacao(item['valor_atual'], item['valor_anterior'])
 
     # Adicionar a linha de total ao final
     dados_finais.append({
@@ -5,6 +5,7 @@ Compara Previsão Atualizada com Receita Realizada do ano atual e ano anterior
 """
 from flask import Blueprint, jsonify
 from app.db_manager import db_manager
+from app.modules.hierarquia import Nivel, consolidar
 from datetime import datetime
 import traceback
 
@@ -95,96 +96,49 @@ def get_dados_receita_realizada():
         traceback.print_exc()
         return jsonify({'erro': str(e)}), 500
 
+CAMPOS_VALORES = ('previsao_atual', 'realizada_atual', 'realizada_anterior')
+
+def _montar_no(tipo, nome, filhos=False):
+    def montar(row):
+        no = {'tipo': tipo, 'nome': row[nome]}
+        no.update(dict.fromkeys(CAMPOS_VALORES, 0))
+        if filhos:
+            no['fontes'] = []
+        return no
+    return montar
+
+def _calcular_variacoes(item):
+    item['variacao_previsto'] = calcular_variacao_percentual(item['realizada_atual'], item['previsao_atual'])
+    item['variacao_anual'] = calcular_variacao_percentual(item['realizada_atual'], item['realizada_anterior'])
+
+NIVEIS = (
+    Nivel(_montar_no('categoria', 'nocategoriareceita', filhos=True), _calcular_variacoes),
+    Nivel(_montar_no('fonte', 'nofontereceita'), _calcular_variacoes),
+)
+
 def processar_dados_receita_realizada(resultados, ano_atual, ano_anterior):
     """
-    Processa os resultados da query em estrutura hierárquica
+    Processa os resultados da query (ordenados por categoria e fonte) em
+    estrutura hierárquica, em uma passada
     """
-    dados_por_categoria = {}
-
-    # Etapa 1: Agrupar os dados lidos do banco
-    for row in resultados:
-        cat_id = row['cocategoriareceita']
-        cat_nome = row['nocategoriareceita']
-        fonte_id = row['fonte_principal']
-        fonte_nome = row['nofontereceita']
-        exercicio = row['coexercicio']
-        previsao_atualizada = float(row['previsao_atualizada'] or 0)
+    def decompor(row):
+        caminho = (row['cocategoriareceita'], row['fonte_principal'])
         receita_realizada = float(row['receita_realizada'] or 0)
-
-        # Cria a entrada da categoria se for a primeira vez
-        if cat_id not in dados_por_categoria:
-            dados_por_categoria[cat_id] = {
-                'nome': cat_nome,
-                'fontes': {},
-                'previsao_atual': 0,
-                'realizada_atual': 0,
-                'realizada_anterior': 0
+        if row['coexercicio'] == ano_atual:
+            return caminho, {
+                'previsao_atual': float(row['previsao_atualizada'] or 0),
+                'realizada_atual': receita_realizada,
+                'realizada_anterior': 0,
             }
+        return caminho, {'previsao_atual': 0, 'realizada_atual': 0, 'realizada_anterior': receita_realizada}
 
-        # Cria a entrada da fonte se for a primeira vez
-        if fonte_id not in dados_por_categoria[cat_id]['fontes']:
-            dados_por_categoria[cat_id]['fontes'][fonte_id] = {
-                'nome': fonte_nome,
-                'previsao_atual': 0,
-                'realizada_atual': 0,
-                'realizada_anterior': 0
-            }
-
-        # Acumula os valores
-        if exercicio == ano_atual:
-            dados_por_categoria[cat_id]['fontes'][fonte_id]['previsao_atual'] += previsao_atualizada
-            dados_por_categoria[cat_id]['fontes'][fonte_id]['realizada_atual'] += receita_realizada
-            dados_por_categoria[cat_id]['previsao_atual'] += previsao_atualizada
-            dados_por_categoria[cat_id]['realizada_atual'] += receita_realizada
-        else:  # ano_anterior
-            dados_por_categoria[cat_id]['fontes'][fonte_id]['realizada_anterior'] += receita_realizada
-            dados_por_categoria[cat_id]['realizada_anterior'] += receita_realizada
-
-    # Etapa 2: Calcular totais e transformar na estrutura final
-    total_previsao_atual = sum(cat['previsao_atual'] for cat in dados_por_categoria.values())
-    total_realizada_atual = sum(cat['realizada_atual'] for cat in dados_por_categoria.values())
-    total_realizada_anterior = sum(cat['realizada_anterior'] for cat in dados_por_categoria.values())
-
-    dados_finais = []
-    
-    # Itera sobre as categorias
-    for cat_id, cat_data in sorted(dados_por_categoria.items()):
-        categoria = {
-            'tipo': 'categoria',
-            'nome': cat_data['nome'],
-            'previsao_atual': cat_data['previsao_atual'],
-            'realizada_atual': cat_data['realizada_atual'],
-            'variacao_previsto': calcular_variacao_percentual(cat_data['realizada_atual'], cat_data['previsao_atual']),
-            'realizada_anterior': cat_data['realizada_anterior'],
-            'variacao_anual': calcular_variacao_percentual(cat_data['realizada_atual'], cat_data['realizada_anterior']),
-            'fontes': []
-        }
-
-        # Itera sobre as fontes
-        for fonte_id, fonte_data in sorted(cat_data['fontes'].items()):
-            fonte = {
-                'tipo': 'fonte',
-                'nome': fonte_data['nome'],
-                'previsao_atual': fonte_data['previsao_atual'],
-                'realizada_atual': fonte_data['realizada_atual'],
-                'variacao_previsto': calcular_variacao_percentual(fonte_data['realizada_atual'], fonte_data['previsao_atual']),
-                'realizada_anterior': fonte_data['realizada_anterior'],
-                'variacao_anual': calcular_variacao_percentual(fonte_data['realizada_atual'], fonte_data['realizada_anterior'])
-            }
-            categoria['fontes'].append(fonte)
-        
-        dados_finais.append(categoria)
+    dados_finais, totais = consolidar(resultados, NIVEIS, decompor, CAMPOS_VALORES, filhos='fontes')
 
     # Adicionar linha de total
-    dados_finais.append({
-        'tipo': 'total',
-        'nome': 'RECEITA LÍQUIDA',
-        'previsao_atual': total_previsao_atual,
-        'realizada_atual': total_realizada_atual,
-        'variacao_previsto': calcular_variacao_percentual(total_realizada_atual, total_previsao_atual),
-        'realizada_anterior': total_realizada_anterior,
-        'variacao_anual': calcular_variacao_percentual(total_realizada_atual, total_realizada_anterior)
-    })
+    total = {'tipo': 'total', 'nome': 'RECEITA LÍQUIDA'}
+    total.update(totais)
+    _calcular_variacoes(total)
+    dados_finais.append(total)
 
     return dados_finais
 
@@ -6,6 +6,7 @@ Versão refatorada para buscar a estrutura de receitas (categorias e fontes) din
 """
 from flask import Blueprint, jsonify
 from app.db_manager import db_manager
+from app.modules.hierarquia import Nivel, consolidar
 from datetime import datetime
 import traceback
 
@@ -101,84 +102,51 @@ def get_colunas_tipo_adm():
         {'codigo': '7', 'nome': 'FUNDOS'}             # Agrupa 07 e 09
     ]
 
+def _montar_no(tipo, nome, filhos=False):
+    def montar(row):
+        no = {'tipo': tipo, 'nome': row[nome], 'valores_tipo_adm': {}}
+        if filhos:
+            no['fontes'] = []
+        return no
+    return montar
+
+def _somar_tipos(destino, origem):
+    """Soma os valores por tipo de administração"""
+    valores = destino.setdefault('valores_tipo_adm', {})
+    for tipo_adm, valor in origem['valores_tipo_adm'].items():
+        valores[tipo_adm] = valores.get(tipo_adm, 0) + valor
+
+def _tem_valores(item):
+    return any(item['valores_tipo_adm'].values())
+
+NIVEIS = (
+    Nivel(_montar_no('categoria', 'nocategoriareceita', filhos=True), manter=_tem_valores),
+    Nivel(_montar_no('fonte', 'nofontereceita'), manter=_tem_valores),
+)
+
+def _decompor_linha(row):
+    tipo_adm = str(row['intipoadm'])  # Garantir que seja string para o lookup
+
+    # Aplicar regra de negócio para agrupar tipos de administração
+    if tipo_adm == '6': tipo_adm = '5'  # Agrupa Economia Mista com Empresas Públicas
+    if tipo_adm == '9': tipo_adm = '7'  # Agrupa Fundos da Indireta com Fundos
+
+    caminho = (row['cocategoriareceita'], row['fonte_principal'])
+    return caminho, {'valores_tipo_adm': {tipo_adm: float(row['receita_prevista'] or 0)}}
+
 def processar_dados_tipo_administracao_dinamico(resultados):
     """
-    Processa os resultados da query em estrutura hierárquica por tipo de administração
-    de forma dinâmica para as categorias e fontes.
+    Processa os resultados da query (ordenados por categoria e fonte) em
+    estrutura hierárquica por tipo de administração, em uma passada. Só
+    entram as fontes e categorias com algum valor.
     """
-    dados_por_categoria = {}
-    totais_gerais = {}
-
-    # Etapa 1: Agrupar os dados lidos do banco
-    for row in resultados:
-        cat_id = row['cocategoriareceita']
-        cat_nome = row['nocategoriareceita']
-        fonte_id = row['fonte_principal']
-        fonte_nome = row['nofontereceita']
-        tipo_adm = str(row['intipoadm']) # Garantir que seja string para o lookup
-        valor = float(row['receita_prevista'] or 0)
-
-        # Aplicar regra de negócio para agrupar tipos de administração
-        if tipo_adm == '6': tipo_adm = '5'  # Agrupa Economia Mista com Empresas Públicas
-        if tipo_adm == '9': tipo_adm = '7'  # Agrupa Fundos da Indireta com Fundos
-
-        # Cria a entrada da categoria dinamicamente
-        if cat_id not in dados_por_categoria:
-            dados_por_categoria[cat_id] = {
-                'nome': cat_nome,
-                'fontes': {},
-                'totais_tipo_adm': {}
-            }
-
-        # Cria a entrada da fonte dinamicamente
-        if fonte_id not in dados_por_categoria[cat_id]['fontes']:
-            dados_por_categoria[cat_id]['fontes'][fonte_id] = {
-                'nome': fonte_nome,
-                'valores_tipo_adm': {}
-            }
-
-        # Inicializa e soma os valores para a fonte
-        dados_por_categoria[cat_id]['fontes'][fonte_id]['valores_tipo_adm'][tipo_adm] = \
-            dados_por_categoria[cat_id]['fontes'][fonte_id]['valores_tipo_adm'].get(tipo_adm, 0) + valor
-
-        # Inicializa e soma os valores para o total da categoria
-        dados_por_categoria[cat_id]['totais_tipo_adm'][tipo_adm] = \
-            dados_por_categoria[cat_id]['totais_tipo_adm'].get(tipo_adm, 0) + valor
-            
-        # Acumula totais gerais
-        totais_gerais[tipo_adm] = totais_gerais.get(tipo_adm, 0) + valor
-
-    # Etapa 2: Montar a estrutura final para a API
-    dados_finais = []
-    # Itera sobre as categorias encontradas, em ordem
-    for cat_id, cat_data in sorted(dados_por_categoria.items()):
-        categoria = {
-            'tipo': 'categoria',
-            'nome': cat_data['nome'],
-            'valores_tipo_adm': cat_data['totais_tipo_adm'],
-            'fontes': []
-        }
-        
-        # Itera sobre as fontes encontradas, em ordem
-        for fonte_id, fonte_data in sorted(cat_data['fontes'].items()):
-            # Só adiciona a fonte se ela tiver valores
-            if any(fonte_data['valores_tipo_adm'].values()):
-                fonte = {
-                    'tipo': 'fonte',
-                    'nome': fonte_data['nome'],
-                    'valores_tipo_adm': fonte_data['valores_tipo_adm']
-                }
-                categoria['fontes'].append(fonte)
-
-        # Só adiciona a categoria se ela tiver valores
-        if any(categoria['valores_tipo_adm'].values()):
-            dados_finais.append(categoria)
+    dados_finais, totais = consolidar(resultados, NIVEIS, _decompor_linha, somar=_somar_tipos, filhos='fontes')
 
     # Adicionar linha de total
     dados_finais.append({
         'tipo': 'total',
         'nome': 'RECEITA LÍQUIDA',
-        'valores_tipo_adm': totais_gerais
+        'valores_tipo_adm': totais.get('valores_tipo_adm', {})
     })
 
     return dados_finais
\ No newline at end of file
@@ -5,6 +5,10 @@ Agora com suporte para exibir UGs por alínea e lançamentos
 """
 from flask import Blueprint, render_template, jsonify, request, current_app
 from app.db_manager import db_manager
+from app.modules.dimensoes import dimensoes
+from app.modules.consultas import registrar_consulta
+from app.modules.formato_colunar import formatar_linhas
+from app.modules.hierarquia import Nivel, consolidar
 from datetime import datetime
 import traceback
 
@@ -30,6 +34,36 @@ CATEGORIA_FONTE_MAP = {
     }
 }
 
+# Lançamentos de uma UG/alínea já no formato da tela (nomes, evento e data
+# montados no banco); sem :limite retorna todos (exportação Excel)
+CONSULTA_LANCAMENTOS = registrar_consulta('balanco_receita.lancamentos', """
+    SELECT
+        rl.cocontacontabil as conta_contabil,
+        rl.coug as ug_emitente,
+        rl.nudocumento as documento,
+        CAST(rl.coevento AS VARCHAR) || ' - ' ||
+            COALESCE(ev.noevento, 'Evento ' || CAST(rl.coevento AS VARCHAR)) as evento,
+        rl.indebitocredito as dc,
+        rl.valancamento as valor,
+        COALESCE({data_br(rl.dalancamento)}, '') as data,
+        rl.inmes as mes
+    FROM receita_lancamento rl
+    LEFT JOIN dim_evento ev ON CAST(rl.coevento AS VARCHAR) = CAST(ev.coevento AS VARCHAR)
+    WHERE rl.coexercicio = :ano
+        AND rl.inmes <= :mes
+        AND rl.cougcontab = :coug
+        AND rl.cofontereceita = :cofontereceita
+        AND rl.cosubfontereceita = :cosubfontereceita
+        AND rl.coalinea = :coalinea
+        AND rl.cocontacontabil >= '621200000'
+        AND rl.cocontacontabil <= '621399999'
+    ORDER BY rl.dalancamento DESC, rl.nulancamento DESC
+    [[ LIMIT :limite ]]
+""")
+
+# Colunas repetidas entre lançamentos, codificadas por índice no formato colunar
+DICIONARIO_LANCAMENTOS = ('conta_contabil', 'ug_emitente', 'evento', 'dc', 'data', 'mes')
+
 @balanco_receita.route('/')
 def index():
     """Página principal do Balanço Orçamentário da Receita"""
@@ -156,10 +190,7 @@ def gerar_relatorio():
         resultados = db_manager.execute_query(query, params=params)
         print(f"Query retornou {len(resultados)} registros")
 
-        resultados_como_tuplas = [tuple(row.values()) for row in resultados]
-        dados_hierarquicos = processar_dados_hierarquicos(resultados_como_tuplas)
-        
-        totais = calcular_totais(dados_hierarquicos)
+        dados_hierarquicos, totais = processar_dados_hierarquicos(resultados)
         
         resultado = {
             'periodo': {
@@ -187,93 +218,27 @@ def gerar_relatorio():
 def get_lancamentos():
     """Retorna os lançamentos de uma UG específica"""
     try:
-        # Obter parâmetros
-        ano = request.args.get('ano', type=int)
-        mes = request.args.get('mes', type=int)
-        coug = request.args.get('coug')
-        cofontereceita = request.args.get('cofontereceita')
-        cosubfontereceita = request.args.get('cosubfontereceita')
-        coalinea = request.args.get('coalinea')
-        
-        if not all([ano, mes, coug, cofontereceita, cosubfontereceita, coalinea]):
+        params = _parametros_lancamentos()
+        if params is None:
             return jsonify({'erro': 'Todos os parâmetros são obrigatórios'}), 400
         
-        # Query para buscar lançamentos
-        param_style = "?" if db_manager.is_duckdb else ":param{}"
-        
-        query = f"""
-        SELECT
-            rl.cocontacontabil,
-            rl.coug as ug_emitente,
-            rl.nudocumento,
-            rl.coevento,
-            COALESCE(ev.noevento, 'Evento ' || rl.coevento) as nome_evento,
-            rl.indebitocredito,
-            rl.valancamento,
-            rl.dalancamento,
-            rl.inmes
-        FROM receita_lancamento rl
-        LEFT JOIN dim_evento ev ON rl.coevento = CAST(ev.coevento AS VARCHAR)
-        WHERE rl.coexercicio = {param_style.format(1) if not db_manager.is_duckdb else '?'}
-            AND rl.inmes <= {param_style.format(2) if not db_manager.is_duckdb else '?'}
-            AND rl.cougcontab = {param_style.format(3) if not db_manager.is_duckdb else '?'}
-            AND rl.cofontereceita = {param_style.format(4) if not db_manager.is_duckdb else '?'}
-            AND rl.cosubfontereceita = {param_style.format(5) if not db_manager.is_duckdb else '?'}
-            AND rl.coalinea = {param_style.format(6) if not db_manager.is_duckdb else '?'}
-            AND rl.cocontacontabil >= '621200000'
-            AND rl.cocontacontabil <= '621399999'
-        ORDER BY rl.dalancamento DESC, rl.nulancamento DESC
-        LIMIT 1001
-        """
-        
-        if db_manager.is_duckdb:
-            params = [ano, mes, int(coug), cofontereceita, cosubfontereceita, coalinea]
-        else:
-            params = {
-                'param1': ano,
-                'param2': mes,
-                'param3': int(coug),
-                'param4': cofontereceita,
-                'param5': cosubfontereceita,
-                'param6': coalinea
-            }
+        # Um registro a mais indica que há mais de 1000
+        params['limite'] = 1001
         
-        print(f"Buscando lançamentos: ano={ano}, mes={mes}, coug={coug}, fonte={cofontereceita}, subfonte={cosubfontereceita}, alinea={coalinea}")
+        print(f"Buscando lançamentos: ano={params['ano']}, mes={params['mes']}, coug={params['coug']}, fonte={params['cofontereceita']}, subfonte={params['cosubfontereceita']}, alinea={params['coalinea']}")
         
-        resultados = db_manager.execute_query(query, params=params)
+        lancamentos = db_manager.execute_query(CONSULTA_LANCAMENTOS, params)
         
         # Verificar se há mais de 1000 registros
-        tem_mais_registros = len(resultados) > 1000
+        tem_mais_registros = len(lancamentos) > 1000
         if tem_mais_registros:
-            resultados = resultados[:1000]  # Limitar a 1000 registros para exibição
-        
-        # Formatar resultados
-        lancamentos = []
-        for row in resultados:
-            lancamentos.append({
-                'conta_contabil': row['cocontacontabil'],
-                'ug_emitente': row['ug_emitente'],
-                'documento': row['nudocumento'],
-                'evento': f"{row['coevento']} - {row['nome_evento']}",
-                'dc': row['indebitocredito'],
-                'valor': float(row['valancamento']),
-                'data': row['dalancamento'].strftime('%d/%m/%Y') if row['dalancamento'] else '',
-                'mes': row['inmes']
-            })
-        
-        # Calcular totais (C - D)
-        total_debito = sum(l['valor'] for l in lancamentos if l['dc'] == 'D')
-        total_credito = sum(l['valor'] for l in lancamentos if l['dc'] == 'C')
+            lancamentos = lancamentos[:1000]  # Limitar a 1000 registros para exibição
         
         return jsonify({
-            'lancamentos': lancamentos,
+            'lancamentos': formatar_linhas(lancamentos, request.args, DICIONARIO_LANCAMENTOS),
             'total_registros': len(lancamentos),
             'tem_mais_registros': tem_mais_registros,
-            'totais': {
-                'debito': total_debito,
-                'credito': total_credito,
-                'saldo': total_credito - total_debito
-            }
+            'totais': _totais_lancamentos(lancamentos)
         })
         
     except Exception as e:
@@ -285,86 +250,19 @@ def get_lancamentos():
 def get_lancamentos_excel():
     """Retorna TODOS os lançamentos para exportação Excel"""
     try:
-        # Obter parâmetros
-        ano = request.args.get('ano', type=int)
-        mes = request.args.get('mes', type=int)
-        coug = request.args.get('coug')
-        cofontereceita = request.args.get('cofontereceita')
-        cosubfontereceita = request.args.get('cosubfontereceita')
-        coalinea = request.args.get('coalinea')
-        
-        if not all([ano, mes, coug, cofontereceita, cosubfontereceita, coalinea]):
+        # Sem 'limite' a consulta não tem LIMIT e traz TODOS os registros
+        params = _parametros_lancamentos()
+        if params is None:
             return jsonify({'erro': 'Todos os parâmetros são obrigatórios'}), 400
         
-        # Query SEM LIMIT para pegar TODOS os registros
-        param_style = "?" if db_manager.is_duckdb else ":param{}"
-        
-        query = f"""
-        SELECT
-            rl.cocontacontabil,
-            rl.coug as ug_emitente,
-            rl.nudocumento,
-            rl.coevento,
-            COALESCE(ev.noevento, 'Evento ' || rl.coevento) as nome_evento,
-            rl.indebitocredito,
-            rl.valancamento,
-            rl.dalancamento,
-            rl.inmes
-        FROM receita_lancamento rl
-        LEFT JOIN dim_evento ev ON rl.coevento = CAST(ev.coevento AS VARCHAR)
-        WHERE rl.coexercicio = {param_style.format(1) if not db_manager.is_duckdb else '?'}
-            AND rl.inmes <= {param_style.format(2) if not db_manager.is_duckdb else '?'}
-            AND rl.cougcontab = {param_style.format(3) if not db_manager.is_duckdb else '?'}
-            AND rl.cofontereceita = {param_style.format(4) if not db_manager.is_duckdb else '?'}
-            AND rl.cosubfontereceita = {param_style.format(5) if not db_manager.is_duckdb else '?'}
-            AND rl.coalinea = {param_style.format(6) if not db_manager.is_duckdb else '?'}
-            AND rl.cocontacontabil >= '621200000'
-            AND rl.cocontacontabil <= '621399999'
-        ORDER BY rl.dalancamento DESC, rl.nulancamento DESC
-        """
-        
-        if db_manager.is_duckdb:
-            params = [ano, mes, int(coug), cofontereceita, cosubfontereceita, coalinea]
-        else:
-            params = {
-                'param1': ano,
-                'param2': mes,
-                'param3': int(coug),
-                'param4': cofontereceita,
-                'param5': cosubfontereceita,
-                'param6': coalinea
-            }
+        print(f"Buscando TODOS os lançamentos para Excel: ano={params['ano']}, mes={params['mes']}, coug={params['coug']}")
         
-        print(f"Buscando TODOS os lançamentos para Excel: ano={ano}, mes={mes}, coug={coug}")
-        
-        resultados = db_manager.execute_query(query, params=params)
-        
-        # Formatar resultados
-        lancamentos = []
-        for row in resultados:
-            lancamentos.append({
-                'conta_contabil': row['cocontacontabil'],
-                'ug_emitente': row['ug_emitente'],
-                'documento': row['nudocumento'],
-                'evento': f"{row['coevento']} - {row['nome_evento']}",
-                'dc': row['indebitocredito'],
-                'valor': float(row['valancamento']),
-                'data': row['dalancamento'].strftime('%d/%m/%Y') if row['dalancamento'] else '',
-                'mes': row['inmes']
-            })
-        
-        # Calcular totais
-        total_debito = sum(l['valor'] for l in lancamentos if l['dc'] == 'D')
-        total_credito = sum(l['valor'] for l in lancamentos if l['dc'] == 'C')
+        lancamentos = db_manager.execute_query(CONSULTA_LANCAMENTOS, params)
         
         return jsonify({
-            'lancamentos': lancamentos,
+            'lancamentos': formatar_linhas(lancamentos, request.args, DICIONARIO_LANCAMENTOS),
             'total_registros': len(lancamentos),
-            'totais': {
-                'debito': total_debito,
-                'credito': total_credito,
-                'saldo': total_credito - total_debito
-            }
+            'totais': _totais_lancamentos(lancamentos)
         })
         
     except Exception as e:
@@ -372,238 +270,140 @@ def get_lancamentos_excel():
         traceback.print_exc()
         return jsonify({'erro': str(e)}), 500
 
-def processar_dados_hierarquicos(resultados):
-    """Processa os resultados em estrutura hierárquica com 5 níveis (incluindo UGs)"""
-    dados = []
-    
-    # Criar estrutura de categorias
-    categorias = {}
-    for cat_id, cat_info in CATEGORIA_FONTE_MAP.items():
-        categorias[cat_id] = {
-            'id': f'cat-{cat_id}',
-            'codigo': cat_id,
-            'descricao': cat_info['nome'],
-            'nivel': 0,
-            'tipo': 'categoria',
-            'previsao_inicial': 0,
-            'previsao_atualizada': 0,
-            'receita_atual': 0,
-            'receita_anterior': 0,
-            'variacao_absoluta': 0,
-            'variacao_percentual': 0,
-            'expandido': False,
-            'tem_filhos': False,
-            'fontes_inicio': cat_info['fontes_inicio'],
-            'fontes_fim': cat_info['fontes_fim']
-        }
-    
-    # Estrutura hierárquica completa
-    fontes_por_categoria = {'1': {}, '2': {}, '7': {}}
-    
-    for row in resultados:
-        # Agora temos 12 campos incluindo UG
-        cat_id, fonte_id, nome_fonte, subfonte_id, nome_subfonte, alinea_id, nome_alinea, \
-        coug, nome_ug, previsao_inicial, previsao_atualizada, receita_atual, receita_anterior = row
-        
-        previsao_inicial = float(previsao_inicial or 0)
-        previsao_atualizada = float(previsao_atualizada or 0)
-        receita_atual = float(receita_atual or 0)
-        receita_anterior = float(receita_anterior or 0)
-        
-        fonte_num = int(fonte_id) if fonte_id and fonte_id.isdigit() else 0
-        categoria_id = None
-        
-        for cid, cinfo in CATEGORIA_FONTE_MAP.items():
-            if cinfo['fontes_inicio'] <= fonte_num <= cinfo['fontes_fim']:
-                categoria_id = cid
-                break
-        
-        if categoria_id and categoria_id == cat_id:
-            # Atualizar totais da categoria
-            categorias[categoria_id]['previsao_inicial'] += previsao_inicial
-            categorias[categoria_id]['previsao_atualizada'] += previsao_atualizada
-            categorias[categoria_id]['receita_atual'] += receita_atual
-            categorias[categoria_id]['receita_anterior'] += receita_anterior
-            categorias[categoria_id]['tem_filhos'] = True
-            
-            # Nível 1: Fontes
-            if fonte_id not in fontes_por_categoria[categoria_id]:
-                fontes_por_categoria[categoria_id][fonte_id] = {
-                    'id': f'fonte-{categoria_id}-{fonte_id}',
-                    'codigo': fonte_id,
-                    'descricao': nome_fonte,
-                    'nivel': 1,
-                    'tipo': 'fonte',
-                    'categoria_pai': categoria_id,
-                    'previsao_inicial': 0,
-                    'previsao_atualizada': 0,
-                    'receita_atual': 0,
-                    'receita_anterior': 0,
-                    'variacao_absoluta': 0,
-                    'variacao_percentual': 0,
-                    'expandido': False,
-                    'tem_filhos': False,
-                    'subfontes': {}
-                }
-            
-            fonte_data = fontes_por_categoria[categoria_id][fonte_id]
-            fonte_data['previsao_inicial'] += previsao_inicial
-            fonte_data['previsao_atualizada'] += previsao_atualizada
-            fonte_data['receita_atual'] += receita_atual
-            fonte_data['receita_anterior'] += receita_anterior
-            
-            # Nível 2: Subfontes
-            if subfonte_id and subfonte_id != fonte_id:
-                fonte_data['tem_filhos'] = True
-                
-                if subfonte_id not in fonte_data['subfontes']:
-                    fonte_data['subfontes'][subfonte_id] = {
-                        'id': f'subfonte-{categoria_id}-{fonte_id}-{subfonte_id}',
-                        'codigo': subfonte_id,
-                        'descricao': nome_subfonte,
-                        'nivel': 2,
-                        'tipo': 'subfonte',
-                        'categoria_pai': categoria_id,
-                        'fonte_pai': fonte_id,
-                        'previsao_inicial': 0,
-                        'previsao_atualizada': 0,
-                        'receita_atual': 0,
-                        'receita_anterior': 0,
-                        'variacao_absoluta': 0,
-                        'variacao_percentual': 0,
-                        'expandido': False,
-                        'tem_filhos': False,
-                        'alineas': {}
-                    }
-                
-                subfonte_data = fonte_data['subfontes'][subfonte_id]
-                subfonte_data['previsao_inicial'] += previsao_inicial
-                subfonte_data['previsao_atualizada'] += previsao_atualizada
-                subfonte_data['receita_atual'] += receita_atual
-                subfonte_data['receita_anterior'] += receita_anterior
-                
-                # Nível 3: Alíneas
-                if alinea_id and alinea_id != subfonte_id:
-                    subfonte_data['tem_filhos'] = True
-                    
-                    if alinea_id not in subfonte_data['alineas']:
-                        subfonte_data['alineas'][alinea_id] = {
-                            'id': f'alinea-{categoria_id}-{fonte_id}-{subfonte_id}-{alinea_id}',
-                            'codigo': alinea_id,
-                            'descricao': nome_alinea,
-                            'nivel': 3,
-                            'tipo': 'alinea',
-                            'categoria_pai': categoria_id,
-                            'fonte_pai': fonte_id,
-                            'subfonte_pai': subfonte_id,
-                            'previsao_inicial': 0,
-                            'previsao_atualizada': 0,
-                            'receita_atual': 0,
-                            'receita_anterior': 0,
-                            'variacao_absoluta': 0,
-                            'variacao_percentual': 0,
-                            'expandido': False,
-                            'tem_filhos': False,
-                            'ugs': {}
-                        }
-                    
-                    alinea_data = subfonte_data['alineas'][alinea_id]
-                    alinea_data['previsao_inicial'] += previsao_inicial
-                    alinea_data['previsao_atualizada'] += previsao_atualizada
-                    alinea_data['receita_atual'] += receita_atual
-                    alinea_data['receita_anterior'] += receita_anterior
-                    
-                    # Nível 4: UGs
-                    if coug:
-                        alinea_data['tem_filhos'] = True
-                        
-                        variacao_absoluta = receita_atual - receita_anterior
-                        variacao_percentual = (variacao_absoluta / abs(receita_anterior) * 100) if receita_anterior != 0 else (100 if receita_atual != 0 else 0)
-                        
-                        alinea_data['ugs'][coug] = {
-                            'id': f'ug-{categoria_id}-{fonte_id}-{subfonte_id}-{alinea_id}-{coug}',
-                            'codigo': coug,
-                            'descricao': f"{coug} - {nome_ug}",
-                            'nivel': 4,
-                            'tipo': 'ug',
-                            'categoria_pai': categoria_id,
-                            'fonte_pai': fonte_id,
-                            'subfonte_pai': subfonte_id,
-                            'alinea_pai': alinea_id,
-                            'previsao_inicial': previsao_inicial,
-                            'previsao_atualizada': previsao_atualizada,
-                            'receita_atual': receita_atual,
-                            'receita_anterior': receita_anterior,
-                            'variacao_absoluta': variacao_absoluta,
-                            'variacao_percentual': variacao_percentual,
-                            'expandido': False,
-                            'tem_filhos': False
-                        }
-    
-    # Montar a estrutura final
-    for cat_id in ['1', '2', '7']:
-        if cat_id in categorias:
-            cat_data = categorias[cat_id]
-            
-            # Calcular variações da categoria
-            cat_data['variacao_absoluta'] = cat_data['receita_atual'] - cat_data['receita_anterior']
-            cat_data['variacao_percentual'] = (cat_data['variacao_absoluta'] / abs(cat_data['receita_anterior']) * 100) if cat_data['receita_anterior'] != 0 else (100 if cat_data['receita_atual'] != 0 else 0)
-            
-            if (abs(cat_data['previsao_inicial']) + abs(cat_data['previsao_atualizada']) + abs(cat_data['receita_atual']) + abs(cat_data['receita_anterior'])) > 0.01:
-                dados.append(cat_data)
-                
-                # Adicionar fontes
-                for fonte_id in sorted(fontes_por_categoria[cat_id].keys()):
-                    fonte_data = fontes_por_categoria[cat_id][fonte_id]
-                    
-                    fonte_data['variacao_absoluta'] = fonte_data['receita_atual'] - fonte_data['receita_anterior']
-                    fonte_data['variacao_percentual'] = (fonte_data['variacao_absoluta'] / abs(fonte_data['receita_anterior']) * 100) if fonte_data['receita_anterior'] != 0 else (100 if fonte_data['receita_atual'] != 0 else 0)
-                    dados.append(fonte_data)
-                    
-                    # Adicionar subfontes
-                    for subfonte_id in sorted(fonte_data['subfontes'].keys()):
-                        subfonte_data = fonte_data['subfontes'][subfonte_id]
-                        
-                        subfonte_data['variacao_absoluta'] = subfonte_data['receita_atual'] - subfonte_data['receita_anterior']
-                        subfonte_data['variacao_percentual'] = (subfonte_data['variacao_absoluta'] / abs(subfonte_data['receita_anterior']) * 100) if subfonte_data['receita_anterior'] != 0 else (100 if subfonte_data['receita_atual'] != 0 else 0)
-                        dados.append(subfonte_data)
-                        
-                        # Adicionar alíneas
-                        for alinea_id in sorted(subfonte_data['alineas'].keys()):
-                            alinea_data = subfonte_data['alineas'][alinea_id]
-                            
-                            alinea_data['variacao_absoluta'] = alinea_data['receita_atual'] - alinea_data['receita_anterior']
-                            alinea_data['variacao_percentual'] = (alinea_data['variacao_absoluta'] / abs(alinea_data['receita_anterior']) * 100) if alinea_data['receita_anterior'] != 0 else (100 if alinea_data['receita_atual'] != 0 else 0)
-                            dados.append(alinea_data)
-                            
-                            # Adicionar UGs
-                            for coug in sorted(alinea_data['ugs'].keys()):
-                                dados.append(alinea_data['ugs'][coug])
-    
-    return dados
-
-def calcular_totais(dados):
-    """Calcula os totais gerais do relatório"""
-    totais = {
-        'previsao_inicial': 0,
-        'previsao_atualizada': 0,
-        'receita_atual': 0,
-        'receita_anterior': 0,
-        'variacao_absoluta': 0,
-        'variacao_percentual': 0
+def _parametros_lancamentos():
+    """Lê os filtros dos endpoints de lançamentos; None se faltar algum"""
+    params = {
+        'ano': request.args.get('ano', type=int),
+        'mes': request.args.get('mes', type=int),
+        'coug': request.args.get('coug'),
+        'cofontereceita': request.args.get('cofontereceita'),
+        'cosubfontereceita': request.args.get('cosubfontereceita'),
+        'coalinea': request.args.get('coalinea')
+    }
+    if not all(params.values()):
+        return None
+    params['coug'] = int(params['coug'])
+    return params
+
+def _totais_lancamentos(lancamentos):
+    """Totais de débito, crédito e saldo (C - D) dos lançamentos retornados"""
+    total_debito = float(sum(l['valor'] for l in lancamentos if l['dc'] == 'D'))
+    total_credito = float(sum(l['valor'] for l in lancamentos if l['dc'] == 'C'))
+    return {
+        'debito': total_debito,
+        'credito': total_credito,
+        'saldo': total_credito - total_debito
     }
-    
-    for item in dados:
-        if item['nivel'] == 0:  # Apenas categorias
-            totais['previsao_inicial'] += item['previsao_inicial']
-            totais['previsao_atualizada'] += item['previsao_atualizada']
-            totais['receita_atual'] += item['receita_atual']
-            totais['receita_anterior'] += item['receita_anterior']
-    
-    totais['variacao_absoluta'] = totais['receita_atual'] - totais['receita_anterior']
-    totais['variacao_percentual'] = (totais['variacao_absoluta'] / abs(totais['receita_anterior']) * 100) if totais['receita_anterior'] != 0 else (100 if totais['receita_atual'] != 0 else 0)
-    
-    return totais
+
+# Categoria de cada fonte (número), pelas faixas de CATEGORIA_FONTE_MAP
+CATEGORIA_POR_FONTE = {
+    fonte: cat_id
+    for cat_id, cat_info in CATEGORIA_FONTE_MAP.items()
+    for fonte in range(cat_info['fontes_inicio'], cat_info['fontes_fim'] + 1)
+}
+
+CAMPOS_VALORES = ('previsao_inicial', 'previsao_atualizada', 'receita_atual', 'receita_anterior')
+
+# Campos de valor de um item recém-criado da lista de exibição
+ITEM_ZERADO = {
+    'previsao_inicial': 0, 'previsao_atualizada': 0, 'receita_atual': 0, 'receita_anterior': 0,
+    'variacao_absoluta': 0, 'variacao_percentual': 0, 'expandido': False, 'tem_filhos': False,
+}
+
+def _montar_categoria(row):
+    cat_id = row['cocategoriareceita']
+    cat_info = CATEGORIA_FONTE_MAP[cat_id]
+    return {
+        'id': f'cat-{cat_id}', 'codigo': cat_id, 'descricao': cat_info['nome'], 'nivel': 0, 'tipo': 'categoria',
+        **ITEM_ZERADO,
+        'fontes_inicio': cat_info['fontes_inicio'], 'fontes_fim': cat_info['fontes_fim'],
+    }
+
+def _montar_fonte(row):
+    c, f = row['cocategoriareceita'], row['cofontereceita']
+    return {
+        'id': f'fonte-{c}-{f}', 'codigo': f, 'descricao': row['nome_fonte'], 'nivel': 1, 'tipo': 'fonte',
+        'categoria_pai': c, **ITEM_ZERADO,
+    }
+
+def _montar_subfonte(row):
+    c, f, s = row['cocategoriareceita'], row['cofontereceita'], row['cosubfontereceita']
+    return {
+        'id': f'subfonte-{c}-{f}-{s}', 'codigo': s, 'descricao': row['nome_subfonte'], 'nivel': 2, 'tipo': 'subfonte',
+        'categoria_pai': c, 'fonte_pai': f, **ITEM_ZERADO,
+    }
+
+def _montar_alinea(row):
+    c, f, s, a = row['cocategoriareceita'], row['cofontereceita'], row['cosubfontereceita'], row['coalinea']
+    return {
+        'id': f'alinea-{c}-{f}-{s}-{a}', 'codigo': a, 'descricao': row['nome_alinea'], 'nivel': 3, 'tipo': 'alinea',
+        'categoria_pai': c, 'fonte_pai': f, 'subfonte_pai': s, **ITEM_ZERADO,
+    }
+
+def _montar_ug(row):
+    c, f, s, a = row['cocategoriareceita'], row['cofontereceita'], row['cosubfontereceita'], row['coalinea']
+    coug = row['coug']
+    return {
+        'id': f'ug-{c}-{f}-{s}-{a}-{coug}', 'codigo': coug, 'descricao': f"{coug} - {row['nome_ug']}",
+        'nivel': 4, 'tipo': 'ug',
+        'categoria_pai': c, 'fonte_pai': f, 'subfonte_pai': s, 'alinea_pai': a, **ITEM_ZERADO,
+    }
+
+def calcular_variacao(item):
+    """Preenche variação absoluta e percentual da receita atual sobre a anterior"""
+    atual, anterior = item['receita_atual'], item['receita_anterior']
+    item['variacao_absoluta'] = atual - anterior
+    item['variacao_percentual'] = ((atual - anterior) / abs(anterior) * 100) if anterior != 0 else (100 if atual != 0 else 0)
+
+def _categoria_com_valor(item):
+    return sum(abs(item[campo]) for campo in CAMPOS_VALORES) > 0.01
+
+NIVEIS_BALANCO = (
+    Nivel(_montar_categoria, calcular_variacao, _categoria_com_valor),
+    Nivel(_montar_fonte, calcular_variacao),
+    Nivel(_montar_subfonte, calcular_variacao),
+    Nivel(_montar_alinea, calcular_variacao),
+    Nivel(_montar_ug, calcular_variacao),
+)
+
+def _decompor_linha(row):
+    """
+    Caminho (categoria, fonte, subfonte, alínea, UG) e valores da linha, ou
+    None se a fonte não pertence à categoria da linha. A subfonte só é um
+    nível próprio quando difere da fonte, e a alínea quando difere da subfonte.
+    """
+    cat_id, fonte_id = row['cocategoriareceita'], row['cofontereceita']
+    fonte_num = int(fonte_id) if fonte_id and fonte_id.isdigit() else 0
+    categoria_id = CATEGORIA_POR_FONTE.get(fonte_num)
+    if categoria_id is None or categoria_id != cat_id:
+        return None
+
+    subfonte_id, alinea_id, coug = row['cosubfontereceita'], row['coalinea'], row['coug']
+    if not subfonte_id or subfonte_id == fonte_id:
+        caminho = (cat_id, fonte_id)
+    elif not alinea_id or alinea_id == subfonte_id:
+        caminho = (cat_id, fonte_id, subfonte_id)
+    elif not coug:
+        caminho = (cat_id, fonte_id, subfonte_id, alinea_id)
+    else:
+        caminho = (cat_id, fonte_id, subfonte_id, alinea_id, coug)
+
+    return caminho, {
+        'previsao_inicial': float(row['previsao_inicial'] or 0),
+        'previsao_atualizada': float(row['previsao_atualizada'] or 0),
+        'receita_atual': float(row['receita_atual'] or 0),
+        'receita_anterior': float(row['receita_anterior'] or 0),
+    }
+
+def processar_dados_hierarquicos(resultados):
+    """
+    Monta a lista de exibição com 5 níveis (categoria, fonte, subfonte,
+    alínea e UG) e os totais gerais, em uma passada sobre os resultados
+    ordenados da consulta. Retorna (dados, totais).
+    """
+    dados, totais = consolidar(resultados, NIVEIS_BALANCO, _decompor_linha, CAMPOS_VALORES)
+    calcular_variacao(totais)
+    return dados, totais
 
 def obter_nome_mes(mes):
     """Retorna o nome do mês"""
@@ -617,11 +417,6 @@ def obter_nome_mes(mes):
 def obter_nome_ug(coug):
     """Obtém o nome da UG"""
     try:
-        param_style = "?" if db_manager.is_duckdb else ":coug"
-        query = f"SELECT noug FROM dim_unidade_gestora WHERE coug = {param_style}"
-        params = [int(coug)] if db_manager.is_duckdb else {'coug': int(coug)}
-        
-        result = db_manager.execute_query(query, params=params)
-        return result[0]['noug'] if result else f"UG {coug}"
+        return dimensoes.nome('ug', int(coug), f"UG {coug}")
     except:
         return f"UG {coug}"
\ No newline at end of file
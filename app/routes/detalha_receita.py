@@ -4,12 +4,162 @@ Adaptado para trabalhar com db_manager (DuckDB/PostgreSQL)
 """
 from flask import Blueprint, render_template, jsonify, request
 from app.db_manager import db_manager
+from app.modules.consultas import registrar_consulta
+from app.modules.formato_colunar import formatar_linhas
+from app.modules.datatables import ler_requisicao_datatables
 from datetime import datetime
 import traceback
 
 # Criar blueprint
 detalha_receita = Blueprint('detalha_receita', __name__)
 
+# Consultas declaradas uma única vez (compiladas para DuckDB e PostgreSQL)
+CONSULTA_ANOS = registrar_consulta('detalha_receita.anos', """
+    SELECT DISTINCT {ano(dalancamento)} as ano
+    FROM receita_lancamento
+    WHERE dalancamento IS NOT NULL
+    ORDER BY ano DESC
+""")
+
+CONSULTA_CONTAS = registrar_consulta('detalha_receita.contas', """
+    SELECT DISTINCT cocontacontabil
+    FROM receita_lancamento
+    WHERE {no_ano(dalancamento)}
+        AND cocontacontabil IS NOT NULL
+    ORDER BY cocontacontabil
+""")
+
+CONSULTA_UGS = registrar_consulta('detalha_receita.ugs', """
+    SELECT DISTINCT cougcontab
+    FROM receita_lancamento
+    WHERE {no_ano(dalancamento)}
+        AND cocontacontabil = :conta
+        AND cougcontab IS NOT NULL
+    ORDER BY cougcontab
+""")
+
+# Filtro de UG opcional: ug=None corresponde ao CONSOLIDADO
+CONSULTA_DADOS = registrar_consulta('detalha_receita.dados', """
+    SELECT 
+        {mes(dalancamento)} as mes,
+        nudocumento,
+        coevento,
+        cocontacorrente,
+        valancamento,
+        indebitocredito,
+        coug,
+        {data_br(dalancamento)} as dalancamento,
+        tipo_lancamento,
+        cofonte,
+        coclasseorc,
+        -- Total sem limite, calculado na mesma leitura (janela antes do LIMIT)
+        COUNT(*) OVER () as total_registros
+    FROM receita_lancamento
+    WHERE {no_ano(dalancamento)}
+        AND cocontacontabil = :conta
+        [[ AND cougcontab = :ug ]]
+    ORDER BY receita_lancamento.dalancamento, nudocumento
+    LIMIT :limite
+""")
+
+# Base da grade server-side (DataTables): sem ORDER BY/LIMIT, aplicados por fora
+CONSULTA_GRADE = registrar_consulta('detalha_receita.grade', """
+    SELECT 
+        {mes(dalancamento)} as mes,
+        nudocumento,
+        coevento,
+        cocontacorrente,
+        valancamento,
+        indebitocredito,
+        coug,
+        {data_br(dalancamento)} as dalancamento,
+        tipo_lancamento,
+        cofonte,
+        coclasseorc,
+        receita_lancamento.dalancamento as data_ordem
+    FROM receita_lancamento
+    WHERE {no_ano(dalancamento)}
+        AND cocontacontabil = :conta
+        [[ AND cougcontab = :ug ]]
+""")
+
+# Colunas da grade: nome no DataTables -> (expressão de ordenação, expressão de busca)
+COLUNAS_GRADE = {
+    'mes': ('mes', None),
+    'nudocumento': ('nudocumento', 'nudocumento'),
+    'coevento': ('coevento', 'coevento'),
+    'cocontacorrente': ('cocontacorrente', 'cocontacorrente'),
+    'valancamento': ('valancamento', 'valancamento'),
+    'indebitocredito': ('indebitocredito', 'indebitocredito'),
+    'coug': ('coug', 'coug'),
+    'dalancamento': ('data_ordem', 'dalancamento'),
+    'tipo_lancamento': ('tipo_lancamento', 'tipo_lancamento'),
+}
+
+# Colunas de baixa cardinalidade codificadas por índice no formato colunar
+DICIONARIO_COLUNAR = ('dalancamento', 'indebitocredito', 'tipo_lancamento', 'cofonte', 'coclasseorc')
+
+# Colunas com select de filtro no cabeçalho da grade (valores em /api/valores-filtro)
+COLUNAS_FILTRO = ('nudocumento', 'coevento', 'cocontacorrente')
+
+# Mesma ordem da consulta sem paginação (a data já ordena pelo mês)
+ORDEM_GRADE = [('data_ordem', 'ASC'), ('nudocumento', 'ASC')]
+
+# Página + contagem + totais por tipo em uma única leitura (com_totais=true).
+# A página sai direto dos lançamentos filtrados; os totais por tipo_lancamento
+# e o geral vêm de GROUPING SETS sobre tipo_lancamento, no mesmo comando. O
+# intervalo de datas no lugar de YEAR() permite descartar blocos fora do
+# exercício.
+CONSULTA_DADOS_TOTAIS = registrar_consulta('detalha_receita.dados_totais', """
+    WITH lancamentos AS MATERIALIZED (
+        SELECT
+            {mes(dalancamento)} as mes,
+            nudocumento,
+            coevento,
+            cocontacorrente,
+            valancamento,
+            indebitocredito,
+            coug,
+            {data_br(dalancamento)} as dalancamento,
+            tipo_lancamento,
+            cofonte,
+            coclasseorc,
+            receita_lancamento.dalancamento as data_ordem
+        FROM receita_lancamento
+        WHERE {no_ano(receita_lancamento.dalancamento)}
+            AND cocontacontabil = :conta
+            [[ AND cougcontab = :ug ]]
+    )
+    SELECT 'LINHA' as nivel, pagina.*, NULL as quantidade, NULL as total
+    FROM (
+        SELECT * FROM lancamentos
+        ORDER BY data_ordem, nudocumento
+        LIMIT :limite
+    ) pagina
+    UNION ALL
+    SELECT
+        CASE WHEN GROUPING(tipo_lancamento) = 0 THEN 'TIPO' ELSE 'GERAL' END,
+        NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL,
+        tipo_lancamento, NULL, NULL, NULL,
+        COUNT(*),
+        SUM(valancamento)
+    FROM lancamentos
+    GROUP BY GROUPING SETS ((tipo_lancamento), ())
+    ORDER BY data_ordem NULLS FIRST, nudocumento
+""")
+
+CONSULTA_TOTAIS = registrar_consulta('detalha_receita.totais', """
+    SELECT 
+        tipo_lancamento,
+        COUNT(*) as quantidade,
+        SUM(valancamento) as total
+    FROM receita_lancamento
+    WHERE {no_ano(dalancamento)}
+        AND cocontacontabil = :conta
+        [[ AND cougcontab = :ug ]]
+    GROUP BY tipo_lancamento
+""")
+
 @detalha_receita.route('/consulta')
 def consulta():
     """Página de consulta de detalhamento de conta contábil receita"""
@@ -20,23 +170,7 @@ def consulta():
 def get_filtros():
     """Retorna apenas os anos únicos - filtros iniciais"""
     try:
-        # Query para buscar anos distintos
-        if db_manager.is_duckdb:
-            anos_query = """
-            SELECT DISTINCT YEAR(dalancamento) as ano
-            FROM receita_lancamento
-            WHERE dalancamento IS NOT NULL
-            ORDER BY ano DESC
-            """
-        else:  # PostgreSQL
-            anos_query = """
-            SELECT DISTINCT EXTRACT(YEAR FROM dalancamento)::integer as ano
-            FROM receita_lancamento
-            WHERE dalancamento IS NOT NULL
-            ORDER BY ano DESC
-            """
-        
-        anos_result = db_manager.execute_query(anos_query)
+        anos_result = db_manager.execute_query(CONSULTA_ANOS)
         anos = [row['ano'] for row in anos_result]
         
         return jsonify({
@@ -64,27 +198,7 @@ def get_contas_por_ano():
         except ValueError:
             return jsonify({'erro': 'Ano deve ser numérico'}), 400
         
-        # Adaptar query para ambos os bancos
-        if db_manager.is_duckdb:
-            contas_query = """
-            SELECT DISTINCT cocontacontabil
-            FROM receita_lancamento
-            WHERE YEAR(dalancamento) = ?
-                AND cocontacontabil IS NOT NULL
-            ORDER BY cocontacontabil
-            """
-            params = [int(ano)]
-        else:
-            contas_query = """
-            SELECT DISTINCT cocontacontabil
-            FROM receita_lancamento
-            WHERE EXTRACT(YEAR FROM dalancamento) = :ano
-                AND cocontacontabil IS NOT NULL
-            ORDER BY cocontacontabil
-            """
-            params = {'ano': int(ano)}
-        
-        contas_result = db_manager.execute_query(contas_query, params)
+        contas_result = db_manager.execute_query(CONSULTA_CONTAS, {'ano': int(ano)})
         contas = [row['cocontacontabil'] for row in contas_result]
         
         return jsonify({
@@ -112,29 +226,7 @@ def get_ugs_por_ano_conta():
         except ValueError:
             return jsonify({'erro': 'Ano deve ser numérico'}), 400
         
-        # Adaptar query para ambos os bancos
-        if db_manager.is_duckdb:
-            ugs_query = """
-            SELECT DISTINCT cougcontab
-            FROM receita_lancamento
-            WHERE YEAR(dalancamento) = ?
-                AND cocontacontabil = ?
-                AND cougcontab IS NOT NULL
-            ORDER BY cougcontab
-            """
-            params = [int(ano), conta]
-        else:
-            ugs_query = """
-            SELECT DISTINCT cougcontab
-            FROM receita_lancamento
-            WHERE EXTRACT(YEAR FROM dalancamento) = :ano
-                AND cocontacontabil = :conta
-                AND cougcontab IS NOT NULL
-            ORDER BY cougcontab
-            """
-            params = {'ano': int(ano), 'conta': conta}
-        
-        ugs_result = db_manager.execute_query(ugs_query, params)
+        ugs_result = db_manager.execute_query(CONSULTA_UGS, {'ano': int(ano), 'conta': conta})
         ugs = [row['cougcontab'] for row in ugs_result]
         
         return jsonify({
@@ -160,143 +252,64 @@ def get_dados():
         if not all([ano, conta, ug]):
             return jsonify({'erro': 'Parâmetros obrigatórios: ano, conta, ug'}), 400
         
-        # Montar query base adaptada para ambos os bancos
-        if db_manager.is_duckdb:
-            if ug == 'CONSOLIDADO':
-                query = """
-                SELECT 
-                    MONTH(dalancamento) as mes,
-                    nudocumento,
-                    coevento,
-                    cocontacorrente,
-                    valancamento,
-                    indebitocredito,
-                    coug,
-                    strftime('%d/%m/%Y', dalancamento) as dalancamento,
-                    tipo_lancamento,
-                    cofonte,
-                    coclasseorc
-                FROM receita_lancamento
-                WHERE YEAR(dalancamento) = ? 
-                    AND cocontacontabil = ?
-                ORDER BY MONTH(dalancamento), dalancamento, nudocumento
-                LIMIT ?
-                """
-                params = [int(ano), conta, int(limite)]
-            else:
-                query = """
-                SELECT 
-                    MONTH(dalancamento) as mes,
-                    nudocumento,
-                    coevento,
-                    cocontacorrente,
-                    valancamento,
-                    indebitocredito,
-                    coug,
-                    strftime('%d/%m/%Y', dalancamento) as dalancamento,
-                    tipo_lancamento,
-                    cofonte,
-                    coclasseorc
-                FROM receita_lancamento
-                WHERE YEAR(dalancamento) = ? 
-                    AND cocontacontabil = ? 
-                    AND cougcontab = ?
-                ORDER BY MONTH(dalancamento), dalancamento, nudocumento
-                LIMIT ?
-                """
-                params = [int(ano), conta, ug, int(limite)]
-        else:  # PostgreSQL
-            if ug == 'CONSOLIDADO':
-                query = """
-                SELECT 
-                    EXTRACT(MONTH FROM dalancamento)::integer as mes,
-                    nudocumento,
-                    coevento,
-                    cocontacorrente,
-                    valancamento,
-                    indebitocredito,
-                    coug,
-                    TO_CHAR(dalancamento, 'DD/MM/YYYY') as dalancamento,
-                    tipo_lancamento,
-                    cofonte,
-                    coclasseorc
-                FROM receita_lancamento
-                WHERE EXTRACT(YEAR FROM dalancamento) = :ano 
-                    AND cocontacontabil = :conta
-                ORDER BY EXTRACT(MONTH FROM dalancamento), dalancamento, nudocumento
-                LIMIT :limite
-                """
-                params = {'ano': int(ano), 'conta': conta, 'limite': int(limite)}
-            else:
-                query = """
-                SELECT 
-                    EXTRACT(MONTH FROM dalancamento)::integer as mes,
-                    nudocumento,
-                    coevento,
-                    cocontacorrente,
-                    valancamento,
-                    indebitocredito,
-                    coug,
-                    TO_CHAR(dalancamento, 'DD/MM/YYYY') as dalancamento,
-                    tipo_lancamento,
-                    cofonte,
-                    coclasseorc
-                FROM receita_lancamento
-                WHERE EXTRACT(YEAR FROM dalancamento) = :ano 
-                    AND cocontacontabil = :conta 
-                    AND cougcontab = :ug
-                ORDER BY EXTRACT(MONTH FROM dalancamento), dalancamento, nudocumento
-                LIMIT :limite
-                """
-                params = {'ano': int(ano), 'conta': conta, 'ug': ug, 'limite': int(limite)}
+        # Parâmetros nomeados; ug=None remove o filtro de UG (CONSOLIDADO)
+        params = {
+            'ano': int(ano),
+            'conta': conta,
+            'ug': None if ug == 'CONSOLIDADO' else ug,
+            'limite': int(limite)
+        }
+        
+        # Grade server-side: só a página pedida pelo DataTables sai do banco
+        requisicao = ler_requisicao_datatables(request.args, COLUNAS_GRADE)
+        if requisicao:
+            resposta = db_manager.executar_pagina(
+                CONSULTA_GRADE, params, requisicao, COLUNAS_GRADE, ORDEM_GRADE
+            )
+            for dado in resposta['data']:
+                del dado['data_ordem']
+                if dado['valancamento'] is not None:
+                    dado['valancamento'] = float(dado['valancamento'])
+                if dado['mes'] is not None:
+                    dado['mes'] = int(dado['mes'])
+            resposta['data'] = formatar_linhas(resposta['data'], request.args, DICIONARIO_COLUNAR)
+            return jsonify(resposta)
+        
+        # Página, contagem e totais na mesma leitura (dispensa /api/totais)
+        if request.args.get('com_totais') == 'true':
+            linhas = db_manager.execute_query(CONSULTA_DADOS_TOTAIS, params)
+            dados, total_registros, totais = _separar_niveis(linhas, conta)
+            return jsonify({
+                'dados': formatar_linhas(dados, request.args, DICIONARIO_COLUNAR),
+                'total': len(dados),
+                'total_registros': total_registros,
+                'tem_mais': total_registros > len(dados),
+                'limite_aplicado': int(limite),
+                'totais': totais,
+                'fonte': 'DuckDB Local' if db_manager.is_duckdb else 'PostgreSQL'
+            })
         
         # Executar query
-        dados = db_manager.execute_query(query, params)
+        dados = db_manager.execute_query(CONSULTA_DADOS, params)
+        
+        # Total sem limite vem da própria consulta (mesmo valor em todas as linhas)
+        total_registros = int(dados[0]['total_registros']) if dados else 0
         
         # Processar dados para garantir tipos corretos
         for dado in dados:
+            del dado['total_registros']
             if 'valancamento' in dado and dado['valancamento'] is not None:
                 dado['valancamento'] = float(dado['valancamento'])
             if 'mes' in dado and dado['mes'] is not None:
                 dado['mes'] = int(dado['mes'])
         
-        # Verificar se tem mais registros
-        if db_manager.is_duckdb:
-            if ug == 'CONSOLIDADO':
-                count_query = """
-                SELECT COUNT(*) as total FROM receita_lancamento
-                WHERE YEAR(dalancamento) = ? AND cocontacontabil = ?
-                """
-                count_params = [int(ano), conta]
-            else:
-                count_query = """
-                SELECT COUNT(*) as total FROM receita_lancamento
-                WHERE YEAR(dalancamento) = ? AND cocontacontabil = ? AND cougcontab = ?
-                """
-                count_params = [int(ano), conta, ug]
-        else:  # PostgreSQL
-            if ug == 'CONSOLIDADO':
-                count_query = """
-                SELECT COUNT(*) as total FROM receita_lancamento
-                WHERE EXTRACT(YEAR FROM dalancamento) = :ano AND cocontacontabil = :conta
-                """
-                count_params = {'ano': int(ano), 'conta': conta}
-            else:
-                count_query = """
-                SELECT COUNT(*) as total FROM receita_lancamento
-                WHERE EXTRACT(YEAR FROM dalancamento) = :ano AND cocontacontabil = :conta AND cougcontab = :ug
-                """
-                count_params = {'ano': int(ano), 'conta': conta, 'ug': ug}
-        
-        count_result = db_manager.execute_query(count_query, count_params)
-        total_registros = count_result[0]['total'] if count_result else 0
         
         # Log temporário para debug
         print(f"🔍 Consulta retornou {len(dados)} registros")
         print(f"   Filtros: ano={ano}, conta={conta}, ug={ug}")
         
         return jsonify({
-            'dados': dados,
+            'dados': formatar_linhas(dados, request.args, DICIONARIO_COLUNAR),
             'total': len(dados),
             'total_registros': total_registros,
             'tem_mais': total_registros > len(dados),
@@ -309,6 +322,31 @@ def get_dados():
         traceback.print_exc()
         return jsonify({'erro': str(e)}), 500
 
+@detalha_receita.route('/api/valores-filtro')
+def get_valores_filtro():
+    """Valores distintos das colunas filtráveis da grade (selects do cabeçalho)"""
+    try:
+        ano = request.args.get('ano')
+        conta = request.args.get('conta')
+        ug = request.args.get('ug')
+        
+        if not all([ano, conta, ug]):
+            return jsonify({'erro': 'Parâmetros obrigatórios: ano, conta, ug'}), 400
+        
+        params = {
+            'ano': int(ano),
+            'conta': conta,
+            'ug': None if ug == 'CONSOLIDADO' else ug
+        }
+        
+        # None: valores demais para um select (o cabeçalho usa um campo de texto)
+        return jsonify(db_manager.valores_filtro(CONSULTA_GRADE, params, COLUNAS_GRADE, COLUNAS_FILTRO))
+        
+    except Exception as e:
+        print(f"Erro em get_valores_filtro: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'erro': str(e)}), 500
+
 @detalha_receita.route('/api/totais')
 def get_totais():
     """Retorna os totais por tipo de lançamento"""
@@ -322,87 +360,69 @@ def get_totais():
         if not all([ano, conta, ug]):
             return jsonify({'erro': 'Parâmetros obrigatórios: ano, conta, ug'}), 400
         
-        # Montar query para totais adaptada para ambos os bancos
-        if db_manager.is_duckdb:
-            if ug == 'CONSOLIDADO':
-                query = """
-                SELECT 
-                    tipo_lancamento,
-                    COUNT(*) as quantidade,
-                    SUM(valancamento) as total
-                FROM receita_lancamento
-                WHERE YEAR(dalancamento) = ? 
-                    AND cocontacontabil = ?
-                GROUP BY tipo_lancamento
-                """
-                params = [int(ano), conta]
-            else:
-                query = """
-                SELECT 
-                    tipo_lancamento,
-                    COUNT(*) as quantidade,
-                    SUM(valancamento) as total
-                FROM receita_lancamento
-                WHERE YEAR(dalancamento) = ? 
-                    AND cocontacontabil = ? 
-                    AND cougcontab = ?
-                GROUP BY tipo_lancamento
-                """
-                params = [int(ano), conta, ug]
-        else:  # PostgreSQL
-            if ug == 'CONSOLIDADO':
-                query = """
-                SELECT 
-                    tipo_lancamento,
-                    COUNT(*) as quantidade,
-                    SUM(valancamento) as total
-                FROM receita_lancamento
-                WHERE EXTRACT(YEAR FROM dalancamento) = :ano 
-                    AND cocontacontabil = :conta
-                GROUP BY tipo_lancamento
-                """
-                params = {'ano': int(ano), 'conta': conta}
-            else:
-                query = """
-                SELECT 
-                    tipo_lancamento,
-                    COUNT(*) as quantidade,
-                    SUM(valancamento) as total
-                FROM receita_lancamento
-                WHERE EXTRACT(YEAR FROM dalancamento) = :ano 
-                    AND cocontacontabil = :conta 
-                    AND cougcontab = :ug
-                GROUP BY tipo_lancamento
-                """
-                params = {'ano': int(ano), 'conta': conta, 'ug': ug}
-        
-        # Executar query
-        result = db_manager.execute_query(query, params)
-        
-        # Formatar resultado
-        totais = {
-            'debito': {'quantidade': 0, 'total': 0},
-            'credito': {'quantidade': 0, 'total': 0},
-            'saldo': 0
+        params = {
+            'ano': int(ano),
+            'conta': conta,
+            'ug': None if ug == 'CONSOLIDADO' else ug
         }
         
-        for row in result:
-            if row['tipo_lancamento'] == 'DEBITO':
-                totais['debito']['quantidade'] = row['quantidade']
-                totais['debito']['total'] = float(row['total'] or 0)
-            elif row['tipo_lancamento'] == 'CREDITO':
-                totais['credito']['quantidade'] = row['quantidade']
-                totais['credito']['total'] = float(row['total'] or 0)
-        
-        # Calcular saldo baseado no primeiro dígito da conta contábil
-        if str(conta).startswith('5'):
-            totais['saldo'] = totais['debito']['total'] - totais['credito']['total']
-        else:
-            totais['saldo'] = totais['credito']['total'] - totais['debito']['total']
+        # Executar query
+        result = db_manager.execute_query(CONSULTA_TOTAIS, params)
         
-        return jsonify(totais)
+        return jsonify(_formatar_totais(result, conta))
         
     except Exception as e:
         print(f"Erro em get_totais: {str(e)}")
         traceback.print_exc()
-        return jsonify({'erro': str(e)}), 500
\ No newline at end of file
+        return jsonify({'erro': str(e)}), 500
+
+
+def _formatar_totais(linhas_tipo, conta):
+    """Monta débito, crédito e saldo a partir das linhas agrupadas por tipo_lancamento"""
+    totais = {
+        'debito': {'quantidade': 0, 'total': 0},
+        'credito': {'quantidade': 0, 'total': 0},
+        'saldo': 0
+    }
+    
+    for row in linhas_tipo:
+        if row['tipo_lancamento'] == 'DEBITO':
+            totais['debito']['quantidade'] = int(row['quantidade'])
+            totais['debito']['total'] = float(row['total'] or 0)
+        elif row['tipo_lancamento'] == 'CREDITO':
+            totais['credito']['quantidade'] = int(row['quantidade'])
+            totais['credito']['total'] = float(row['total'] or 0)
+    
+    # Calcular saldo baseado no primeiro dígito da conta contábil
+    if str(conta).startswith('5'):
+        totais['saldo'] = totais['debito']['total'] - totais['credito']['total']
+    else:
+        totais['saldo'] = totais['credito']['total'] - totais['debito']['total']
+    
+    return totais
+
+
+def _separar_niveis(linhas, conta):
+    """Separa o resultado de CONSULTA_DADOS_TOTAIS em (dados, total_registros, totais)"""
+    dados = []
+    linhas_tipo = []
+    total_registros = 0
+    
+    for row in linhas:
+        nivel = row.pop('nivel')
+        if nivel == 'GERAL':
+            total_registros = int(row['quantidade'])
+        elif nivel == 'TIPO':
+            linhas_tipo.append(row)
+        else:
+            del row['quantidade'], row['total'], row['data_ordem']
+            if row['valancamento'] is not None:
+                row['valancamento'] = float(row['valancamento'])
+            # As linhas de total trazem NULL nessas colunas e o pandas as devolve
+            # como float; nas linhas de lançamento voltam a ser inteiros
+            for coluna in ('mes', 'coevento', 'coug'):
+                valor = row[coluna]
+                row[coluna] = None if valor is None or valor != valor else int(valor)
+            dados.append(row)
+    
+    return dados, total_registros, _formatar_totais(linhas_tipo, conta)
@@ -5,12 +5,61 @@ ATUALIZADO: Duas regras de inconsistências com endpoints separados
 """
 from flask import Blueprint, render_template, jsonify, request
 from app.db_manager import db_manager
+from app.modules.dimensoes import dimensoes
+from app.modules.consultas import registrar_consulta
+from app.modules.formato_colunar import formatar_linhas
+from app.modules.hierarquia import Nivel, consolidar
+from app.modules.etl_inconsistencias_receita_duckdb import TABELA_INCONSISTENCIAS, CADASTRO_FONTE_ALINEA
 from datetime import datetime
 import traceback
 
 # Criar blueprint
 relatorio_receita_fonte = Blueprint('relatorio_receita_fonte', __name__)
 
+# Fica True depois que a tabela pré-calculada de inconsistências é encontrada
+_indice_inconsistencias = False
+
+# Lançamentos de uma fonte/alínea já no formato da tela. Página + total de
+# registros + totais D/C em uma única leitura: as funções de janela são
+# avaliadas antes do LIMIT (sem :limite retorna tudo, para exportação)
+CONSULTA_DETALHES_LANCAMENTOS = registrar_consulta('relatorio_receita_fonte.detalhes_lancamentos', """
+    SELECT 
+        rl.cocontacontabil,
+        COALESCE(cc.nocontacontabil, '') as nocontacontabil,
+        COALESCE(CAST(rl.coug AS VARCHAR), '') as coug,
+        COALESCE(ug.noug, '') as noug,
+        rl.nudocumento,
+        rl.coevento,
+        COALESCE(ev.noevento, '') as noevento,
+        rl.indebitocredito,
+        COALESCE(rl.valancamento, 0) as valancamento,
+        COALESCE({data_br(rl.dalancamento)}, '') as dalancamento,
+        COALESCE(rl.cogrupo, '') as cogrupo,
+        COUNT(*) OVER () as total_registros,
+        SUM(CASE WHEN rl.indebitocredito = 'D' THEN rl.valancamento ELSE 0 END) OVER () as total_debito,
+        SUM(CASE WHEN rl.indebitocredito = 'D' THEN 0 ELSE rl.valancamento END) OVER () as total_credito
+    FROM receita_lancamento rl
+    LEFT JOIN dim_conta_contabil cc ON CAST(rl.cocontacontabil AS VARCHAR) = CAST(cc.cocontacontabil AS VARCHAR)
+    LEFT JOIN dim_unidade_gestora ug ON CAST(rl.coug AS VARCHAR) = CAST(ug.coug AS VARCHAR)
+    LEFT JOIN dim_evento ev ON CAST(rl.coevento AS VARCHAR) = CAST(ev.coevento AS VARCHAR)
+    WHERE CAST(rl.cofonte AS VARCHAR) = CAST(:cofonte AS VARCHAR)
+      AND CAST(rl.coalinea AS VARCHAR) = CAST(:coalinea AS VARCHAR)
+      AND rl.coexercicio = :ano
+      [[ AND CAST(rl.cougcontab AS VARCHAR) = CAST(:coug AS VARCHAR) ]]
+      AND CAST(rl.cocontacontabil AS BIGINT) BETWEEN 621200000 AND 621399999
+    ORDER BY rl.dalancamento DESC, rl.nudocumento
+    [[ LIMIT :limite ]]
+""")
+
+# Colunas de totais calculadas pela janela, retiradas de cada linha da resposta
+_COLUNAS_TOTAIS_DETALHES = ('total_registros', 'total_debito', 'total_credito')
+
+# Colunas repetidas entre lançamentos, codificadas por índice no formato colunar
+DICIONARIO_DETALHES = (
+    'cocontacontabil', 'nocontacontabil', 'coug', 'noug', 'coevento', 'noevento',
+    'indebitocredito', 'dalancamento', 'cogrupo',
+)
+
 @relatorio_receita_fonte.route('/')
 def index():
     """Página principal do relatório"""
@@ -150,98 +199,19 @@ def get_dados_por_fonte():
         
         dados = db_manager.execute_query(query, params)
         
-        # Buscar descrições das fontes
-        query_desc_fonte = """
-        SELECT DISTINCT 
-            CAST(cofonte AS VARCHAR) as cofonte, 
-            nofonte 
-        FROM dim_fonte
-        """
-        desc_fontes = db_manager.execute_query(query_desc_fonte)
-        dict_fontes = {str(f['cofonte']): f['nofonte'] for f in desc_fontes}
-        
-        # Buscar descrições das alíneas
-        query_desc_alinea = """
-        SELECT DISTINCT 
-            CAST(coalinea AS VARCHAR) as coalinea, 
-            noalinea 
-        FROM dim_receita_alinea
-        """
-        desc_alineas = db_manager.execute_query(query_desc_alinea)
-        dict_alineas = {str(a['coalinea']): a['noalinea'] for a in desc_alineas}
+        # Descrições das fontes e alíneas (dimensões em cache)
+        dict_fontes = dimensoes.mapa('fonte')
+        dict_alineas = dimensoes.mapa('alinea')
         
         # Adicionar descrições aos dados
         for item in dados:
             item['nome_fonte'] = dict_fontes.get(str(item['cofonte']), '')
             item['nome_alinea'] = dict_alineas.get(str(item['coalinea']), '')
         
-        # Agrupar dados por fonte para estrutura hierárquica
-        dados_agrupados = {}
-        totais_gerais = {
-            'previsao_inicial': 0,
-            'previsao_atualizada': 0,
-            'realizada_atual': 0,
-            'realizada_anterior': 0
-        }
-        
-        for item in dados:
-            cofonte = item['cofonte']
-            
-            if cofonte not in dados_agrupados:
-                dados_agrupados[cofonte] = {
-                    'cofonte': cofonte,
-                    'nome_fonte': item['nome_fonte'],
-                    'previsao_inicial': 0,
-                    'previsao_atualizada': 0,
-                    'realizada_atual': 0,
-                    'realizada_anterior': 0,
-                    'variacao_percentual': 0,
-                    'variacao_absoluta': 0,
-                    'alineas': []
-                }
-            
-            # Adicionar alínea
-            dados_agrupados[cofonte]['alineas'].append({
-                'coalinea': item['coalinea'],
-                'nome_alinea': item['nome_alinea'],
-                'previsao_inicial': float(item['previsao_inicial'] or 0),
-                'previsao_atualizada': float(item['previsao_atualizada'] or 0),
-                'realizada_atual': float(item['realizada_atual'] or 0),
-                'realizada_anterior': float(item['realizada_anterior'] or 0),
-                'variacao_percentual': float(item['variacao_percentual'] or 0),
-                'variacao_absoluta': float(item['variacao_absoluta'] or 0)
-            })
-            
-            # Somar totais da fonte
-            dados_agrupados[cofonte]['previsao_inicial'] += float(item['previsao_inicial'] or 0)
-            dados_agrupados[cofonte]['previsao_atualizada'] += float(item['previsao_atualizada'] or 0)
-            dados_agrupados[cofonte]['realizada_atual'] += float(item['realizada_atual'] or 0)
-            dados_agrupados[cofonte]['realizada_anterior'] += float(item['realizada_anterior'] or 0)
-            
-            # Somar totais gerais
-            totais_gerais['previsao_inicial'] += float(item['previsao_inicial'] or 0)
-            totais_gerais['previsao_atualizada'] += float(item['previsao_atualizada'] or 0)
-            totais_gerais['realizada_atual'] += float(item['realizada_atual'] or 0)
-            totais_gerais['realizada_anterior'] += float(item['realizada_anterior'] or 0)
-        
-        # Calcular variação para cada fonte
-        for fonte_data in dados_agrupados.values():
-            if fonte_data['realizada_anterior'] != 0:
-                fonte_data['variacao_percentual'] = ((fonte_data['realizada_atual'] - fonte_data['realizada_anterior']) / abs(fonte_data['realizada_anterior'])) * 100
-                fonte_data['variacao_absoluta'] = fonte_data['realizada_atual'] - fonte_data['realizada_anterior']
-        
-        # Calcular variação dos totais gerais
-        if totais_gerais['realizada_anterior'] != 0:
-            totais_gerais['variacao_percentual'] = ((totais_gerais['realizada_atual'] - totais_gerais['realizada_anterior']) / abs(totais_gerais['realizada_anterior'])) * 100
-            totais_gerais['variacao_absoluta'] = totais_gerais['realizada_atual'] - totais_gerais['realizada_anterior']
-        else:
-            totais_gerais['variacao_percentual'] = 0
-            totais_gerais['variacao_absoluta'] = 0
-        
-        # Ordenar por valor realizado 2025 (maior para menor)
-        dados_ordenados = sorted(dados_agrupados.values(), 
-                                key=lambda x: x['realizada_atual'], 
-                                reverse=True)
+        # Fontes com os subtotais e a lista de alíneas, em uma passada
+        dados_ordenados, totais_gerais = _agrupar(
+            dados, ('cofonte', 'nome_fonte'), ('coalinea', 'nome_alinea'), 'alineas'
+        )
         
         return jsonify({
             'dados': dados_ordenados,
@@ -380,97 +350,19 @@ def get_dados_por_receita():
         
         dados = db_manager.execute_query(query, params)
         
-        # Buscar descrições
-        query_desc_fonte = """
-        SELECT DISTINCT 
-            CAST(cofonte AS VARCHAR) as cofonte, 
-            nofonte 
-        FROM dim_fonte
-        """
-        desc_fontes = db_manager.execute_query(query_desc_fonte)
-        dict_fontes = {str(f['cofonte']): f['nofonte'] for f in desc_fontes}
-        
-        query_desc_alinea = """
-        SELECT DISTINCT 
-            CAST(coalinea AS VARCHAR) as coalinea, 
-            noalinea 
-        FROM dim_receita_alinea
-        """
-        desc_alineas = db_manager.execute_query(query_desc_alinea)
-        dict_alineas = {str(a['coalinea']): a['noalinea'] for a in desc_alineas}
+        # Descrições (dimensões em cache)
+        dict_fontes = dimensoes.mapa('fonte')
+        dict_alineas = dimensoes.mapa('alinea')
         
         # Adicionar descrições aos dados
         for item in dados:
             item['nome_fonte'] = dict_fontes.get(str(item['cofonte']), '')
             item['nome_alinea'] = dict_alineas.get(str(item['coalinea']), '')
         
-        # Agrupar dados por alínea para estrutura hierárquica
-        dados_agrupados = {}
-        totais_gerais = {
-            'previsao_inicial': 0,
-            'previsao_atualizada': 0,
-            'realizada_atual': 0,
-            'realizada_anterior': 0
-        }
-        
-        for item in dados:
-            coalinea = item['coalinea']
-            
-            if coalinea not in dados_agrupados:
-                dados_agrupados[coalinea] = {
-                    'coalinea': coalinea,
-                    'nome_alinea': item['nome_alinea'],
-                    'previsao_inicial': 0,
-                    'previsao_atualizada': 0,
-                    'realizada_atual': 0,
-                    'realizada_anterior': 0,
-                    'variacao_percentual': 0,
-                    'variacao_absoluta': 0,
-                    'fontes': []
-                }
-            
-            # Adicionar fonte
-            dados_agrupados[coalinea]['fontes'].append({
-                'cofonte': item['cofonte'],
-                'nome_fonte': item['nome_fonte'],
-                'previsao_inicial': float(item['previsao_inicial'] or 0),
-                'previsao_atualizada': float(item['previsao_atualizada'] or 0),
-                'realizada_atual': float(item['realizada_atual'] or 0),
-                'realizada_anterior': float(item['realizada_anterior'] or 0),
-                'variacao_percentual': float(item['variacao_percentual'] or 0),
-                'variacao_absoluta': float(item['variacao_absoluta'] or 0)
-            })
-            
-            # Somar totais da alínea
-            dados_agrupados[coalinea]['previsao_inicial'] += float(item['previsao_inicial'] or 0)
-            dados_agrupados[coalinea]['previsao_atualizada'] += float(item['previsao_atualizada'] or 0)
-            dados_agrupados[coalinea]['realizada_atual'] += float(item['realizada_atual'] or 0)
-            dados_agrupados[coalinea]['realizada_anterior'] += float(item['realizada_anterior'] or 0)
-            
-            # Somar totais gerais
-            totais_gerais['previsao_inicial'] += float(item['previsao_inicial'] or 0)
-            totais_gerais['previsao_atualizada'] += float(item['previsao_atualizada'] or 0)
-            totais_gerais['realizada_atual'] += float(item['realizada_atual'] or 0)
-            totais_gerais['realizada_anterior'] += float(item['realizada_anterior'] or 0)
-        
-        # Calcular variação para cada alínea
-        for alinea_data in dados_agrupados.values():
-            if alinea_data['realizada_anterior'] != 0:
-                alinea_data['variacao_percentual'] = ((alinea_data['realizada_atual'] - alinea_data['realizada_anterior']) / abs(alinea_data['realizada_anterior'])) * 100
-                alinea_data['variacao_absoluta'] = alinea_data['realizada_atual'] - alinea_data['realizada_anterior']
-        
-        # Calcular variação dos totais gerais
-        if totais_gerais['realizada_anterior'] != 0:
-            totais_gerais['variacao_percentual'] = ((totais_gerais['realizada_atual'] - totais_gerais['realizada_anterior']) / abs(totais_gerais['realizada_anterior'])) * 100
-            totais_gerais['variacao_absoluta'] = totais_gerais['realizada_atual'] - totais_gerais['realizada_anterior']
-        else:
-            totais_gerais['variacao_percentual'] = 0
-            totais_gerais['variacao_absoluta'] = 0
-        
-        # Ordenar por valor realizado 2025 (maior para menor)
-        dados_ordenados = sorted(dados_agrupados.values(), 
-                                key=lambda x: x['realizada_atual'], 
-                                reverse=True)
+        # Alíneas com os subtotais e a lista de fontes, em uma passada
+        dados_ordenados, totais_gerais = _agrupar(
+            dados, ('coalinea', 'nome_alinea'), ('cofonte', 'nome_fonte'), 'fontes'
+        )
         
         return jsonify({
             'dados': dados_ordenados,
@@ -484,6 +376,51 @@ def get_dados_por_receita():
         traceback.print_exc()
         return jsonify({'erro': str(e)}), 500
 
+CAMPOS_VALORES = ('previsao_inicial', 'previsao_atualizada', 'realizada_atual', 'realizada_anterior')
+
+def _calcular_variacao(item):
+    """Variação do realizado sobre o ano anterior (fica em 0 se não houve realizado anterior)"""
+    if item['realizada_anterior'] != 0:
+        item['variacao_percentual'] = ((item['realizada_atual'] - item['realizada_anterior']) / abs(item['realizada_anterior'])) * 100
+        item['variacao_absoluta'] = item['realizada_atual'] - item['realizada_anterior']
+    else:
+        item.setdefault('variacao_percentual', 0)
+        item.setdefault('variacao_absoluta', 0)
+
+def _agrupar(dados, grupo, item, lista):
+    """
+    Agrupa as linhas (ordenadas por grupo e item) em dois níveis: o grupo
+    (fonte ou alínea) com os subtotais e, em `lista`, uma entrada por linha.
+    Retorna (grupos do maior para o menor realizado no ano atual, totais).
+    """
+    codigo_grupo, nome_grupo = grupo
+    codigo_item, nome_item = item
+
+    def montar_grupo(row):
+        no = {codigo_grupo: row[codigo_grupo], nome_grupo: row[nome_grupo]}
+        no.update(dict.fromkeys(CAMPOS_VALORES, 0))
+        no.update(variacao_percentual=0, variacao_absoluta=0)
+        no[lista] = []
+        return no
+
+    def montar_item(row):
+        no = {codigo_item: row[codigo_item], nome_item: row[nome_item]}
+        no.update(dict.fromkeys(CAMPOS_VALORES, 0))
+        no['variacao_percentual'] = float(row['variacao_percentual'] or 0)
+        no['variacao_absoluta'] = float(row['variacao_absoluta'] or 0)
+        return no
+
+    def decompor(row):
+        valores = {campo: float(row[campo] or 0) for campo in CAMPOS_VALORES}
+        return (row[codigo_grupo], row[codigo_item]), valores
+
+    niveis = (Nivel(montar_grupo, _calcular_variacao), Nivel(montar_item))
+    grupos, totais = consolidar(dados, niveis, decompor, CAMPOS_VALORES, filhos=lista)
+    _calcular_variacao(totais)
+
+    # Ordenar por valor realizado no ano atual (maior para menor)
+    return sorted(grupos, key=lambda x: x['realizada_atual'], reverse=True), totais
+
 @relatorio_receita_fonte.route('/api/lista-ugs')
 def get_lista_ugs():
     """Retorna lista de UGs que possuem saldo nas contas de receita realizada"""
@@ -539,116 +476,30 @@ def get_detalhes_lancamentos():
         if not cofonte or not coalinea:
             return jsonify({'erro': 'Parâmetros cofonte e coalinea são obrigatórios'}), 400
         
-        if coug:
-            query = """
-            SELECT 
-                rl.cocontacontabil,
-                CAST(rl.coug AS VARCHAR) as coug,
-                rl.nudocumento,
-                rl.coevento,
-                rl.indebitocredito,
-                rl.valancamento,
-                rl.dalancamento,
-                rl.cogrupo,
-                cc.nocontacontabil,
-                ug.noug,
-                ev.noevento
-            FROM receita_lancamento rl
-            LEFT JOIN dim_conta_contabil cc ON CAST(rl.cocontacontabil AS VARCHAR) = CAST(cc.cocontacontabil AS VARCHAR)
-            LEFT JOIN dim_unidade_gestora ug ON CAST(rl.coug AS VARCHAR) = CAST(ug.coug AS VARCHAR)
-            LEFT JOIN dim_evento ev ON CAST(rl.coevento AS VARCHAR) = CAST(ev.coevento AS VARCHAR)
-            WHERE CAST(rl.cofonte AS VARCHAR) = CAST(? AS VARCHAR)
-              AND CAST(rl.coalinea AS VARCHAR) = CAST(? AS VARCHAR)
-              AND rl.coexercicio = ?
-              AND CAST(rl.cougcontab AS VARCHAR) = CAST(? AS VARCHAR)
-              AND CAST(rl.cocontacontabil AS BIGINT) BETWEEN 621200000 AND 621399999
-            ORDER BY rl.dalancamento DESC, rl.nudocumento
-            """
-            params = [cofonte, coalinea, ano, coug]
-        else:
-            query = """
-            SELECT 
-                rl.cocontacontabil,
-                CAST(rl.coug AS VARCHAR) as coug,
-                rl.nudocumento,
-                rl.coevento,
-                rl.indebitocredito,
-                rl.valancamento,
-                rl.dalancamento,
-                rl.cogrupo,
-                cc.nocontacontabil,
-                ug.noug,
-                ev.noevento
-            FROM receita_lancamento rl
-            LEFT JOIN dim_conta_contabil cc ON CAST(rl.cocontacontabil AS VARCHAR) = CAST(cc.cocontacontabil AS VARCHAR)
-            LEFT JOIN dim_unidade_gestora ug ON CAST(rl.coug AS VARCHAR) = CAST(ug.coug AS VARCHAR)
-            LEFT JOIN dim_evento ev ON CAST(rl.coevento AS VARCHAR) = CAST(ev.coevento AS VARCHAR)
-            WHERE CAST(rl.cofonte AS VARCHAR) = CAST(? AS VARCHAR)
-              AND CAST(rl.coalinea AS VARCHAR) = CAST(? AS VARCHAR)
-              AND rl.coexercicio = ?
-              AND CAST(rl.cocontacontabil AS BIGINT) BETWEEN 621200000 AND 621399999
-            ORDER BY rl.dalancamento DESC, rl.nudocumento
-            """
-            params = [cofonte, coalinea, ano]
+        params = {
+            'cofonte': cofonte,
+            'coalinea': coalinea,
+            'ano': int(ano),
+            'coug': coug or None,
+            'limite': None if exportar else 1000
+        }
         
-        if not exportar:
-            query += " LIMIT 1000"
+        dados = db_manager.execute_query(CONSULTA_DETALHES_LANCAMENTOS, params)
         
-        dados = db_manager.execute_query(query, params)
-        
-        # Contar total de registros
-        if coug:
-            query_count = """
-            SELECT COUNT(*) as total
-            FROM receita_lancamento
-            WHERE CAST(cofonte AS VARCHAR) = CAST(? AS VARCHAR)
-              AND CAST(coalinea AS VARCHAR) = CAST(? AS VARCHAR)
-              AND coexercicio = ?
-              AND CAST(cougcontab AS VARCHAR) = CAST(? AS VARCHAR)
-              AND CAST(cocontacontabil AS BIGINT) BETWEEN 621200000 AND 621399999
-            """
-            count_params = [cofonte, coalinea, ano, coug]
+        # Totais sobre todos os registros (não apenas a página exibida)
+        if dados:
+            total_registros = int(dados[0]['total_registros'])
+            total_debito = float(dados[0]['total_debito'] or 0)
+            total_credito = float(dados[0]['total_credito'] or 0)
         else:
-            query_count = """
-            SELECT COUNT(*) as total
-            FROM receita_lancamento
-            WHERE CAST(cofonte AS VARCHAR) = CAST(? AS VARCHAR)
-              AND CAST(coalinea AS VARCHAR) = CAST(? AS VARCHAR)
-              AND coexercicio = ?
-              AND CAST(cocontacontabil AS BIGINT) BETWEEN 621200000 AND 621399999
-            """
-            count_params = [cofonte, coalinea, ano]
-        
-        count_result = db_manager.execute_query(query_count, count_params)
-        total_registros = count_result[0]['total'] if count_result else 0
-        
-        # Formatar dados para retorno
-        dados_formatados = []
-        total_debito = 0
-        total_credito = 0
+            total_registros = 0
+            total_debito = 0
+            total_credito = 0
         
+        # Linhas já vêm formatadas do banco; só as colunas de totais saem
         for item in dados:
-            valor = float(item['valancamento'] or 0)
-            tipo_dc = item['indebitocredito']
-            
-            if tipo_dc == 'D':
-                total_debito += valor
-            else:
-                total_credito += valor
-            
-            dados_formatados.append({
-                'cocontacontabil': item['cocontacontabil'],
-                'nocontacontabil': item['nocontacontabil'] or '',
-                'coug': str(item['coug']) if item['coug'] else '',
-                'noug': item['noug'] or '',
-                'nudocumento': item['nudocumento'],
-                'coevento': item['coevento'],
-                'noevento': item['noevento'] or '',
-                'indebitocredito': tipo_dc,
-                'valancamento': valor,
-                'dalancamento': item['dalancamento'].strftime('%d/%m/%Y') if item['dalancamento'] else '',
-                'cogrupo': item['cogrupo'] or ''
-            })
+            for coluna in _COLUNAS_TOTAIS_DETALHES:
+                del item[coluna]
         
         # Buscar descrições da fonte e alínea
         query_desc = """
@@ -662,9 +513,9 @@ def get_detalhes_lancamentos():
         nome_alinea = desc_result[0]['nome_alinea'] if desc_result else ''
         
         return jsonify({
-            'dados': dados_formatados,
+            'dados': formatar_linhas(dados, request.args, DICIONARIO_DETALHES),
             'total_registros': total_registros,
-            'registros_exibidos': len(dados_formatados),
+            'registros_exibidos': len(dados),
             'total_debito': total_debito,
             'total_credito': total_credito,
             'saldo': total_credito - total_debito,
@@ -686,12 +537,23 @@ def verificar_inconsistencias():
     """Retorna todas as inconsistências (ambas as regras)"""
     try:
         ano_atual = datetime.now().year
+        exportar, limite = _parametros_exportacao()
         
-        # Buscar inconsistências Fonte/Alínea
-        fonte_alinea = _verificar_fonte_alinea(ano_atual)
+        # Uma consulta por regra (página + contagem juntas), as duas em paralelo
+        docs_fa, docs_ug = db_manager.executar_em_paralelo([
+            _consulta_fonte_alinea(ano_atual, exportar, limite),
+            _consulta_alinea_ug(ano_atual, exportar, limite)
+        ])
+        
+        # Inconsistências Fonte/Alínea
+        fonte_alinea = _resumir_inconsistencias(
+            docs_fa, ('cofonte', 'coalinea'), ano_atual, exportar, limite
+        )
         
-        # Buscar inconsistências Alínea 7 UG
-        alinea_ug = _verificar_alinea_ug(ano_atual)
+        # Inconsistências Alínea 7 UG
+        alinea_ug = _resumir_inconsistencias(
+            docs_ug, ('cougcontab', 'coug'), ano_atual, exportar, limite
+        )
         
         # Retornar ambas
         return jsonify({
@@ -729,177 +591,230 @@ def verificar_inconsistencias_alinea_ug():
         traceback.print_exc()
         return jsonify({'erro': str(e)}), 500
 
-def _verificar_fonte_alinea(ano_atual):
-    """Lógica interna para verificar inconsistências Fonte/Alínea"""
+def _parametros_exportacao():
+    """Lê o parâmetro 'exportar' da requisição e define o limite de documentos"""
     exportar = request.args.get('exportar', 'false') == 'true'
     limite = 10000 if exportar else 2000
-    
-    query = """
-    SELECT DISTINCT
-        rl.nudocumento,
-        rl.cougcontab,
-        rl.coug,
-        rl.coevento,
-        TRIM(CAST(rl.cofonte AS VARCHAR)) as cofonte,
-        TRIM(CAST(rl.coalinea AS VARCHAR)) as coalinea,
-        rl.dalancamento,
-        rl.valancamento,
-        rl.indebitocredito,
-        f.nofonte,
-        a.noalinea,
-        ug.noug,
-        ev.noevento
-    FROM receita_lancamento rl
-    LEFT JOIN dim_fonte f 
-        ON TRIM(CAST(rl.cofonte AS VARCHAR)) = TRIM(CAST(f.cofonte AS VARCHAR))
-    LEFT JOIN dim_receita_alinea a 
-        ON TRIM(CAST(rl.coalinea AS VARCHAR)) = TRIM(CAST(a.coalinea AS VARCHAR))
-    LEFT JOIN dim_unidade_gestora ug
-        ON TRIM(CAST(rl.cougcontab AS VARCHAR)) = TRIM(CAST(ug.coug AS VARCHAR))
-    LEFT JOIN dim_evento ev
-        ON TRIM(CAST(rl.coevento AS VARCHAR)) = TRIM(CAST(ev.coevento AS VARCHAR))
-    WHERE NOT EXISTS (
-        SELECT 1 
-        FROM dim_receita_fonte_conta_contabil drfc
-        WHERE TRIM(CAST(drfc.cofonte AS VARCHAR)) = TRIM(CAST(rl.cofonte AS VARCHAR))
-          AND TRIM(CAST(drfc.coalinea AS VARCHAR)) = TRIM(CAST(rl.coalinea AS VARCHAR))
-          AND drfc.instatus = 0
-    )
-    AND rl.cofonte IS NOT NULL
-    AND TRIM(CAST(rl.cofonte AS VARCHAR)) != ''
-    AND rl.coalinea IS NOT NULL
-    AND TRIM(CAST(rl.coalinea AS VARCHAR)) != ''
-    AND rl.coexercicio = ?
-    ORDER BY ABS(rl.valancamento) DESC
-    """
-    
-    if not exportar:
-        query += f" LIMIT {limite}"
-    
-    documentos = db_manager.execute_query(query, [ano_atual])
-    
-    # Calcular totais
-    total_documentos = len(documentos)
-    valor_total = sum(abs(doc['valancamento']) for doc in documentos)
-    
-    # Contar combinações únicas
-    combinacoes_unicas = set()
-    for doc in documentos:
-        combinacoes_unicas.add((doc['cofonte'], doc['coalinea']))
-    
-    # Query para contar total real
-    query_count = """
-    SELECT COUNT(DISTINCT nudocumento) as total
-    FROM receita_lancamento rl
-    WHERE NOT EXISTS (
-        SELECT 1 
-        FROM dim_receita_fonte_conta_contabil drfc
-        WHERE TRIM(CAST(drfc.cofonte AS VARCHAR)) = TRIM(CAST(rl.cofonte AS VARCHAR))
-          AND TRIM(CAST(drfc.coalinea AS VARCHAR)) = TRIM(CAST(rl.coalinea AS VARCHAR))
-          AND drfc.instatus = 0
+    return exportar, limite
+
+def _verificar_fonte_alinea(ano_atual):
+    """Lógica interna para verificar inconsistências Fonte/Alínea"""
+    exportar, limite = _parametros_exportacao()
+    query, params = _consulta_fonte_alinea(ano_atual, exportar, limite)
+    documentos = db_manager.execute_query(query, params)
+    return _resumir_inconsistencias(
+        documentos, ('cofonte', 'coalinea'), ano_atual, exportar, limite
     )
-    AND rl.cofonte IS NOT NULL
-    AND TRIM(CAST(rl.cofonte AS VARCHAR)) != ''
-    AND rl.coalinea IS NOT NULL
-    AND TRIM(CAST(rl.coalinea AS VARCHAR)) != ''
-    AND rl.coexercicio = ?
-    """
-    
-    count_result = db_manager.execute_query(query_count, [ano_atual])
-    total_sem_limite = count_result[0]['total'] if count_result else total_documentos
-    
-    return {
-        'documentos': documentos,
-        'totais': {
-            'total_documentos': total_sem_limite,
-            'total_exibido': len(documentos),
-            'total_combinacoes': len(combinacoes_unicas),
-            'valor_total': float(valor_total)
-        },
-        'filtros': {
-            'ano': ano_atual,
-            'limitado': not exportar and total_sem_limite > limite
-        },
-        'timestamp': datetime.now().isoformat()
-    }
 
 def _verificar_alinea_ug(ano_atual):
     """
     Lógica interna para verificar inconsistências de Alínea 7 com UG divergente
     Regra: Quando coalinea começa com 7, cougcontab deve ser igual a coug
     """
-    exportar = request.args.get('exportar', 'false') == 'true'
-    limite = 10000 if exportar else 2000
-    
-    query = """
-    SELECT DISTINCT
-        rl.nudocumento,
-        rl.cougcontab,
-        rl.coug,
-        rl.coevento,
-        TRIM(CAST(rl.cofonte AS VARCHAR)) as cofonte,
-        TRIM(CAST(rl.coalinea AS VARCHAR)) as coalinea,
-        rl.dalancamento,
-        rl.valancamento,
-        rl.indebitocredito,
-        f.nofonte,
-        a.noalinea,
-        ug1.noug as noug_contabil,
-        ug2.noug as noug_emitente,
-        ev.noevento
-    FROM receita_lancamento rl
-    LEFT JOIN dim_fonte f 
-        ON TRIM(CAST(rl.cofonte AS VARCHAR)) = TRIM(CAST(f.cofonte AS VARCHAR))
-    LEFT JOIN dim_receita_alinea a 
-        ON TRIM(CAST(rl.coalinea AS VARCHAR)) = TRIM(CAST(a.coalinea AS VARCHAR))
-    LEFT JOIN dim_unidade_gestora ug1
-        ON TRIM(CAST(rl.cougcontab AS VARCHAR)) = TRIM(CAST(ug1.coug AS VARCHAR))
-    LEFT JOIN dim_unidade_gestora ug2
-        ON TRIM(CAST(rl.coug AS VARCHAR)) = TRIM(CAST(ug2.coug AS VARCHAR))
-    LEFT JOIN dim_evento ev
-        ON TRIM(CAST(rl.coevento AS VARCHAR)) = TRIM(CAST(ev.coevento AS VARCHAR))
-    WHERE LEFT(TRIM(CAST(rl.coalinea AS VARCHAR)), 1) = '7'
-      AND CAST(rl.cougcontab AS VARCHAR) != CAST(rl.coug AS VARCHAR)
-      AND rl.coalinea IS NOT NULL
-      AND TRIM(CAST(rl.coalinea AS VARCHAR)) != ''
-      AND rl.coexercicio = ?
-    ORDER BY ABS(rl.valancamento) DESC
+    exportar, limite = _parametros_exportacao()
+    query, params = _consulta_alinea_ug(ano_atual, exportar, limite)
+    documentos = db_manager.execute_query(query, params)
+    return _resumir_inconsistencias(
+        documentos, ('cougcontab', 'coug'), ano_atual, exportar, limite
+    )
+
+def _paginar_inconsistencias(query_documentos, exportar, limite):
+    """
+    Envolve a consulta de documentos inconsistentes para devolver, na mesma
+    leitura, a página ordenada por valor e o total de documentos distintos
+    (equivalente ao COUNT(DISTINCT nudocumento) sem limite).
+    """
+    query = f"""
+    WITH inconsistencias AS (
+{query_documentos}
+    ),
+    numeradas AS (
+        SELECT 
+            i.*,
+            DENSE_RANK() OVER (ORDER BY i.nudocumento) as ordem_documento
+        FROM inconsistencias i
+    )
+    SELECT 
+        n.*,
+        MAX(CASE WHEN n.nudocumento IS NOT NULL THEN n.ordem_documento END) OVER () as total_documentos_distintos
+    FROM numeradas n
+    ORDER BY ABS(n.valancamento) DESC
     """
     
     if not exportar:
         query += f" LIMIT {limite}"
     
-    documentos = db_manager.execute_query(query, [ano_atual])
+    return query
+
+def _indice_inconsistencias_disponivel():
+    """
+    Verifica se a tabela receita_inconsistencia (gerada pelo ETL) existe.
+    O resultado positivo fica guardado; enquanto não existir, as regras são
+    calculadas direto sobre receita_lancamento.
+    """
+    global _indice_inconsistencias
+    if _indice_inconsistencias:
+        return True
     
-    # Calcular totais
-    total_documentos = len(documentos)
-    valor_total = sum(abs(doc['valancamento']) for doc in documentos)
+    if db_manager.is_duckdb:
+        query = """
+        SELECT table_name 
+        FROM information_schema.tables 
+        WHERE table_name = ?
+        """
+    else:  # PostgreSQL
+        query = """
+        SELECT table_name 
+        FROM information_schema.tables 
+        WHERE table_name = ?
+        AND table_schema = current_schema()
+        """
+    
+    _indice_inconsistencias = len(db_manager.execute_query(query, [TABELA_INCONSISTENCIAS])) > 0
+    return _indice_inconsistencias
+
+def _consulta_fonte_alinea(ano_atual, exportar, limite):
+    """Consulta (página + contagem) da regra Fonte/Alínea não cadastrada"""
+    return _paginar_inconsistencias(_documentos_fonte_alinea(), exportar, limite), [ano_atual]
+
+def _consulta_alinea_ug(ano_atual, exportar, limite):
+    """Consulta (página + contagem) da regra Alínea 7 com UG divergente"""
+    return _paginar_inconsistencias(_documentos_alinea_ug(), exportar, limite), [ano_atual]
+
+def _documentos_fonte_alinea():
+    """Documentos da regra Fonte/Alínea não cadastrada (parâmetro: ano)"""
+    if _indice_inconsistencias_disponivel():
+        return f"""
+        SELECT
+            nudocumento,
+            cougcontab,
+            coug,
+            coevento,
+            cofonte,
+            coalinea,
+            dalancamento,
+            valancamento,
+            indebitocredito,
+            nofonte,
+            noalinea,
+            noug_contabil as noug,
+            noevento
+        FROM {TABELA_INCONSISTENCIAS}
+        WHERE regra = 'FONTE_ALINEA'
+          AND coexercicio = ?"""
+    
+    # Sem o índice (ex.: PostgreSQL): anti-join direto sobre os lançamentos,
+    # com a mesma comparação como texto do pré-cálculo (CADASTRO_FONTE_ALINEA)
+    return f"""
+        SELECT DISTINCT
+            rl.nudocumento,
+            rl.cougcontab,
+            rl.coug,
+            rl.coevento,
+            TRIM(rl.cofonte) as cofonte,
+            TRIM(rl.coalinea) as coalinea,
+            rl.dalancamento,
+            rl.valancamento,
+            rl.indebitocredito,
+            f.nofonte,
+            a.noalinea,
+            ug.noug,
+            ev.noevento
+        FROM receita_lancamento rl
+        LEFT JOIN ({CADASTRO_FONTE_ALINEA}) drfc
+            ON drfc.cofonte = TRIM(rl.cofonte)
+            AND drfc.coalinea = TRIM(rl.coalinea)
+        LEFT JOIN dim_fonte f 
+            ON CAST(f.cofonte AS VARCHAR) = TRIM(rl.cofonte)
+        LEFT JOIN dim_receita_alinea a 
+            ON CAST(a.coalinea AS VARCHAR) = TRIM(rl.coalinea)
+        LEFT JOIN dim_unidade_gestora ug
+            ON ug.coug = rl.cougcontab
+        LEFT JOIN dim_evento ev
+            ON ev.coevento = rl.coevento
+        WHERE drfc.cofonte IS NULL
+        AND rl.cofonte IS NOT NULL
+        AND TRIM(rl.cofonte) != ''
+        AND rl.coalinea IS NOT NULL
+        AND TRIM(rl.coalinea) != ''
+        AND rl.coexercicio = ?"""
+
+def _documentos_alinea_ug():
+    """Documentos da regra Alínea 7 com UG divergente (parâmetro: ano)"""
+    if _indice_inconsistencias_disponivel():
+        return f"""
+        SELECT
+            nudocumento,
+            cougcontab,
+            coug,
+            coevento,
+            cofonte,
+            coalinea,
+            dalancamento,
+            valancamento,
+            indebitocredito,
+            nofonte,
+            noalinea,
+            noug_contabil,
+            noug_emitente,
+            noevento
+        FROM {TABELA_INCONSISTENCIAS}
+        WHERE regra = 'ALINEA_UG'
+          AND coexercicio = ?"""
     
-    # Contar UGs divergentes únicas
-    ugs_divergentes = set()
+    return """
+        SELECT DISTINCT
+            rl.nudocumento,
+            rl.cougcontab,
+            rl.coug,
+            rl.coevento,
+            TRIM(rl.cofonte) as cofonte,
+            TRIM(rl.coalinea) as coalinea,
+            rl.dalancamento,
+            rl.valancamento,
+            rl.indebitocredito,
+            f.nofonte,
+            a.noalinea,
+            ug1.noug as noug_contabil,
+            ug2.noug as noug_emitente,
+            ev.noevento
+        FROM receita_lancamento rl
+        LEFT JOIN dim_fonte f 
+            ON CAST(f.cofonte AS VARCHAR) = TRIM(rl.cofonte)
+        LEFT JOIN dim_receita_alinea a 
+            ON CAST(a.coalinea AS VARCHAR) = TRIM(rl.coalinea)
+        LEFT JOIN dim_unidade_gestora ug1
+            ON ug1.coug = rl.cougcontab
+        LEFT JOIN dim_unidade_gestora ug2
+            ON ug2.coug = rl.coug
+        LEFT JOIN dim_evento ev
+            ON ev.coevento = rl.coevento
+        WHERE LEFT(TRIM(rl.coalinea), 1) = '7'
+          AND rl.cougcontab != rl.coug
+          AND rl.coexercicio = ?"""
+
+def _resumir_inconsistencias(documentos, campos_combinacao, ano_atual, exportar, limite):
+    """Monta a resposta de uma regra de inconsistência a partir da consulta paginada"""
+    # Total real (sem limite) vem da própria consulta
+    total_sem_limite = int(documentos[0]['total_documentos_distintos'] or 0) if documentos else 0
     for doc in documentos:
-        ugs_divergentes.add((doc['cougcontab'], doc['coug']))
+        del doc['ordem_documento']
+        del doc['total_documentos_distintos']
     
-    # Query para contar total real
-    query_count = """
-    SELECT COUNT(DISTINCT nudocumento) as total
-    FROM receita_lancamento rl
-    WHERE LEFT(TRIM(CAST(rl.coalinea AS VARCHAR)), 1) = '7'
-      AND CAST(rl.cougcontab AS VARCHAR) != CAST(rl.coug AS VARCHAR)
-      AND rl.coalinea IS NOT NULL
-      AND TRIM(CAST(rl.coalinea AS VARCHAR)) != ''
-      AND rl.coexercicio = ?
-    """
+    # Calcular totais
+    valor_total = sum(abs(doc['valancamento']) for doc in documentos)
     
-    count_result = db_manager.execute_query(query_count, [ano_atual])
-    total_sem_limite = count_result[0]['total'] if count_result else total_documentos
+    # Contar combinações únicas (fonte/alínea ou UG contábil/UG emitente)
+    combinacoes_unicas = set()
+    for doc in documentos:
+        combinacoes_unicas.add(tuple(doc[campo] for campo in campos_combinacao))
     
     return {
         'documentos': documentos,
         'totais': {
             'total_documentos': total_sem_limite,
             'total_exibido': len(documentos),
-            'total_combinacoes': len(ugs_divergentes),
+            'total_combinacoes': len(combinacoes_unicas),
             'valor_total': float(valor_total)
         },
         'filtros': {
@@ -915,39 +830,24 @@ def get_estatisticas_inconsistencias():
     try:
         ano_atual = datetime.now().year
         
-        # Contar inconsistências Fonte/Alínea
-        query_fa = """
-        SELECT COUNT(DISTINCT CONCAT(TRIM(CAST(rl.cofonte AS VARCHAR)), '-', TRIM(CAST(rl.coalinea AS VARCHAR)))) as total
-        FROM receita_lancamento rl
-        WHERE NOT EXISTS (
-            SELECT 1 
-            FROM dim_receita_fonte_conta_contabil drfc
-            WHERE TRIM(CAST(drfc.cofonte AS VARCHAR)) = TRIM(CAST(rl.cofonte AS VARCHAR))
-              AND TRIM(CAST(drfc.coalinea AS VARCHAR)) = TRIM(CAST(rl.coalinea AS VARCHAR))
-              AND drfc.instatus = 0
-        )
-        AND rl.cofonte IS NOT NULL
-        AND TRIM(CAST(rl.cofonte AS VARCHAR)) != ''
-        AND rl.coalinea IS NOT NULL
-        AND TRIM(CAST(rl.coalinea AS VARCHAR)) != ''
-        AND rl.coexercicio = ?
+        # Contagens lidas da tabela pré-calculada (ou das regras, sem ela)
+        query_fa = f"""
+        SELECT COUNT(DISTINCT CONCAT(cofonte, '-', coalinea)) as total
+        FROM ({_documentos_fonte_alinea()}
+        ) docs
         """
         
-        result_fa = db_manager.execute_query(query_fa, [ano_atual])
-        total_fa = result_fa[0]['total'] if result_fa else 0
-        
-        # Contar inconsistências Alínea 7 UG
-        query_ug = """
+        query_ug = f"""
         SELECT COUNT(DISTINCT nudocumento) as total
-        FROM receita_lancamento rl
-        WHERE LEFT(TRIM(CAST(rl.coalinea AS VARCHAR)), 1) = '7'
-          AND CAST(rl.cougcontab AS VARCHAR) != CAST(rl.coug AS VARCHAR)
-          AND rl.coalinea IS NOT NULL
-          AND TRIM(CAST(rl.coalinea AS VARCHAR)) != ''
-          AND rl.coexercicio = ?
+        FROM ({_documentos_alinea_ug()}
+        ) docs
         """
         
-        result_ug = db_manager.execute_query(query_ug, [ano_atual])
+        result_fa, result_ug = db_manager.executar_em_paralelo([
+            (query_fa, [ano_atual]),
+            (query_ug, [ano_atual])
+        ])
+        total_fa = result_fa[0]['total'] if result_fa else 0
         total_ug = result_ug[0]['total'] if result_ug else 0
         
         return jsonify({
@@ -4,6 +4,7 @@ Adaptado para trabalhar com db_manager (DuckDB/PostgreSQL)
 """
 from flask import Blueprint, render_template, jsonify, request
 from app.db_manager import db_manager
+from app.modules.consultas import registrar_consulta
 from datetime import datetime
 import traceback
 
@@ -72,38 +73,43 @@ def gerar_relatorio():
         meses_bimestre = BIMESTRES[bimestre]['meses']
         meses_ate_bimestre = list(range(1, max(meses_bimestre) + 1))
         
-        # Buscar despesas correntes (exceto intra)
-        despesas_correntes_exceto = buscar_despesas_por_categoria(
-            ano, meses_bimestre, meses_ate_bimestre,
-            ['1', '2', '3'],  # Categorias de despesas correntes
-            excluir_intra=True
-        )
-        
-        # Buscar despesas de capital (exceto intra)
-        despesas_capital_exceto = buscar_despesas_por_categoria(
-            ano, meses_bimestre, meses_ate_bimestre,
-            ['4', '5', '6'],  # Categorias de despesas de capital
-            excluir_intra=True
-        )
-        
-        # Buscar despesas correntes intra-orçamentárias
-        despesas_correntes_intra = buscar_despesas_por_categoria(
-            ano, meses_bimestre, meses_ate_bimestre,
-            ['1', '2', '3'],  # Categorias de despesas correntes
-            apenas_intra=True
-        )
-        
-        # Buscar despesas de capital intra-orçamentárias
-        despesas_capital_intra = buscar_despesas_por_categoria(
-            ano, meses_bimestre, meses_ate_bimestre,
-            ['4', '5', '6'],  # Categorias de despesas de capital
-            apenas_intra=True
-        )
-        
-        # Buscar reserva de contingência (incategoria = 9)
-        reserva_contingencia = buscar_reserva_contingencia(
-            ano, meses_bimestre, meses_ate_bimestre
-        )
+        # Buscar grupos de despesa e reserva de contingência em paralelo
+        (
+            despesas_correntes_exceto,
+            despesas_capital_exceto,
+            despesas_correntes_intra,
+            despesas_capital_intra,
+            reserva_contingencia
+        ) = db_manager.executar_em_paralelo([
+            # Despesas correntes (exceto intra)
+            lambda: buscar_despesas_por_categoria(
+                ano, meses_bimestre, meses_ate_bimestre,
+                ['1', '2', '3'],  # Categorias de despesas correntes
+                excluir_intra=True
+            ),
+            # Despesas de capital (exceto intra)
+            lambda: buscar_despesas_por_categoria(
+                ano, meses_bimestre, meses_ate_bimestre,
+                ['4', '5', '6'],  # Categorias de despesas de capital
+                excluir_intra=True
+            ),
+            # Despesas correntes intra-orçamentárias
+            lambda: buscar_despesas_por_categoria(
+                ano, meses_bimestre, meses_ate_bimestre,
+                ['1', '2', '3'],  # Categorias de despesas correntes
+                apenas_intra=True
+            ),
+            # Despesas de capital intra-orçamentárias
+            lambda: buscar_despesas_por_categoria(
+                ano, meses_bimestre, meses_ate_bimestre,
+                ['4', '5', '6'],  # Categorias de despesas de capital
+                apenas_intra=True
+            ),
+            # Reserva de contingência (incategoria = 9)
+            lambda: buscar_reserva_contingencia(
+                ano, meses_bimestre, meses_ate_bimestre
+            )
+        ])
         
         # Calcular totais
         total_correntes_exceto = calcular_total_grupo(despesas_correntes_exceto)
@@ -178,192 +184,108 @@ def gerar_relatorio():
         traceback.print_exc()
         return jsonify({'erro': str(e)}), 500
 
+# Despesas por grupo no bimestre, com filtro opcional de modalidade
+CONSULTA_DESPESAS_CATEGORIA = registrar_consulta('rreo_despesa.despesas_categoria', """
+    WITH dados_agrupados AS (
+        SELECT 
+            cogrupo,
+            -- Dotação inicial (522110000 a 522119999)
+            SUM(CASE 
+                WHEN cocontacontabil >= '522110000' AND cocontacontabil <= '522119999' 
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as dotacao_inicial,
+
+            -- Dotação autorizada (inclui créditos suplementares)
+            SUM(CASE 
+                WHEN (
+                    (cocontacontabil >= '522110000' AND cocontacontabil <= '522119999') OR
+                    (cocontacontabil >= '522120000' AND cocontacontabil <= '522129999') OR
+                    (cocontacontabil >= '522150000' AND cocontacontabil <= '522159999') OR
+                    (cocontacontabil >= '522190000' AND cocontacontabil <= '522199999')
+                )
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as dotacao_autorizada,
+
+            -- Empenhado no bimestre (622130000 a 622139999)
+            SUM(CASE 
+                WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
+                AND {na_lista(inmes, :meses_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as empenhado_bimestre,
+
+            -- Empenhado até o bimestre (622130000 a 622139999)
+            SUM(CASE 
+                WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as empenhado_ate_bimestre,
+
+            -- Liquidado no bimestre
+            SUM(CASE 
+                WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
+                AND {na_lista(inmes, :meses_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as liquidado_bimestre,
+
+            -- Liquidado até o bimestre
+            SUM(CASE 
+                WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as liquidado_ate_bimestre,
+
+            -- Pago até o bimestre
+            SUM(CASE 
+                WHEN cocontacontabil = '622920104'
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as pago_ate_bimestre
+
+        FROM despesa_saldo
+        WHERE coexercicio = :ano
+        AND {na_lista(cogrupo, :grupos)}
+        [[ AND comodalidade != :modalidade_excluida ]]
+        [[ AND comodalidade = :modalidade_unica ]]
+        GROUP BY cogrupo
+    )
+    SELECT 
+        d.*,
+        COALESCE(g.nogrupo, 'Grupo ' || d.cogrupo) as nome_grupo
+    FROM dados_agrupados d
+    LEFT JOIN dim_grupo_despesa g ON d.cogrupo = CAST(g.cogrupo AS VARCHAR)
+    WHERE d.dotacao_inicial != 0 OR d.dotacao_autorizada != 0 
+          OR d.empenhado_bimestre != 0 OR d.empenhado_ate_bimestre != 0
+          OR d.liquidado_bimestre != 0 OR d.liquidado_ate_bimestre != 0
+          OR d.pago_ate_bimestre != 0
+    ORDER BY d.cogrupo
+""")
+
 def buscar_despesas_por_categoria(ano, meses_bimestre, meses_ate_bimestre, grupos, excluir_intra=False, apenas_intra=False):
     """Busca despesas por grupo com filtro de modalidade"""
     
-    # Converter listas para formato adequado
-    grupos_str = ','.join([f"'{g}'" for g in grupos])
-    meses_bimestre_str = ','.join([str(m) for m in meses_bimestre])
-    meses_ate_bimestre_str = ','.join([str(m) for m in meses_ate_bimestre])
-    
-    # Filtro de modalidade
-    filtro_modalidade = ""
-    if excluir_intra:
-        filtro_modalidade = "AND comodalidade != '91'"
-    elif apenas_intra:
-        filtro_modalidade = "AND comodalidade = '91'"
+    # Filtro de modalidade (None desativa o trecho correspondente na consulta)
+    modalidade_excluida = '91' if excluir_intra else None
+    modalidade_unica = '91' if apenas_intra and not excluir_intra else None
     
-    # Query adaptada para ambos os bancos
-    if db_manager.is_duckdb:
-        query = f"""
-        WITH dados_agrupados AS (
-            SELECT 
-                cogrupo,
-                -- Dotação inicial (522110000 a 522119999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '522110000' AND cocontacontabil <= '522119999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as dotacao_inicial,
-                
-                -- Dotação autorizada (inclui créditos suplementares)
-                SUM(CASE 
-                    WHEN (
-                        (cocontacontabil >= '522110000' AND cocontacontabil <= '522119999') OR
-                        (cocontacontabil >= '522120000' AND cocontacontabil <= '522129999') OR
-                        (cocontacontabil >= '522150000' AND cocontacontabil <= '522159999') OR
-                        (cocontacontabil >= '522190000' AND cocontacontabil <= '522199999')
-                    )
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as dotacao_autorizada,
-                
-                -- Empenhado no bimestre (622130000 a 622139999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
-                    AND inmes IN ({meses_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as empenhado_bimestre,
-                
-                -- Empenhado até o bimestre (622130000 a 622139999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as empenhado_ate_bimestre,
-                
-                -- Liquidado no bimestre
-                SUM(CASE 
-                    WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
-                    AND inmes IN ({meses_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as liquidado_bimestre,
-                
-                -- Liquidado até o bimestre
-                SUM(CASE 
-                    WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as liquidado_ate_bimestre,
-                
-                -- Pago até o bimestre
-                SUM(CASE 
-                    WHEN cocontacontabil = '622920104'
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as pago_ate_bimestre
-                
-            FROM despesa_saldo
-            WHERE coexercicio = ?
-            AND cogrupo IN ({grupos_str})
-            {filtro_modalidade}
-            GROUP BY cogrupo
-        )
-        SELECT 
-            d.*,
-            COALESCE(g.nogrupo, 'Grupo ' || d.cogrupo) as nome_grupo
-        FROM dados_agrupados d
-        LEFT JOIN dim_grupo_despesa g ON d.cogrupo = CAST(g.cogrupo AS VARCHAR)
-        WHERE d.dotacao_inicial != 0 OR d.dotacao_autorizada != 0 
-              OR d.empenhado_bimestre != 0 OR d.empenhado_ate_bimestre != 0
-              OR d.liquidado_bimestre != 0 OR d.liquidado_ate_bimestre != 0
-              OR d.pago_ate_bimestre != 0
-        ORDER BY d.cogrupo
-        """
-        params = [ano]
-    else:  # PostgreSQL
-        query = f"""
-        WITH dados_agrupados AS (
-            SELECT 
-                cogrupo,
-                -- Dotação inicial (522110000 a 522119999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '522110000' AND cocontacontabil <= '522119999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as dotacao_inicial,
-                
-                -- Dotação autorizada (inclui créditos suplementares)
-                SUM(CASE 
-                    WHEN (
-                        (cocontacontabil >= '522110000' AND cocontacontabil <= '522119999') OR
-                        (cocontacontabil >= '522120000' AND cocontacontabil <= '522129999') OR
-                        (cocontacontabil >= '522150000' AND cocontacontabil <= '522159999') OR
-                        (cocontacontabil >= '522190000' AND cocontacontabil <= '522199999')
-                    )
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as dotacao_autorizada,
-                
-                -- Empenhado no bimestre (622130000 a 622139999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
-                    AND inmes IN ({meses_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as empenhado_bimestre,
-                
-                -- Empenhado até o bimestre (622130000 a 622139999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as empenhado_ate_bimestre,
-                
-                -- Liquidado no bimestre
-                SUM(CASE 
-                    WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
-                    AND inmes IN ({meses_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as liquidado_bimestre,
-                
-                -- Liquidado até o bimestre
-                SUM(CASE 
-                    WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as liquidado_ate_bimestre,
-                
-                -- Pago até o bimestre
-                SUM(CASE 
-                    WHEN cocontacontabil = '622920104'
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as pago_ate_bimestre
-                
-            FROM despesa_saldo
-            WHERE coexercicio = :ano
-            AND cogrupo IN ({grupos_str})
-            {filtro_modalidade}
-            GROUP BY cogrupo
-        )
-        SELECT 
-            d.*,
-            COALESCE(g.nogrupo, 'Grupo ' || d.cogrupo) as nome_grupo
-        FROM dados_agrupados d
-        LEFT JOIN dim_grupo_despesa g ON d.cogrupo = CAST(g.cogrupo AS VARCHAR)
-        WHERE d.dotacao_inicial != 0 OR d.dotacao_autorizada != 0 
-              OR d.empenhado_bimestre != 0 OR d.empenhado_ate_bimestre != 0
-              OR d.liquidado_bimestre != 0 OR d.liquidado_ate_bimestre != 0
-              OR d.pago_ate_bimestre != 0
-        ORDER BY d.cogrupo
-        """
-        params = {'ano': ano}
+    params = {
+        'ano': ano,
+        'meses_bimestre': meses_bimestre,
+        'meses_ate_bimestre': meses_ate_bimestre,
+        'grupos': grupos,
+        'modalidade_excluida': modalidade_excluida,
+        'modalidade_unica': modalidade_unica
+    }
     
-    result = db_manager.execute_query(query, params)
+    result = db_manager.execute_query(CONSULTA_DESPESAS_CATEGORIA, params)
     
     # Organizar dados
     dados_organizados = {}
@@ -410,154 +332,86 @@ def calcular_total_grupo(grupo_dados):
     
     return total
 
+# Reserva de contingência (incategoria = 9)
+CONSULTA_RESERVA_CONTINGENCIA = registrar_consulta('rreo_despesa.reserva_contingencia', """
+    SELECT 
+        -- Dotação inicial (522110000 a 522119999)
+        SUM(CASE 
+            WHEN cocontacontabil >= '522110000' AND cocontacontabil <= '522119999' 
+            AND {na_lista(inmes, :meses_ate_bimestre)}
+            THEN saldo_contabil_despesa 
+            ELSE 0 
+        END) as dotacao_inicial,
+
+        -- Dotação autorizada (inclui créditos suplementares)
+        SUM(CASE 
+            WHEN (
+                (cocontacontabil >= '522110000' AND cocontacontabil <= '522119999') OR
+                (cocontacontabil >= '522120000' AND cocontacontabil <= '522129999') OR
+                (cocontacontabil >= '522150000' AND cocontacontabil <= '522159999') OR
+                (cocontacontabil >= '522190000' AND cocontacontabil <= '522199999')
+            )
+            AND {na_lista(inmes, :meses_ate_bimestre)}
+            THEN saldo_contabil_despesa 
+            ELSE 0 
+        END) as dotacao_autorizada,
+
+        -- Empenhado no bimestre (622130000 a 622139999)
+        SUM(CASE 
+            WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
+            AND {na_lista(inmes, :meses_bimestre)}
+            THEN saldo_contabil_despesa 
+            ELSE 0 
+        END) as empenhado_bimestre,
+
+        -- Empenhado até o bimestre (622130000 a 622139999)
+        SUM(CASE 
+            WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
+            AND {na_lista(inmes, :meses_ate_bimestre)}
+            THEN saldo_contabil_despesa 
+            ELSE 0 
+        END) as empenhado_ate_bimestre,
+
+        -- Liquidado no bimestre
+        SUM(CASE 
+            WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
+            AND {na_lista(inmes, :meses_bimestre)}
+            THEN saldo_contabil_despesa 
+            ELSE 0 
+        END) as liquidado_bimestre,
+
+        -- Liquidado até o bimestre
+        SUM(CASE 
+            WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
+            AND {na_lista(inmes, :meses_ate_bimestre)}
+            THEN saldo_contabil_despesa 
+            ELSE 0 
+        END) as liquidado_ate_bimestre,
+
+        -- Pago até o bimestre
+        SUM(CASE 
+            WHEN cocontacontabil = '622920104'
+            AND {na_lista(inmes, :meses_ate_bimestre)}
+            THEN saldo_contabil_despesa 
+            ELSE 0 
+        END) as pago_ate_bimestre
+
+    FROM despesa_saldo
+    WHERE coexercicio = :ano
+    AND incategoria = '9'
+    AND comodalidade != '91'
+""")
+
 def buscar_reserva_contingencia(ano, meses_bimestre, meses_ate_bimestre):
     """Busca reserva de contingência (incategoria = 9)"""
     
-    meses_bimestre_str = ','.join([str(m) for m in meses_bimestre])
-    meses_ate_bimestre_str = ','.join([str(m) for m in meses_ate_bimestre])
-    
-    if db_manager.is_duckdb:
-        query = f"""
-        SELECT 
-            -- Dotação inicial (522110000 a 522119999)
-            SUM(CASE 
-                WHEN cocontacontabil >= '522110000' AND cocontacontabil <= '522119999' 
-                AND inmes IN ({meses_ate_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as dotacao_inicial,
-            
-            -- Dotação autorizada (inclui créditos suplementares)
-            SUM(CASE 
-                WHEN (
-                    (cocontacontabil >= '522110000' AND cocontacontabil <= '522119999') OR
-                    (cocontacontabil >= '522120000' AND cocontacontabil <= '522129999') OR
-                    (cocontacontabil >= '522150000' AND cocontacontabil <= '522159999') OR
-                    (cocontacontabil >= '522190000' AND cocontacontabil <= '522199999')
-                )
-                AND inmes IN ({meses_ate_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as dotacao_autorizada,
-            
-            -- Empenhado no bimestre (622130000 a 622139999)
-            SUM(CASE 
-                WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
-                AND inmes IN ({meses_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as empenhado_bimestre,
-            
-            -- Empenhado até o bimestre (622130000 a 622139999)
-            SUM(CASE 
-                WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
-                AND inmes IN ({meses_ate_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as empenhado_ate_bimestre,
-            
-            -- Liquidado no bimestre
-            SUM(CASE 
-                WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
-                AND inmes IN ({meses_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as liquidado_bimestre,
-            
-            -- Liquidado até o bimestre
-            SUM(CASE 
-                WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
-                AND inmes IN ({meses_ate_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as liquidado_ate_bimestre,
-            
-            -- Pago até o bimestre
-            SUM(CASE 
-                WHEN cocontacontabil = '622920104'
-                AND inmes IN ({meses_ate_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as pago_ate_bimestre
-            
-        FROM despesa_saldo
-        WHERE coexercicio = ?
-        AND incategoria = '9'
-        AND comodalidade != '91'
-        """
-        params = [ano]
-    else:  # PostgreSQL
-        query = f"""
-        SELECT 
-            -- Dotação inicial (522110000 a 522119999)
-            SUM(CASE 
-                WHEN cocontacontabil >= '522110000' AND cocontacontabil <= '522119999' 
-                AND inmes IN ({meses_ate_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as dotacao_inicial,
-            
-            -- Dotação autorizada (inclui créditos suplementares)
-            SUM(CASE 
-                WHEN (
-                    (cocontacontabil >= '522110000' AND cocontacontabil <= '522119999') OR
-                    (cocontacontabil >= '522120000' AND cocontacontabil <= '522129999') OR
-                    (cocontacontabil >= '522150000' AND cocontacontabil <= '522159999') OR
-                    (cocontacontabil >= '522190000' AND cocontacontabil <= '522199999')
-                )
-                AND inmes IN ({meses_ate_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as dotacao_autorizada,
-            
-            -- Empenhado no bimestre (622130000 a 622139999)
-            SUM(CASE 
-                WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
-                AND inmes IN ({meses_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as empenhado_bimestre,
-            
-            -- Empenhado até o bimestre (622130000 a 622139999)
-            SUM(CASE 
-                WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
-                AND inmes IN ({meses_ate_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as empenhado_ate_bimestre,
-            
-            -- Liquidado no bimestre
-            SUM(CASE 
-                WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
-                AND inmes IN ({meses_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as liquidado_bimestre,
-            
-            -- Liquidado até o bimestre
-            SUM(CASE 
-                WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
-                AND inmes IN ({meses_ate_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as liquidado_ate_bimestre,
-            
-            -- Pago até o bimestre
-            SUM(CASE 
-                WHEN cocontacontabil = '622920104'
-                AND inmes IN ({meses_ate_bimestre_str})
-                THEN saldo_contabil_despesa 
-                ELSE 0 
-            END) as pago_ate_bimestre
-            
-        FROM despesa_saldo
-        WHERE coexercicio = :ano
-        AND incategoria = '9'
-        AND comodalidade != '91'
-        """
-        params = {'ano': ano}
+    params = {
+        'ano': ano,
+        'meses_bimestre': meses_bimestre,
+        'meses_ate_bimestre': meses_ate_bimestre
+    }
     
-    result = db_manager.execute_query(query, params)
+    result = db_manager.execute_query(CONSULTA_RESERVA_CONTINGENCIA, params)
     
     if result and len(result) > 0:
         row = result[0]
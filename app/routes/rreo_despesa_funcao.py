@@ -4,6 +4,7 @@ Adaptado para trabalhar com db_manager (DuckDB/PostgreSQL)
 """
 from flask import Blueprint, render_template, jsonify, request
 from app.db_manager import db_manager
+from app.modules.consultas import registrar_consulta
 from datetime import datetime
 import traceback
 
@@ -72,17 +73,17 @@ def gerar_relatorio():
         meses_bimestre = BIMESTRES[bimestre]['meses']
         meses_ate_bimestre = list(range(1, max(meses_bimestre) + 1))
         
-        # Buscar despesas por função (exceto intra)
-        despesas_funcao_exceto = buscar_despesas_por_funcao(
-            ano, meses_bimestre, meses_ate_bimestre,
-            excluir_intra=True
-        )
-        
-        # Buscar despesas por função (intra-orçamentárias)
-        despesas_funcao_intra = buscar_despesas_por_funcao(
-            ano, meses_bimestre, meses_ate_bimestre,
-            apenas_intra=True
-        )
+        # Buscar despesas por função (exceto intra e intra-orçamentárias) em paralelo
+        despesas_funcao_exceto, despesas_funcao_intra = db_manager.executar_em_paralelo([
+            lambda: buscar_despesas_por_funcao(
+                ano, meses_bimestre, meses_ate_bimestre,
+                excluir_intra=True
+            ),
+            lambda: buscar_despesas_por_funcao(
+                ano, meses_bimestre, meses_ate_bimestre,
+                apenas_intra=True
+            )
+        ])
         
         # Calcular totais
         total_exceto_intra = calcular_total_geral(despesas_funcao_exceto)
@@ -133,195 +134,109 @@ def gerar_relatorio():
         traceback.print_exc()
         return jsonify({'erro': str(e)}), 500
 
+# Despesas por função e subfunção, com filtro opcional de modalidade
+CONSULTA_DESPESAS_FUNCAO = registrar_consulta('rreo_despesa_funcao.despesas_funcao', """
+    WITH dados_agrupados AS (
+        SELECT 
+            cofuncao,
+            cosubfuncao,
+            -- Dotação inicial (522110000 a 522119999)
+            SUM(CASE 
+                WHEN cocontacontabil >= '522110000' AND cocontacontabil <= '522119999' 
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as dotacao_inicial,
+
+            -- Dotação autorizada (inclui créditos suplementares)
+            SUM(CASE 
+                WHEN (
+                    (cocontacontabil >= '522110000' AND cocontacontabil <= '522119999') OR
+                    (cocontacontabil >= '522120000' AND cocontacontabil <= '522129999') OR
+                    (cocontacontabil >= '522150000' AND cocontacontabil <= '522159999') OR
+                    (cocontacontabil >= '522190000' AND cocontacontabil <= '522199999')
+                )
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as dotacao_autorizada,
+
+            -- Empenhado no bimestre (622130000 a 622139999)
+            SUM(CASE 
+                WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
+                AND {na_lista(inmes, :meses_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as empenhado_bimestre,
+
+            -- Empenhado até o bimestre (622130000 a 622139999)
+            SUM(CASE 
+                WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as empenhado_ate_bimestre,
+
+            -- Liquidado no bimestre
+            SUM(CASE 
+                WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
+                AND {na_lista(inmes, :meses_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as liquidado_bimestre,
+
+            -- Liquidado até o bimestre
+            SUM(CASE 
+                WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as liquidado_ate_bimestre,
+
+            -- Pago até o bimestre
+            SUM(CASE 
+                WHEN cocontacontabil = '622920104'
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_despesa 
+                ELSE 0 
+            END) as pago_ate_bimestre
+
+        FROM despesa_saldo
+        WHERE coexercicio = :ano
+        [[ AND comodalidade != :modalidade_excluida ]]
+        [[ AND comodalidade = :modalidade_unica ]]
+        GROUP BY cofuncao, cosubfuncao
+    )
+    SELECT 
+        d.*,
+        COALESCE(f.nofuncao, 'Função ' || d.cofuncao) as nome_funcao,
+        COALESCE(s.nosubfuncao, 'Subfunção ' || d.cosubfuncao) as nome_subfuncao
+    FROM dados_agrupados d
+    LEFT JOIN dim_funcao f ON CAST(d.cofuncao AS INTEGER) = f.cofuncao
+    LEFT JOIN dim_subfuncao s ON CAST(d.cosubfuncao AS INTEGER) = s.cosubfuncao
+    WHERE d.dotacao_inicial != 0 OR d.dotacao_autorizada != 0 
+          OR d.empenhado_bimestre != 0 OR d.empenhado_ate_bimestre != 0
+          OR d.liquidado_bimestre != 0 OR d.liquidado_ate_bimestre != 0
+          OR d.pago_ate_bimestre != 0
+    ORDER BY d.cofuncao, d.cosubfuncao
+""")
+
 def buscar_despesas_por_funcao(ano, meses_bimestre, meses_ate_bimestre, excluir_intra=False, apenas_intra=False):
     """Busca despesas agrupadas por função e subfunção"""
     
-    # Converter listas para formato adequado
-    meses_bimestre_str = ','.join([str(m) for m in meses_bimestre])
-    meses_ate_bimestre_str = ','.join([str(m) for m in meses_ate_bimestre])
+    # Filtro de modalidade (None desativa o trecho correspondente na consulta)
+    modalidade_excluida = '91' if excluir_intra else None
+    modalidade_unica = '91' if apenas_intra and not excluir_intra else None
     
-    # Filtro de modalidade
-    filtro_modalidade = ""
-    if excluir_intra:
-        filtro_modalidade = "AND comodalidade != '91'"
-    elif apenas_intra:
-        filtro_modalidade = "AND comodalidade = '91'"
-    
-    # Query adaptada para ambos os bancos
-    if db_manager.is_duckdb:
-        query = f"""
-        WITH dados_agrupados AS (
-            SELECT 
-                cofuncao,
-                cosubfuncao,
-                -- Dotação inicial (522110000 a 522119999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '522110000' AND cocontacontabil <= '522119999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as dotacao_inicial,
-                
-                -- Dotação autorizada (inclui créditos suplementares)
-                SUM(CASE 
-                    WHEN (
-                        (cocontacontabil >= '522110000' AND cocontacontabil <= '522119999') OR
-                        (cocontacontabil >= '522120000' AND cocontacontabil <= '522129999') OR
-                        (cocontacontabil >= '522150000' AND cocontacontabil <= '522159999') OR
-                        (cocontacontabil >= '522190000' AND cocontacontabil <= '522199999')
-                    )
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as dotacao_autorizada,
-                
-                -- Empenhado no bimestre (622130000 a 622139999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
-                    AND inmes IN ({meses_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as empenhado_bimestre,
-                
-                -- Empenhado até o bimestre (622130000 a 622139999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as empenhado_ate_bimestre,
-                
-                -- Liquidado no bimestre
-                SUM(CASE 
-                    WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
-                    AND inmes IN ({meses_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as liquidado_bimestre,
-                
-                -- Liquidado até o bimestre
-                SUM(CASE 
-                    WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as liquidado_ate_bimestre,
-                
-                -- Pago até o bimestre
-                SUM(CASE 
-                    WHEN cocontacontabil = '622920104'
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as pago_ate_bimestre
-                
-            FROM despesa_saldo
-            WHERE coexercicio = ?
-            {filtro_modalidade}
-            GROUP BY cofuncao, cosubfuncao
-        )
-        SELECT 
-            d.*,
-            COALESCE(f.nofuncao, 'Função ' || d.cofuncao) as nome_funcao,
-            COALESCE(s.nosubfuncao, 'Subfunção ' || d.cosubfuncao) as nome_subfuncao
-        FROM dados_agrupados d
-        LEFT JOIN dim_funcao f ON CAST(d.cofuncao AS INTEGER) = f.cofuncao
-        LEFT JOIN dim_subfuncao s ON CAST(d.cosubfuncao AS INTEGER) = s.cosubfuncao
-        WHERE d.dotacao_inicial != 0 OR d.dotacao_autorizada != 0 
-              OR d.empenhado_bimestre != 0 OR d.empenhado_ate_bimestre != 0
-              OR d.liquidado_bimestre != 0 OR d.liquidado_ate_bimestre != 0
-              OR d.pago_ate_bimestre != 0
-        ORDER BY d.cofuncao, d.cosubfuncao
-        """
-        params = [ano]
-    else:  # PostgreSQL
-        query = f"""
-        WITH dados_agrupados AS (
-            SELECT 
-                cofuncao,
-                cosubfuncao,
-                -- Dotação inicial (522110000 a 522119999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '522110000' AND cocontacontabil <= '522119999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as dotacao_inicial,
-                
-                -- Dotação autorizada (inclui créditos suplementares)
-                SUM(CASE 
-                    WHEN (
-                        (cocontacontabil >= '522110000' AND cocontacontabil <= '522119999') OR
-                        (cocontacontabil >= '522120000' AND cocontacontabil <= '522129999') OR
-                        (cocontacontabil >= '522150000' AND cocontacontabil <= '522159999') OR
-                        (cocontacontabil >= '522190000' AND cocontacontabil <= '522199999')
-                    )
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as dotacao_autorizada,
-                
-                -- Empenhado no bimestre (622130000 a 622139999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
-                    AND inmes IN ({meses_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as empenhado_bimestre,
-                
-                -- Empenhado até o bimestre (622130000 a 622139999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '622130000' AND cocontacontabil <= '622139999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as empenhado_ate_bimestre,
-                
-                -- Liquidado no bimestre
-                SUM(CASE 
-                    WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
-                    AND inmes IN ({meses_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as liquidado_bimestre,
-                
-                -- Liquidado até o bimestre
-                SUM(CASE 
-                    WHEN cocontacontabil IN ('622130300', '622130400', '622130700')
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as liquidado_ate_bimestre,
-                
-                -- Pago até o bimestre
-                SUM(CASE 
-                    WHEN cocontacontabil = '622920104'
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_despesa 
-                    ELSE 0 
-                END) as pago_ate_bimestre
-                
-            FROM despesa_saldo
-            WHERE coexercicio = :ano
-            {filtro_modalidade}
-            GROUP BY cofuncao, cosubfuncao
-        )
-        SELECT 
-            d.*,
-            COALESCE(f.nofuncao, 'Função ' || d.cofuncao) as nome_funcao,
-            COALESCE(s.nosubfuncao, 'Subfunção ' || d.cosubfuncao) as nome_subfuncao
-        FROM dados_agrupados d
-        LEFT JOIN dim_funcao f ON CAST(d.cofuncao AS INTEGER) = f.cofuncao
-        LEFT JOIN dim_subfuncao s ON CAST(d.cosubfuncao AS INTEGER) = s.cosubfuncao
-        WHERE d.dotacao_inicial != 0 OR d.dotacao_autorizada != 0 
-              OR d.empenhado_bimestre != 0 OR d.empenhado_ate_bimestre != 0
-              OR d.liquidado_bimestre != 0 OR d.liquidado_ate_bimestre != 0
-              OR d.pago_ate_bimestre != 0
-        ORDER BY d.cofuncao, d.cosubfuncao
-        """
-        params = {'ano': ano}
+    params = {
+        'ano': ano,
+        'meses_bimestre': meses_bimestre,
+        'meses_ate_bimestre': meses_ate_bimestre,
+        'modalidade_excluida': modalidade_excluida,
+        'modalidade_unica': modalidade_unica
+    }
     
-    result = db_manager.execute_query(query, params)
+    result = db_manager.execute_query(CONSULTA_DESPESAS_FUNCAO, params)
     
     # Organizar dados hierarquicamente por função e subfunção
     dados_organizados = {}
@@ -4,6 +4,7 @@ Adaptado para trabalhar com db_manager (DuckDB/PostgreSQL)
 """
 from flask import Blueprint, render_template, jsonify, request
 from app.db_manager import db_manager
+from app.modules.consultas import registrar_consulta
 from datetime import datetime
 import traceback
 
@@ -72,34 +73,40 @@ def gerar_relatorio():
         meses_bimestre = BIMESTRES[bimestre]['meses']
         meses_ate_bimestre = list(range(1, max(meses_bimestre) + 1))
         
-        # Buscar dados de receitas correntes (exceto intra)
-        receitas_correntes = buscar_receitas_por_categoria(
-            ano, meses_bimestre, meses_ate_bimestre,
-            ['11', '12', '13', '14', '15', '16', '17', '18', '19']
-        )
-        
-        # Buscar dados de receitas de capital (exceto intra)
-        receitas_capital = buscar_receitas_por_categoria(
-            ano, meses_bimestre, meses_ate_bimestre,
-            ['21', '22', '23', '24', '25', '26', '27', '28', '29']
-        )
-        
-        # Buscar dados de receitas intra-orçamentárias correntes
-        receitas_intra_correntes = buscar_receitas_por_categoria(
-            ano, meses_bimestre, meses_ate_bimestre,
-            ['71', '72', '73', '74', '75', '76', '77', '78', '79']
-        )
-        
-        # Buscar dados de receitas intra-orçamentárias de capital
-        receitas_intra_capital = buscar_receitas_por_categoria(
-            ano, meses_bimestre, meses_ate_bimestre,
-            ['81', '82', '83', '84', '85', '86', '87', '88', '89']
-        )
-        
-        # Buscar saldos de exercícios anteriores
-        saldos_exercicios_anteriores = buscar_saldos_exercicios_anteriores(
-            ano, meses_bimestre, meses_ate_bimestre
-        )
+        # Buscar as categorias de receita e os saldos de exercícios anteriores
+        # em paralelo (consultas independentes)
+        (
+            receitas_correntes,
+            receitas_capital,
+            receitas_intra_correntes,
+            receitas_intra_capital,
+            saldos_exercicios_anteriores
+        ) = db_manager.executar_em_paralelo([
+            # Receitas correntes (exceto intra)
+            lambda: buscar_receitas_por_categoria(
+                ano, meses_bimestre, meses_ate_bimestre,
+                ['11', '12', '13', '14', '15', '16', '17', '18', '19']
+            ),
+            # Receitas de capital (exceto intra)
+            lambda: buscar_receitas_por_categoria(
+                ano, meses_bimestre, meses_ate_bimestre,
+                ['21', '22', '23', '24', '25', '26', '27', '28', '29']
+            ),
+            # Receitas intra-orçamentárias correntes
+            lambda: buscar_receitas_por_categoria(
+                ano, meses_bimestre, meses_ate_bimestre,
+                ['71', '72', '73', '74', '75', '76', '77', '78', '79']
+            ),
+            # Receitas intra-orçamentárias de capital
+            lambda: buscar_receitas_por_categoria(
+                ano, meses_bimestre, meses_ate_bimestre,
+                ['81', '82', '83', '84', '85', '86', '87', '88', '89']
+            ),
+            # Saldos de exercícios anteriores
+            lambda: buscar_saldos_exercicios_anteriores(
+                ano, meses_bimestre, meses_ate_bimestre
+            )
+        ])
         
         # Calcular totais
         total_correntes = calcular_total_categoria(receitas_correntes)
@@ -170,132 +177,75 @@ def gerar_relatorio():
         traceback.print_exc()
         return jsonify({'erro': str(e)}), 500
 
+# Receitas por fonte/subfonte no bimestre (valores consolidados)
+CONSULTA_RECEITAS_CATEGORIA = registrar_consulta('rreo_receita.receitas_categoria', """
+    WITH dados_agrupados AS (
+        SELECT 
+            cofontereceita,
+            cosubfontereceita,
+            -- Previsão inicial (521100000 a 521199999)
+            SUM(CASE 
+                WHEN cocontacontabil >= '521100000' AND cocontacontabil <= '521199999' 
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_receita 
+                ELSE 0 
+            END) as previsao_inicial,
+
+            -- Previsão atualizada (521100000 a 521299999)
+            SUM(CASE 
+                WHEN cocontacontabil >= '521100000' AND cocontacontabil <= '521299999' 
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_receita 
+                ELSE 0 
+            END) as previsao_atualizada,
+
+            -- Realizado no bimestre (621200000 a 621399999)
+            SUM(CASE 
+                WHEN cocontacontabil >= '621200000' AND cocontacontabil <= '621399999' 
+                AND {na_lista(inmes, :meses_bimestre)}
+                THEN saldo_contabil_receita 
+                ELSE 0 
+            END) as realizado_bimestre,
+
+            -- Realizado até o bimestre (621200000 a 621399999)
+            SUM(CASE 
+                WHEN cocontacontabil >= '621200000' AND cocontacontabil <= '621399999' 
+                AND {na_lista(inmes, :meses_ate_bimestre)}
+                THEN saldo_contabil_receita 
+                ELSE 0 
+            END) as realizado_ate_bimestre
+
+        FROM receita_saldo
+        WHERE coexercicio = :ano
+        AND {na_lista(cofontereceita, :codigos_fonte)}
+        GROUP BY cofontereceita, cosubfontereceita
+    ),
+    dados_com_nomes AS (
+        SELECT 
+            d.*,
+            COALESCE(f.nofontereceita, 'Fonte ' || d.cofontereceita) as nome_fonte,
+            COALESCE(sf.nosubfontereceita, 'Subfonte ' || d.cosubfontereceita) as nome_subfonte
+        FROM dados_agrupados d
+        LEFT JOIN dim_receita_origem f ON d.cofontereceita = CAST(f.cofontereceita AS VARCHAR)
+        LEFT JOIN dim_receita_especie sf ON d.cosubfontereceita = CAST(sf.cosubfontereceita AS VARCHAR)
+    )
+    SELECT * FROM dados_com_nomes
+    WHERE previsao_inicial != 0 OR previsao_atualizada != 0 
+          OR realizado_bimestre != 0 OR realizado_ate_bimestre != 0
+    ORDER BY cofontereceita, cosubfontereceita
+""")
+
 def buscar_receitas_por_categoria(ano, meses_bimestre, meses_ate_bimestre, codigos_fonte):
     """Busca receitas por categoria (correntes, capital ou intra) - valores consolidados"""
     
-    # Converter listas para formato adequado
-    codigos_str = ','.join([f"'{c}'" for c in codigos_fonte])
-    meses_bimestre_str = ','.join([str(m) for m in meses_bimestre])
-    meses_ate_bimestre_str = ','.join([str(m) for m in meses_ate_bimestre])
-    
-    if db_manager.is_duckdb:
-        query = f"""
-        WITH dados_agrupados AS (
-            SELECT 
-                cofontereceita,
-                cosubfontereceita,
-                -- Previsão inicial (521100000 a 521199999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '521100000' AND cocontacontabil <= '521199999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as previsao_inicial,
-                
-                -- Previsão atualizada (521100000 a 521299999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '521100000' AND cocontacontabil <= '521299999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as previsao_atualizada,
-                
-                -- Realizado no bimestre (621200000 a 621399999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '621200000' AND cocontacontabil <= '621399999' 
-                    AND inmes IN ({meses_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as realizado_bimestre,
-                
-                -- Realizado até o bimestre (621200000 a 621399999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '621200000' AND cocontacontabil <= '621399999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as realizado_ate_bimestre
-                
-            FROM receita_saldo
-            WHERE coexercicio = ?
-            AND cofontereceita IN ({codigos_str})
-            GROUP BY cofontereceita, cosubfontereceita
-        ),
-        dados_com_nomes AS (
-            SELECT 
-                d.*,
-                COALESCE(f.nofontereceita, 'Fonte ' || d.cofontereceita) as nome_fonte,
-                COALESCE(sf.nosubfontereceita, 'Subfonte ' || d.cosubfontereceita) as nome_subfonte
-            FROM dados_agrupados d
-            LEFT JOIN dim_receita_origem f ON d.cofontereceita = CAST(f.cofontereceita AS VARCHAR)
-            LEFT JOIN dim_receita_especie sf ON d.cosubfontereceita = CAST(sf.cosubfontereceita AS VARCHAR)
-        )
-        SELECT * FROM dados_com_nomes
-        WHERE previsao_inicial != 0 OR previsao_atualizada != 0 
-              OR realizado_bimestre != 0 OR realizado_ate_bimestre != 0
-        ORDER BY cofontereceita, cosubfontereceita
-        """
-        params = [ano]
-    else:  # PostgreSQL
-        query = f"""
-        WITH dados_agrupados AS (
-            SELECT 
-                cofontereceita,
-                cosubfontereceita,
-                -- Previsão inicial (521100000 a 521199999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '521100000' AND cocontacontabil <= '521199999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as previsao_inicial,
-                
-                -- Previsão atualizada (521100000 a 521299999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '521100000' AND cocontacontabil <= '521299999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as previsao_atualizada,
-                
-                -- Realizado no bimestre (621200000 a 621399999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '621200000' AND cocontacontabil <= '621399999' 
-                    AND inmes IN ({meses_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as realizado_bimestre,
-                
-                -- Realizado até o bimestre (621200000 a 621399999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '621200000' AND cocontacontabil <= '621399999' 
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as realizado_ate_bimestre
-                
-            FROM receita_saldo
-            WHERE coexercicio = :ano
-            AND cofontereceita IN ({codigos_str})
-            GROUP BY cofontereceita, cosubfontereceita
-        ),
-        dados_com_nomes AS (
-            SELECT 
-                d.*,
-                COALESCE(f.nofontereceita, 'Fonte ' || d.cofontereceita) as nome_fonte,
-                COALESCE(sf.nosubfontereceita, 'Subfonte ' || d.cosubfontereceita) as nome_subfonte
-            FROM dados_agrupados d
-            LEFT JOIN dim_receita_origem f ON d.cofontereceita = CAST(f.cofontereceita AS VARCHAR)
-            LEFT JOIN dim_receita_especie sf ON d.cosubfontereceita = CAST(sf.cosubfontereceita AS VARCHAR)
-        )
-        SELECT * FROM dados_com_nomes
-        WHERE previsao_inicial != 0 OR previsao_atualizada != 0 
-              OR realizado_bimestre != 0 OR realizado_ate_bimestre != 0
-        ORDER BY cofontereceita, cosubfontereceita
-        """
-        params = {'ano': ano}
+    params = {
+        'ano': ano,
+        'meses_bimestre': meses_bimestre,
+        'meses_ate_bimestre': meses_ate_bimestre,
+        'codigos_fonte': codigos_fonte
+    }
     
-    result = db_manager.execute_query(query, params)
+    result = db_manager.execute_query(CONSULTA_RECEITAS_CATEGORIA, params)
     
     # Organizar dados hierarquicamente
     dados_organizados = {}
@@ -363,12 +313,67 @@ def somar_totais(total1, total2):
         'realizado_ate_bimestre': total1.get('realizado_ate_bimestre', 0) + total2.get('realizado_ate_bimestre', 0)
     }
 
+# Recursos arrecadados em exercícios anteriores - RPPS
+CONSULTA_RECURSOS_RPPS = registrar_consulta('rreo_receita.recursos_rpps', """
+    SELECT 
+        -- Previsão inicial (521100000 a 521199999)
+        SUM(CASE 
+            WHEN cocontacontabil >= '521100000' AND cocontacontabil <= '521199999' 
+            AND cocontacorrente LIKE '99%'
+            AND {na_lista(inmes, :meses_ate_bimestre)}
+            THEN saldo_contabil_receita 
+            ELSE 0 
+        END) as previsao_inicial,
+
+        -- Previsão atualizada (521100000 a 521299999)
+        SUM(CASE 
+            WHEN cocontacontabil >= '521100000' AND cocontacontabil <= '521299999' 
+            AND cocontacorrente LIKE '99%'
+            AND {na_lista(inmes, :meses_ate_bimestre)}
+            THEN saldo_contabil_receita 
+            ELSE 0 
+        END) as previsao_atualizada,
+
+        -- Realizado no bimestre (621200000 a 621399999)
+        SUM(CASE 
+            WHEN cocontacontabil >= '621200000' AND cocontacontabil <= '621399999' 
+            AND cocontacorrente LIKE '99%'
+            AND {na_lista(inmes, :meses_bimestre)}
+            THEN saldo_contabil_receita 
+            ELSE 0 
+        END) as realizado_bimestre,
+
+        -- Realizado até o bimestre (621200000 a 621399999)
+        SUM(CASE 
+            WHEN cocontacontabil >= '621200000' AND cocontacontabil <= '621399999' 
+            AND cocontacorrente LIKE '99%'
+            AND {na_lista(inmes, :meses_ate_bimestre)}
+            THEN saldo_contabil_receita 
+            ELSE 0 
+        END) as realizado_ate_bimestre
+
+    FROM receita_saldo
+    WHERE coexercicio = :ano
+""")
+
+# Superávit financeiro utilizado para créditos adicionais
+CONSULTA_SUPERAVIT = registrar_consulta('rreo_receita.superavit', """
+    SELECT 
+        -- Superávit só tem previsão atualizada e realizado até o bimestre
+        SUM(CASE 
+            WHEN cocontacontabil >= '522130100' AND cocontacontabil <= '522130199' 
+            AND {na_lista(inmes, :meses_ate_bimestre)}
+            THEN saldo_contabil_receita 
+            ELSE 0 
+        END) as valor_superavit
+
+    FROM receita_saldo
+    WHERE coexercicio = :ano
+""")
+
 def buscar_saldos_exercicios_anteriores(ano, meses_bimestre, meses_ate_bimestre):
     """Busca os saldos de exercícios anteriores"""
     
-    meses_bimestre_str = ','.join([str(m) for m in meses_bimestre])
-    meses_ate_bimestre_str = ','.join([str(m) for m in meses_ate_bimestre])
-    
     # Primeiro verificar se existe a coluna cocontacorrente
     if db_manager.is_duckdb:
         check_column = """
@@ -402,95 +407,14 @@ def buscar_saldos_exercicios_anteriores(ano, meses_bimestre, meses_ate_bimestre)
         }
     else:
         # 1. Recursos Arrecadados em Exercícios Anteriores - RPPS
-        if db_manager.is_duckdb:
-            query_rpps = f"""
-            SELECT 
-                -- Previsão inicial (521100000 a 521199999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '521100000' AND cocontacontabil <= '521199999' 
-                    AND cocontacorrente LIKE '99%'
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as previsao_inicial,
-                
-                -- Previsão atualizada (521100000 a 521299999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '521100000' AND cocontacontabil <= '521299999' 
-                    AND cocontacorrente LIKE '99%'
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as previsao_atualizada,
-                
-                -- Realizado no bimestre (621200000 a 621399999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '621200000' AND cocontacontabil <= '621399999' 
-                    AND cocontacorrente LIKE '99%'
-                    AND inmes IN ({meses_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as realizado_bimestre,
-                
-                -- Realizado até o bimestre (621200000 a 621399999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '621200000' AND cocontacontabil <= '621399999' 
-                    AND cocontacorrente LIKE '99%'
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as realizado_ate_bimestre
-                
-            FROM receita_saldo
-            WHERE coexercicio = ?
-            """
-            params_rpps = [ano]
-        else:  # PostgreSQL
-            query_rpps = f"""
-            SELECT 
-                -- Previsão inicial (521100000 a 521199999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '521100000' AND cocontacontabil <= '521199999' 
-                    AND cocontacorrente LIKE '99%'
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as previsao_inicial,
-                
-                -- Previsão atualizada (521100000 a 521299999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '521100000' AND cocontacontabil <= '521299999' 
-                    AND cocontacorrente LIKE '99%'
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as previsao_atualizada,
-                
-                -- Realizado no bimestre (621200000 a 621399999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '621200000' AND cocontacontabil <= '621399999' 
-                    AND cocontacorrente LIKE '99%'
-                    AND inmes IN ({meses_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as realizado_bimestre,
-                
-                -- Realizado até o bimestre (621200000 a 621399999)
-                SUM(CASE 
-                    WHEN cocontacontabil >= '621200000' AND cocontacontabil <= '621399999' 
-                    AND cocontacorrente LIKE '99%'
-                    AND inmes IN ({meses_ate_bimestre_str})
-                    THEN saldo_contabil_receita 
-                    ELSE 0 
-                END) as realizado_ate_bimestre
-                
-            FROM receita_saldo
-            WHERE coexercicio = :ano
-            """
-            params_rpps = {'ano': ano}
+        params_rpps = {
+            'ano': ano,
+            'meses_bimestre': meses_bimestre,
+            'meses_ate_bimestre': meses_ate_bimestre
+        }
         
         print(f"Executando query RPPS...")
-        result_rpps = db_manager.execute_query(query_rpps, params_rpps)
+        result_rpps = db_manager.execute_query(CONSULTA_RECURSOS_RPPS, params_rpps)
         print(f"Resultado RPPS: {result_rpps}")
         
         if result_rpps and len(result_rpps) > 0:
@@ -510,39 +434,13 @@ def buscar_saldos_exercicios_anteriores(ano, meses_bimestre, meses_ate_bimestre)
             }
     
     # 2. Superávit Financeiro Utilizado para Créditos Adicionais
-    if db_manager.is_duckdb:
-        query_superavit = f"""
-        SELECT 
-            -- Superávit só tem previsão atualizada e realizado até o bimestre
-            SUM(CASE 
-                WHEN cocontacontabil >= '522130100' AND cocontacontabil <= '522130199' 
-                AND inmes IN ({meses_ate_bimestre_str})
-                THEN saldo_contabil_receita 
-                ELSE 0 
-            END) as valor_superavit
-            
-        FROM receita_saldo
-        WHERE coexercicio = ?
-        """
-        params_superavit = [ano]
-    else:  # PostgreSQL
-        query_superavit = f"""
-        SELECT 
-            -- Superávit só tem previsão atualizada e realizado até o bimestre
-            SUM(CASE 
-                WHEN cocontacontabil >= '522130100' AND cocontacontabil <= '522130199' 
-                AND inmes IN ({meses_ate_bimestre_str})
-                THEN saldo_contabil_receita 
-                ELSE 0 
-            END) as valor_superavit
-            
-        FROM receita_saldo
-        WHERE coexercicio = :ano
-        """
-        params_superavit = {'ano': ano}
+    params_superavit = {
+        'ano': ano,
+        'meses_ate_bimestre': meses_ate_bimestre
+    }
     
     print(f"Executando query Superávit...")
-    result_superavit = db_manager.execute_query(query_superavit, params_superavit)
+    result_superavit = db_manager.execute_query(CONSULTA_SUPERAVIT, params_superavit)
     print(f"Resultado Superávit: {result_superavit}")
     
     valor_superavit = 0
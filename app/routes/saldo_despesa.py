@@ -4,11 +4,116 @@ Adaptado para trabalhar com db_manager (DuckDB/PostgreSQL)
 """
 from flask import Blueprint, render_template, jsonify, request
 from app.db_manager import db_manager
+from app.modules.consultas import registrar_consulta
+from app.modules.formato_colunar import formatar_linhas
+from app.modules.datatables import ler_requisicao_datatables
 import traceback
 
 # Criar blueprint
 saldo_despesa = Blueprint('saldo_despesa', __name__)
 
+# Consultas declaradas uma única vez (compiladas para DuckDB e PostgreSQL)
+CONSULTA_CONTAS = registrar_consulta('saldo_despesa.contas', """
+    SELECT DISTINCT cocontacontabil
+    FROM despesa_saldo
+    WHERE coexercicio = :ano
+    ORDER BY cocontacontabil
+""")
+
+CONSULTA_UGS = registrar_consulta('saldo_despesa.ugs', """
+    SELECT DISTINCT coug
+    FROM despesa_saldo
+    WHERE coexercicio = :ano AND cocontacontabil = :conta
+    ORDER BY coug
+""")
+
+# Consolidado: agrupa por mês
+CONSULTA_DADOS_CONSOLIDADO = registrar_consulta('saldo_despesa.dados_consolidado', """
+    SELECT 
+        inmes,
+        'CONSOLIDADO' as cocontacorrente,
+        SUM(saldo_contabil_despesa) as saldo_contabil_despesa,
+        -- Para consolidado, campos individuais ficam nulos
+        NULL as conatureza,
+        NULL as cofonte,
+        NULL as inesfera,
+        NULL as couo,
+        NULL as cofuncao,
+        NULL as cosubfuncao,
+        NULL as coprograma,
+        NULL as coprojeto,
+        NULL as cosubtitulo,
+        -- Campos derivados também nulos
+        NULL as cogrupo,
+        NULL as comodalidade,
+        NULL as coelemento,
+        NULL as cosubelemento,
+        0 as tamanho_conta
+    FROM despesa_saldo
+    WHERE coexercicio = :ano AND cocontacontabil = :conta
+    GROUP BY inmes
+    ORDER BY inmes
+""")
+
+# UG específica
+CONSULTA_DADOS_UG = registrar_consulta('saldo_despesa.dados_ug', """
+    SELECT 
+        inmes,
+        cocontacorrente,
+        saldo_contabil_despesa,
+        -- Campos principais
+        conatureza,
+        cofonte,
+        inesfera,
+        couo,
+        cofuncao,
+        cosubfuncao,
+        coprograma,
+        coprojeto,
+        cosubtitulo,
+        -- Campos derivados de conatureza
+        cogrupo,
+        comodalidade,
+        coelemento,
+        cosubelemento,
+        -- Tamanho da conta para determinar quais campos mostrar
+        LENGTH(TRIM(cocontacorrente)) as tamanho_conta
+    FROM despesa_saldo
+    WHERE coexercicio = :ano AND cocontacontabil = :conta AND coug = :ug
+    ORDER BY inmes, conatureza, cofonte
+""")
+
+# Colunas da grade server-side (DataTables): nome -> (ordenação, busca).
+# As consultas acima servem de base; o ORDER BY interno é substituído pelo externo.
+# Campos parseados da conta corrente (baixa cardinalidade), codificados por
+# índice no formato colunar
+DICIONARIO_COLUNAR = (
+    'conatureza', 'cofonte', 'inesfera', 'couo', 'cofuncao', 'cosubfuncao',
+    'coprograma', 'coprojeto', 'cosubtitulo', 'cogrupo', 'comodalidade',
+    'coelemento', 'cosubelemento',
+)
+
+COLUNAS_GRADE = {
+    'inmes': ('inmes', None),
+    'cocontacorrente': ('cocontacorrente', 'cocontacorrente'),
+    'saldo_contabil_despesa': ('saldo_contabil_despesa', 'saldo_contabil_despesa'),
+    'conatureza': ('conatureza', 'conatureza'),
+    'cofonte': ('cofonte', 'cofonte'),
+    'inesfera': ('inesfera', 'inesfera'),
+    'couo': ('couo', 'couo'),
+    'cofuncao': ('cofuncao', 'cofuncao'),
+    'cosubfuncao': ('cosubfuncao', 'cosubfuncao'),
+    'coprograma': ('coprograma', 'coprograma'),
+    'coprojeto': ('coprojeto', 'coprojeto'),
+    'cosubtitulo': ('cosubtitulo', 'cosubtitulo'),
+    'cogrupo': ('cogrupo', 'cogrupo'),
+    'comodalidade': ('comodalidade', 'comodalidade'),
+    'coelemento': ('coelemento', 'coelemento'),
+    'cosubelemento': ('cosubelemento', 'cosubelemento'),
+}
+
+ORDEM_GRADE = [('inmes', 'ASC'), ('conatureza', 'ASC'), ('cofonte', 'ASC'), ('cocontacorrente', 'ASC')]
+
 @saldo_despesa.route('/consulta')
 def consulta():
     """Página de consulta de saldo de despesa"""
@@ -54,25 +159,7 @@ def get_contas_por_ano():
         except ValueError:
             return jsonify({'erro': 'Ano deve ser numérico'}), 400
         
-        # Adaptar query para ambos os bancos
-        if db_manager.is_duckdb:
-            contas_query = """
-            SELECT DISTINCT cocontacontabil
-            FROM despesa_saldo
-            WHERE coexercicio = ?
-            ORDER BY cocontacontabil
-            """
-            params = [int(ano)]
-        else:
-            contas_query = """
-            SELECT DISTINCT cocontacontabil
-            FROM despesa_saldo
-            WHERE coexercicio = :ano
-            ORDER BY cocontacontabil
-            """
-            params = {'ano': int(ano)}
-        
-        contas_result = db_manager.execute_query(contas_query, params)
+        contas_result = db_manager.execute_query(CONSULTA_CONTAS, {'ano': int(ano)})
         contas = [row['cocontacontabil'] for row in contas_result]
         
         return jsonify({
@@ -100,25 +187,7 @@ def get_ugs_por_ano_conta():
         except ValueError:
             return jsonify({'erro': 'Ano deve ser numérico'}), 400
         
-        # Adaptar query para ambos os bancos
-        if db_manager.is_duckdb:
-            ugs_query = """
-            SELECT DISTINCT coug
-            FROM despesa_saldo
-            WHERE coexercicio = ? AND cocontacontabil = ?
-            ORDER BY coug
-            """
-            params = [int(ano), conta]
-        else:
-            ugs_query = """
-            SELECT DISTINCT coug
-            FROM despesa_saldo
-            WHERE coexercicio = :ano AND cocontacontabil = :conta
-            ORDER BY coug
-            """
-            params = {'ano': int(ano), 'conta': conta}
-        
-        ugs_result = db_manager.execute_query(ugs_query, params)
+        ugs_result = db_manager.execute_query(CONSULTA_UGS, {'ano': int(ano), 'conta': conta})
         ugs = [row['coug'] for row in ugs_result]
         
         return jsonify({
@@ -143,123 +212,29 @@ def get_dados():
         if not all([ano, conta, ug]):
             return jsonify({'erro': 'Parâmetros obrigatórios: ano, conta, ug'}), 400
         
-        # Montar query base adaptada para ambos os bancos
         if ug == 'CONSOLIDADO':
             # Se for consolidado, agrupa por mês
-            if db_manager.is_duckdb:
-                query = """
-                SELECT 
-                    inmes,
-                    'CONSOLIDADO' as cocontacorrente,
-                    SUM(saldo_contabil_despesa) as saldo_contabil_despesa,
-                    -- Para consolidado, campos individuais ficam nulos
-                    NULL as conatureza,
-                    NULL as cofonte,
-                    NULL as inesfera,
-                    NULL as couo,
-                    NULL as cofuncao,
-                    NULL as cosubfuncao,
-                    NULL as coprograma,
-                    NULL as coprojeto,
-                    NULL as cosubtitulo,
-                    -- Campos derivados também nulos
-                    NULL as cogrupo,
-                    NULL as comodalidade,
-                    NULL as coelemento,
-                    NULL as cosubelemento,
-                    0 as tamanho_conta
-                FROM despesa_saldo
-                WHERE coexercicio = ? AND cocontacontabil = ?
-                GROUP BY inmes
-                ORDER BY inmes
-                """
-                params = [int(ano), conta]
-            else:  # PostgreSQL
-                query = """
-                SELECT 
-                    inmes,
-                    'CONSOLIDADO' as cocontacorrente,
-                    SUM(saldo_contabil_despesa) as saldo_contabil_despesa,
-                    -- Para consolidado, campos individuais ficam nulos
-                    NULL as conatureza,
-                    NULL as cofonte,
-                    NULL as inesfera,
-                    NULL as couo,
-                    NULL as cofuncao,
-                    NULL as cosubfuncao,
-                    NULL as coprograma,
-                    NULL as coprojeto,
-                    NULL as cosubtitulo,
-                    -- Campos derivados também nulos
-                    NULL as cogrupo,
-                    NULL as comodalidade,
-                    NULL as coelemento,
-                    NULL as cosubelemento,
-                    0 as tamanho_conta
-                FROM despesa_saldo
-                WHERE coexercicio = :ano AND cocontacontabil = :conta
-                GROUP BY inmes
-                ORDER BY inmes
-                """
-                params = {'ano': int(ano), 'conta': conta}
+            query = CONSULTA_DADOS_CONSOLIDADO
         else:
             # Query normal com UG específica
-            if db_manager.is_duckdb:
-                query = """
-                SELECT 
-                    inmes,
-                    cocontacorrente,
-                    saldo_contabil_despesa,
-                    -- Campos principais
-                    conatureza,
-                    cofonte,
-                    inesfera,
-                    couo,
-                    cofuncao,
-                    cosubfuncao,
-                    coprograma,
-                    coprojeto,
-                    cosubtitulo,
-                    -- Campos derivados de conatureza
-                    cogrupo,
-                    comodalidade,
-                    coelemento,
-                    cosubelemento,
-                    -- Tamanho da conta para determinar quais campos mostrar
-                    LENGTH(TRIM(cocontacorrente)) as tamanho_conta
-                FROM despesa_saldo
-                WHERE coexercicio = ? AND cocontacontabil = ? AND coug = ?
-                ORDER BY inmes, conatureza, cofonte
-                """
-                params = [int(ano), conta, ug]
-            else:  # PostgreSQL
-                query = """
-                SELECT 
-                    inmes,
-                    cocontacorrente,
-                    saldo_contabil_despesa,
-                    -- Campos principais
-                    conatureza,
-                    cofonte,
-                    inesfera,
-                    couo,
-                    cofuncao,
-                    cosubfuncao,
-                    coprograma,
-                    coprojeto,
-                    cosubtitulo,
-                    -- Campos derivados de conatureza
-                    cogrupo,
-                    comodalidade,
-                    coelemento,
-                    cosubelemento,
-                    -- Tamanho da conta para determinar quais campos mostrar
-                    LENGTH(TRIM(cocontacorrente)) as tamanho_conta
-                FROM despesa_saldo
-                WHERE coexercicio = :ano AND cocontacontabil = :conta AND coug = :ug
-                ORDER BY inmes, conatureza, cofonte
-                """
-                params = {'ano': int(ano), 'conta': conta, 'ug': ug}
+            query = CONSULTA_DADOS_UG
+        params = {'ano': int(ano), 'conta': conta, 'ug': ug}
+        
+        # Grade server-side: só a página pedida pelo DataTables sai do banco
+        requisicao = ler_requisicao_datatables(request.args, COLUNAS_GRADE)
+        if requisicao:
+            resposta = db_manager.executar_pagina(
+                query, params, requisicao, COLUNAS_GRADE, ORDEM_GRADE
+            )
+            for dado in resposta['data']:
+                if dado['saldo_contabil_despesa'] is not None:
+                    dado['saldo_contabil_despesa'] = float(dado['saldo_contabil_despesa'])
+                if dado['inmes'] is not None:
+                    dado['inmes'] = int(dado['inmes'])
+                if dado['tamanho_conta'] is not None:
+                    dado['tamanho_conta'] = int(dado['tamanho_conta'])
+            resposta['data'] = formatar_linhas(resposta['data'], request.args, DICIONARIO_COLUNAR)
+            return jsonify(resposta)
         
         # Executar query
         dados = db_manager.execute_query(query, params)
@@ -279,7 +254,7 @@ def get_dados():
         print(f"   Filtros: ano={ano}, conta={conta}, ug={ug}")
         
         return jsonify({
-            'dados': dados,
+            'dados': formatar_linhas(dados, request.args, DICIONARIO_COLUNAR),
             'total': len(dados),
             'fonte': 'DuckDB Local' if db_manager.is_duckdb else 'PostgreSQL'
         })
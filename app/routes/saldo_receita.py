@@ -4,11 +4,137 @@ Adaptado para trabalhar com db_manager (DuckDB/PostgreSQL)
 """
 from flask import Blueprint, render_template, jsonify, request
 from app.db_manager import db_manager
+from app.modules.consultas import registrar_consulta
+from app.modules.formato_colunar import formatar_linhas
+from app.modules.datatables import ler_requisicao_datatables
 import traceback
 
 # Criar blueprint
 saldo_receita = Blueprint('saldo_receita', __name__)
 
+# Consultas declaradas uma única vez (compiladas para DuckDB e PostgreSQL)
+CONSULTA_CONTAS = registrar_consulta('saldo_receita.contas', """
+    SELECT DISTINCT cocontacontabil
+    FROM receita_saldo
+    WHERE coexercicio = :ano
+    ORDER BY cocontacontabil
+""")
+
+CONSULTA_UGS = registrar_consulta('saldo_receita.ugs', """
+    SELECT DISTINCT coug
+    FROM receita_saldo
+    WHERE coexercicio = :ano AND cocontacontabil = :conta
+    ORDER BY coug
+""")
+
+# Consolidado: agrupa por mês
+CONSULTA_DADOS_CONSOLIDADO = registrar_consulta('saldo_receita.dados_consolidado', """
+    SELECT 
+        inmes,
+        'CONSOLIDADO' as cocontacorrente,
+        MAX(intipoadm) as intipoadm,
+        SUM(saldo_contabil_receita) as saldo_contabil_receita,
+        -- Campos que serão NULL no consolidado
+        NULL as coclasseorc,
+        NULL as cofonte,
+        NULL as cocategoriareceita,
+        NULL as cofontereceita,
+        NULL as cosubfontereceita,
+        NULL as corubrica,
+        NULL as coalinea,
+        NULL as inesfera,
+        NULL as couo,
+        NULL as cofuncao,
+        NULL as cosubfuncao,
+        NULL as coprograma,
+        NULL as coprojeto,
+        NULL as cosubtitulo,
+        NULL as conatureza,
+        NULL as incategoria,
+        NULL as cogrupo,
+        NULL as comodalidade,
+        NULL as coelemento,
+        0 as tamanho_conta
+    FROM receita_saldo
+    WHERE coexercicio = :ano AND cocontacontabil = :conta
+    GROUP BY inmes
+    ORDER BY inmes
+""")
+
+# UG específica
+CONSULTA_DADOS_UG = registrar_consulta('saldo_receita.dados_ug', """
+    SELECT 
+        inmes,
+        cocontacorrente,
+        intipoadm,
+        saldo_contabil_receita,
+        -- Campos de 17 chars
+        coclasseorc,
+        cofonte,
+        cocategoriareceita,
+        cofontereceita,
+        cosubfontereceita,
+        corubrica,
+        coalinea,
+        -- Campos de 38 chars
+        inesfera,
+        couo,
+        cofuncao,
+        cosubfuncao,
+        coprograma,
+        coprojeto,
+        cosubtitulo,
+        conatureza,
+        incategoria,
+        cogrupo,
+        comodalidade,
+        coelemento,
+        -- Tamanho da conta para determinar quais campos mostrar
+        LENGTH(TRIM(cocontacorrente)) as tamanho_conta
+    FROM receita_saldo
+    WHERE coexercicio = :ano AND cocontacontabil = :conta AND coug = :ug
+    ORDER BY inmes, cocontacorrente
+""")
+
+# Colunas da grade server-side (DataTables): nome -> (ordenação, busca).
+# As consultas acima servem de base; o ORDER BY interno é substituído pelo externo.
+# Campos parseados da conta corrente (baixa cardinalidade), codificados por
+# índice no formato colunar
+DICIONARIO_COLUNAR = (
+    'intipoadm', 'coclasseorc', 'cofonte', 'cocategoriareceita', 'cofontereceita',
+    'cosubfontereceita', 'corubrica', 'coalinea', 'inesfera', 'couo', 'cofuncao',
+    'cosubfuncao', 'coprograma', 'coprojeto', 'cosubtitulo', 'conatureza',
+    'incategoria', 'cogrupo', 'comodalidade', 'coelemento', 'cosubelemento',
+)
+
+COLUNAS_GRADE = {
+    'inmes': ('inmes', None),
+    'cocontacorrente': ('cocontacorrente', 'cocontacorrente'),
+    'intipoadm': ('intipoadm', 'intipoadm'),
+    'saldo_contabil_receita': ('saldo_contabil_receita', 'saldo_contabil_receita'),
+    'coclasseorc': ('coclasseorc', 'coclasseorc'),
+    'cofonte': ('cofonte', 'cofonte'),
+    'cocategoriareceita': ('cocategoriareceita', 'cocategoriareceita'),
+    'cofontereceita': ('cofontereceita', 'cofontereceita'),
+    'cosubfontereceita': ('cosubfontereceita', 'cosubfontereceita'),
+    'corubrica': ('corubrica', 'corubrica'),
+    'coalinea': ('coalinea', 'coalinea'),
+    'inesfera': ('inesfera', 'inesfera'),
+    'couo': ('couo', 'couo'),
+    'cofuncao': ('cofuncao', 'cofuncao'),
+    'cosubfuncao': ('cosubfuncao', 'cosubfuncao'),
+    'coprograma': ('coprograma', 'coprograma'),
+    'coprojeto': ('coprojeto', 'coprojeto'),
+    'cosubtitulo': ('cosubtitulo', 'cosubtitulo'),
+    'conatureza': ('conatureza', 'conatureza'),
+    'incategoria': ('incategoria', 'incategoria'),
+    'cogrupo': ('cogrupo', 'cogrupo'),
+    'comodalidade': ('comodalidade', 'comodalidade'),
+    'coelemento': ('coelemento', 'coelemento'),
+}
+
+ORDEM_GRADE = [('inmes', 'ASC'), ('cocontacorrente', 'ASC')]
+
 @saldo_receita.route('/consulta')
 def consulta():
     """Página de consulta de saldo de receita"""
@@ -54,25 +180,7 @@ def get_contas_por_ano():
         except ValueError:
             return jsonify({'erro': 'Ano deve ser numérico'}), 400
         
-        # Adaptar query para ambos os bancos
-        if db_manager.is_duckdb:
-            contas_query = """
-            SELECT DISTINCT cocontacontabil
-            FROM receita_saldo
-            WHERE coexercicio = ?
-            ORDER BY cocontacontabil
-            """
-            params = [int(ano)]
-        else:
-            contas_query = """
-            SELECT DISTINCT cocontacontabil
-            FROM receita_saldo
-            WHERE coexercicio = :ano
-            ORDER BY cocontacontabil
-            """
-            params = {'ano': int(ano)}
-        
-        contas_result = db_manager.execute_query(contas_query, params)
+        contas_result = db_manager.execute_query(CONSULTA_CONTAS, {'ano': int(ano)})
         contas = [row['cocontacontabil'] for row in contas_result]
         
         return jsonify({
@@ -100,25 +208,7 @@ def get_ugs_por_ano_conta():
         except ValueError:
             return jsonify({'erro': 'Ano deve ser numérico'}), 400
         
-        # Adaptar query para ambos os bancos
-        if db_manager.is_duckdb:
-            ugs_query = """
-            SELECT DISTINCT coug
-            FROM receita_saldo
-            WHERE coexercicio = ? AND cocontacontabil = ?
-            ORDER BY coug
-            """
-            params = [int(ano), conta]
-        else:
-            ugs_query = """
-            SELECT DISTINCT coug
-            FROM receita_saldo
-            WHERE coexercicio = :ano AND cocontacontabil = :conta
-            ORDER BY coug
-            """
-            params = {'ano': int(ano), 'conta': conta}
-        
-        ugs_result = db_manager.execute_query(ugs_query, params)
+        ugs_result = db_manager.execute_query(CONSULTA_UGS, {'ano': int(ano), 'conta': conta})
         ugs = [row['coug'] for row in ugs_result]
         
         return jsonify({
@@ -143,171 +233,32 @@ def get_dados():
         if not all([ano, conta, ug]):
             return jsonify({'erro': 'Parâmetros obrigatórios: ano, conta, ug'}), 400
         
-        # Montar query base adaptada para ambos os bancos
         if ug == 'CONSOLIDADO':
             # Se for consolidado, agrupa por mês
-            if db_manager.is_duckdb:
-                query = """
-                SELECT 
-                    inmes,
-                    'CONSOLIDADO' as cocontacorrente,
-                    MAX(intipoadm) as intipoadm,
-                    SUM(saldo_contabil_receita) as saldo_contabil_receita,
-                    -- Campos que serão NULL no consolidado
-                    NULL as coclasseorc,
-                    NULL as cofonte,
-                    NULL as cocategoriareceita,
-                    NULL as cofontereceita,
-                    NULL as cosubfontereceita,
-                    NULL as corubrica,
-                    NULL as coalinea,
-                    NULL as inesfera,
-                    NULL as couo,
-                    NULL as cofuncao,
-                    NULL as cosubfuncao,
-                    NULL as coprograma,
-                    NULL as coprojeto,
-                    NULL as cosubtitulo,
-                    NULL as conatureza,
-                    NULL as incategoria,
-                    NULL as cogrupo,
-                    NULL as comodalidade,
-                    NULL as coelemento,
-                    0 as tamanho_conta
-                FROM receita_saldo
-                WHERE coexercicio = ? AND cocontacontabil = ?
-                GROUP BY inmes
-                ORDER BY inmes
-                """
-                params = [int(ano), conta]
-            else:  # PostgreSQL
-                query = """
-                SELECT 
-                    inmes,
-                    'CONSOLIDADO' as cocontacorrente,
-                    MAX(intipoadm) as intipoadm,
-                    SUM(saldo_contabil_receita) as saldo_contabil_receita,
-                    -- Campos que serão NULL no consolidado
-                    NULL as coclasseorc,
-                    NULL as cofonte,
-                    NULL as cocategoriareceita,
-                    NULL as cofontereceita,
-                    NULL as cosubfontereceita,
-                    NULL as corubrica,
-                    NULL as coalinea,
-                    NULL as inesfera,
-                    NULL as couo,
-                    NULL as cofuncao,
-                    NULL as cosubfuncao,
-                    NULL as coprograma,
-                    NULL as coprojeto,
-                    NULL as cosubtitulo,
-                    NULL as conatureza,
-                    NULL as incategoria,
-                    NULL as cogrupo,
-                    NULL as comodalidade,
-                    NULL as coelemento,
-                    0 as tamanho_conta
-                FROM receita_saldo
-                WHERE coexercicio = :ano AND cocontacontabil = :conta
-                GROUP BY inmes
-                ORDER BY inmes
-                """
-                params = {'ano': int(ano), 'conta': conta}
+            query = CONSULTA_DADOS_CONSOLIDADO
         else:
             # Query normal com UG específica
-            if db_manager.is_duckdb:
-                query = """
-                SELECT 
-                    inmes,
-                    cocontacorrente,
-                    intipoadm,
-                    saldo_contabil_receita,
-                    -- Campos de 17 chars
-                    coclasseorc,
-                    cofonte,
-                    cocategoriareceita,
-                    cofontereceita,
-                    cosubfontereceita,
-                    corubrica,
-                    coalinea,
-                    -- Campos de 38 chars
-                    inesfera,
-                    couo,
-                    cofuncao,
-                    cosubfuncao,
-                    coprograma,
-                    coprojeto,
-                    cosubtitulo,
-                    conatureza,
-                    incategoria,
-                    cogrupo,
-                    comodalidade,
-                    coelemento,
-                    -- Tamanho da conta para determinar quais campos mostrar
-                    LENGTH(TRIM(cocontacorrente)) as tamanho_conta
-                FROM receita_saldo
-                WHERE coexercicio = ? AND cocontacontabil = ? AND coug = ?
-                ORDER BY inmes, cocontacorrente
-                """
-                params = [int(ano), conta, ug]
-            else:  # PostgreSQL
-                query = """
-                SELECT 
-                    inmes,
-                    cocontacorrente,
-                    intipoadm,
-                    saldo_contabil_receita,
-                    -- Campos de 17 chars
-                    coclasseorc,
-                    cofonte,
-                    cocategoriareceita,
-                    cofontereceita,
-                    cosubfontereceita,
-                    corubrica,
-                    coalinea,
-                    -- Campos de 38 chars
-                    inesfera,
-                    couo,
-                    cofuncao,
-                    cosubfuncao,
-                    coprograma,
-                    coprojeto,
-                    cosubtitulo,
-                    conatureza,
-                    incategoria,
-                    cogrupo,
-                    comodalidade,
-                    coelemento,
-                    -- Tamanho da conta para determinar quais campos mostrar
-                    LENGTH(TRIM(cocontacorrente)) as tamanho_conta
-                FROM receita_saldo
-                WHERE coexercicio = :ano AND cocontacontabil = :conta AND coug = :ug
-                ORDER BY inmes, cocontacorrente
-                """
-                params = {'ano': int(ano), 'conta': conta, 'ug': ug}
+            query = CONSULTA_DADOS_UG
+        params = {'ano': int(ano), 'conta': conta, 'ug': ug}
         
-        # Executar query
-        dados = db_manager.execute_query(query, params)
+        # Grade server-side: só a página pedida pelo DataTables sai do banco
+        requisicao = ler_requisicao_datatables(request.args, COLUNAS_GRADE)
+        if requisicao:
+            resposta = db_manager.executar_pagina(
+                query, params, requisicao, COLUNAS_GRADE, ORDEM_GRADE
+            )
+            resposta['data'] = formatar_linhas(resposta['data'], request.args, DICIONARIO_COLUNAR)
+            return jsonify(resposta)
         
-        # Processar dados para garantir tipos corretos
-        for dado in dados:
-            # Converter valores numéricos
-            if 'saldo_contabil_receita' in dado and dado['saldo_contabil_receita'] is not None:
-                dado['saldo_contabil_receita'] = float(dado['saldo_contabil_receita'])
-            if 'inmes' in dado and dado['inmes'] is not None:
-                dado['inmes'] = int(dado['inmes'])
-            if 'intipoadm' in dado and dado['intipoadm'] is not None:
-                dado['intipoadm'] = int(dado['intipoadm'])
-            if 'tamanho_conta' in dado and dado['tamanho_conta'] is not None:
-                dado['tamanho_conta'] = int(dado['tamanho_conta'])
+        # Executar query (Decimal e inteiros do NumPy são convertidos pelo app.json)
+        dados = db_manager.execute_query(query, params)
         
         # Log temporário para debug
         print(f"🔍 Consulta retornou {len(dados)} registros")
         print(f"   Filtros: ano={ano}, conta={conta}, ug={ug}")
         
         return jsonify({
-            'dados': dados,
+            'dados': formatar_linhas(dados, request.args, DICIONARIO_COLUNAR),
             'total': len(dados),
             'fonte': 'DuckDB Local' if db_manager.is_duckdb else 'PostgreSQL'
         })
@@ -60,7 +60,7 @@ class ApiBalancoReceita {
         return $.ajax({
             url: this.endpoints.LANCAMENTOS,
             method: 'GET',
-            data: parametros,
+            data: $.extend({}, parametros, { format: 'columnar' }),
             error: (xhr) => {
                 console.error('❌ Erro ao carregar lançamentos:', xhr);
                 let mensagemErro = 'Erro ao carregar lançamentos';
@@ -69,6 +69,9 @@ class ApiBalancoReceita {
                 }
                 throw new Error(mensagemErro);
             }
+        }).then((response) => {
+            response.lancamentos = decodificarColunar(response.lancamentos);
+            return response;
         });
     }
 }
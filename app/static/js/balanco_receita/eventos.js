@@ -528,8 +528,9 @@ class EventosBalancoReceita {
                 const response = await $.ajax({
                     url: this.config.API.LANCAMENTOS_EXCEL,
                     method: 'GET',
-                    data: parametros
+                    data: $.extend({}, parametros, { format: 'columnar' })
                 });
+                response.lancamentos = decodificarColunar(response.lancamentos);
                 dadosParaExcel = response;
             }
             
@@ -85,6 +85,24 @@ function mostrarSucesso(elemento, mensagem) {
     $(elemento).html(sucessoHtml);
 }
 
+// Decodifica uma resposta no formato colunar (?format=columnar) para a lista de objetos
+// {columns, data, dictionaries}: colunas de dicionário vêm como índice do valor
+function decodificarColunar(tabela) {
+    if (!tabela || Array.isArray(tabela)) {
+        return tabela || [];
+    }
+    const colunas = tabela.columns;
+    const dicionarios = colunas.map(coluna => (tabela.dictionaries || {})[coluna]);
+    return tabela.data.map(function(valores) {
+        const linha = {};
+        for (let i = 0; i < colunas.length; i++) {
+            const valor = valores[i];
+            linha[colunas[i]] = (dicionarios[i] && valor !== null) ? dicionarios[i][valor] : valor;
+        }
+        return linha;
+    });
+}
+
 // Inicialização quando o documento estiver pronto
 $(document).ready(function() {
     // Ativar tooltips do Bootstrap
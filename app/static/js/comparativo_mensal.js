@@ -153,6 +153,16 @@ class ComparativoMensalAcumulado {
                 tipo_receita: $('#selectTipoReceita').val() || 'todas'
             };
             
+            // Mesmo ano e UG: trocar apenas o tipo de receita usando as variantes já carregadas
+            const variante = this.obterVarianteCarregada(filtros);
+            if (variante) {
+                this.dadosOriginais = variante;
+                this.renderizarGrafico(variante.dados_grafico);
+                this.renderizarTabela(variante.dados_html);
+                this.renderizarAnalise(variante.dados_brutos);
+                return;
+            }
+            
             // Fazer requisição para API
             const response = await fetch(`/comparativo-mensal/api/comparativo-mensal?ano=${filtros.ano}&coug=${filtros.coug}&tipo_receita=${filtros.tipo_receita}`);
             
@@ -178,6 +188,35 @@ class ComparativoMensalAcumulado {
         }
     }
 
+    /**
+     * Retorna os dados de um tipo de receita a partir da última resposta da API,
+     * ou null se ano/UG mudaram e é preciso buscar novamente
+     */
+    obterVarianteCarregada(filtros) {
+        const anterior = this.dadosOriginais;
+        if (!anterior || !anterior.variantes || !anterior.filtros) {
+            return null;
+        }
+        if (String(anterior.filtros.ano) !== String(filtros.ano) ||
+            String(anterior.filtros.coug || '') !== String(filtros.coug)) {
+            return null;
+        }
+        
+        const variante = anterior.variantes[filtros.tipo_receita] || {
+            dados_html: { meses: [], tem_dados: false },
+            dados_grafico: { labels: [], datasets: [] },
+            dados_brutos: []
+        };
+        
+        return {
+            ...anterior,
+            dados_html: variante.dados_html,
+            dados_grafico: variante.dados_grafico,
+            dados_brutos: variante.dados_brutos,
+            filtros: { ...anterior.filtros, tipo_receita: filtros.tipo_receita }
+        };
+    }
+
     /**
      * Renderiza o gráfico principal
      */
@@ -2,7 +2,6 @@
 console.log('Arquivo detalha_despesa.js carregado - Versão com filtros em cascata');
 
 let tabelaDados = null;
-let dadosAtuais = [];
 let totaisGlobais = null;
 
 // Mapeamento de nomes de colunas
@@ -199,6 +198,7 @@ function limparFiltros() {
     
     if (tabelaDados) {
         tabelaDados.destroy();
+        tabelaDados = null;
         $('#divTabela').empty();
     }
     
@@ -215,7 +215,6 @@ function limparFiltros() {
     $('#cardTopNaturezas').hide();
     
     // Limpar variáveis globais
-    dadosAtuais = [];
     totaisGlobais = null;
 }
 
@@ -261,63 +260,24 @@ function consultarDados() {
             atualizarTotais(totais);
             mostrarTopNaturezas(totais.top_naturezas);
             
-            // Buscar dados
-            $.ajax({
-                url: '/detalha-despesa/api/dados',
-                method: 'GET',
-                data: {
-                    ano: ano,
-                    conta: conta,
-                    ug: ug
-                },
-                success: function(response) {
-                    console.log('✅ Dados carregados:', response);
-                    dadosAtuais = response.dados;
-                    
-                    // Mostrar aviso se tem mais dados
-                    if (response.tem_mais) {
-                        $('#avisoLimite').show();
-                        $('#textoAvisoLimite').html(
-                            `<strong>Atenção:</strong> Mostrando ${response.total.toLocaleString('pt-BR')} de ${response.total_registros.toLocaleString('pt-BR')} registros. 
-                            Use a exportação para obter todos os dados.`
-                        );
-                    }
-                    
-                    construirTabela(dadosAtuais);
-                    $('#areaResultados').show();
-                    
-                    // Fechar modal
-                    $('#modalLoading').modal('hide');
-                    
-                    // Forçar fechamento do modal se ainda estiver visível
-                    setTimeout(function() {
-                        if ($('#modalLoading').hasClass('show') || $('#modalLoading').is(':visible')) {
-                            console.log('Forçando fechamento do modal...');
-                            $('#modalLoading').removeClass('show');
-                            $('#modalLoading').css('display', 'none');
-                            $('.modal-backdrop').remove();
-                            $('body').removeClass('modal-open');
-                            $('body').css('padding-right', '');
-                        }
-                    }, 500);
-                },
-                error: function(xhr) {
-                    $('#modalLoading').modal('hide');
-                    setTimeout(function() {
-                        if ($('#modalLoading').hasClass('show') || $('#modalLoading').is(':visible')) {
-                            $('#modalLoading').removeClass('show');
-                            $('#modalLoading').css('display', 'none');
-                            $('.modal-backdrop').remove();
-                            $('body').removeClass('modal-open');
-                            $('body').css('padding-right', '');
-                        }
-                    }, 100);
-                    
-                    let erro = xhr.responseJSON ? xhr.responseJSON.erro : 'Erro desconhecido';
-                    mostrarErro('#divTabela', 'Erro ao consultar dados: ' + erro);
-                    $('#areaResultados').show();
+            // Grade server-side: o DataTables busca só a página visível
+            construirTabela(ano, conta, ug);
+            $('#areaResultados').show();
+            
+            // Fechar modal
+            $('#modalLoading').modal('hide');
+            
+            // Forçar fechamento do modal se ainda estiver visível
+            setTimeout(function() {
+                if ($('#modalLoading').hasClass('show') || $('#modalLoading').is(':visible')) {
+                    console.log('Forçando fechamento do modal...');
+                    $('#modalLoading').removeClass('show');
+                    $('#modalLoading').css('display', 'none');
+                    $('.modal-backdrop').remove();
+                    $('body').removeClass('modal-open');
+                    $('body').css('padding-right', '');
                 }
-            });
+            }, 500);
         },
         error: function(xhr) {
             $('#modalLoading').modal('hide');
@@ -403,14 +363,14 @@ function mostrarTopNaturezas(naturezas) {
     $('#cardTopNaturezas').show();
 }
 
-// Construir tabela com os dados
-function construirTabela(dados) {
-    if (!dados || dados.length === 0) {
-        $('#divTabela').html('<p class="text-center text-muted py-3">Nenhum lançamento encontrado.</p>');
-        return;
+// Construir tabela server-side (ordenação, busca e paginação no banco)
+function construirTabela(ano, conta, ug) {
+    if (tabelaDados) {
+        tabelaDados.destroy();
+        tabelaDados = null;
     }
     
-    // Construir HTML da tabela
+    // Construir HTML da tabela (o corpo é preenchido pelo DataTables)
     let html = '<table id="tabelaDados" class="table table-striped table-hover">';
     html += '<thead><tr>';
     html += '<th>Mês</th>';
@@ -423,74 +383,74 @@ function construirTabela(dados) {
     html += '<th>UG</th>';
     html += '<th>Data</th>';
     html += '<th>Tipo</th>';
-    html += '</tr></thead><tbody>';
-    
-    // Adicionar dados
-    dados.forEach(function(row) {
-        html += '<tr>';
-        
-        // Mês
-        html += `<td data-order="${row.mes}">${formatarMes(row.mes)}</td>`;
-        
-        // Documento
-        html += `<td>${row.nudocumento || '-'}</td>`;
-        
-        // Evento
-        html += `<td>${row.coevento || '-'}</td>`;
-        
-        // Natureza
-        html += `<td><span class="natureza-cell">${row.conatureza || '-'}</span></td>`;
-        
-        // Conta Corrente - SEM TRUNCAMENTO
-        html += `<td class="text-nowrap">${row.cocontacorrente || '-'}</td>`;
-        
-        // Valor
-        let valor = formatarNumero(row.valancamento);
-        let classeValor = row.tipo_lancamento === 'CREDITO' ? 'text-positive' : 'text-negative';
-        html += `<td class="text-end ${classeValor}">${valor}</td>`;
-        
-        // D/C
-        html += `<td class="text-center">${row.indebitocredito || '-'}</td>`;
-        
-        // UG
-        html += `<td>${row.coug || '-'}</td>`;
-        
-        // Data
-        html += `<td>${row.dalancamento || '-'}</td>`;
-        
-        // Tipo
-        let classeTipo = row.tipo_lancamento === 'CREDITO' ? 'badge-credito' : 'badge-debito';
-        html += `<td><span class="badge ${classeTipo}">${row.tipo_lancamento || '-'}</span></td>`;
-        
-        html += '</tr>';
-    });
-    
-    html += '</tbody></table>';
+    html += '</tr></thead><tbody></tbody></table>';
     
     $('#divTabela').html(html);
     
-    if (tabelaDados) {
-        tabelaDados.destroy();
-    }
-    
     // Inicializar DataTable
     tabelaDados = $('#tabelaDados').DataTable({
-        pageLength: 25,
-        lengthMenu: [[10, 25, 50, 100, 500, -1], [10, 25, 50, 100, 500, "Todos"]],
-        language: {
-            url: '//cdn.datatables.net/plug-ins/1.13.7/i18n/pt-BR.json'
+        serverSide: true,
+        processing: true,
+        ajax: {
+            url: '/detalha-despesa/api/dados',
+            data: function(d) {
+                d.ano = ano;
+                d.conta = conta;
+                d.ug = ug;
+                d.format = 'columnar';
+            },
+            dataSrc: function(json) {
+                return decodificarColunar(json.data);
+            },
+            error: function(xhr) {
+                let erro = xhr.responseJSON ? xhr.responseJSON.erro : 'Erro desconhecido';
+                mostrarErro('#divTabela', 'Erro ao consultar dados: ' + erro);
+            }
         },
-        order: [[0, 'asc'], [8, 'asc']], // Ordenar por mês e data
-        columnDefs: [
+        columns: [
+            {
+                data: 'mes',
+                render: function(data, type) {
+                    return type === 'display' ? formatarMes(data) : data;
+                }
+            },
+            { data: 'nudocumento', defaultContent: '-' },
+            { data: 'coevento', defaultContent: '-' },
+            {
+                data: 'conatureza',
+                render: function(data, type) {
+                    return type === 'display' ? `<span class="natureza-cell">${data || '-'}</span>` : data;
+                }
+            },
+            { data: 'cocontacorrente', defaultContent: '-', className: 'text-nowrap' },
             {
-                targets: 0, // Coluna do mês
-                type: 'num'
+                data: 'valancamento',
+                className: 'text-end',
+                render: function(data, type, row) {
+                    if (type !== 'display') return data;
+                    let classeValor = row.tipo_lancamento === 'CREDITO' ? 'text-positive' : 'text-negative';
+                    return `<span class="${classeValor}">${formatarNumero(data)}</span>`;
+                }
             },
+            { data: 'indebitocredito', defaultContent: '-', className: 'text-center' },
+            { data: 'coug', defaultContent: '-' },
+            { data: 'dalancamento', defaultContent: '-' },
             {
-                targets: 5, // Coluna de valor
-                type: 'num-fmt'
+                data: 'tipo_lancamento',
+                render: function(data, type) {
+                    if (type !== 'display') return data;
+                    let classeTipo = data === 'CREDITO' ? 'badge-credito' : 'badge-debito';
+                    return `<span class="badge ${classeTipo}">${data || '-'}</span>`;
+                }
             }
         ],
+        pageLength: 25,
+        lengthMenu: [[10, 25, 50, 100, 500], [10, 25, 50, 100, 500]],
+        searchDelay: 400,
+        language: {
+            url: '//cdn.datatables.net/plug-ins/1.13.7/i18n/pt-BR.json'
+        },
+        order: [[0, 'asc'], [8, 'asc']], // Ordenar por mês e data
         drawCallback: function(settings) {
             // Adicionar tooltips nas contas correntes muito longas
             $('#tabelaDados td:nth-child(5)').each(function() {
@@ -505,46 +465,32 @@ function construirTabela(dados) {
             $('[data-bs-toggle="tooltip"]').tooltip();
         },
         initComplete: function() {
-            // Adicionar filtros nas colunas específicas
-            this.api().columns().every(function(index) {
-                var column = this;
-                
-                // Adicionar filtros apenas nas colunas: Mês, Documento, Evento, Natureza, Conta Corrente
-                if (index === 0 || index === 1 || index === 2 || index === 3 || index === 4) {
-                    var select = $('<select class="form-select form-select-sm mt-1"><option value="">Todos</option></select>')
-                        .appendTo($(column.header()))
-                        .on('change', function() {
-                            var val = $.fn.dataTable.util.escapeRegex($(this).val());
-                            column.search(val ? '^' + val + '$' : '', true, false).draw();
-                        })
-                        .on('click', function(e) {
-                            e.stopPropagation();
-                        });
-                    
-                    // Coletar valores únicos
-                    var valores = [];
-                    column.data().unique().each(function(d) {
-                        if (d && d !== '-') {
-                            valores.push(d);
-                        }
-                    });
-                    
-                    // Ordenar valores
-                    if (index === 0) { // Se for a coluna de mês
-                        valores.sort(function(a, b) {
-                            return parseInt(a) - parseInt(b); // Ordenar numericamente
-                        });
-                    } else {
-                        valores.sort(); // Ordenar alfabeticamente para outras colunas
-                    }
-                    
-                    // Adicionar valores ao select
-                    valores.forEach(function(d) {
-                        let displayText = d;
-                        if (index === 0) { // Se for a coluna de mês
-                            displayText = formatarMes(d);
-                        }
-                        select.append('<option value="' + d + '">' + displayText + '</option>');
+            var api = this.api();
+            
+            // Filtro de mês no cabeçalho (aplicado no servidor como valor exato)
+            var column = api.column(0);
+            var select = $('<select class="form-select form-select-sm mt-1"><option value="">Todos</option></select>')
+                .appendTo($(column.header()))
+                .on('change', function() {
+                    column.search($(this).val()).draw();
+                })
+                .on('click', function(e) {
+                    e.stopPropagation();
+                });
+            
+            for (let mes = 1; mes <= 12; mes++) {
+                select.append('<option value="' + mes + '">' + formatarMes(mes) + '</option>');
+            }
+            
+            // Filtros de Documento, Evento, Natureza e Conta Corrente: a grade só tem a página
+            // visível, então os valores distintos vêm do servidor
+            $.ajax({
+                url: '/detalha-despesa/api/valores-filtro',
+                method: 'GET',
+                data: { ano: ano, conta: conta, ug: ug },
+                success: function(valores) {
+                    [1, 2, 3, 4].forEach(function(indice) {
+                        adicionarFiltroColuna(api.column(indice), valores[api.column(indice).dataSrc()]);
                     });
                 }
             });
@@ -552,6 +498,29 @@ function construirTabela(dados) {
     });
 }
 
+// Filtro por valor exato no cabeçalho da coluna: select com os valores
+// distintos ou, se forem muitos (valores = null), campo de texto
+function adicionarFiltroColuna(column, valores) {
+    var campo;
+    if (valores) {
+        campo = $('<select class="form-select form-select-sm mt-1"><option value="">Todos</option></select>');
+        valores.forEach(function(valor) {
+            campo.append($('<option>').val(valor).text(valor));
+        });
+    } else {
+        campo = $('<input type="text" class="form-control form-control-sm mt-1" placeholder="Valor exato">');
+    }
+    campo
+        .appendTo($(column.header()))
+        .on('change', function() {
+            column.search($(this).val().trim()).draw();
+        })
+        // Clique e Enter no campo não ordenam a coluna
+        .on('click keypress', function(e) {
+            e.stopPropagation();
+        });
+}
+
 // Formatar mês
 function formatarMes(mes) {
     const meses = {
@@ -608,9 +577,12 @@ function exportarExcel() {
             ano: ano,
             conta: conta,
             ug: ug,
-            limite: 999999  // Pegar todos os registros
+            limite: 999999,  // Pegar todos os registros
+            com_totais: true,  // Totais calculados na mesma leitura dos dados
+            format: 'columnar'
         },
         success: function(response) {
+            response.dados = decodificarColunar(response.dados);
             console.log(`📊 Exportando ${response.dados.length} registros...`);
             
             let csv = [];
@@ -638,23 +610,24 @@ function exportarExcel() {
                 csv.push(linha.join(';'));
             });
             
-            // Adicionar totais no final (se temos os totais globais)
-            if (totaisGlobais) {
+            // Adicionar totais no final (vindos da mesma consulta dos dados)
+            const totaisExportacao = response.totais || totaisGlobais;
+            if (totaisExportacao) {
                 csv.push(''); // Linha vazia
                 csv.push(['RESUMO'].join(';'));
                 csv.push(['Tipo', 'Quantidade', 'Valor Total'].join(';'));
-                csv.push(['Créditos', totaisGlobais.credito.quantidade.toLocaleString('pt-BR'), totaisGlobais.credito.total.toFixed(2).replace('.', ',')].join(';'));
-                csv.push(['Débitos', totaisGlobais.debito.quantidade.toLocaleString('pt-BR'), totaisGlobais.debito.total.toFixed(2).replace('.', ',')].join(';'));
+                csv.push(['Créditos', totaisExportacao.credito.quantidade.toLocaleString('pt-BR'), totaisExportacao.credito.total.toFixed(2).replace('.', ',')].join(';'));
+                csv.push(['Débitos', totaisExportacao.debito.quantidade.toLocaleString('pt-BR'), totaisExportacao.debito.total.toFixed(2).replace('.', ',')].join(';'));
                 
                 const formulaSaldo = conta.startsWith('5') ? 'Saldo (D-C)' : 'Saldo (C-D)';
-                csv.push([formulaSaldo, '', totaisGlobais.saldo.toFixed(2).replace('.', ',')].join(';'));
+                csv.push([formulaSaldo, '', totaisExportacao.saldo.toFixed(2).replace('.', ',')].join(';'));
                 
                 // Adicionar top naturezas se existir
-                if (totaisGlobais.top_naturezas && totaisGlobais.top_naturezas.length > 0) {
+                if (totaisExportacao.top_naturezas && totaisExportacao.top_naturezas.length > 0) {
                     csv.push(''); // Linha vazia
                     csv.push(['TOP 5 NATUREZAS DE DESPESA'].join(';'));
                     csv.push(['Natureza', 'Quantidade', 'Valor Total'].join(';'));
-                    totaisGlobais.top_naturezas.forEach(function(nat) {
+                    totaisExportacao.top_naturezas.forEach(function(nat) {
                         csv.push([nat.natureza, nat.quantidade.toLocaleString('pt-BR'), nat.total.toFixed(2).replace('.', ',')].join(';'));
                     });
                 }
@@ -490,8 +490,9 @@ function abrirModalDetalhes(cofonte, coalinea, nomeFonte, nomeAlinea) {
     $.ajax({
         url: '/relatorio-receita-fonte/api/detalhes-lancamentos',
         method: 'GET',
-        data: params,
+        data: $.extend({}, params, { format: 'columnar' }),
         success: function(response) {
+            response.dados = decodificarColunar(response.dados);
             console.log('✅ Detalhes carregados:', response);
             
             dadosLancamentosCompletos = response;
@@ -899,8 +900,9 @@ function exportarDetalhesExcel() {
     $.ajax({
         url: '/relatorio-receita-fonte/api/detalhes-lancamentos',
         method: 'GET',
-        data: params,
+        data: $.extend({}, params, { format: 'columnar' }),
         success: function(response) {
+            response.dados = decodificarColunar(response.dados);
             console.log('✅ Dados completos carregados para exportação');
             
             let csv = [];
@@ -139,8 +139,9 @@ window.Exportacao = {
         $.ajax({
             url: '/relatorio-receita-fonte/api/detalhes-lancamentos',
             method: 'GET',
-            data: params,
+            data: $.extend({}, params, { format: 'columnar' }),
             success: function(response) {
+                response.dados = decodificarColunar(response.dados);
                 console.log('✅ Dados completos carregados para exportação');
                 
                 let csv = [];
@@ -48,8 +48,9 @@ window.ModalDetalhes = {
         $.ajax({
             url: '/relatorio-receita-fonte/api/detalhes-lancamentos',
             method: 'GET',
-            data: params,
+            data: $.extend({}, params, { format: 'columnar' }),
             success: function(response) {
+                response.dados = decodificarColunar(response.dados);
                 console.log('✅ Detalhes carregados:', response);
                 
                 // Salvar dados completos
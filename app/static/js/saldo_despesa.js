@@ -283,9 +283,11 @@ function consultarDados() {
         data: {
             ano: ano,
             conta: conta,
-            ug: ug
+            ug: ug,
+            format: 'columnar'
         },
         success: function(response) {
+            response.dados = decodificarColunar(response.dados);
             console.log('✅ Dados carregados:', response);
             
             // Adicionar badge de fonte se retornado
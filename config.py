@@ -29,6 +29,20 @@ class Config:
     # Configurações de upload (para os arquivos Excel)
     UPLOAD_FOLDER = 'dados_brutos'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max
+    
+    # Compressão e ETag das APIs (app/modules/compressao_etag.py)
+    COMPRESSAO_MINIMO_BYTES = int(os.environ.get('COMPRESSAO_MINIMO_BYTES', 1024))
+    COMPRESSAO_NIVEL = int(os.environ.get('COMPRESSAO_NIVEL', 6))
+    VERSAO_DADOS_TTL = int(os.environ.get('VERSAO_DADOS_TTL', 30))  # segundos (PostgreSQL)
+
+    # Cache de resultados em disco, compartilhado pelos workers (app/modules/cache_resultados.py);
+    # vazio desliga
+    CACHE_RESULTADOS_DIR = os.environ.get('CACHE_RESULTADOS_DIR', 'dados_brutos/cache_resultados')
+
+    # Aquecimento do cache ao final de cada carga (app/modules/aquecimento_cache.py)
+    AQUECIMENTO_URL = os.environ.get('AQUECIMENTO_URL', '')  # servidor em execução; vazio = no próprio processo
+    AQUECIMENTO_TOP_UGS = int(os.environ.get('AQUECIMENTO_TOP_UGS', 5))
+    AQUECIMENTO_PARALELO = int(os.environ.get('AQUECIMENTO_PARALELO', 4))
 
     @staticmethod
     def init_app(app):
@@ -0,0 +1,66 @@
+"""
+Configuração do gunicorn para produção
+Uso: gunicorn -c gunicorn.conf.py run:app (ver Procfile)
+
+Com preload_app, a aplicação é criada uma única vez no processo mestre e as
+dimensões em cache (app/modules/dimensoes.py) são carregadas antes do fork:
+os workers herdam essas estruturas somente leitura por copy-on-write, em vez
+de cada um montar as suas. Depois do fork, cada worker descarta as conexões
+e o pool de threads herdados (db_manager.reiniciar_apos_fork).
+
+Variáveis de ambiente:
+    PORT                  porta (padrão 8000)
+    WEB_CONCURRENCY       número de workers (padrão 2 x CPUs + 1, máximo 9)
+    GUNICORN_THREADS      threads por worker (padrão 4)
+    GUNICORN_TIMEOUT      timeout de requisição em segundos (padrão 120)
+    GUNICORN_PRELOAD      0 para desligar o preload (padrão 1)
+    GUNICORN_MAX_REQUESTS reciclagem do worker após N requisições (padrão 1000; 0 desliga)
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Workers e threads: as telas fazem consultas longas no banco (I/O), então
+# algumas threads por worker aproveitam a espera sem multiplicar a memória
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 9)))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Relatórios anuais podem levar dezenas de segundos na primeira consulta
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclagem periódica dos workers (o novo worker herda o mestre já carregado)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    """Mestre pronto, antes de criar os workers: carrega as estruturas compartilhadas"""
+    if not preload_app:
+        return
+
+    from app.modules.dimensoes import dimensoes
+    dimensoes.carregar()
+
+    # Objetos criados até aqui saem da coleta do GC: a varredura dos workers
+    # não toca nessas páginas e elas continuam compartilhadas
+    gc.freeze()
+    server.log.info("📦 Aplicação e dimensões carregadas no mestre (preload)")
+
+
+def post_fork(server, worker):
+    """No worker recém-criado: descarta conexões e threads herdadas do mestre"""
+    if not preload_app:
+        return
+
+    from app.db_manager import db_manager
+    db_manager.reiniciar_apos_fork()
@@ -78,26 +78,31 @@ def main():
         print(f"\n⚠️ ATENÇÃO: Os seguintes períodos já existem no banco:")
         for p in periodos_existentes:
             # Contar registros existentes
-            conn = etl.db_duckdb.get_connection()
-            count = conn.execute(f"SELECT COUNT(*) FROM {etl.table_name} WHERE periodo = ?", [p]).fetchone()[0]
+            conn = etl.db_duckdb.get_connection(somente_leitura=True)
+            filtro, params = etl.filtro_periodo(p)
+            count = conn.execute(f"SELECT COUNT(*) FROM {etl.table_name} WHERE {filtro}", params).fetchone()[0]
             conn.close()
             print(f"   - {p} ({count:,} registros)")
         
-        resposta = input("\n❓ Deseja SOBRESCREVER os dados existentes? (s/N): ")
-        if resposta.lower() != 's':
+        print("\n💡 Atualizar grava só a diferença pela chave (coexercicio, coug, nudocumento, nulancamento):")
+        print("   insere os lançamentos novos e atualiza os alterados, sem apagar o período.")
+        resposta = input("\n❓ SOBRESCREVER (s), ATUALIZAR só a diferença (a) ou cancelar (N)? ").lower()
+        if resposta not in ('s', 'a'):
             print("\n❌ Carga cancelada pelo usuário.")
             return
-        sobrescrever = True
+        sobrescrever = resposta == 's'
+        atualizar = resposta == 'a'
     else:
         print("\n✅ Todos os períodos são novos.")
         sobrescrever = False
+        atualizar = False
     
     # Confirmar processamento
     print(f"\n📋 RESUMO DA CARGA:")
     print(f"   Arquivo: {nome_arquivo}")
     print(f"   Períodos: {', '.join(sorted(periodos))}")
     print(f"   Registros estimados: ~{total_estimado:,}")
-    print(f"   Modo: {'SOBRESCREVER' if sobrescrever else 'INCREMENTAL'}")
+    print(f"   Modo: {'SOBRESCREVER' if sobrescrever else 'ATUALIZAR (DIFERENÇA)' if atualizar else 'INCREMENTAL'}")
     print(f"   Chunks: {etl.chunk_size:,} registros por vez")
     
     resposta = input("\n✅ Confirma o processamento? (S/n): ")
@@ -111,7 +116,7 @@ def main():
     
     # Processar arquivo
     inicio = datetime.now()
-    sucesso = etl.processar_arquivo(arquivo, sobrescrever=sobrescrever)
+    sucesso = etl.processar_arquivo(arquivo, sobrescrever=sobrescrever, atualizar=atualizar)
     tempo_total = datetime.now() - inicio
     
     if sucesso:
@@ -15,7 +15,7 @@ def validar_carga():
     """Valida os dados carregados"""
     from app.modules.database_duckdb import db_duckdb
     
-    conn = db_duckdb.get_connection()
+    conn = db_duckdb.get_connection(somente_leitura=True)
     try:
         query = """
         SELECT 
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Aquece o cache de resultados dos relatórios (RREO, balanço da receita,
+relatório por fonte/receita, comparativo mensal e quadros do Balanço Geral).
+
+Executado automaticamente ao final de cada carga (processar_arquivo); este
+comando serve para aquecer manualmente ou contra outro servidor.
+
+Com --verificar, depois de aquecer repete as requisições como as telas as
+fazem e falha se alguma não sair do cache (X-Cache: HIT).
+
+Uso:
+    python scripts/aquecer_cache.py [--url http://localhost:8000] [--ano 2025] [--ugs 5] [--paralelo 4] [--verificar]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from app import create_app
+from app.modules.aquecimento_cache import aquecer, verificar_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aquece o cache de resultados dos relatórios')
+    parser.add_argument('--url', help='Servidor em execução (padrão: AQUECIMENTO_URL ou no próprio processo)')
+    parser.add_argument('--ano', type=int, help='Exercício (padrão: o mais recente até o ano atual)')
+    parser.add_argument('--ugs', type=int, help='Quantidade de maiores UGs (padrão: AQUECIMENTO_TOP_UGS)')
+    parser.add_argument('--paralelo', type=int, help='Requisições simultâneas (padrão: AQUECIMENTO_PARALELO)')
+    parser.add_argument('--verificar', action='store_true',
+                        help='Confere se as requisições das telas saem do cache aquecido')
+    args = parser.parse_args()
+
+    app = create_app(os.getenv('FLASK_ENV', 'default'))
+
+    print("=" * 70)
+    print("🔥 AQUECIMENTO DO CACHE DE RESULTADOS")
+    print("=" * 70)
+
+    base_url = args.url or app.config['AQUECIMENTO_URL'] or None
+    top_ugs = args.ugs or app.config['AQUECIMENTO_TOP_UGS']
+    with app.app_context():
+        resultados = aquecer(
+            app=app,
+            base_url=base_url,
+            ano=args.ano,
+            top_ugs=top_ugs,
+            paralelo=args.paralelo or app.config['AQUECIMENTO_PARALELO'],
+        )
+
+        falhas = []
+        if args.verificar:
+            print("🔎 Conferindo as requisições das telas no cache")
+            falhas = verificar_cache(app=app, base_url=base_url, ano=args.ano, top_ugs=top_ugs)
+
+    if any(status != 200 for _, _, status, _ in resultados) or falhas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark: detecção da chave primária e gravação incremental das dimensões
+(scripts/carga_dimensoes_duckdb.py).
+
+Gera uma dimensão sintética larga (uma coluna de código única, colunas de
+código repetidas e colunas de texto) e mede o tempo de carga de um arquivo
+já lido, para volumes crescentes:
+  - antes: nunique() coluna a coluna no DataFrame + DROP TABLE + CREATE
+    TABLE AS SELECT;
+  - agora: preparar_arquivo + inferir_chave_primaria (uma agregação na
+    tabela preparada) + aplicar_dimensao (diferença por chave + hash da
+    linha), com 50 linhas alteradas e sem alterações.
+
+O banco é um arquivo temporário, como na carga real (a recriação da tabela
+regrava todas as linhas em disco).
+
+Uso:
+    python scripts/benchmark_carga_dimensoes.py [repeticoes] [linhas ...]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import time
+import random
+import statistics
+import tempfile
+
+import duckdb
+import pandas as pd
+
+from carga_dimensoes_duckdb import preparar_arquivo, inferir_chave_primaria, aplicar_dimensao
+
+
+def gerar_dimensao(quantidade, colunas_codigo=20, colunas_texto=20, semente=42):
+    """DataFrame no formato das planilhas de dimensão (colunas em minúsculas)"""
+    aleatorio = random.Random(semente)
+    dados = {
+        'coevento': range(100000, 100000 + quantidade),
+        'noevento': [f'Evento {i % 7000}' for i in range(quantidade)],
+    }
+    for k in range(colunas_codigo):
+        dados[f'cocampo{k}'] = [aleatorio.randint(0, 50) for _ in range(quantidade)]
+    for k in range(colunas_texto):
+        dados[f'txcampo{k}'] = [f'texto {aleatorio.randint(0, 2000)}' for _ in range(quantidade)]
+    return pd.DataFrame(dados)
+
+
+def medir(funcao, repeticoes):
+    """Executa a função N vezes e retorna a mediana em ms"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    volumes = [int(v) for v in sys.argv[2:]] or [8_000, 50_000, 200_000]
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK - CHAVE PRIMÁRIA E CARGA INCREMENTAL DAS DIMENSÕES")
+    print("=" * 70)
+    print(f"Repetições: {repeticoes}")
+
+    for quantidade in volumes:
+        df = gerar_dimensao(quantidade)
+        alterado = df.copy()
+        alterado.loc[:49, 'noevento'] = 'alterado'
+
+        pasta = tempfile.TemporaryDirectory()
+        conn = duckdb.connect(os.path.join(pasta.name, 'benchmark.duckdb'))
+
+        def antes():
+            [df[col].nunique() for col in df.columns]
+            conn.execute("DROP TABLE IF EXISTS dim_antes")
+            conn.register('df_temp', df)
+            conn.execute("CREATE TABLE dim_antes AS SELECT * FROM df_temp")
+            conn.unregister('df_temp')
+
+        def agora(dados):
+            preparar_arquivo(conn, dados, 'dim_benchmark')
+            pk = inferir_chave_primaria(conn)
+            aplicar_dimensao(conn, 'dim_benchmark', pk)
+            return pk
+
+        pk = agora(df)
+        # Alterna entre o arquivo alterado e o original: toda execução grava 50 linhas
+        execucoes = [0]
+
+        def agora_alterado():
+            execucoes[0] += 1
+            agora(alterado if execucoes[0] % 2 else df)
+
+        t_antes = medir(antes, repeticoes)
+        t_alterado = medir(agora_alterado, repeticoes)
+        agora(df)
+        t_igual = medir(lambda: agora(df), repeticoes)
+        conn.close()
+        pasta.cleanup()
+
+        print(f"\n📊 {quantidade:,} linhas x {len(df.columns)} colunas (chave: {' + '.join(pk)})")
+        print(f"   Antes (nunique + recriação) : {t_antes:8.1f} ms")
+        print(f"   Agora, 50 linhas alteradas  : {t_alterado:8.1f} ms")
+        print(f"   Agora, sem alterações       : {t_igual:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark: página + contagem em uma única leitura (COUNT(*) OVER ()) versus
+a forma antiga (consulta de dados seguida de um COUNT(*) com os mesmos filtros).
+
+Usa a base DuckDB local e escolhe automaticamente a conta contábil com mais
+lançamentos no ano mais recente, que é o pior caso do detalhamento.
+
+Uso:
+    python scripts/benchmark_contagem_janela.py [repeticoes]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import statistics
+import duckdb
+from pathlib import Path
+
+DB_PATH = Path("dados_brutos/fato/db_local/uban.duckdb")
+LIMITE = 10000
+
+QUERY_DADOS = """
+SELECT
+    MONTH(dalancamento) as mes,
+    nudocumento,
+    coevento,
+    cocontacorrente,
+    valancamento,
+    indebitocredito,
+    coug,
+    strftime(dalancamento, '%d/%m/%Y') as data_formatada,
+    tipo_lancamento
+FROM {tabela}
+WHERE YEAR(dalancamento) = ?
+    AND cocontacontabil = ?
+ORDER BY MONTH(dalancamento), dalancamento, nudocumento
+LIMIT ?
+"""
+
+QUERY_CONTAGEM = """
+SELECT COUNT(*) as total FROM {tabela}
+WHERE YEAR(dalancamento) = ? AND cocontacontabil = ?
+"""
+
+QUERY_JANELA = """
+SELECT
+    MONTH(dalancamento) as mes,
+    nudocumento,
+    coevento,
+    cocontacorrente,
+    valancamento,
+    indebitocredito,
+    coug,
+    strftime(dalancamento, '%d/%m/%Y') as data_formatada,
+    tipo_lancamento,
+    COUNT(*) OVER () as total_registros
+FROM {tabela}
+WHERE YEAR(dalancamento) = ?
+    AND cocontacontabil = ?
+ORDER BY MONTH(dalancamento), dalancamento, nudocumento
+LIMIT ?
+"""
+
+
+def escolher_parametros(conn, tabela):
+    """Retorna (ano, conta, quantidade) da conta com mais lançamentos no último ano"""
+    return conn.execute(f"""
+        SELECT YEAR(dalancamento) as ano, cocontacontabil, COUNT(*) as qtd
+        FROM {tabela}
+        WHERE dalancamento IS NOT NULL
+        GROUP BY 1, 2
+        ORDER BY ano DESC, qtd DESC
+        LIMIT 1
+    """).fetchone()
+
+
+def medir(funcao, repeticoes):
+    """Executa a função N vezes (após um aquecimento) e retorna os tempos em ms"""
+    funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def benchmark_tabela(conn, tabela, repeticoes):
+    ano, conta, qtd = escolher_parametros(conn, tabela)
+    print(f"\n📊 {tabela}: ano={ano}, conta={conta} ({qtd:,} lançamentos)")
+
+    def forma_antiga():
+        dados = conn.execute(QUERY_DADOS.format(tabela=tabela), [ano, conta, LIMITE]).fetchdf()
+        total = conn.execute(QUERY_CONTAGEM.format(tabela=tabela), [ano, conta]).fetchone()[0]
+        return len(dados), total
+
+    def forma_nova():
+        dados = conn.execute(QUERY_JANELA.format(tabela=tabela), [ano, conta, LIMITE]).fetchdf()
+        total = int(dados['total_registros'].iloc[0]) if len(dados) else 0
+        return len(dados), total
+
+    # Conferir que as duas formas retornam o mesmo resultado
+    assert forma_antiga() == forma_nova(), "Resultados divergentes entre as duas formas"
+
+    antiga = medir(forma_antiga, repeticoes)
+    nova = medir(forma_nova, repeticoes)
+
+    print(f"   Dados + COUNT(*) separado : mediana {statistics.median(antiga):8.1f} ms")
+    print(f"   COUNT(*) OVER () único    : mediana {statistics.median(nova):8.1f} ms")
+    print(f"   Ganho                     : {statistics.median(antiga) / statistics.median(nova):.2f}x")
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    if not DB_PATH.exists():
+        print(f"❌ Banco não encontrado: {DB_PATH}")
+        return
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK - PÁGINA + CONTAGEM EM UMA ÚNICA LEITURA")
+    print("=" * 70)
+    print(f"Repetições: {repeticoes} | Limite da página: {LIMITE:,}")
+
+    conn = duckdb.connect(str(DB_PATH), read_only=True)
+    try:
+        for tabela in ('receita_lancamento', 'despesa_lancamento'):
+            benchmark_tabela(conn, tabela, repeticoes)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark: montagem da hierarquia do Balanço da Receita (categoria → fonte →
+subfonte → alínea → UG) com app/modules/hierarquia.py.
+
+Gera linhas sintéticas no formato da consulta de gerar_relatorio, já
+ordenadas como o ORDER BY, e mede processar_dados_hierarquicos para volumes
+crescentes. Com a consolidação em uma passada, o tempo por linha deve ficar
+estável (crescimento linear).
+
+Uso:
+    python scripts/benchmark_hierarquia.py [repeticoes] [linhas ...]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import random
+import statistics
+
+from app.routes.balanco_receita import processar_dados_hierarquicos
+
+FONTES_POR_CATEGORIA = {'1': range(11, 20), '2': range(21, 30), '7': range(71, 80)}
+
+
+def gerar_linhas(quantidade, semente=42):
+    """Linhas (categoria, fonte, subfonte, alínea, UG) ordenadas, com valores aleatórios"""
+    aleatorio = random.Random(semente)
+    chaves = set()
+    while len(chaves) < quantidade:
+        cat = aleatorio.choice('127')
+        fonte = str(aleatorio.choice(FONTES_POR_CATEGORIA[cat]))
+        subfonte = fonte + str(aleatorio.randint(0, 9))
+        alinea = subfonte + f"{aleatorio.randint(0, 99):02d}"
+        coug = str(130000 + aleatorio.randint(0, 400))
+        chaves.add((cat, fonte, subfonte, alinea, coug))
+
+    linhas = []
+    for cat, fonte, subfonte, alinea, coug in sorted(chaves):
+        linhas.append({
+            'cocategoriareceita': cat, 'cofontereceita': fonte, 'nome_fonte': f'Fonte {fonte}',
+            'cosubfontereceita': subfonte, 'nome_subfonte': f'Subfonte {subfonte}',
+            'coalinea': alinea, 'nome_alinea': f'Alínea {alinea}',
+            'coug': coug, 'nome_ug': f'UG {coug}',
+            'previsao_inicial': aleatorio.uniform(0, 1e6), 'previsao_atualizada': aleatorio.uniform(0, 1e6),
+            'receita_atual': aleatorio.uniform(0, 1e6), 'receita_anterior': aleatorio.uniform(0, 1e6),
+        })
+    return linhas
+
+
+def medir(funcao, repeticoes):
+    """Executa a função N vezes e retorna a mediana em ms"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    volumes = [int(v) for v in sys.argv[2:]] or [10_000, 50_000, 200_000]
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK - HIERARQUIA DO BALANÇO DA RECEITA")
+    print("=" * 70)
+    print(f"Repetições: {repeticoes}")
+
+    for quantidade in volumes:
+        linhas = gerar_linhas(quantidade)
+        dados, _ = processar_dados_hierarquicos(linhas)
+        tempo = medir(lambda: processar_dados_hierarquicos(linhas), repeticoes)
+        print(f"\n📊 {quantidade:,} linhas -> {len(dados):,} itens na lista")
+        print(f"   Mediana : {tempo:8.1f} ms | {tempo * 1000 / quantidade:6.2f} µs por linha")
+
+
+if __name__ == "__main__":
+    main()
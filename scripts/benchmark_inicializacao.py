@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tempo de inicialização da aplicação (import de `app` + create_app).
+
+Cada medição roda em um processo Python novo, como um worker do gunicorn ou
+um script avulso, e informa quais bibliotecas pesadas ficaram carregadas ao
+final (SQLAlchemy, psycopg2, pandas, NumPy, duckdb). Em desenvolvimento
+(DuckDB) nenhuma delas deve aparecer: são importadas na primeira consulta.
+
+Uso:
+    python scripts/benchmark_inicializacao.py [repeticoes] [ambiente ...]
+    (ambientes: development, production; padrão: os dois)
+"""
+import sys
+import os
+import json
+import time
+import statistics
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BIBLIOTECAS_PESADAS = ('sqlalchemy', 'psycopg2', 'pandas', 'numpy', 'duckdb')
+
+# Executado no processo filho: mede import + create_app e lista as bibliotecas carregadas
+CODIGO_FILHO = f"""
+import sys, time, json
+inicio = time.perf_counter()
+from app import create_app
+importado = time.perf_counter()
+create_app()
+fim = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (importado - inicio) * 1000,
+    'create_app_ms': (fim - importado) * 1000,
+    'carregadas': [m for m in {BIBLIOTECAS_PESADAS!r} if m in sys.modules],
+}}))
+"""
+
+
+def medir_processo(ambiente):
+    """Roda um processo novo e retorna (tempo total em ms, resultado do filho)"""
+    env = dict(os.environ, FLASK_ENV=ambiente)
+    inicio = time.perf_counter()
+    saida = subprocess.run(
+        [sys.executable, '-c', CODIGO_FILHO],
+        cwd=RAIZ, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    total = (time.perf_counter() - inicio) * 1000
+    # A última linha é o JSON; as anteriores são os prints da inicialização
+    return total, json.loads(saida.strip().splitlines()[-1])
+
+
+def medir(ambiente, repeticoes):
+    """Executa N processos (após um aquecimento do cache de bytecode) e retorna as medianas"""
+    medir_processo(ambiente)
+    totais, imports, fabricas = [], [], []
+    resultado = None
+    for _ in range(repeticoes):
+        total, resultado = medir_processo(ambiente)
+        totais.append(total)
+        imports.append(resultado['import_ms'])
+        fabricas.append(resultado['create_app_ms'])
+    return {
+        'total': statistics.median(totais),
+        'import': statistics.median(imports),
+        'create_app': statistics.median(fabricas),
+        'carregadas': resultado['carregadas'],
+    }
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    ambientes = sys.argv[2:] or ['development', 'production']
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK - INICIALIZAÇÃO DA APLICAÇÃO")
+    print("=" * 70)
+    print(f"Repetições: {repeticoes} | Python: {sys.executable}")
+
+    for ambiente in ambientes:
+        try:
+            tempos = medir(ambiente, repeticoes)
+        except subprocess.CalledProcessError as e:
+            print(f"\n❌ {ambiente}: falha ao iniciar a aplicação")
+            print(e.stderr.strip().splitlines()[-1] if e.stderr else '')
+            continue
+
+        print(f"\n📊 {ambiente}")
+        print(f"   Processo completo : mediana {tempos['total']:8.1f} ms")
+        print(f"   import app        : mediana {tempos['import']:8.1f} ms")
+        print(f"   create_app()      : mediana {tempos['create_app']:8.1f} ms")
+        carregadas = ', '.join(tempos['carregadas']) or 'nenhuma'
+        print(f"   Bibliotecas pesadas carregadas: {carregadas}")
+
+
+if __name__ == "__main__":
+    main()
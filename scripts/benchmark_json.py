@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serialização JSON de uma página de lançamentos.
+
+Compara a forma antiga (laço por linha com float()/int()/strftime() seguido
+do jsonify padrão do Flask) com o provedor da aplicação (app.modules.json_rapido),
+que recebe as linhas como saem de db_manager.execute_query. Com o orjson
+instalado, mede o caminho em C; sem ele, o fallback da biblioteca padrão.
+
+As linhas são geradas em um DataFrame com os mesmos tipos das consultas
+(DECIMAL -> Decimal, inteiros/float do NumPy, datas do pandas).
+
+Uso:
+    python scripts/benchmark_json.py [repeticoes] [linhas]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import statistics
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.modules.json_rapido import ProvedorJSON, orjson
+
+
+def gerar_linhas(quantidade):
+    """Linhas no formato de df.to_dict(orient='records'), como em execute_query"""
+    indices = np.arange(quantidade)
+    df = pd.DataFrame({
+        'nudocumento': [f"2025NL{i:06d}" for i in indices],
+        'coevento': (500000 + indices % 300).astype('int64'),
+        'coug': (100000 + indices % 90).astype('int64'),
+        'cocontacorrente': [f"{i % 97:017d}" for i in indices],
+        'valancamento': [Decimal(f"{(i * 37) % 1000000}.{i % 100:02d}") for i in indices],
+        'saldo': (indices * 1.75).astype('float64'),
+        'indebitocredito': np.where(indices % 2 == 0, 'D', 'C'),
+        'dalancamento': pd.to_datetime('2025-01-01') + pd.to_timedelta(indices % 365, unit='D'),
+        'inmes': (1 + indices % 12).astype('int64'),
+    })
+    return df.to_dict(orient='records')
+
+
+def forma_antiga(app, linhas):
+    """Conversão por linha (como as rotas faziam) + provedor padrão do Flask"""
+    dados = []
+    for row in linhas:
+        dados.append({
+            'nudocumento': row['nudocumento'],
+            'coevento': int(row['coevento']),
+            'coug': int(row['coug']),
+            'cocontacorrente': row['cocontacorrente'],
+            'valancamento': float(row['valancamento']),
+            'saldo': float(row['saldo']),
+            'indebitocredito': row['indebitocredito'],
+            'dalancamento': row['dalancamento'].strftime('%d/%m/%Y'),
+            'inmes': int(row['inmes']),
+        })
+    return app.json.response({'dados': dados, 'total': len(dados)})
+
+
+def forma_nova(app, linhas):
+    """Linhas direto para o provedor da aplicação"""
+    return app.json.response({'dados': linhas, 'total': len(linhas)})
+
+
+def medir(funcao, repeticoes):
+    """Executa a função N vezes (após um aquecimento) e retorna os tempos em ms"""
+    funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    quantidade = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK - SERIALIZAÇÃO JSON DE LANÇAMENTOS")
+    print("=" * 70)
+    print(f"Repetições: {repeticoes} | Linhas: {quantidade:,} | "
+          f"orjson: {'sim' if orjson is not None else 'não (fallback json)'}")
+
+    linhas = gerar_linhas(quantidade)
+
+    # Provedores sem modo debug (saída compacta, como em produção)
+    app_antiga = Flask('benchmark_antiga')
+    app_antiga.json = DefaultJSONProvider(app_antiga)
+    app_nova = Flask('benchmark_nova')
+    app_nova.json = ProvedorJSON(app_nova)
+
+    tamanho_antiga = len(forma_antiga(app_antiga, linhas).get_data())
+    tamanho_nova = len(forma_nova(app_nova, linhas).get_data())
+
+    antiga = medir(lambda: forma_antiga(app_antiga, linhas), repeticoes)
+    nova = medir(lambda: forma_nova(app_nova, linhas), repeticoes)
+
+    for descricao, tempos, tamanho in (
+        ("Laço por linha + jsonify padrão", antiga, tamanho_antiga),
+        ("Provedor da aplicação          ", nova, tamanho_nova),
+    ):
+        mediana = statistics.median(tempos)
+        print(f"\n   {descricao}: mediana {mediana:8.1f} ms")
+        print(f"      {quantidade / mediana * 1000:12,.0f} linhas/s | "
+              f"{tamanho / 1024 / 1024 / mediana * 1000:8.1f} MB/s | {tamanho / 1024:,.0f} KB")
+
+    print(f"\n   Ganho: {statistics.median(antiga) / statistics.median(nova):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
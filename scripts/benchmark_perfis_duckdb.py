@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Benchmark: perfis de conexão do DuckDB (web x etl) sob carga concorrente
+(app/modules/database_duckdb.py).
+
+Simula, em processos separados como em produção, os workers web lendo um
+banco (consultas típicas dos relatórios sobre uma receita_saldo sintética,
+uma conexão por consulta, várias threads) enquanto uma carga grava em
+outro banco (agregação e ordenação de lançamentos sintéticos em laço). Para
+cada cenário mede:
+  - a latência das consultas web (mediana e p95);
+  - o tempo médio de cada carga no processo ETL.
+
+Cenários:
+  - sem carga: só as consultas web, com o padrão do DuckDB;
+  - padrão: web e carga com o padrão do DuckDB (todas as threads e 80% da
+    memória para cada um);
+  - perfis: web com o perfil 'web' e carga com o perfil 'etl'.
+
+Uso:
+    python scripts/benchmark_perfis_duckdb.py [consultas_por_thread] [threads_web] [linhas]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import statistics
+import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+
+from app.modules.database_duckdb import db_duckdb
+
+SQL_SALDO = """
+    CREATE TABLE receita_saldo AS
+    SELECT
+        2024 + i % 2 AS coexercicio,
+        1 + (i // 11) % 12 AS inmes,
+        CAST(100000 + hash(i) % 300 AS INTEGER) AS coug,
+        '6212' || lpad(CAST(hash(i * 3) % 100000 AS VARCHAR), 5, '0') AS cocontacontabil,
+        lpad(CAST(hash(i * 7) % 100 AS VARCHAR), 2, '0') AS cofontereceita,
+        CAST((hash(i * 13) % 10000000) / 100.0 AS DECIMAL(18,2)) AS saldo_contabil_receita
+    FROM range(?) t(i)
+"""
+
+# Consultas no formato das telas (filtro por exercício, agregação por mês/fonte/UG)
+CONSULTAS_WEB = [
+    """
+    SELECT inmes, cofontereceita, SUM(saldo_contabil_receita)
+    FROM receita_saldo WHERE coexercicio = 2025 GROUP BY ALL
+    """,
+    """
+    SELECT coug, SUM(ABS(saldo_contabil_receita)) AS volume
+    FROM receita_saldo WHERE coexercicio = 2025 AND cocontacontabil BETWEEN '621200000' AND '621399999'
+    GROUP BY coug ORDER BY volume DESC LIMIT 5
+    """,
+    """
+    SELECT coexercicio, inmes, SUM(saldo_contabil_receita) FILTER (WHERE coug = 100007)
+    FROM receita_saldo GROUP BY ALL
+    """,
+]
+
+# Carga: transformação e ordenação dos lançamentos, como na gravação das cargas
+SQL_CARGA = """
+    CREATE OR REPLACE TABLE lancamento_carga AS
+    SELECT
+        i % 400 AS coug,
+        '6221' || lpad(CAST(hash(i) % 99999 AS VARCHAR), 5, '0') AS cocontacontabil,
+        md5(CAST(i AS VARCHAR)) AS cocontacorrente,
+        CAST((hash(i * 3) % 10000000) / 100.0 AS DECIMAL(18,2)) AS valancamento
+    FROM range(?) t(i)
+    ORDER BY cocontacontabil, coug
+"""
+
+
+def processo_carga(caminho, perfil, linhas, parar, concluidas, tempo_total):
+    """Processo ETL: repete a carga até o sinal de parada (e pelo menos uma vez)"""
+    conn = duckdb.connect(caminho)
+    if perfil:
+        conn.execute(db_duckdb.perfis[perfil])
+    while not parar.is_set() or concluidas.value == 0:
+        inicio = time.perf_counter()
+        conn.execute(SQL_CARGA, [linhas])
+        tempo_total.value += (time.perf_counter() - inicio) * 1000
+        concluidas.value += 1
+    conn.close()
+
+
+def consulta_web(caminho, perfil, sql):
+    """Uma consulta como no db_manager: conexão própria, perfil e leitura"""
+    inicio = time.perf_counter()
+    conn = duckdb.connect(caminho)
+    try:
+        if perfil:
+            conn.execute(db_duckdb.perfis[perfil])
+        conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+    return (time.perf_counter() - inicio) * 1000
+
+
+def medir(funcao, repeticoes):
+    """Executa a função N vezes (após um aquecimento) e retorna a mediana em ms"""
+    funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def executar_cenario(pasta, consultas, threads_web, linhas, perfil_web, perfil_etl, com_carga):
+    """Retorna (latências web em ms, tempo médio da carga em ms)"""
+    contexto = multiprocessing.get_context('spawn')
+    parar = contexto.Event()
+    concluidas = contexto.Value('i', 0)
+    tempo_total = contexto.Value('d', 0.0)
+    carga = None
+    if com_carga:
+        carga = contexto.Process(
+            target=processo_carga,
+            args=(os.path.join(pasta, 'carga.duckdb'), perfil_etl, linhas, parar, concluidas, tempo_total)
+        )
+        carga.start()
+        time.sleep(2)  # A carga já em andamento quando as consultas começam
+
+    leitura = os.path.join(pasta, 'leitura.duckdb')
+    tarefas = [CONSULTAS_WEB[i % len(CONSULTAS_WEB)] for i in range(consultas * threads_web)]
+    with ThreadPoolExecutor(max_workers=threads_web) as executor:
+        latencias = list(executor.map(lambda sql: consulta_web(leitura, perfil_web, sql), tarefas))
+
+    if carga is None:
+        return latencias, None
+    parar.set()
+    carga.join()
+    return latencias, tempo_total.value / concluidas.value
+
+
+def main():
+    consultas = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    threads_web = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    linhas = int(sys.argv[3]) if len(sys.argv) > 3 else 2_000_000
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK - PERFIS DE CONEXÃO DO DUCKDB (WEB x ETL)")
+    print("=" * 70)
+    print(f"Consultas por thread: {consultas} | Threads web: {threads_web} | "
+          f"Linhas: {linhas:,} | Núcleos: {os.cpu_count()}")
+    print(f"Perfil web: {db_duckdb.perfis['web']}")
+    print(f"Perfil etl: {db_duckdb.perfis['etl']}")
+
+    pasta = tempfile.TemporaryDirectory()
+    conn = duckdb.connect(os.path.join(pasta.name, 'leitura.duckdb'))
+    conn.execute(SQL_SALDO, [linhas])
+    conn.execute("CHECKPOINT")
+    conn.close()
+
+    leitura = os.path.join(pasta.name, 'leitura.duckdb')
+    print("\n📊 Consulta isolada (mediana, ms):")
+    for perfil in (None, 'web'):
+        tempos = [medir(lambda: consulta_web(leitura, perfil, sql), 5) for sql in CONSULTAS_WEB]
+        print(f"   {perfil or 'padrão':<10} " + ' | '.join(f"{t:8.1f}" for t in tempos))
+
+    cenarios = [
+        ('sem carga', None, None, False),
+        ('padrão', None, None, True),
+        ('perfis', 'web', 'etl', True),
+    ]
+    print(f"\n📊 {'Cenário':<12} {'mediana (ms)':>13} {'p95 (ms)':>10} {'carga (ms)':>11}")
+    for nome, perfil_web, perfil_etl, com_carga in cenarios:
+        latencias, carga = executar_cenario(
+            pasta.name, consultas, threads_web, linhas, perfil_web, perfil_etl, com_carga
+        )
+        latencias.sort()
+        p95 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))]
+        carga = f"{carga:11.1f}" if carga is not None else f"{'-':>11}"
+        print(f"   {nome:<12} {statistics.median(latencias):13.1f} {p95:10.1f} {carga}")
+    pasta.cleanup()
+
+
+if __name__ == "__main__":
+    main()
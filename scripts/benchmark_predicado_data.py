@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Benchmark: filtro do exercício por intervalo de datas
+(dalancamento >= inicio AND dalancamento < fim, ordenado pela data) versus a
+forma antiga (YEAR(dalancamento) = ano, ordenado por MONTH(dalancamento)).
+
+O intervalo deixa o DuckDB descartar pelos zonemaps os blocos fora do ano,
+que a função sobre a coluna impede. Mede as tabelas sintéticas de 1,4 e 14
+milhões de linhas (geradas em memória, carregadas em ordem de período como no
+ETL) e, se a base DuckDB local existir, as tabelas reais de lançamento.
+
+Uso:
+    python scripts/benchmark_predicado_data.py [repeticoes]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import statistics
+from datetime import date
+import duckdb
+from pathlib import Path
+
+DB_PATH = Path("dados_brutos/fato/db_local/uban.duckdb")
+LIMITE = 10000
+TAMANHOS_SINTETICOS = (1_400_000, 14_000_000)
+
+# Dez exercícios e 150 contas contábeis, como no histórico de produção
+ANO_INICIAL = 2016
+QUANTIDADE_ANOS = 10
+QUANTIDADE_CONTAS = 150
+
+QUERY_DADOS_ANTIGA = """
+SELECT
+    MONTH(dalancamento) as mes,
+    nudocumento,
+    valancamento,
+    strftime(dalancamento, '%d/%m/%Y') as data_formatada,
+    tipo_lancamento,
+    COUNT(*) OVER () as total_registros
+FROM {tabela}
+WHERE YEAR(dalancamento) = ?
+    AND cocontacontabil = ?
+ORDER BY MONTH(dalancamento), dalancamento, nudocumento
+LIMIT ?
+"""
+
+QUERY_DADOS_NOVA = """
+SELECT
+    MONTH(dalancamento) as mes,
+    nudocumento,
+    valancamento,
+    strftime(dalancamento, '%d/%m/%Y') as data_formatada,
+    tipo_lancamento,
+    COUNT(*) OVER () as total_registros
+FROM {tabela}
+WHERE (dalancamento >= ? AND dalancamento < ?)
+    AND cocontacontabil = ?
+ORDER BY dalancamento, nudocumento
+LIMIT ?
+"""
+
+QUERY_TOTAIS_ANTIGA = """
+SELECT tipo_lancamento, COUNT(*) as quantidade, SUM(valancamento) as total
+FROM {tabela}
+WHERE YEAR(dalancamento) = ? AND cocontacontabil = ?
+GROUP BY tipo_lancamento
+ORDER BY tipo_lancamento
+"""
+
+QUERY_TOTAIS_NOVA = """
+SELECT tipo_lancamento, COUNT(*) as quantidade, SUM(valancamento) as total
+FROM {tabela}
+WHERE (dalancamento >= ? AND dalancamento < ?) AND cocontacontabil = ?
+GROUP BY tipo_lancamento
+ORDER BY tipo_lancamento
+"""
+
+
+def criar_tabela_sintetica(conn, linhas):
+    """Gera lançamentos ordenados por data, distribuídos por QUANTIDADE_ANOS exercícios"""
+    tabela = f"lancamento_sintetico_{linhas}"
+    dias = (date(ANO_INICIAL + QUANTIDADE_ANOS, 1, 1) - date(ANO_INICIAL, 1, 1)).days
+    conn.execute(f"""
+        CREATE TABLE {tabela} AS
+        SELECT
+            DATE '{ANO_INICIAL}-01-01' + CAST(i * {dias} // {linhas} AS INTEGER) as dalancamento,
+            '6212' || lpad(CAST(hash(i) % {QUANTIDADE_CONTAS} AS VARCHAR), 5, '0') as cocontacontabil,
+            'NL' || lpad(CAST(i AS VARCHAR), 10, '0') as nudocumento,
+            CAST((hash(i * 7) % 1000000) / 100.0 AS DECIMAL(18,2)) as valancamento,
+            CASE WHEN hash(i * 3) % 2 = 0 THEN 'DEBITO' ELSE 'CREDITO' END as tipo_lancamento
+        FROM range({linhas}) t(i)
+        ORDER BY i
+    """)
+    return tabela
+
+
+def escolher_parametros(conn, tabela):
+    """Retorna (ano, conta, quantidade) da conta com mais lançamentos no último ano"""
+    return conn.execute(f"""
+        SELECT YEAR(dalancamento) as ano, cocontacontabil, COUNT(*) as qtd
+        FROM {tabela}
+        WHERE dalancamento IS NOT NULL
+        GROUP BY 1, 2
+        ORDER BY ano DESC, qtd DESC
+        LIMIT 1
+    """).fetchone()
+
+
+def medir(funcao, repeticoes):
+    """Executa a função N vezes (após um aquecimento) e retorna os tempos em ms"""
+    funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def comparar(descricao, antiga, nova, repeticoes):
+    # Empates de data/documento podem vir em ordem diferente; compara-se o conteúdo
+    assert antiga() == nova(), f"Resultados divergentes em {descricao}"
+    tempos_antiga = medir(antiga, repeticoes)
+    tempos_nova = medir(nova, repeticoes)
+    print(f"   {descricao}")
+    print(f"      YEAR()/MONTH()       : mediana {statistics.median(tempos_antiga):8.1f} ms")
+    print(f"      Intervalo de datas   : mediana {statistics.median(tempos_nova):8.1f} ms")
+    print(f"      Ganho                : {statistics.median(tempos_antiga) / statistics.median(tempos_nova):.2f}x")
+
+
+def benchmark_tabela(conn, tabela, repeticoes):
+    total_linhas = conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+    ano, conta, qtd = escolher_parametros(conn, tabela)
+    inicio, fim = date(ano, 1, 1), date(ano + 1, 1, 1)
+    print(f"\n📊 {tabela} ({total_linhas:,} linhas): ano={ano}, conta={conta} ({qtd:,} lançamentos)")
+
+    def dados_antiga():
+        df = conn.execute(QUERY_DADOS_ANTIGA.format(tabela=tabela), [ano, conta, LIMITE]).fetchdf()
+        return sorted(df['nudocumento']), int(df['total_registros'].iloc[0]) if len(df) else 0
+
+    def dados_nova():
+        df = conn.execute(QUERY_DADOS_NOVA.format(tabela=tabela), [inicio, fim, conta, LIMITE]).fetchdf()
+        return sorted(df['nudocumento']), int(df['total_registros'].iloc[0]) if len(df) else 0
+
+    def totais_antiga():
+        return conn.execute(QUERY_TOTAIS_ANTIGA.format(tabela=tabela), [ano, conta]).fetchall()
+
+    def totais_nova():
+        return conn.execute(QUERY_TOTAIS_NOVA.format(tabela=tabela), [inicio, fim, conta]).fetchall()
+
+    comparar("Página + contagem", dados_antiga, dados_nova, repeticoes)
+    comparar("Totais por tipo  ", totais_antiga, totais_nova, repeticoes)
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK - FILTRO DO EXERCÍCIO POR INTERVALO DE DATAS")
+    print("=" * 70)
+    print(f"Repetições: {repeticoes} | Limite da página: {LIMITE:,}")
+
+    conn = duckdb.connect()
+    try:
+        for linhas in TAMANHOS_SINTETICOS:
+            print(f"\n⚙️  Gerando tabela sintética com {linhas:,} linhas...")
+            tabela = criar_tabela_sintetica(conn, linhas)
+            benchmark_tabela(conn, tabela, repeticoes)
+            conn.execute(f"DROP TABLE {tabela}")
+    finally:
+        conn.close()
+
+    if not DB_PATH.exists():
+        print(f"\n⚠️  Banco local não encontrado ({DB_PATH}); tabelas reais não medidas")
+        return
+
+    conn = duckdb.connect(str(DB_PATH), read_only=True)
+    try:
+        for tabela in ('receita_lancamento', 'despesa_lancamento'):
+            benchmark_tabela(conn, tabela, repeticoes)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
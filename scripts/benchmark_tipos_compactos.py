@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmark: layout compacto da despesa_lancamento no DuckDB
+(app/modules/etl_despesa_lancamento_duckdb.py).
+
+Gera lançamentos sintéticos no layout antigo (período, tipo, hora e conta
+corrente em VARCHAR, com as partes da conta repetidas em colunas) e os
+converte para o layout compacto com o mesmo SELECT da carga (ENUM, TIME,
+partes da conta em inteiros e cocontacorrente/periodo/natureza como colunas
+geradas). Para cada layout mede:
+  - tamanho do arquivo do banco (após CHECKPOINT);
+  - memória da tabela em um banco em memória (duckdb_memory);
+  - tempo das leituras típicas da tela de detalhamento.
+
+Uso:
+    python scripts/benchmark_tipos_compactos.py [repeticoes] [linhas]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import statistics
+import tempfile
+
+import duckdb
+
+from app.modules.etl_despesa_lancamento_duckdb import COLUNAS_GRAVADAS, ddl_despesa_lancamento, select_compacto
+
+NATUREZAS = ['339030', '339039', '319011', '449052', '339014', '339036', '339093', '319113']
+
+# Layout antigo: tudo o que a carga produzia, com as partes da conta em texto
+# (a conta contábil já era BIGINT, como na dim_conta_contabil e na despesa_saldo)
+SQL_LAYOUT_ANTIGO = """
+    CREATE {temporaria} TABLE {tabela} AS
+    WITH base AS (
+        SELECT
+            i,
+            (2024 + i % 2) as coexercicio,
+            1 + (i // 7) % 12 as inmes,
+            CASE WHEN hash(i) % 2 = 0 THEN 'D' ELSE 'C' END as indebitocredito,
+            CAST(1 + hash(i * 3) % 2 AS VARCHAR) as inesfera,
+            CAST(10000 + hash(i * 5) % 400 AS VARCHAR) as couo,
+            lpad(CAST(hash(i * 7) % 28 AS VARCHAR), 2, '0') as cofuncao,
+            CAST(100 + hash(i * 11) % 800 AS VARCHAR) as cosubfuncao,
+            lpad(CAST(hash(i * 13) % 300 AS VARCHAR), 4, '0') as coprograma,
+            CAST(1000 + hash(i * 17) % 2000 AS VARCHAR) as coprojeto,
+            lpad(CAST(hash(i * 19) % 50 AS VARCHAR), 4, '0') as cosubtitulo,
+            '5' || lpad(CAST(hash(i * 23) % 1000 AS VARCHAR), 3, '0') || '00000' as cofonte,
+            (?::VARCHAR[])[CAST(1 + hash(i * 29) % 8 AS BIGINT)] as conatureza,
+            CASE WHEN hash(i * 31) % 10 < 3 THEN lpad(CAST(hash(i * 37) % 99 AS VARCHAR), 2, '0') END as cosubelemento
+        FROM range(?) t(i)
+    )
+    SELECT
+        CAST(coexercicio AS INTEGER) as coexercicio,
+        CAST(100000 + hash(i * 41) % 300 AS INTEGER) as coug,
+        1 as cogestao,
+        coexercicio || 'NE' || lpad(CAST(i // 3 AS VARCHAR), 6, '0') as nudocumento,
+        CAST(i % 3 AS INTEGER) as nulancamento,
+        CAST(500000 + hash(i * 43) % 200 AS INTEGER) as coevento,
+        CAST('6221' || lpad(CAST(hash(i * 47) % 50 AS VARCHAR), 5, '0') AS BIGINT) as cocontacontabil,
+        -- 1% das contas fora do padrão de 38/40 dígitos
+        CASE WHEN i % 100 = 0 THEN 'CONTA ' || i % 10
+             ELSE inesfera || couo || cofuncao || cosubfuncao || coprograma || coprojeto
+                  || cosubtitulo || cofonte || conatureza || COALESCE(cosubelemento, '') END as cocontacorrente,
+        CAST(inmes AS INTEGER) as inmes,
+        make_date(coexercicio, inmes, 1 + i % 28) as dalancamento,
+        CAST((hash(i * 53) % 10000000) / 100.0 AS DECIMAL(18,2)) as valancamento,
+        indebitocredito,
+        0 as inabreencerra,
+        CAST(100000 + hash(i * 59) % 300 AS INTEGER) as cougdestino,
+        1 as cogestaodestino,
+        make_date(coexercicio, inmes, 1 + i % 28) as datransacao,
+        lpad(CAST(8 + i % 10 AS VARCHAR), 2, '0') || ':' || lpad(CAST(i % 60 AS VARCHAR), 2, '0') || ':00' as hotransacao,
+        CAST(100000 + hash(i * 41) % 300 AS INTEGER) as cougcontab,
+        1 as cogestaocontab,
+        inesfera, couo, cofuncao, cosubfuncao, coprograma, coprojeto, cosubtitulo, cofonte, conatureza,
+        substr(conatureza, 1, 1) as incategoria,
+        substr(conatureza, 2, 1) as cogrupo,
+        substr(conatureza, 3, 2) as comodalidade,
+        substr(conatureza, 5, 2) as coelemento,
+        cosubelemento,
+        coexercicio || '-' || lpad(CAST(inmes AS VARCHAR), 2, '0') as periodo,
+        CASE indebitocredito WHEN 'D' THEN 'DEBITO' ELSE 'CREDITO' END as tipo_lancamento
+    FROM base
+    ORDER BY dalancamento
+"""
+
+# Leituras da tela de detalhamento (e da validação da carga)
+CONSULTAS = [
+    ('Totais por tipo', """
+        SELECT tipo_lancamento, COUNT(*), SUM(valancamento)
+        FROM despesa_lancamento GROUP BY tipo_lancamento
+    """),
+    # Mesmo filtro de ETLLancamentoDuckDB.filtro_periodo (colunas gravadas)
+    ('Filtro por período', """
+        SELECT COUNT(*), SUM(valancamento) FROM despesa_lancamento WHERE coexercicio = 2025 AND inmes = 6
+    """),
+    ('Naturezas do ano', """
+        SELECT conatureza, COUNT(*), SUM(valancamento)
+        FROM despesa_lancamento WHERE coexercicio = 2025 GROUP BY conatureza
+    """),
+    ('Grade de uma conta', """
+        SELECT nudocumento, conatureza, cocontacorrente, valancamento, tipo_lancamento,
+               CAST(cofonte AS INTEGER), CAST(couo AS INTEGER), CAST(coprograma AS INTEGER)
+        FROM despesa_lancamento WHERE coexercicio = 2025 AND cocontacontabil = '622100007'
+        ORDER BY dalancamento, nudocumento
+    """),
+]
+
+
+def criar_layout_antigo(conn, linhas, tabela='despesa_lancamento', temporaria=False):
+    conn.execute(
+        SQL_LAYOUT_ANTIGO.format(tabela=tabela, temporaria='TEMP' if temporaria else ''),
+        [NATUREZAS, linhas]
+    )
+
+
+def criar_layout_compacto(conn, linhas):
+    """
+    Converte o layout antigo com o SELECT usado pela carga. A origem fica numa
+    tabela temporária (em memória), para não ocupar blocos no arquivo medido.
+    """
+    criar_layout_antigo(conn, linhas, tabela='despesa_antiga', temporaria=True)
+    colunas_antigas = {linha[0] for linha in conn.execute("DESCRIBE despesa_antiga").fetchall()}
+    colunas = ', '.join(coluna for coluna, _ in COLUNAS_GRAVADAS)
+    conn.execute(ddl_despesa_lancamento('despesa_lancamento'))
+    conn.execute(f"""
+        INSERT INTO despesa_lancamento ({colunas})
+        SELECT {select_compacto(colunas_antigas)} FROM despesa_antiga ORDER BY dalancamento
+    """)
+    conn.execute("DROP TABLE despesa_antiga")
+
+
+def memoria_tabela(criar):
+    """Bytes da tabela em um banco em memória"""
+    conn = duckdb.connect()
+    criar(conn)
+    bytes_ = conn.execute(
+        "SELECT SUM(memory_usage_bytes) FROM duckdb_memory() WHERE tag = 'IN_MEMORY_TABLE'"
+    ).fetchone()[0]
+    conn.close()
+    return bytes_
+
+
+def medir(funcao, repeticoes):
+    """Executa a função N vezes (após um aquecimento) e retorna a mediana em ms"""
+    funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    linhas = int(sys.argv[2]) if len(sys.argv) > 2 else 1_400_000
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK - LAYOUT COMPACTO DA DESPESA_LANCAMENTO")
+    print("=" * 70)
+    print(f"Repetições: {repeticoes} | Linhas: {linhas:,}")
+
+    pasta = tempfile.TemporaryDirectory()
+    resultados = {}
+    for layout, criar in (('antigo', criar_layout_antigo), ('compacto', criar_layout_compacto)):
+        caminho = os.path.join(pasta.name, f'{layout}.duckdb')
+        conn = duckdb.connect(caminho)
+        criar(conn, linhas)
+        conn.execute("CHECKPOINT")
+        tempos = {}
+        respostas = {}
+        for nome, sql in CONSULTAS:
+            respostas[nome] = sorted(conn.execute(sql).fetchall(), key=str)
+            tempos[nome] = medir(lambda: conn.execute(sql).fetchall(), repeticoes)
+        conn.close()
+        resultados[layout] = {
+            'arquivo': os.path.getsize(caminho),
+            'memoria': memoria_tabela(lambda conn: criar(conn, linhas)),
+            'tempos': tempos,
+            'respostas': respostas,
+        }
+    pasta.cleanup()
+
+    # As duas versões têm de responder o mesmo (as partes da conta comparadas como inteiros)
+    for nome, _ in CONSULTAS:
+        antigo = [tuple(str(v) for v in linha) for linha in resultados['antigo']['respostas'][nome]]
+        compacto = [tuple(str(v) for v in linha) for linha in resultados['compacto']['respostas'][nome]]
+        assert antigo == compacto, f"Resultados divergentes em {nome}"
+
+    antigo, compacto = resultados['antigo'], resultados['compacto']
+    mb = 1024 * 1024
+    print(f"\n📊 {'':<22} {'antigo':>10} {'compacto':>10} {'redução':>9}")
+    print(f"   {'Arquivo (MB)':<22} {antigo['arquivo'] / mb:10.1f} {compacto['arquivo'] / mb:10.1f} "
+          f"{1 - compacto['arquivo'] / antigo['arquivo']:9.0%}")
+    print(f"   {'Memória (MB)':<22} {antigo['memoria'] / mb:10.1f} {compacto['memoria'] / mb:10.1f} "
+          f"{1 - compacto['memoria'] / antigo['memoria']:9.0%}")
+    for nome, _ in CONSULTAS:
+        t_antigo, t_compacto = antigo['tempos'][nome], compacto['tempos'][nome]
+        print(f"   {nome + ' (ms)':<22} {t_antigo:10.1f} {t_compacto:10.1f} {1 - t_compacto / t_antigo:9.0%}")
+
+
+if __name__ == "__main__":
+    main()
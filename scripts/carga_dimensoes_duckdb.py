@@ -2,6 +2,20 @@
 """
 Script VERDADEIRAMENTE INTELIGENTE para carregar dimensões no DuckDB.
 Aprende e lembra dos mapeamentos arquivo->tabela usando um arquivo JSON.
+
+Carga incremental:
+  - arquivos com o mesmo hash MD5 da última carga são pulados sem abrir o
+    banco (o arquivo do banco não muda e os caches continuam válidos);
+  - os arquivos alterados são lidos em paralelo (processos) e comparados com
+    a tabela existente; só as linhas novas, alteradas ou removidas são
+    gravadas (DELETE + INSERT pela chave, em uma transação);
+  - só as tabelas que de fato mudaram entram no etl_control, o que muda a
+    versão dos dados: as telas (outros processos) releem os dicionários de
+    dimensões e as respostas em cache na próxima requisição, e o índice de
+    inconsistências de receita é recalculado se uma dimensão das regras mudou.
+
+Uso:
+    python scripts/carga_dimensoes_duckdb.py [--auto] [--forcar] [--paralelo N]
 """
 import sys
 import os
@@ -11,10 +25,17 @@ import pandas as pd
 import duckdb
 from pathlib import Path
 from datetime import datetime
+import argparse
 import logging
 import re
 import json
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from app.modules.etl_inconsistencias_receita_duckdb import (
+    DIMENSOES_INCONSISTENCIAS, recalcular_inconsistencias
+)
+from app.modules.controle_carga import controle_carga
+from app.modules.database_duckdb import db_duckdb
 
 # Configurar logging
 logging.basicConfig(
@@ -23,6 +44,276 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+def ler_arquivo_dimensao(caminho):
+    """Lê a planilha da dimensão com as colunas em minúsculas (executado em processo separado)"""
+    df = pd.read_excel(caminho)
+    df.columns = df.columns.str.lower()
+    return df
+
+
+def ler_arquivos_paralelo(itens, paralelo=4):
+    """
+    Lê as planilhas em paralelo. Retorna {arquivo: DataFrame ou exceção}.
+    A leitura de Excel é CPU (openpyxl), por isso processos e não threads.
+    """
+    if not itens:
+        return {}
+    if paralelo <= 1 or len(itens) == 1:
+        lidos = {}
+        for item in itens:
+            try:
+                lidos[item['arquivo']] = ler_arquivo_dimensao(item['caminho'])
+            except Exception as e:
+                lidos[item['arquivo']] = e
+        return lidos
+
+    lidos = {}
+    with ProcessPoolExecutor(max_workers=min(paralelo, len(itens))) as executor:
+        futuros = {item['arquivo']: executor.submit(ler_arquivo_dimensao, item['caminho']) for item in itens}
+        for arquivo, futuro in futuros.items():
+            try:
+                lidos[arquivo] = futuro.result()
+            except Exception as e:
+                lidos[arquivo] = e
+    return lidos
+
+
+def normalizar_chave(pk):
+    """Chave como lista de colunas (mapeamentos antigos guardam uma coluna só)"""
+    if not pk:
+        return []
+    return [pk] if isinstance(pk, str) else list(pk)
+
+
+def pontuar_nome_coluna(col):
+    """Peso do nome da coluna como candidata a chave (padrões comuns de PK)"""
+    score = 0
+    if col.startswith('co'):
+        score += 3
+    if col.startswith('id'):
+        score += 3
+    if 'codigo' in col or 'code' in col:
+        score += 2
+    if col.endswith('id'):
+        score += 1
+    return score
+
+
+def _colunas_tipos(conn, tabela):
+    """[(coluna, tipo)] da tabela, ou [] se ela não existe"""
+    try:
+        return [(c[0], c[1]) for c in conn.execute(f"DESCRIBE {tabela}").fetchall()]
+    except duckdb.CatalogException:
+        return []
+
+
+def preparar_arquivo(conn, df, nome_tabela=None):
+    """
+    Converte o DataFrame uma única vez para a tabela temporária dim_arquivo,
+    lida pela detecção da chave e pela gravação. Se a tabela de destino já
+    existe com as mesmas colunas, o arquivo já é convertido para os tipos dela.
+    """
+    conn.register('df_temp', df)
+    try:
+        destino = _colunas_tipos(conn, nome_tabela) if nome_tabela else []
+        if destino and [c for c, _ in destino] == list(df.columns):
+            try:
+                conn.execute(f"CREATE OR REPLACE TEMP TABLE dim_arquivo AS SELECT * FROM {nome_tabela} LIMIT 0")
+                conn.execute("INSERT INTO dim_arquivo SELECT * FROM df_temp")
+                return
+            except duckdb.Error:
+                pass
+        conn.execute("CREATE OR REPLACE TEMP TABLE dim_arquivo AS SELECT * FROM df_temp")
+    finally:
+        conn.unregister('df_temp')
+
+
+def inferir_chave_primaria(conn, tabela='dim_arquivo', chave_conhecida=None, limite_compostas=6):
+    """
+    Infere a chave (lista de colunas) na tabela preparada, sem percorrer o
+    DataFrame coluna a coluna:
+      1. uma única agregação dá, para todas as colunas, a cardinalidade
+         (COUNT DISTINCT) e a quantidade de não nulos; a pontuação é a mesma
+         de antes (nome + unicidade);
+      2. se a melhor coluna não for única, os pares das colunas de código
+         sem nulos e de maior cardinalidade são testados em uma consulta
+         (ex.: cofonte + coalinea).
+    chave_conhecida: chave salva nos mapeamentos, mantida se ainda for única.
+    """
+    colunas = [c[0] for c in conn.execute(f"DESCRIBE {tabela}").fetchall()]
+    if chave_conhecida and chave_valida(conn, tabela, chave_conhecida):
+        return list(chave_conhecida)
+
+    valores = conn.execute("SELECT COUNT(*), " + ', '.join(
+        f'COUNT(DISTINCT "{c}"), COUNT("{c}")' for c in colunas
+    ) + f" FROM {tabela}").fetchone()
+    total = valores[0]
+    if total == 0:
+        return colunas[:1]
+    distintos = {c: valores[2 * i + 1] for i, c in enumerate(colunas)}
+    sem_nulos = {c for i, c in enumerate(colunas) if valores[2 * i + 2] == total}
+
+    pontuacao = {}
+    for col in colunas:
+        score = pontuar_nome_coluna(col)
+        unicidade = distintos[col] / total
+        if unicidade == 1.0:
+            score += 5
+        elif unicidade > 0.95:
+            score += 3
+        elif unicidade > 0.8:
+            score += 1
+        pontuacao[col] = score
+
+    melhor = max(colunas, key=lambda c: pontuacao[c])
+    if pontuacao[melhor] == 0:
+        return colunas[:1]
+    if distintos[melhor] == total and melhor in sem_nulos:
+        return [melhor]
+
+    # Chave composta: pares das colunas de código sem nulos
+    codigos = sorted(
+        (c for c in colunas if pontuar_nome_coluna(c) > 0 and c in sem_nulos),
+        key=lambda c: distintos[c], reverse=True
+    )[:limite_compostas]
+    pares = [(a, b) for i, a in enumerate(codigos) for b in codigos[i + 1:]]
+    if pares:
+        valores = conn.execute("SELECT " + ', '.join(
+            f'COUNT(DISTINCT ("{a}", "{b}"))' for a, b in pares
+        ) + f" FROM {tabela}").fetchone()
+        unicos = [par for par, qtd in zip(pares, valores) if qtd == total]
+        if unicos:
+            a, b = max(unicos, key=lambda par: pontuacao[par[0]] + pontuacao[par[1]])
+            # Na ordem das colunas do arquivo
+            return sorted([a, b], key=colunas.index)
+    return [melhor]
+
+
+def _colunas_sql(pk):
+    return ', '.join(f'"{c}"' for c in pk)
+
+
+def chave_valida(conn, tabela, pk):
+    """A chave é única e sem nulos na tabela?"""
+    if not pk:
+        return False
+    chave = _colunas_sql(pk)
+    nulos = ' OR '.join(f'"{c}" IS NULL' for c in pk)
+    return conn.execute(f"""
+        SELECT COUNT(*) = COUNT(DISTINCT ({chave})) AND COUNT(*) FILTER (WHERE {nulos}) = 0
+        FROM {tabela}
+    """).fetchone()[0]
+
+
+def garantir_chave_primaria(conn, nome_tabela, pk):
+    """
+    Cria a PRIMARY KEY com a chave detectada, se a tabela ainda não tem uma
+    e os dados permitem. A constraint garante a unicidade nas próximas cargas
+    e cria o índice (ART) usado nos filtros por código.
+    """
+    existente = conn.execute("""
+        SELECT constraint_column_names FROM duckdb_constraints()
+        WHERE table_name = ? AND constraint_type = 'PRIMARY KEY'
+    """, [nome_tabela]).fetchone()
+    if existente:
+        return list(existente[0])
+    if not chave_valida(conn, nome_tabela, pk):
+        return None
+    conn.execute(f"ALTER TABLE {nome_tabela} ADD PRIMARY KEY ({_colunas_sql(pk)})")
+    return pk
+
+
+def aplicar_dimensao(conn, nome_tabela, pk, origem='dim_arquivo'):
+    """
+    Grava o arquivo preparado (preparar_arquivo) na tabela aplicando só a
+    diferença e cria a PRIMARY KEY com a chave detectada.
+
+    Retorna (ação, inseridos, removidos), com ação em 'criada', 'recriada',
+    'atualizada' ou 'sem_alteracao':
+      - chave única no arquivo: a diferença é calculada pela chave + hash da
+        linha (anti-joins); as linhas antigas das chaves alteradas ou
+        removidas são apagadas e as novas versões inseridas;
+      - sem chave única: diferença por EXCEPT ALL da linha inteira e, se
+        houver, a tabela é recriada;
+      - colunas diferentes (ou tipos incompatíveis): a tabela é recriada.
+    """
+    destino = _colunas_tipos(conn, nome_tabela)
+    total = conn.execute(f"SELECT COUNT(*) FROM {origem}").fetchone()[0]
+
+    if not destino:
+        conn.execute(f"CREATE TABLE {nome_tabela} AS SELECT * FROM {origem}")
+        garantir_chave_primaria(conn, nome_tabela, pk)
+        return 'criada', total, 0
+
+    temporarias = ['dim_nova', 'dim_h_nova', 'dim_h_atual', 'dim_inserir', 'dim_remover']
+    try:
+        arquivo = _colunas_tipos(conn, origem)
+        compativel = arquivo == destino
+        if not compativel and [c for c, _ in arquivo] == [c for c, _ in destino]:
+            try:
+                # Mesmas colunas com outros tipos: converte para os da tabela
+                conn.execute(f"CREATE OR REPLACE TEMP TABLE dim_nova AS SELECT * FROM {nome_tabela} LIMIT 0")
+                conn.execute(f"INSERT INTO dim_nova SELECT * FROM {origem}")
+                origem, compativel = 'dim_nova', True
+            except duckdb.Error:
+                pass
+
+        if not compativel:
+            conn.execute(f"CREATE OR REPLACE TABLE {nome_tabela} AS SELECT * FROM {origem}")
+            garantir_chave_primaria(conn, nome_tabela, pk)
+            return 'recriada', total, 0
+
+        colunas = [c for c, _ in destino]
+        chave_unica = all(c in colunas for c in pk) and chave_valida(conn, origem, pk)
+
+        if not chave_unica:
+            inseridos = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT * FROM {origem} EXCEPT ALL SELECT * FROM {nome_tabela})"
+            ).fetchone()[0]
+            removidos = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT * FROM {nome_tabela} EXCEPT ALL SELECT * FROM {origem})"
+            ).fetchone()[0]
+            if inseridos == 0 and removidos == 0:
+                return 'sem_alteracao', 0, 0
+            conn.execute(f"CREATE OR REPLACE TABLE {nome_tabela} AS SELECT * FROM {origem}")
+            return 'recriada', inseridos, removidos
+
+        # Chave + hash da linha: só as chaves e um inteiro por linha são comparados
+        chave = _colunas_sql(pk)
+        linha = _colunas_sql(colunas)
+        conn.execute(f"CREATE OR REPLACE TEMP TABLE dim_h_nova AS SELECT {chave}, hash({linha}) AS _h FROM {origem}")
+        conn.execute(f"CREATE OR REPLACE TEMP TABLE dim_h_atual AS SELECT {chave}, hash({linha}) AS _h FROM {nome_tabela}")
+        conn.execute(f"CREATE OR REPLACE TEMP TABLE dim_inserir AS SELECT {chave} FROM dim_h_nova ANTI JOIN dim_h_atual USING ({chave}, _h)")
+        conn.execute(f"CREATE OR REPLACE TEMP TABLE dim_remover AS SELECT {chave} FROM dim_h_atual ANTI JOIN dim_h_nova USING ({chave}, _h)")
+        inseridos = conn.execute("SELECT COUNT(*) FROM dim_inserir").fetchone()[0]
+        removidos = conn.execute("SELECT COUNT(*) FROM dim_remover").fetchone()[0]
+
+        if inseridos == 0 and removidos == 0:
+            garantir_chave_primaria(conn, nome_tabela, pk)
+            return 'sem_alteracao', 0, 0
+
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            conn.execute(f"""
+                DELETE FROM {nome_tabela}
+                WHERE ({chave}) IN (SELECT {chave} FROM dim_remover UNION SELECT {chave} FROM dim_inserir)
+            """)
+            conn.execute(f"""
+                INSERT INTO {nome_tabela}
+                SELECT * FROM {origem} WHERE ({chave}) IN (SELECT {chave} FROM dim_inserir)
+            """)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        garantir_chave_primaria(conn, nome_tabela, pk)
+        return 'atualizada', inseridos, removidos
+    finally:
+        for temporaria in temporarias:
+            conn.execute(f"DROP TABLE IF EXISTS {temporaria}")
+
+
 class CarregadorVerdadeiramenteInteligente:
     """Carregador que REALMENTE aprende e lembra dos mapeamentos"""
     
@@ -37,6 +328,17 @@ class CarregadorVerdadeiramenteInteligente:
         # Carrega mapeamentos salvos ou cria novo
         self.mapeamentos = self.carregar_mapeamentos()
         self.historico = self.carregar_historico()
+        
+        # Marcado quando uma dimensão das regras de inconsistência é alterada
+        self.inconsistencias_pendentes = False
+        
+        # Tabelas cujo conteúdo mudou nesta execução (caches a invalidar)
+        self.tabelas_alteradas = set()
+        
+        # Execução sem perguntas (--auto), recarga forçada e leituras em paralelo
+        self.perguntar = True
+        self.forcar = False
+        self.paralelo = 4
     
     def carregar_mapeamentos(self):
         """Carrega mapeamentos salvos do arquivo JSON"""
@@ -121,52 +423,19 @@ class CarregadorVerdadeiramenteInteligente:
         print(f"   💡 Sugestão de nome: {nome}")
         return nome
     
-    def detectar_chave_primaria(self, df, nome_tabela):
-        """Detecta chave primária inteligentemente"""
-        colunas = df.columns.str.lower()
-        
-        # Se já conhece este arquivo, usa a PK salva
+    def detectar_chave_primaria(self, conn, nome_tabela, colunas):
+        """Detecta chave primária (lista de colunas) no arquivo preparado em dim_arquivo"""
+        # Se já conhece este arquivo, a PK salva é mantida se ainda for única
+        pk = None
         for arquivo, info in self.mapeamentos.items():
             if info['tabela'] == nome_tabela and 'pk' in info:
-                if info['pk'] in colunas:
-                    return info['pk']
-        
-        # Senão, tenta detectar
-        candidatos = []
-        
-        for col in colunas:
-            # Calcula score para cada coluna
-            score = 0
-            
-            # Padrões comuns
-            if col.startswith('co'):
-                score += 3
-            if col.startswith('id'):
-                score += 3
-            if 'codigo' in col or 'code' in col:
-                score += 2
-            if col.endswith('id'):
-                score += 1
-            
-            # Verifica unicidade
-            if len(df[col].dropna()) > 0:
-                unicidade = df[col].nunique() / len(df)
-                if unicidade == 1.0:
-                    score += 5
-                elif unicidade > 0.95:
-                    score += 3
-                elif unicidade > 0.8:
-                    score += 1
-            
-            if score > 0:
-                candidatos.append((col, score))
+                salva = normalizar_chave(info['pk'])
+                if salva and all(c in colunas for c in salva):
+                    pk = salva
+                    break
         
-        # Ordena por score e pega o melhor
-        if candidatos:
-            candidatos.sort(key=lambda x: x[1], reverse=True)
-            return candidatos[0][0]
-        
-        return colunas[0]
+        # Senão, infere no DuckDB (uma agregação para todas as colunas)
+        return inferir_chave_primaria(conn, 'dim_arquivo', chave_conhecida=pk)
     
     def analisar_situacao_completa(self):
         """Análise completa e inteligente da situação"""
@@ -181,7 +450,7 @@ class CarregadorVerdadeiramenteInteligente:
         # Listar tabelas no banco
         tabelas_banco = set()
         if self.db_path.exists():
-            conn = duckdb.connect(str(self.db_path))
+            conn = db_duckdb.get_connection(somente_leitura=True)
             try:
                 result = conn.execute("""
                     SELECT table_name 
@@ -217,21 +486,26 @@ class CarregadorVerdadeiramenteInteligente:
                             'arquivo': nome_arquivo,
                             'tabela': nome_tabela,
                             'ultima_carga': info.get('ultima_carga', 'desconhecida'),
-                            'caminho': arquivo
+                            'caminho': arquivo,
+                            'hash': hash_atual,
+                            'tabela_existe': True
                         })
                     else:
                         status_arquivos['conhecidos_existentes'].append({
                             'arquivo': nome_arquivo,
                             'tabela': nome_tabela,
                             'ultima_carga': info.get('ultima_carga', 'desconhecida'),
-                            'caminho': arquivo
+                            'caminho': arquivo,
+                            'hash': hash_atual,
+                            'tabela_existe': True
                         })
                 else:
                     # Tabela não existe (foi deletada?)
                     status_arquivos['conhecidos_ausentes'].append({
                         'arquivo': nome_arquivo,
                         'tabela': nome_tabela,
-                        'caminho': arquivo
+                        'caminho': arquivo,
+                        'hash': hash_atual
                     })
             else:
                 # Arquivo desconhecido
@@ -242,20 +516,35 @@ class CarregadorVerdadeiramenteInteligente:
                     status_arquivos['desconhecidos_com_tabela'].append({
                         'arquivo': nome_arquivo,
                         'tabela_sugerida': nome_sugerido,
-                        'caminho': arquivo
+                        'caminho': arquivo,
+                        'hash': hash_atual
                     })
                 else:
                     # Completamente novo
                     status_arquivos['novos'].append({
                         'arquivo': nome_arquivo,
                         'tabela_sugerida': nome_sugerido,
-                        'caminho': arquivo
+                        'caminho': arquivo,
+                        'hash': hash_atual
                     })
         
         return status_arquivos, tabelas_banco
     
-    def processar_arquivo_com_aprendizado(self, info_arquivo):
-        """Processa arquivo e aprende o mapeamento"""
+    def processar_arquivo_com_aprendizado(self, info_arquivo, df=None, conn=None):
+        """
+        Processa arquivo e aprende o mapeamento. df e conn vêm de
+        processar_lote (arquivo já lido e conexão compartilhada); sem eles,
+        o arquivo é lido e a conexão aberta aqui.
+        """
+        if conn is None:
+            # Arquivo avulso: grava em uma cópia do banco, publicada no final
+            with db_duckdb.carga():
+                conn = db_duckdb.get_connection(perfil='etl')
+                try:
+                    return self.processar_arquivo_com_aprendizado(info_arquivo, df, conn)
+                finally:
+                    conn.close()
+        
         arquivo = info_arquivo['arquivo']
         caminho = info_arquivo['caminho']
         
@@ -270,56 +559,60 @@ class CarregadorVerdadeiramenteInteligente:
         
         try:
             # Ler arquivo
-            df = pd.read_excel(caminho)
-            df.columns = df.columns.str.lower()
+            if df is None:
+                df = ler_arquivo_dimensao(caminho)
             
             print(f"   📊 {len(df):,} linhas, {len(df.columns)} colunas")
             
-            # Detectar PK
-            pk = self.detectar_chave_primaria(df, nome_tabela)
-            print(f"   🔑 Chave primária: {pk}")
-            
-            # Perguntar confirmação
-            print(f"   📋 Tabela: {nome_tabela}")
-            resp = input("   Confirmar (Enter), digitar outro nome (n), ou pular (p)? ").strip()
-            
-            if resp.lower() == 'p':
-                print("   ⏭️ Pulado")
-                return False
-            elif resp.lower() == 'n':
-                novo_nome = input("   Digite o nome da tabela: ").strip()
-                if novo_nome:
-                    nome_tabela = novo_nome
-            
-            # Verificar se tabela existe
-            conn = duckdb.connect(str(self.db_path))
             try:
-                existe = conn.execute(f"""
-                    SELECT COUNT(*) FROM information_schema.tables 
-                    WHERE table_name = '{nome_tabela}'
-                """).fetchone()[0] > 0
+                # Arquivo convertido uma vez, usado na detecção da PK e na gravação
+                preparar_arquivo(conn, df, nome_tabela)
+                
+                # Detectar PK
+                pk = self.detectar_chave_primaria(conn, nome_tabela, list(df.columns))
+                print(f"   🔑 Chave primária: {' + '.join(pk)}")
+                
+                # Perguntar confirmação
+                print(f"   📋 Tabela: {nome_tabela}")
+                if self.perguntar:
+                    resp = input("   Confirmar (Enter), digitar outro nome (n), ou pular (p)? ").strip()
+                    
+                    if resp.lower() == 'p':
+                        print("   ⏭️ Pulado")
+                        return False
+                    elif resp.lower() == 'n':
+                        novo_nome = input("   Digite o nome da tabela: ").strip()
+                        if novo_nome:
+                            nome_tabela = novo_nome
                 
-                if existe:
+                # Verificar se tabela existe
+                existe = conn.execute(
+                    "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [nome_tabela]
+                ).fetchone()[0] > 0
+                
+                if existe and self.perguntar:
                     count = conn.execute(f"SELECT COUNT(*) FROM {nome_tabela}").fetchone()[0]
                     print(f"   ⚠️ Tabela existe com {count:,} registros")
-                    resp = input("   Substituir? (s/N): ")
+                    resp = input("   Atualizar com as diferenças do arquivo? (s/N): ")
                     if resp.lower() != 's':
                         return False
-                    conn.execute(f"DROP TABLE {nome_tabela}")
-                
-                # Criar tabela
-                conn.register('df_temp', df)
-                conn.execute(f"CREATE TABLE {nome_tabela} AS SELECT * FROM df_temp")
-                conn.unregister('df_temp')
                 
+                # Gravar só a diferença em relação à tabela atual
+                acao, inseridos, removidos = aplicar_dimensao(conn, nome_tabela, pk)
                 count_final = conn.execute(f"SELECT COUNT(*) FROM {nome_tabela}").fetchone()[0]
-                print(f"   ✅ {count_final:,} registros carregados!")
+                if acao == 'sem_alteracao':
+                    print(f"   ✅ Conteúdo igual ao da tabela ({count_final:,} registros), nada gravado")
+                elif acao == 'atualizada':
+                    print(f"   ✅ {inseridos:,} linhas inseridas/alteradas, {removidos:,} removidas "
+                          f"({count_final:,} registros)")
+                else:
+                    print(f"   ✅ Tabela {acao}: {count_final:,} registros carregados!")
                 
                 # APRENDER E SALVAR o mapeamento
                 self.mapeamentos[arquivo] = {
                     'tabela': nome_tabela,
                     'pk': pk,
-                    'hash': self.calcular_hash_arquivo(caminho),
+                    'hash': info_arquivo.get('hash') or self.calcular_hash_arquivo(caminho),
                     'ultima_carga': datetime.now().isoformat(),
                     'registros': count_final,
                     'colunas': list(df.columns)
@@ -327,17 +620,85 @@ class CarregadorVerdadeiramenteInteligente:
                 self.salvar_mapeamentos()
                 
                 # Salvar no histórico
-                self.salvar_historico(arquivo, nome_tabela, 'carga', count_final)
+                self.salvar_historico(arquivo, nome_tabela, acao, count_final)
+                
+                if acao != 'sem_alteracao':
+                    self.tabelas_alteradas.add(nome_tabela)
+                    # Dimensão alterada vale para todos os exercícios (etl_control)
+                    controle_carga.registrar_global(conn, nome_tabela, caminho, acao)
+                    # Dimensões usadas nas regras de inconsistência de receita
+                    # afetam todos os períodos já carregados (recalculados no final)
+                    if nome_tabela in DIMENSOES_INCONSISTENCIAS:
+                        self.inconsistencias_pendentes = True
                 
                 return True
                 
             finally:
-                conn.close()
+                conn.execute("DROP TABLE IF EXISTS dim_arquivo")
                 
         except Exception as e:
             print(f"   ❌ Erro: {e}")
             return False
     
+    def processar_lote(self, itens, forcar=False):
+        """
+        Processa vários arquivos: pula os que têm o mesmo hash da última carga
+        (a menos que forcar), lê os demais em paralelo e grava tudo em uma
+        única conexão (o DuckDB aceita um escritor por vez).
+        """
+        pendentes = []
+        for item in itens:
+            info = self.mapeamentos.get(item['arquivo'])
+            if (not forcar and info and item.get('tabela_existe')
+                    and info.get('hash') and info.get('hash') == item.get('hash')):
+                print(f"   ⏭️ {item['arquivo']}: sem alterações desde {info.get('ultima_carga', '?')[:19]}")
+                continue
+            pendentes.append(item)
+        
+        if not pendentes:
+            print("\n✅ Nenhum arquivo alterado: nada a carregar")
+            return 0
+        
+        print(f"\n📖 Lendo {len(pendentes)} arquivo(s) com {self.paralelo} processo(s)...")
+        lidos = ler_arquivos_paralelo(pendentes, self.paralelo)
+        
+        processados = 0
+        with db_duckdb.carga():
+            conn = db_duckdb.get_connection(perfil='etl')
+            try:
+                for item in pendentes:
+                    df = lidos.get(item['arquivo'])
+                    if isinstance(df, Exception):
+                        print(f"\n📄 {item['arquivo']}\n   ❌ Erro na leitura: {df}")
+                        continue
+                    if self.processar_arquivo_com_aprendizado(item, df=df, conn=conn):
+                        processados += 1
+            finally:
+                conn.close()
+        return processados
+    
+    def invalidar_caches(self):
+        """
+        Resume as tabelas que mudaram nesta execução e recalcula as
+        inconsistências, se preciso. Os caches das telas não são alcançáveis
+        daqui: elas os renovam pela versão dos dados (etl_control).
+        """
+        if not self.tabelas_alteradas:
+            print("\n♻️ Nenhuma tabela alterada: caches mantidos")
+            return
+        
+        print(f"\n♻️ Tabelas alteradas: {', '.join(sorted(self.tabelas_alteradas))} "
+              f"(as telas releem as dimensões pela versão dos dados)")
+        
+        if self.inconsistencias_pendentes:
+            print("\n🔎 Recalculando inconsistências de receita...")
+            try:
+                recalcular_inconsistencias()
+                self.inconsistencias_pendentes = False
+            except Exception as e:
+                print(f"⚠️ Erro ao recalcular inconsistências: {e}")
+        self.tabelas_alteradas.clear()
+    
     def menu_principal(self):
         """Menu principal inteligente"""
         print("\n" + "="*80)
@@ -380,25 +741,25 @@ class CarregadorVerdadeiramenteInteligente:
         opcao = input("\nEscolha: ").strip()
         
         if opcao == '1':
-            for item in status['novos']:
-                self.processar_arquivo_com_aprendizado(item)
+            self.processar_lote(status['novos'], forcar=self.forcar)
         
         elif opcao == '2':
+            selecionados = []
             for item in status['modificados']:
                 print(f"\n📝 Arquivo modificado: {item['arquivo']}")
                 resp = input("   Atualizar? (s/N): ")
                 if resp.lower() == 's':
-                    self.processar_arquivo_com_aprendizado(item)
+                    selecionados.append(item)
+            self.processar_lote(selecionados, forcar=self.forcar)
         
         elif opcao == '3':
-            for item in status['conhecidos_ausentes']:
-                self.processar_arquivo_com_aprendizado(item)
+            self.processar_lote(status['conhecidos_ausentes'], forcar=self.forcar)
         
         elif opcao == '4':
+            # Os sincronizados entram, mas são pulados pelo hash (exceto com --forcar)
             todos = (status['novos'] + status['modificados'] + 
                     status['conhecidos_ausentes'] + status['conhecidos_existentes'])
-            for item in todos:
-                self.processar_arquivo_com_aprendizado(item)
+            self.processar_lote(todos, forcar=self.forcar)
         
         elif opcao == '5':
             print("\n📜 HISTÓRICO DE CARGAS:")
@@ -415,12 +776,45 @@ class CarregadorVerdadeiramenteInteligente:
                 self.salvar_mapeamentos()
                 print("🧹 Aprendizado resetado!")
         
+        self.invalidar_caches()
+        
         print("\n✨ Operação concluída!")
+    
+    def carga_automatica(self):
+        """Carga sem perguntas (agendada): novos, modificados e tabelas deletadas"""
+        print("\n" + "="*80)
+        print("🧠 CARREGADOR VERDADEIRAMENTE INTELIGENTE - CARGA AUTOMÁTICA")
+        print("="*80)
+        
+        status, tabelas = self.analisar_situacao_completa()
+        todos = (status['novos'] + status['modificados'] + 
+                status['conhecidos_ausentes'] + status['conhecidos_existentes'])
+        for item in status['desconhecidos_com_tabela']:
+            print(f"   ⚠️ {item['arquivo']}: tabela {item['tabela_sugerida']} já existe, "
+                  f"mapeie pelo menu interativo")
+        
+        processados = self.processar_lote(todos, forcar=self.forcar)
+        self.invalidar_caches()
+        print(f"\n✨ Operação concluída! {processados} arquivo(s) processado(s)")
 
 def main():
     """Função principal"""
+    parser = argparse.ArgumentParser(description='Carga das dimensões no DuckDB')
+    parser.add_argument('--auto', action='store_true',
+                        help='carrega novos e modificados sem menu nem perguntas')
+    parser.add_argument('--forcar', action='store_true',
+                        help='compara com a tabela mesmo os arquivos com hash igual ao da última carga')
+    parser.add_argument('--paralelo', type=int, default=4, help='arquivos lidos ao mesmo tempo')
+    args = parser.parse_args()
+    
     carregador = CarregadorVerdadeiramenteInteligente()
-    carregador.menu_principal()
+    carregador.forcar = args.forcar
+    carregador.paralelo = args.paralelo
+    if args.auto:
+        carregador.perguntar = False
+        carregador.carga_automatica()
+    else:
+        carregador.menu_principal()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,6 +2,19 @@
 """
 Script VERDADEIRAMENTE INTELIGENTE para carregar dimensões no PostgreSQL.
 Aprende e lembra dos mapeamentos arquivo->tabela usando um arquivo JSON.
+
+Carga incremental (mesmo fluxo de carga_dimensoes_duckdb.py):
+  - arquivos com o mesmo hash MD5 da última carga são pulados;
+  - os arquivos alterados são lidos em paralelo (processos), enviados com
+    COPY para uma tabela temporária e comparados com a tabela existente;
+    só as linhas novas, alteradas ou removidas são gravadas (DELETE +
+    INSERT pela chave, em uma transação);
+  - só as tabelas que de fato mudaram recebem gravações, o que muda a
+    versão dos dados (contadores de escrita do PostgreSQL): as telas (outros
+    processos) releem os dicionários de dimensões na próxima requisição.
+
+Uso:
+    python scripts/carga_dimensoes_postgres.py [--auto] [--forcar] [--paralelo N]
 """
 import sys
 import os
@@ -10,10 +23,13 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
+import argparse
+import io
 import logging
 import re
 import json
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from sqlalchemy import text
 
 # Importa a conexão do PostgreSQL
@@ -26,6 +42,141 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+def ler_arquivo_dimensao(caminho):
+    """Lê a planilha da dimensão com as colunas em minúsculas (executado em processo separado)"""
+    df = pd.read_excel(caminho)
+    df.columns = df.columns.str.lower()
+    return df
+
+
+def ler_arquivos_paralelo(itens, paralelo=4):
+    """
+    Lê as planilhas em paralelo. Retorna {arquivo: DataFrame ou exceção}.
+    A leitura de Excel é CPU (openpyxl), por isso processos e não threads.
+    """
+    if not itens:
+        return {}
+    if paralelo <= 1 or len(itens) == 1:
+        lidos = {}
+        for item in itens:
+            try:
+                lidos[item['arquivo']] = ler_arquivo_dimensao(item['caminho'])
+            except Exception as e:
+                lidos[item['arquivo']] = e
+        return lidos
+
+    lidos = {}
+    with ProcessPoolExecutor(max_workers=min(paralelo, len(itens))) as executor:
+        futuros = {item['arquivo']: executor.submit(ler_arquivo_dimensao, item['caminho']) for item in itens}
+        for arquivo, futuro in futuros.items():
+            try:
+                lidos[arquivo] = futuro.result()
+            except Exception as e:
+                lidos[arquivo] = e
+    return lidos
+
+
+def copiar_dataframe(cursor, tabela, df):
+    """Envia o DataFrame com COPY ... FROM STDIN (CSV; vazio = NULL)"""
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    colunas = ', '.join(f'"{c}"' for c in df.columns)
+    cursor.copy_expert(f"COPY {tabela} ({colunas}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def aplicar_dimensao(engine, nome_tabela, df, pk):
+    """
+    Grava o DataFrame na tabela aplicando só a diferença.
+
+    Retorna (ação, inseridos, removidos), com ação em 'criada', 'recriada',
+    'atualizada' ou 'sem_alteracao'. O arquivo vai por COPY para uma tabela
+    temporária com os tipos da tabela e a diferença é calculada com EXCEPT ALL:
+      - a chave é única no arquivo: apaga as linhas antigas das chaves
+        alteradas ou removidas e insere as novas versões;
+      - sem chave única ou com mudança de colunas: recria a tabela, e só se
+        houver diferença.
+    """
+    with engine.connect() as conn:
+        colunas_tabela = [row[0] for row in conn.execute(text("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = :tabela
+            ORDER BY ordinal_position
+        """), {'tabela': nome_tabela})]
+
+    def recriar(acao):
+        # Estrutura pelo pandas, dados por COPY
+        df.head(0).to_sql(name=nome_tabela, con=engine, if_exists='replace', index=False)
+        conexao = engine.raw_connection()
+        try:
+            with conexao.cursor() as cursor:
+                copiar_dataframe(cursor, nome_tabela, df)
+            conexao.commit()
+        finally:
+            conexao.close()
+        return acao, len(df), 0
+
+    if not colunas_tabela:
+        return recriar('criada')
+    if colunas_tabela != list(df.columns):
+        return recriar('recriada')
+
+    conexao = engine.raw_connection()
+    try:
+        with conexao.cursor() as cursor:
+            try:
+                cursor.execute(f"CREATE TEMP TABLE dim_nova (LIKE {nome_tabela}) ON COMMIT DROP")
+                copiar_dataframe(cursor, 'dim_nova', df)
+            except Exception:
+                # Tipos do arquivo incompatíveis com a tabela atual
+                conexao.rollback()
+                return recriar('recriada')
+
+            cursor.execute(f"""
+                CREATE TEMP TABLE dim_inserir ON COMMIT DROP AS
+                SELECT * FROM dim_nova EXCEPT ALL SELECT * FROM {nome_tabela}
+            """)
+            cursor.execute(f"""
+                CREATE TEMP TABLE dim_remover ON COMMIT DROP AS
+                SELECT * FROM {nome_tabela} EXCEPT ALL SELECT * FROM dim_nova
+            """)
+            cursor.execute("SELECT (SELECT COUNT(*) FROM dim_inserir), (SELECT COUNT(*) FROM dim_remover)")
+            inseridos, removidos = cursor.fetchone()
+
+            if inseridos == 0 and removidos == 0:
+                conexao.rollback()
+                return 'sem_alteracao', 0, 0
+
+            chave = f'"{pk}"'
+            cursor.execute(f"""
+                SELECT COUNT(*) = COUNT(DISTINCT {chave}) AND COUNT({chave}) = COUNT(*) FROM dim_nova
+            """)
+            chave_unica = pk in colunas_tabela and cursor.fetchone()[0]
+
+            if chave_unica:
+                cursor.execute(f"""
+                    DELETE FROM {nome_tabela}
+                    WHERE {chave} IN (SELECT {chave} FROM dim_remover UNION SELECT {chave} FROM dim_inserir)
+                """)
+                cursor.execute(f"""
+                    INSERT INTO {nome_tabela}
+                    SELECT * FROM dim_nova WHERE {chave} IN (SELECT {chave} FROM dim_inserir)
+                """)
+                acao = 'atualizada'
+            else:
+                cursor.execute(f"TRUNCATE {nome_tabela}")
+                cursor.execute(f"INSERT INTO {nome_tabela} SELECT * FROM dim_nova")
+                acao = 'recriada'
+        conexao.commit()
+        return acao, inseridos, removidos
+    except Exception:
+        conexao.rollback()
+        raise
+    finally:
+        conexao.close()
+
+
 class CarregadorInteligentePostgres:
     """Carregador que REALMENTE aprende e lembra dos mapeamentos no PostgreSQL"""
     
@@ -40,6 +191,14 @@ class CarregadorInteligentePostgres:
         # Carrega mapeamentos salvos
         self.mapeamentos = self.carregar_mapeamentos()
         self.historico = self.carregar_historico()
+        
+        # Tabelas cujo conteúdo mudou nesta execução (caches a invalidar)
+        self.tabelas_alteradas = set()
+        
+        # Execução sem perguntas (--auto), recarga forçada e leituras em paralelo
+        self.perguntar = True
+        self.forcar = False
+        self.paralelo = 4
     
     def carregar_mapeamentos(self):
         """Carrega mapeamentos salvos do arquivo JSON"""
@@ -249,21 +408,26 @@ class CarregadorInteligentePostgres:
                             'arquivo': nome_arquivo,
                             'tabela': nome_tabela,
                             'ultima_carga': info.get('ultima_carga', 'desconhecida'),
-                            'caminho': arquivo
+                            'caminho': arquivo,
+                            'hash': hash_atual,
+                            'tabela_existe': True
                         })
                     else:
                         status_arquivos['conhecidos_existentes'].append({
                             'arquivo': nome_arquivo,
                             'tabela': nome_tabela,
                             'ultima_carga': info.get('ultima_carga', 'desconhecida'),
-                            'caminho': arquivo
+                            'caminho': arquivo,
+                            'hash': hash_atual,
+                            'tabela_existe': True
                         })
                 else:
                     # Tabela foi deletada
                     status_arquivos['conhecidos_ausentes'].append({
                         'arquivo': nome_arquivo,
                         'tabela': nome_tabela,
-                        'caminho': arquivo
+                        'caminho': arquivo,
+                        'hash': hash_atual
                     })
             else:
                 # Arquivo novo/desconhecido
@@ -273,19 +437,24 @@ class CarregadorInteligentePostgres:
                     status_arquivos['desconhecidos_com_tabela'].append({
                         'arquivo': nome_arquivo,
                         'tabela_sugerida': nome_sugerido,
-                        'caminho': arquivo
+                        'caminho': arquivo,
+                        'hash': hash_atual
                     })
                 else:
                     status_arquivos['novos'].append({
                         'arquivo': nome_arquivo,
                         'tabela_sugerida': nome_sugerido,
-                        'caminho': arquivo
+                        'caminho': arquivo,
+                        'hash': hash_atual
                     })
         
         return status_arquivos, tabelas_banco
     
-    def processar_arquivo_com_aprendizado(self, info_arquivo):
-        """Processa arquivo e aprende o mapeamento"""
+    def processar_arquivo_com_aprendizado(self, info_arquivo, df=None):
+        """
+        Processa arquivo e aprende o mapeamento. df vem de processar_lote
+        (arquivo já lido em paralelo); sem ele, o arquivo é lido aqui.
+        """
         arquivo = info_arquivo['arquivo']
         caminho = info_arquivo['caminho']
         
@@ -300,8 +469,8 @@ class CarregadorInteligentePostgres:
         
         try:
             # Ler arquivo Excel
-            df = pd.read_excel(caminho)
-            df.columns = df.columns.str.lower()
+            if df is None:
+                df = ler_arquivo_dimensao(caminho)
             
             print(f"   📊 {len(df):,} linhas, {len(df.columns)} colunas")
             
@@ -311,45 +480,45 @@ class CarregadorInteligentePostgres:
             
             # Confirmar com usuário
             print(f"   📋 Tabela: {nome_tabela}")
-            resp = input("   Confirmar (Enter), digitar outro nome (n), ou pular (p)? ").strip()
-            
-            if resp.lower() == 'p':
-                print("   ⏭️ Pulado")
-                return False
-            elif resp.lower() == 'n':
-                novo_nome = input("   Digite o nome da tabela: ").strip()
-                if novo_nome:
-                    nome_tabela = novo_nome
-            
-            # Verificar se tabela existe
-            if self.verificar_tabela_existe(nome_tabela):
-                count = self.contar_registros(nome_tabela)
-                print(f"   ⚠️ Tabela '{nome_tabela}' existe com {count:,} registros")
-                resp = input("   Substituir? (s/N): ")
-                if resp.lower() != 's':
-                    print("   ⏭️ Mantendo tabela existente")
+            if self.perguntar:
+                resp = input("   Confirmar (Enter), digitar outro nome (n), ou pular (p)? ").strip()
+                
+                if resp.lower() == 'p':
+                    print("   ⏭️ Pulado")
                     return False
+                elif resp.lower() == 'n':
+                    novo_nome = input("   Digite o nome da tabela: ").strip()
+                    if novo_nome:
+                        nome_tabela = novo_nome
             
-            # Carregar no PostgreSQL
-            print(f"   📤 Carregando dados no PostgreSQL...")
-            df.to_sql(
-                name=nome_tabela,
-                con=self.engine,
-                if_exists='replace',
-                index=False,
-                method='multi',
-                chunksize=1000
-            )
+                # Verificar se tabela existe
+                if self.verificar_tabela_existe(nome_tabela):
+                    count = self.contar_registros(nome_tabela)
+                    print(f"   ⚠️ Tabela '{nome_tabela}' existe com {count:,} registros")
+                    resp = input("   Atualizar com as diferenças do arquivo? (s/N): ")
+                    if resp.lower() != 's':
+                        print("   ⏭️ Mantendo tabela existente")
+                        return False
+            
+            # Gravar no PostgreSQL só a diferença em relação à tabela atual
+            print(f"   📤 Comparando e gravando no PostgreSQL...")
+            acao, inseridos, removidos = aplicar_dimensao(self.engine, nome_tabela, df, pk)
             
             # Contar registros finais
             count_final = self.contar_registros(nome_tabela)
-            print(f"   ✅ {count_final:,} registros carregados!")
+            if acao == 'sem_alteracao':
+                print(f"   ✅ Conteúdo igual ao da tabela ({count_final:,} registros), nada gravado")
+            elif acao == 'atualizada':
+                print(f"   ✅ {inseridos:,} linhas inseridas/alteradas, {removidos:,} removidas "
+                      f"({count_final:,} registros)")
+            else:
+                print(f"   ✅ Tabela {acao}: {count_final:,} registros carregados!")
             
             # APRENDER e SALVAR o mapeamento
             self.mapeamentos[arquivo] = {
                 'tabela': nome_tabela,
                 'pk': pk,
-                'hash': self.calcular_hash_arquivo(caminho),
+                'hash': info_arquivo.get('hash') or self.calcular_hash_arquivo(caminho),
                 'ultima_carga': datetime.now().isoformat(),
                 'registros': count_final,
                 'colunas': list(df.columns),
@@ -358,7 +527,10 @@ class CarregadorInteligentePostgres:
             self.salvar_mapeamentos()
             
             # Salvar histórico
-            self.salvar_historico(arquivo, nome_tabela, 'carga', count_final)
+            self.salvar_historico(arquivo, nome_tabela, acao, count_final)
+            
+            if acao != 'sem_alteracao':
+                self.tabelas_alteradas.add(nome_tabela)
             
             return True
             
@@ -368,6 +540,50 @@ class CarregadorInteligentePostgres:
             traceback.print_exc()
             return False
     
+    def processar_lote(self, itens, forcar=False):
+        """
+        Processa vários arquivos: pula os que têm o mesmo hash da última carga
+        (a menos que forcar) e lê os demais em paralelo antes de gravar.
+        """
+        pendentes = []
+        for item in itens:
+            info = self.mapeamentos.get(item['arquivo'])
+            if (not forcar and info and item.get('tabela_existe')
+                    and info.get('hash') and info.get('hash') == item.get('hash')):
+                print(f"   ⏭️ {item['arquivo']}: sem alterações desde {info.get('ultima_carga', '?')[:19]}")
+                continue
+            pendentes.append(item)
+        
+        if not pendentes:
+            print("\n✅ Nenhum arquivo alterado: nada a carregar")
+            return 0
+        
+        print(f"\n📖 Lendo {len(pendentes)} arquivo(s) com {self.paralelo} processo(s)...")
+        lidos = ler_arquivos_paralelo(pendentes, self.paralelo)
+        
+        processados = 0
+        for item in pendentes:
+            df = lidos.get(item['arquivo'])
+            if isinstance(df, Exception):
+                print(f"\n📄 {item['arquivo']}\n   ❌ Erro na leitura: {df}")
+                continue
+            if self.processar_arquivo_com_aprendizado(item, df=df):
+                processados += 1
+        return processados
+    
+    def invalidar_caches(self):
+        """
+        Resume as tabelas que mudaram nesta execução. Os caches das telas não
+        são alcançáveis daqui: elas os renovam pela versão dos dados.
+        """
+        if not self.tabelas_alteradas:
+            print("\n♻️ Nenhuma tabela alterada: caches mantidos")
+            return
+        
+        print(f"\n♻️ Tabelas alteradas: {', '.join(sorted(self.tabelas_alteradas))} "
+              f"(as telas releem as dimensões pela versão dos dados)")
+        self.tabelas_alteradas.clear()
+    
     def menu_principal(self):
         """Menu principal do carregador inteligente"""
         print("\n" + "="*80)
@@ -425,34 +641,35 @@ class CarregadorInteligentePostgres:
             if not status['novos']:
                 print("\n✅ Não há arquivos novos!")
                 return
-            for item in status['novos']:
-                self.processar_arquivo_com_aprendizado(item)
+            self.processar_lote(status['novos'], forcar=self.forcar)
         
         elif opcao == '2':
             if not status['modificados']:
                 print("\n✅ Não há arquivos modificados!")
                 return
+            selecionados = []
             for item in status['modificados']:
                 print(f"\n📝 Arquivo modificado: {item['arquivo']}")
                 resp = input("   Atualizar? (s/N): ")
                 if resp.lower() == 's':
-                    self.processar_arquivo_com_aprendizado(item)
+                    selecionados.append(item)
+            self.processar_lote(selecionados, forcar=self.forcar)
         
         elif opcao == '3':
             if not status['conhecidos_ausentes']:
                 print("\n✅ Não há tabelas deletadas!")
                 return
-            for item in status['conhecidos_ausentes']:
-                self.processar_arquivo_com_aprendizado(item)
+            self.processar_lote(status['conhecidos_ausentes'], forcar=self.forcar)
         
         elif opcao == '4':
             todos = (status['novos'] + status['modificados'] + 
                     status['conhecidos_ausentes'])
+            if self.forcar:
+                todos += status['conhecidos_existentes']
             if not todos:
                 print("\n✅ Tudo está sincronizado!")
                 return
-            for item in todos:
-                self.processar_arquivo_com_aprendizado(item)
+            self.processar_lote(todos, forcar=self.forcar)
         
         elif opcao == '5':
             print("\n📜 HISTÓRICO DE CARGAS NO POSTGRESQL:")
@@ -474,11 +691,46 @@ class CarregadorInteligentePostgres:
                     json.dump({}, f, indent=2)
                 print("🧹 Aprendizado resetado!")
         
+        self.invalidar_caches()
+        
         print("\n✨ Operação concluída!")
+    
+    def carga_automatica(self):
+        """Carga sem perguntas (agendada): novos, modificados e tabelas deletadas"""
+        print("\n" + "="*80)
+        print("🧠 CARREGADOR INTELIGENTE - POSTGRESQL - CARGA AUTOMÁTICA")
+        print("="*80)
+        
+        status, tabelas = self.analisar_situacao_completa()
+        if not status:
+            return
+        todos = (status['novos'] + status['modificados'] + 
+                status['conhecidos_ausentes'] + status['conhecidos_existentes'])
+        for item in status['desconhecidos_com_tabela']:
+            print(f"   ⚠️ {item['arquivo']}: tabela {item['tabela_sugerida']} já existe, "
+                  f"mapeie pelo menu interativo")
+        
+        processados = self.processar_lote(todos, forcar=self.forcar)
+        self.invalidar_caches()
+        print(f"\n✨ Operação concluída! {processados} arquivo(s) processado(s)")
 
 def main():
     """Função principal"""
+    parser = argparse.ArgumentParser(description='Carga das dimensões no PostgreSQL')
+    parser.add_argument('--auto', action='store_true',
+                        help='carrega novos e modificados sem menu nem perguntas')
+    parser.add_argument('--forcar', action='store_true',
+                        help='compara com a tabela mesmo os arquivos com hash igual ao da última carga')
+    parser.add_argument('--paralelo', type=int, default=4, help='arquivos lidos ao mesmo tempo')
+    args = parser.parse_args()
+    
     carregador = CarregadorInteligentePostgres()
+    carregador.forcar = args.forcar
+    carregador.paralelo = args.paralelo
+    if args.auto:
+        carregador.perguntar = False
+        carregador.carga_automatica()
+        return
     
     if not carregador.mapeamentos:
         print("\n⚠️ ATENÇÃO: Nenhum mapeamento encontrado!")
@@ -9,6 +9,7 @@ import os
 from datetime import datetime
 from pathlib import Path
 import pandas as pd
+from sqlalchemy import text
 
 # Adiciona o diretório raiz do projeto ao path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -22,6 +23,21 @@ from app.modules.etl_receita_lancamento_duckdb import ETLReceitaLancamentoDuckDB
 from app.modules.etl_despesa_saldo_duckdb import ETLDespesaSaldoDuckDB
 from app.modules.etl_receita_saldo_duckdb import ETLReceitaSaldoDuckDB
 
+# Tabelas de lançamento consultadas pelo detalhamento por conta contábil e
+# exercício: igualdade na conta + intervalo em dalancamento usam o mesmo B-tree
+TABELAS_LANCAMENTO = ('despesa_lancamento', 'receita_lancamento')
+
+
+def criar_indice_lancamento(table_name):
+    """Cria (se ainda não existir) o índice (cocontacontabil, dalancamento)"""
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS idx_{table_name}_conta_data "
+            f"ON {table_name} (cocontacontabil, dalancamento)"
+        ))
+    print(f"   🗂️  Índice idx_{table_name}_conta_data verificado.")
+
+
 def carregar_dados_fato(nome_arquivo):
     """
     Processa um único arquivo de fato (Excel) e o carrega no PostgreSQL.
@@ -80,6 +96,9 @@ def carregar_dados_fato(nome_arquivo):
             chunksize=10000  # Insere os dados em lotes para melhor performance
         )
         
+        if table_name in TABELAS_LANCAMENTO:
+            criar_indice_lancamento(table_name)
+        
         print(f"🎉 SUCESSO! {len(df_transformado):,} registros foram carregados no PostgreSQL.")
 
     except Exception as e:
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Arquiva os exercícios fechados das tabelas fato em Parquet (um arquivo por
+tabela e ano, fora do uban.duckdb) e mantém as views que unem a tabela
+nativa e o histórico, ou restaura anos arquivados para a tabela nativa.
+
+Ficam no banco os anos quentes (HISTORICO_ANOS_QUENTES, padrão 2: o
+exercício atual e o anterior). Depois do arquivamento o banco passa pela
+manutenção (scripts/manutencao_duckdb.py).
+
+Uso:
+    python scripts/historico_parquet.py [--anos-quentes 2] [--tabelas receita_lancamento] [--compactar]
+    python scripts/historico_parquet.py --restaurar 2022 2023 [--tabelas receita_lancamento]
+    python scripts/historico_parquet.py --listar
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from app.modules.historico_parquet import historico_parquet, TABELAS_HISTORICO
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Histórico dos exercícios fechados em Parquet')
+    parser.add_argument('--anos-quentes', type=int,
+                        help='Exercícios mantidos no banco, contando o atual (padrão: HISTORICO_ANOS_QUENTES ou 2)')
+    parser.add_argument('--tabelas', nargs='+', choices=TABELAS_HISTORICO, help='Restringe a estas tabelas')
+    parser.add_argument('--compactar', action='store_true',
+                        help='Compacta o arquivo do banco depois do arquivamento (servidor parado)')
+    parser.add_argument('--restaurar', type=int, nargs='+', metavar='ANO',
+                        help='Traz estes exercícios de volta para a tabela nativa')
+    parser.add_argument('--listar', action='store_true', help='Lista os exercícios arquivados')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🗄️ HISTÓRICO DOS EXERCÍCIOS EM PARQUET")
+    print("=" * 70)
+
+    if args.restaurar:
+        for tabela in args.tabelas or TABELAS_HISTORICO:
+            historico_parquet.restaurar(tabela, args.restaurar)
+    elif not args.listar:
+        if historico_parquet.arquivar(
+            tabelas=args.tabelas, anos_quentes=args.anos_quentes, compactar=args.compactar
+        ) is None:
+            sys.exit(1)
+
+    print("📚 Exercícios arquivados:")
+    historico_parquet.listar()
+
+
+if __name__ == "__main__":
+    main()
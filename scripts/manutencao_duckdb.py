@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Manutenção do banco DuckDB: checkpoint, reescrita das tabelas com muitas
+linhas apagadas (opcionalmente ordenadas pelas chaves das consultas),
+estatísticas, compactação opcional do arquivo e relatório de tamanho e row
+groups antes e depois.
+
+Executada automaticamente ao final de cada carga (processar_arquivo, sem
+--ordenar); este comando serve para rodar manualmente ou ao fim da carga
+mensal com a reordenação completa.
+
+Uso:
+    python scripts/manutencao_duckdb.py [--ordenar] [--compactar] [--limite 0.10] [--tabelas receita_saldo despesa_saldo]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from app.modules.manutencao_duckdb import ManutencaoDuckDB
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manutenção do banco DuckDB (uban.duckdb)')
+    parser.add_argument('--ordenar', action='store_true',
+                        help='Reescreve todas as tabelas fato ordenadas pelas chaves das consultas')
+    parser.add_argument('--compactar', action='store_true',
+                        help='Copia o banco para um arquivo novo, devolvendo o espaço livre (servidor parado)')
+    parser.add_argument('--limite', type=float,
+                        help='Fração de linhas apagadas que força a reescrita (padrão: MANUTENCAO_LIMITE_EXCLUIDOS ou 0.10)')
+    parser.add_argument('--tabelas', nargs='+', help='Restringe a manutenção a estas tabelas')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🧹 MANUTENÇÃO DO BANCO DUCKDB")
+    print("=" * 70)
+
+    resultado = ManutencaoDuckDB(limite_excluidos=args.limite).executar(
+        ordenar=args.ordenar, tabelas=args.tabelas, compactar=args.compactar
+    )
+    if resultado is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Teste de carga: gunicorn com e sem preload (gunicorn.conf.py).
+
+Para cada modo, sobe o gunicorn com a configuração de produção, dispara
+requisições simultâneas contra as URLs por um tempo fixo e informa:
+  - vazão (requisições/s), latência mediana e p95, erros;
+  - memória de cada worker: RSS (total residente), PSS (com as páginas
+    compartilhadas divididas entre os processos) e USS (páginas exclusivas).
+    Com preload, as páginas herdadas do mestre ficam compartilhadas e o USS
+    por worker cai.
+
+A memória é lida de /proc/<pid>/smaps_rollup (Linux).
+
+Uso:
+    python scripts/teste_carga_gunicorn.py [segundos] [clientes] [workers] [url ...]
+"""
+import sys
+import os
+import time
+import statistics
+import subprocess
+import threading
+import urllib.request
+import urllib.error
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORTA = int(os.getenv('PORTA_TESTE', 8765))
+
+URLS_PADRAO = [
+    '/',
+    '/balanco-receita/',
+    '/relatorio-receita-fonte/',
+    '/comparativo-mensal/api/dados?ano=2025',
+]
+
+
+def ler_memoria(pid):
+    """Retorna (rss, pss, uss) em MB a partir de /proc/<pid>/smaps_rollup"""
+    campos = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for linha in f:
+            partes = linha.split()
+            if len(partes) >= 2 and partes[0].endswith(':') and partes[1].isdigit():
+                campos[partes[0][:-1]] = int(partes[1])
+    uss = campos.get('Private_Clean', 0) + campos.get('Private_Dirty', 0)
+    return campos.get('Rss', 0) / 1024, campos.get('Pss', 0) / 1024, uss / 1024
+
+
+def listar_workers(pid_mestre):
+    """PIDs dos processos filhos do mestre do gunicorn"""
+    filhos = []
+    for nome in os.listdir('/proc'):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f'/proc/{nome}/stat') as f:
+                # O nome do processo vem entre parênteses e pode conter espaços
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid_mestre:
+            filhos.append(int(nome))
+    return sorted(filhos)
+
+
+def aguardar_servidor(processo, workers, limite=60):
+    """Espera o servidor responder e todos os workers existirem"""
+    fim = time.time() + limite
+    while time.time() < fim:
+        if processo.poll() is not None:
+            raise RuntimeError("gunicorn encerrou durante a inicialização")
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{PORTA}/', timeout=2).read()
+            if len(listar_workers(processo.pid)) >= workers:
+                return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.3)
+    raise RuntimeError("gunicorn não respondeu a tempo")
+
+
+def disparar(urls, segundos, clientes):
+    """Clientes em threads fazendo requisições em sequência; retorna (latências em ms, erros)"""
+    latencias, erros = [], [0]
+    lock = threading.Lock()
+    fim = time.time() + segundos
+
+    def cliente(indice):
+        i = indice
+        while time.time() < fim:
+            url = f'http://127.0.0.1:{PORTA}{urls[i % len(urls)]}'
+            i += 1
+            inicio = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=60) as resposta:
+                    resposta.read()
+                ok = True
+            except (urllib.error.URLError, ConnectionError, OSError):
+                ok = False
+            decorrido = (time.perf_counter() - inicio) * 1000
+            with lock:
+                if ok:
+                    latencias.append(decorrido)
+                else:
+                    erros[0] += 1
+
+    threads = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencias, erros[0]
+
+
+def rodar_modo(preload, urls, segundos, clientes, workers):
+    env = dict(
+        os.environ,
+        PORT=str(PORTA),
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_PRELOAD='1' if preload else '0',
+        GUNICORN_MAX_REQUESTS='0',
+    )
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', os.devnull, 'run:app'],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        aguardar_servidor(processo, workers)
+        # Aquecimento: cada worker passa pelas telas antes da medição
+        disparar(urls, 2, clientes)
+        latencias, erros = disparar(urls, segundos, clientes)
+        memorias = [ler_memoria(pid) for pid in listar_workers(processo.pid)]
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+
+    print(f"\n📊 Preload {'ligado' if preload else 'desligado'} ({workers} workers)")
+    if latencias:
+        latencias.sort()
+        p95 = latencias[int(len(latencias) * 0.95) - 1]
+        print(f"   Vazão     : {len(latencias) / segundos:8.1f} req/s ({len(latencias):,} respostas, {erros} erros)")
+        print(f"   Latência  : mediana {statistics.median(latencias):7.1f} ms | p95 {p95:7.1f} ms")
+    else:
+        print(f"   Nenhuma resposta com sucesso ({erros} erros)")
+    for i, (rss, pss, uss) in enumerate(memorias, 1):
+        print(f"   Worker {i}  : RSS {rss:7.1f} MB | PSS {pss:7.1f} MB | USS {uss:7.1f} MB")
+    if memorias:
+        print(f"   Média USS : {statistics.mean(m[2] for m in memorias):7.1f} MB por worker")
+
+
+def main():
+    segundos = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    clientes = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    urls = sys.argv[4:] or URLS_PADRAO
+
+    print("=" * 70)
+    print("⏱️  TESTE DE CARGA - GUNICORN COM E SEM PRELOAD")
+    print("=" * 70)
+    print(f"Duração: {segundos}s | Clientes: {clientes} | Workers: {workers} | URLs: {len(urls)}")
+
+    for preload in (False, True):
+        rodar_modo(preload, urls, segundos, clientes, workers)
+
+
+if __name__ == "__main__":
+    main()
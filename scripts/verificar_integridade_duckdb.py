@@ -3,21 +3,42 @@
 Script para verificar integridade referencial entre tabelas fato e dimensão
 Identifica valores órfãos e problemas de relacionamento
 Versão corrigida: verifica apenas colunas que existem em cada tabela
+
+Cada tabela fato é lida uma única vez: um GROUP BY GROUPING SETS gera os
+valores distintos de todas as FKs (com a quantidade de registros de cada um)
+e cada conjunto é comparado (anti-join) com a sua dimensão. As tabelas fato
+são verificadas em paralelo.
+
+No modo incremental, só são verificados os períodos carregados desde a última
+execução (períodos novos ou com quantidade/data de carga diferente). Se uma
+dimensão da tabela mudou, a tabela inteira é verificada de novo. O estado fica
+em integridade_estado.json, ao lado do banco.
+
+Uso:
+    python scripts/verificar_integridade_duckdb.py [--incremental] [--paralelo N] [--sim]
 """
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import argparse
+import json
+import time
 import duckdb
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
+
+# Tabelas com periodo como coluna gerada (layout compacto): os filtros e
+# agrupamentos por período usam as colunas gravadas coexercicio e inmes
+TABELAS_PERIODO_GERADO = {'despesa_lancamento'}
 
 class VerificadorIntegridade:
     """Classe para verificar integridade referencial no DuckDB"""
     
     def __init__(self):
         self.db_path = Path("dados_brutos/fato/db_local/uban.duckdb")
+        self.estado_path = self.db_path.with_name("integridade_estado.json")
         
         # Mapeamento de relacionamentos específicos por tabela
         self.relacionamentos_por_tabela = {
@@ -94,6 +115,15 @@ class VerificadorIntegridade:
             'receita_saldo'
         ]
     
+    def carregar_catalogo(self, conn):
+        """Retorna {tabela: set(colunas)} de todas as tabelas do banco, em uma consulta"""
+        catalogo = {}
+        for tabela, coluna in conn.execute(
+            "SELECT table_name, column_name FROM information_schema.columns"
+        ).fetchall():
+            catalogo.setdefault(tabela, set()).add(coluna)
+        return catalogo
+    
     def verificar_tabela_existe(self, conn, tabela):
         """Verifica se uma tabela existe no banco"""
         query = f"""
@@ -103,80 +133,207 @@ class VerificadorIntegridade:
         """
         return conn.execute(query).fetchone()[0] > 0
     
-    def verificar_coluna_existe(self, conn, tabela, coluna):
-        """Verifica se uma coluna existe em uma tabela"""
-        query = f"""
-        SELECT COUNT(*) 
-        FROM information_schema.columns 
-        WHERE table_name = '{tabela}' AND column_name = '{coluna}'
+    def montar_consulta_tabela(self, tabela_fato, relacionamentos, filtro=''):
+        """
+        Consulta que verifica todas as FKs da tabela com uma única leitura:
+        uma linha por FK com distintos, registros, órfãos e exemplos
+        """
+        colunas = list(relacionamentos)
+        marcadores = ', '.join(f'GROUPING({c}) AS g_{c}' for c in colunas)
+        conjuntos = ', '.join(f'({c})' for c in colunas)
+        
+        verificacoes = [f"""
+            SELECT
+                '{coluna_fk}' AS coluna_fk,
+                COUNT(*) AS valores_distintos,
+                COALESCE(SUM(g.qtd), 0) AS total_fato,
+                COUNT(*) FILTER (WHERE d.chave IS NULL) AS valores_orfaos,
+                COALESCE(SUM(g.qtd) FILTER (WHERE d.chave IS NULL), 0) AS registros_orfaos,
+                (LIST(CAST(g.{coluna_fk} AS VARCHAR) ORDER BY g.qtd DESC)
+                    FILTER (WHERE d.chave IS NULL))[1:5] AS exemplos_orfaos
+            FROM grupos g
+            LEFT JOIN (SELECT DISTINCT {coluna_fk} AS chave FROM {tabela_dim}) d
+                ON g.{coluna_fk} = d.chave
+            WHERE g.g_{coluna_fk} = 0 AND g.{coluna_fk} IS NOT NULL
+            """ for coluna_fk, tabela_dim in relacionamentos.items()]
+        
+        return f"""
+        WITH grupos AS MATERIALIZED (
+            SELECT {', '.join(colunas)}, {marcadores}, COUNT(*) AS qtd
+            FROM {tabela_fato}
+            {filtro}
+            GROUP BY GROUPING SETS ({conjuntos})
+        )
+        {' UNION ALL '.join(verificacoes)}
         """
-        return conn.execute(query).fetchone()[0] > 0
     
-    def verificar_integridade_relacionamento(self, conn, tabela_fato, coluna_fk, tabela_dim):
-        """Verifica integridade de um relacionamento específico"""
-        resultado = {
-            'tabela_fato': tabela_fato,
-            'coluna_fk': coluna_fk,
-            'tabela_dimensao': tabela_dim,
-            'status': 'OK',
-            'total_fato': 0,
-            'valores_distintos': 0,
-            'valores_orfaos': 0,
-            'exemplos_orfaos': []
-        }
+    def _executar_consulta_tabela(self, conn, tabela_fato, relacionamentos, periodos):
+        """Executa a verificação das FKs e retorna {coluna_fk: linha do resultado}"""
+        filtro, params = '', []
+        if periodos is not None and tabela_fato in TABELAS_PERIODO_GERADO:
+            filtro = "WHERE " + " OR ".join("(coexercicio = ? AND inmes = ?)" for _ in periodos)
+            params = [int(parte) for periodo in periodos for parte in str(periodo).split('-')]
+        elif periodos is not None:
+            filtro = f"WHERE periodo IN ({', '.join('?' for _ in periodos)})"
+            params = list(periodos)
+        cursor = conn.execute(self.montar_consulta_tabela(tabela_fato, relacionamentos, filtro), params)
+        nomes = [d[0] for d in cursor.description]
+        return {linha[0]: dict(zip(nomes, linha)) for linha in cursor.fetchall()}
+    
+    def verificar_tabela(self, conn, tabela_fato, relacionamentos, catalogo, periodos=None):
+        """
+        Verifica todos os relacionamentos de uma tabela fato com uma leitura.
+        periodos: lista de períodos (AAAA-MM) a verificar; None verifica tudo
+        """
+        resultados = []
+        verificaveis = {}
+        colunas_fato = catalogo.get(tabela_fato, set())
         
-        try:
-            # Verificar se a tabela dimensão existe
-            if not self.verificar_tabela_existe(conn, tabela_dim):
-                resultado['status'] = 'TABELA_DIM_NAO_EXISTE'
-                return resultado
+        for coluna_fk, tabela_dim in relacionamentos.items():
+            resultado = {
+                'tabela_fato': tabela_fato,
+                'coluna_fk': coluna_fk,
+                'tabela_dimensao': tabela_dim,
+                'status': 'OK',
+                'total_fato': 0,
+                'valores_distintos': 0,
+                'valores_orfaos': 0,
+                'registros_orfaos': 0,
+                'exemplos_orfaos': []
+            }
+            resultados.append(resultado)
             
-            # Verificar se a coluna existe na tabela fato
-            if not self.verificar_coluna_existe(conn, tabela_fato, coluna_fk):
+            if tabela_dim not in catalogo:
+                resultado['status'] = 'TABELA_DIM_NAO_EXISTE'
+            elif coluna_fk not in colunas_fato:
                 resultado['status'] = 'COLUNA_FK_NAO_EXISTE'
-                return resultado
-            
-            # Contar total de registros e valores distintos na tabela fato
-            query_totais = f"""
-            SELECT 
-                COUNT(*) as total,
-                COUNT(DISTINCT {coluna_fk}) as distintos
-            FROM {tabela_fato}
-            WHERE {coluna_fk} IS NOT NULL
-            """
-            totais = conn.execute(query_totais).fetchone()
-            resultado['total_fato'] = totais[0]
-            resultado['valores_distintos'] = totais[1]
-            
-            # Verificar valores órfãos (que não existem na dimensão)
-            query_orfaos = f"""
-            SELECT DISTINCT f.{coluna_fk}
-            FROM {tabela_fato} f
-            LEFT JOIN {tabela_dim} d ON f.{coluna_fk} = d.{coluna_fk}
-            WHERE f.{coluna_fk} IS NOT NULL
-            AND d.{coluna_fk} IS NULL
-            """
-            
-            orfaos = conn.execute(query_orfaos).fetchall()
-            resultado['valores_orfaos'] = len(orfaos)
-            
-            # Pegar alguns exemplos de valores órfãos
-            if orfaos:
-                resultado['exemplos_orfaos'] = [str(o[0]) for o in orfaos[:5]]
+            elif coluna_fk not in catalogo[tabela_dim]:
+                resultado['status'] = 'ERRO'
+                resultado['erro'] = f"coluna {coluna_fk} não existe em {tabela_dim}"
+            else:
+                verificaveis[coluna_fk] = tabela_dim
+        
+        if not verificaveis or periodos == []:
+            return resultados
+        
+        try:
+            linhas = self._executar_consulta_tabela(conn, tabela_fato, verificaveis, periodos)
+        except Exception:
+            # Uma FK com problema (ex.: tipos incompatíveis) não pode esconder as
+            # demais: verifica cada uma separadamente
+            linhas = {}
+            for coluna_fk, tabela_dim in verificaveis.items():
+                try:
+                    linhas.update(self._executar_consulta_tabela(
+                        conn, tabela_fato, {coluna_fk: tabela_dim}, periodos
+                    ))
+                except Exception as e:
+                    linhas[coluna_fk] = {'erro': str(e)}
+        
+        for resultado in resultados:
+            linha = linhas.get(resultado['coluna_fk'])
+            if linha is None:
+                continue
+            if 'erro' in linha:
+                resultado['status'] = 'ERRO'
+                resultado['erro'] = linha['erro']
+                continue
+            for campo in ('total_fato', 'valores_distintos', 'valores_orfaos', 'registros_orfaos'):
+                resultado[campo] = int(linha[campo] or 0)
+            resultado['exemplos_orfaos'] = list(linha['exemplos_orfaos'] or [])
+            if resultado['valores_orfaos']:
                 resultado['status'] = 'PROBLEMAS_ENCONTRADOS'
-            
-        except Exception as e:
-            resultado['status'] = 'ERRO'
-            resultado['erro'] = str(e)
         
-        return resultado
+        return resultados
+    
+    def verificar_integridade_relacionamento(self, conn, tabela_fato, coluna_fk, tabela_dim):
+        """Verifica integridade de um relacionamento específico"""
+        return self.verificar_tabela(
+            conn, tabela_fato, {coluna_fk: tabela_dim}, self.carregar_catalogo(conn)
+        )[0]
+    
+    def impressao_tabela(self, conn, tabela_fato, catalogo):
+        """
+        Estado da tabela para o modo incremental: por período, a quantidade
+        de registros e a última data de carga; por dimensão, a quantidade de
+        registros
+        """
+        colunas = catalogo.get(tabela_fato, set())
+        if 'periodo' not in colunas:
+            return None
+        
+        carga = "CAST(MAX(data_carga) AS VARCHAR)" if 'data_carga' in colunas else "NULL"
+        if tabela_fato in TABELAS_PERIODO_GERADO:
+            # Agrupa pelas colunas gravadas e monta o período só por grupo
+            consulta = f"""
+                SELECT CAST(coexercicio AS VARCHAR) || '-' || lpad(CAST(inmes AS VARCHAR), 2, '0'),
+                    COUNT(*), {carga}
+                FROM {tabela_fato}
+                GROUP BY coexercicio, inmes
+            """
+        else:
+            consulta = f"SELECT periodo, COUNT(*), {carga} FROM {tabela_fato} GROUP BY periodo"
+        periodos = {
+            periodo: [qtd, ultima_carga]
+            for periodo, qtd, ultima_carga in conn.execute(consulta).fetchall()
+        }
+        dimensoes = {
+            tabela_dim: conn.execute(f"SELECT COUNT(*) FROM {tabela_dim}").fetchone()[0]
+            for tabela_dim in sorted(set(self.relacionamentos_por_tabela.get(tabela_fato, {}).values()))
+            if tabela_dim in catalogo
+        }
+        return {'periodos': periodos, 'dimensoes': dimensoes}
     
-    def executar_verificacao(self):
-        """Executa verificação completa de integridade"""
+    def periodos_alterados(self, impressao, anterior):
+        """
+        Períodos a verificar no modo incremental; None quando a tabela deve
+        ser verificada inteira (sem estado anterior ou dimensão alterada)
+        """
+        if not impressao or not anterior or impressao['dimensoes'] != anterior.get('dimensoes'):
+            return None
+        periodos_anteriores = anterior.get('periodos', {})
+        return sorted(
+            periodo for periodo, estado in impressao['periodos'].items()
+            if periodos_anteriores.get(periodo) != estado
+        )
+    
+    def carregar_estado(self):
+        """Estado da última verificação (modo incremental)"""
+        try:
+            with open(self.estado_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def salvar_estado(self, estado):
+        with open(self.estado_path, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False, indent=2)
+    
+    def verificar_tabela_fato(self, conn, tabela_fato, catalogo, estado_anterior, incremental):
+        """
+        Verifica uma tabela fato em um cursor próprio (pode rodar em paralelo
+        com as demais). Retorna (resultados, períodos verificados, impressão, segundos)
+        """
+        inicio = time.perf_counter()
+        cursor = conn.cursor()
+        try:
+            impressao = self.impressao_tabela(cursor, tabela_fato, catalogo)
+            periodos = None
+            if incremental:
+                periodos = self.periodos_alterados(impressao, estado_anterior.get(tabela_fato))
+            relacionamentos = self.relacionamentos_por_tabela.get(tabela_fato, {})
+            resultados = self.verificar_tabela(cursor, tabela_fato, relacionamentos, catalogo, periodos)
+        finally:
+            cursor.close()
+        return resultados, periodos, impressao, time.perf_counter() - inicio
+    
+    def executar_verificacao(self, incremental=False, paralelo=4, perguntar=True):
+        """Executa verificação de integridade (completa ou incremental)"""
         print("=" * 80)
         print("VERIFICAÇÃO DE INTEGRIDADE REFERENCIAL - DUCKDB")
         print("=" * 80)
         print(f"Banco de dados: {self.db_path}")
+        print(f"Modo: {'incremental' if incremental else 'completo'} | Tabelas em paralelo: {paralelo}")
         print(f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
         
         if not self.db_path.exists():
@@ -188,6 +345,21 @@ class VerificadorIntegridade:
         
         try:
             conn = duckdb.connect(str(self.db_path), read_only=True)
+            catalogo = self.carregar_catalogo(conn)
+            estado_anterior = self.carregar_estado().get('tabelas', {}) if incremental else {}
+            
+            # Todas as tabelas fato em paralelo, cada uma com uma leitura
+            tabelas = [t for t in self.tabelas_fato if t in catalogo]
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(1, paralelo)) as executor:
+                futuros = {
+                    tabela: executor.submit(
+                        self.verificar_tabela_fato, conn, tabela, catalogo, estado_anterior, incremental
+                    )
+                    for tabela in tabelas
+                }
+                execucoes = {tabela: futuro.result() for tabela, futuro in futuros.items()}
+            tempo_total = time.perf_counter() - inicio
             
             # Abrir arquivo de relatório
             with open(output_file, 'w', encoding='utf-8') as f:
@@ -201,39 +373,42 @@ class VerificadorIntegridade:
                 total_verificacoes = 0
                 total_problemas = 0
                 problemas_detalhados = []
+                estado_atual = dict(self.carregar_estado().get('tabelas', {}))
                 
                 for tabela_fato in self.tabelas_fato:
-                    print(f"\n📊 Verificando tabela: {tabela_fato}")
+                    print(f"\n📊 Tabela: {tabela_fato}")
                     f.write(f"\n{'='*100}\n")
                     f.write(f"TABELA: {tabela_fato.upper()}\n")
                     f.write(f"{'='*100}\n\n")
                     
-                    if not self.verificar_tabela_existe(conn, tabela_fato):
+                    if tabela_fato not in execucoes:
                         print(f"   ⚠️ Tabela não existe!")
                         f.write("❌ TABELA NÃO EXISTE NO BANCO\n")
                         continue
                     
-                    # Obter relacionamentos específicos desta tabela
-                    relacionamentos = self.relacionamentos_por_tabela.get(tabela_fato, {})
+                    verificacoes_tabela, periodos, impressao, segundos = execucoes[tabela_fato]
                     
-                    # Mostrar informação sobre colunas verificadas
-                    f.write(f"Verificando {len(relacionamentos)} relacionamentos específicos desta tabela\n\n")
+                    # Mostrar informação sobre colunas e períodos verificados
+                    if periodos is None:
+                        escopo = "todos os períodos"
+                    elif periodos:
+                        escopo = f"períodos carregados desde a última verificação: {', '.join(periodos)}"
+                    else:
+                        escopo = "nenhum período novo desde a última verificação"
+                    print(f"   {len(verificacoes_tabela)} relacionamentos, {escopo} ({segundos:.2f}s)")
+                    f.write(f"Verificando {len(verificacoes_tabela)} relacionamentos específicos desta tabela\n")
+                    f.write(f"Escopo: {escopo}\n\n")
                     
-                    # Verificar cada relacionamento
-                    verificacoes_tabela = []
-                    
-                    for coluna_fk, tabela_dim in relacionamentos.items():
-                        print(f"   Verificando: {coluna_fk} -> {tabela_dim}")
-                        resultado = self.verificar_integridade_relacionamento(
-                            conn, tabela_fato, coluna_fk, tabela_dim
-                        )
-                        verificacoes_tabela.append(resultado)
+                    for resultado in verificacoes_tabela:
                         total_verificacoes += 1
-                        
                         if resultado['status'] == 'PROBLEMAS_ENCONTRADOS':
                             total_problemas += 1
                             problemas_detalhados.append(resultado)
                     
+                    # Estado para o próximo modo incremental (só sem erros)
+                    if impressao and not any(v['status'] == 'ERRO' for v in verificacoes_tabela):
+                        estado_atual[tabela_fato] = impressao
+                    
                     # Escrever resultados da tabela
                     f.write(f"{'Coluna FK':<20} {'Tabela Dimensão':<35} {'Status':<20} {'Valores Órfãos':<15}\n")
                     f.write("-" * 90 + "\n")
@@ -278,12 +453,13 @@ class VerificadorIntegridade:
                         f.write(f"\n{problema['tabela_fato']}.{problema['coluna_fk']} -> "
                                f"{problema['tabela_dimensao']}\n")
                         f.write("-" * 50 + "\n")
-                        f.write(f"Total de registros afetados: {problema['total_fato']:,}\n")
+                        f.write(f"Registros com a FK preenchida: {problema['total_fato']:,}\n")
+                        f.write(f"Total de registros afetados: {problema['registros_orfaos']:,}\n")
                         f.write(f"Valores distintos: {problema['valores_distintos']:,}\n")
                         f.write(f"Valores órfãos: {problema['valores_orfaos']:,}\n")
                         
                         if problema['exemplos_orfaos']:
-                            f.write(f"Exemplos de valores órfãos: {', '.join(problema['exemplos_orfaos'])}\n")
+                            f.write(f"Exemplos de valores órfãos (mais frequentes): {', '.join(problema['exemplos_orfaos'])}\n")
                 
                 # Resumo final
                 f.write("\n\n" + "="*100 + "\n")
@@ -308,8 +484,9 @@ class VerificadorIntegridade:
                 f.write("="*100 + "\n")
             
             conn.close()
+            self.salvar_estado({'data': datetime.now().isoformat(timespec='seconds'), 'tabelas': estado_atual})
             
-            print(f"\n✅ Verificação concluída!")
+            print(f"\n✅ Verificação concluída em {tempo_total:.2f}s!")
             print(f"📄 Relatório salvo em: {output_file}")
             
             # Mostrar resumo na tela
@@ -322,9 +499,10 @@ class VerificadorIntegridade:
                 print(f"   Consulte o relatório para mais detalhes.")
                 
                 # Criar script SQL de correção?
-                resposta = input("\nDeseja gerar script SQL para análise dos problemas? (s/N): ")
-                if resposta.lower() == 's':
-                    self.gerar_script_analise(problemas_detalhados)
+                if perguntar:
+                    resposta = input("\nDeseja gerar script SQL para análise dos problemas? (s/N): ")
+                    if resposta.lower() == 's':
+                        self.gerar_script_analise(problemas_detalhados)
             
         except Exception as e:
             print(f"\n❌ Erro durante a verificação: {e}")
@@ -372,6 +550,13 @@ class VerificadorIntegridade:
 
 def main():
     """Função principal"""
+    parser = argparse.ArgumentParser(description='Verifica a integridade referencial das tabelas fato')
+    parser.add_argument('--incremental', action='store_true',
+                        help='verifica só os períodos carregados desde a última execução')
+    parser.add_argument('--paralelo', type=int, default=4, help='tabelas fato verificadas ao mesmo tempo')
+    parser.add_argument('--sim', action='store_true', help='não faz perguntas (execução agendada)')
+    args = parser.parse_args()
+    
     print("\n🔍 VERIFICADOR DE INTEGRIDADE REFERENCIAL")
     print("Este script irá verificar:")
     print("  - Se todos os valores FK nas tabelas fato existem nas dimensões")
@@ -379,13 +564,14 @@ def main():
     print("  - Gerar relatório detalhado dos problemas\n")
     print("CORREÇÃO: Agora verifica apenas colunas que existem em cada tabela")
     
-    resposta = input("\nIniciar verificação? (S/n): ")
-    if resposta.lower() == 'n':
-        print("\n❌ Operação cancelada.")
-        return
+    if not args.sim:
+        resposta = input("\nIniciar verificação? (S/n): ")
+        if resposta.lower() == 'n':
+            print("\n❌ Operação cancelada.")
+            return
     
     verificador = VerificadorIntegridade()
-    verificador.executar_verificacao()
+    verificador.executar_verificacao(incremental=args.incremental, paralelo=args.paralelo, perguntar=not args.sim)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file